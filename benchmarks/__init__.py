@@ -0,0 +1,16 @@
+"""Reproducible CPU benchmarks of the training stack.
+
+Suites:
+
+* `micro` (`benchmarks.micro_benchmarks`): `RolloutStorage.compute_returns`,
+  `RolloutStorage.recurrent_generator`, `batch_observations`,
+  `Memory.sampler_select` and `PPO.loss`.
+* `ipc` (`benchmarks.ipc_benchmarks`): frames per second of synthetic image
+  observations moved from task sampler processes by `VectorSampledTasks`.
+* `fps` (`benchmarks.fps_benchmarks`): end-to-end training frames per second
+  in LightHouse, MiniGrid and synthetic tasks (`plugins.synthetic_plugin`)
+  for several numbers of task samplers and samplers per process.
+
+Run them with `python -m benchmarks run` and compare two runs with
+`python -m benchmarks compare` (see `benchmarks.__main__`).
+"""
@@ -0,0 +1,181 @@
+"""Runs the benchmark suites or compares saved results.
+
+```bash
+# Run all suites and save the results
+python -m benchmarks run --output benchmark_results/before.json
+# Run the microbenchmarks only, with smaller (faster) scenarios
+python -m benchmarks run --suites micro --quick --output benchmark_results/after.json
+# Compare two runs (exits with status 1 on regressions with --fail_on_regression)
+python -m benchmarks compare benchmark_results/before.json benchmark_results/after.json
+```
+"""
+import argparse
+import sys
+import time
+from typing import Any, Dict, List
+
+import torch
+
+from benchmarks.benchmark_utils import (
+    compare_results,
+    format_comparison,
+    format_results,
+    load_results,
+    machine_metadata,
+    save_results,
+)
+from utils.system import get_logger, init_logging
+
+SUITES = ["micro", "ipc", "fps"]
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description="allenact benchmarks", formatter_class=argparse.RawTextHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="run benchmark suites")
+    run_parser.add_argument(
+        "--suites",
+        nargs="+",
+        choices=SUITES,
+        default=SUITES,
+        help="suites to run: microbenchmarks (`micro`), sampler-to-trainer observation throughput (`ipc`)"
+        " and end-to-end training frames per second (`fps`)",
+    )
+    run_parser.add_argument(
+        "--output",
+        type=str,
+        default="benchmark_results/{}.json".format(time.strftime("%Y-%m-%d_%H-%M-%S")),
+        help="path of the results file",
+    )
+    run_parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="run fewer and smaller scenarios (e.g. to check the benchmarks run)",
+    )
+    run_parser.add_argument(
+        "--min_seconds",
+        type=float,
+        default=1.0,
+        help="minimum seconds measured per micro and ipc benchmark",
+    )
+    run_parser.add_argument(
+        "--repeats", type=int, default=1, help="repeats per fps benchmark"
+    )
+    run_parser.add_argument(
+        "--torch_threads",
+        type=int,
+        default=None,
+        help="number of intra-op threads used by torch (torch's default if not given)",
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="compare the results of two runs"
+    )
+    compare_parser.add_argument("baseline", type=str, help="reference results file")
+    compare_parser.add_argument("candidate", type=str, help="results file to evaluate")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.05,
+        help="relative change beyond which benchmarks are flagged as improved or regressed",
+    )
+    compare_parser.add_argument(
+        "--fail_on_regression",
+        action="store_true",
+        help="exit with status 1 if any benchmark regressed",
+    )
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        sys.exit(2)
+    return args
+
+
+def run(args) -> None:
+    if args.torch_threads is not None:
+        torch.set_num_threads(args.torch_threads)
+
+    metadata: Dict[str, Any] = machine_metadata()
+    metadata["suites"] = args.suites
+    metadata["quick"] = args.quick
+
+    results: List[Dict[str, Any]] = []
+    for suite in args.suites:
+        get_logger().info("Running {} benchmarks".format(suite))
+        # Suites are imported lazily, as they depend on different plugins
+        if suite == "micro":
+            from benchmarks.micro_benchmarks import run_micro_benchmarks
+
+            suite_results = run_micro_benchmarks(
+                quick=args.quick, min_seconds=args.min_seconds
+            )
+        elif suite == "ipc":
+            from benchmarks.ipc_benchmarks import run_ipc_benchmarks
+
+            suite_results = run_ipc_benchmarks(
+                quick=args.quick, min_seconds=args.min_seconds
+            )
+        else:
+            from benchmarks.fps_benchmarks import run_fps_benchmarks
+
+            suite_results = run_fps_benchmarks(quick=args.quick, repeats=args.repeats)
+
+        get_logger().info(
+            "{} benchmarks:\n{}".format(suite, format_results(suite_results))
+        )
+        results.extend(suite_results)
+
+    save_results(args.output, results, metadata)
+    get_logger().info("Saved {} results in {}".format(len(results), args.output))
+
+
+def compare(args) -> int:
+    baseline = load_results(args.baseline)
+    candidate = load_results(args.candidate)
+
+    for key in ["hostname", "processor", "cpu_count", "torch", "torch_num_threads"]:
+        if baseline["metadata"].get(key) != candidate["metadata"].get(key):
+            get_logger().warning(
+                "Results measured with different {}: {} (baseline) vs {} (candidate)".format(
+                    key, baseline["metadata"].get(key), candidate["metadata"].get(key)
+                )
+            )
+
+    comparison = compare_results(
+        baseline["results"], candidate["results"], threshold=args.threshold
+    )
+    get_logger().info(
+        "{} ({}) vs {} ({}):\n{}".format(
+            args.baseline,
+            baseline["metadata"].get("git_sha"),
+            args.candidate,
+            candidate["metadata"].get("git_sha"),
+            format_comparison(comparison),
+        )
+    )
+
+    num_regressed = sum(row["status"] == "regressed" for row in comparison)
+    num_improved = sum(row["status"] == "improved" for row in comparison)
+    get_logger().info(
+        "{} benchmarks compared: {} improved, {} regressed (threshold {:.0%})".format(
+            len(comparison), num_improved, num_regressed, args.threshold
+        )
+    )
+    return 1 if args.fail_on_regression and num_regressed > 0 else 0
+
+
+def main() -> None:
+    init_logging("info")
+    args = get_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
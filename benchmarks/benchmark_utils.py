@@ -0,0 +1,281 @@
+"""Measurement, persistence and comparison of benchmark results.
+
+A benchmark result is a dictionary with the benchmark's `name`, its
+`params`, the measured `value` (in `unit`), whether higher values are
+better and the raw measurements, e.g.
+
+```python
+dict(
+    name="compute_returns",
+    params=dict(num_steps=128, num_samplers=32),
+    unit="s",
+    higher_is_better=False,
+    value=0.0123,  # median
+    samples=[...],
+)
+```
+
+Results are saved together with the metadata of the machine they were
+measured on (see `machine_metadata`), and results with the same name and
+params in two files can be compared with `compare_results`.
+"""
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from constants import ABS_PATH_OF_TOP_LEVEL_DIR
+
+RESULTS_FORMAT_VERSION = 1
+
+
+def set_benchmark_seed(seed: int = 0) -> None:
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def _git_revision() -> Dict[str, Any]:
+    try:
+        sha = (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"],
+                cwd=ABS_PATH_OF_TOP_LEVEL_DIR,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode("utf-8")
+            .strip()
+        )
+        dirty = (
+            len(
+                subprocess.check_output(
+                    ["git", "status", "--porcelain", "--untracked-files=no"],
+                    cwd=ABS_PATH_OF_TOP_LEVEL_DIR,
+                    stderr=subprocess.DEVNULL,
+                ).strip()
+            )
+            > 0
+        )
+        return dict(git_sha=sha, git_dirty=dirty)
+    except (OSError, subprocess.CalledProcessError):
+        return dict(git_sha=None, git_dirty=None)
+
+
+def machine_metadata() -> Dict[str, Any]:
+    """Describes the machine, software and code revision the benchmarks run
+    on."""
+    metadata: Dict[str, Any] = OrderedDict(
+        hostname=socket.gethostname(),
+        platform=platform.platform(),
+        processor=platform.processor() or platform.machine(),
+        cpu_count=os.cpu_count(),
+        python=platform.python_version(),
+        torch=torch.__version__,
+        numpy=np.__version__,
+        torch_num_threads=torch.get_num_threads(),
+        cuda_available=torch.cuda.is_available(),
+        date=time.strftime("%Y-%m-%d %H:%M:%S %z"),
+    )
+    if hasattr(os, "sched_getaffinity"):
+        metadata["cpu_affinity_count"] = len(os.sched_getaffinity(0))  # type: ignore
+    metadata.update(_git_revision())
+    return metadata
+
+
+def measure(
+    fn: Callable[[], Any],
+    warmup: int = 1,
+    min_repeats: int = 5,
+    min_seconds: float = 0.5,
+    max_repeats: int = 1000,
+) -> List[float]:
+    """Wall-clock seconds of calls to `fn`, after `warmup` untimed calls.
+
+    Calls are repeated at least `min_repeats` times and until `min_seconds`
+    have been spent in them (or `max_repeats` calls).
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples: List[float] = []
+    total = 0.0
+    while len(samples) < max_repeats and (
+        len(samples) < min_repeats or total < min_seconds
+    ):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+        total += samples[-1]
+    return samples
+
+
+def make_result(
+    name: str,
+    params: Dict[str, Any],
+    samples: Sequence[float],
+    unit: str = "s",
+    higher_is_better: bool = False,
+    **extras: Any
+) -> Dict[str, Any]:
+    """Builds a result from the measured `samples`, with their median as
+    value."""
+    result: Dict[str, Any] = OrderedDict(
+        name=name,
+        params=OrderedDict(sorted(params.items())),
+        unit=unit,
+        higher_is_better=higher_is_better,
+        value=statistics.median(samples),
+        mean=statistics.mean(samples),
+        stdev=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        min=min(samples),
+        max=max(samples),
+        repeats=len(samples),
+        samples=list(samples),
+    )
+    result.update(extras)
+    return result
+
+
+def result_key(result: Dict[str, Any]) -> Tuple[str, str]:
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def format_params(params: Dict[str, Any]) -> str:
+    return ",".join("{}={}".format(k, v) for k, v in sorted(params.items()))
+
+
+def save_results(
+    path: str, results: List[Dict[str, Any]], metadata: Optional[Dict] = None
+) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(
+            OrderedDict(
+                version=RESULTS_FORMAT_VERSION,
+                metadata=metadata if metadata is not None else machine_metadata(),
+                results=results,
+            ),
+            f,
+            indent=2,
+        )
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, "r") as f:
+        data = json.load(f)
+    assert (
+        data.get("version") == RESULTS_FORMAT_VERSION
+    ), "Unsupported benchmark results version {} in {}".format(
+        data.get("version"), path
+    )
+    return data
+
+
+def compare_results(
+    baseline: List[Dict[str, Any]],
+    candidate: List[Dict[str, Any]],
+    threshold: float = 0.05,
+) -> List[Dict[str, Any]]:
+    """Compares the results with the same name and params in `baseline` and
+    `candidate`.
+
+    # Parameters
+
+    baseline : Results of the reference run.
+    candidate : Results of the run to evaluate.
+    threshold : Relative change (of the median) beyond which a result is flagged as an
+        improvement or a regression.
+
+    # Returns
+
+    A list with, for each benchmark in both runs, the `name`, `params`, `unit`, `baseline`
+    and `candidate` values, the relative `change` of the candidate value, the `speedup`
+    (larger is better) and the `status` (`"improved"`, `"regressed"` or `"unchanged"`).
+    """
+    candidate_by_key = OrderedDict((result_key(r), r) for r in candidate)
+
+    comparison: List[Dict[str, Any]] = []
+    for base in baseline:
+        cand = candidate_by_key.get(result_key(base))
+        if cand is None:
+            continue
+        change = (
+            (cand["value"] - base["value"]) / base["value"]
+            if base["value"] != 0
+            else 0.0
+        )
+        if base["higher_is_better"]:
+            speedup = cand["value"] / base["value"] if base["value"] != 0 else 1.0
+        else:
+            speedup = base["value"] / cand["value"] if cand["value"] != 0 else 1.0
+
+        if abs(change) <= threshold:
+            status = "unchanged"
+        elif (change > 0) == base["higher_is_better"]:
+            status = "improved"
+        else:
+            status = "regressed"
+
+        comparison.append(
+            OrderedDict(
+                name=base["name"],
+                params=base["params"],
+                unit=base["unit"],
+                baseline=base["value"],
+                candidate=cand["value"],
+                change=change,
+                speedup=speedup,
+                status=status,
+            )
+        )
+    return comparison
+
+
+def format_comparison(comparison: List[Dict[str, Any]]) -> str:
+    header = ("benchmark", "baseline", "candidate", "change", "speedup", "status")
+    rows = [
+        (
+            "{}[{}]".format(row["name"], format_params(row["params"])),
+            "{:.4g} {}".format(row["baseline"], row["unit"]),
+            "{:.4g} {}".format(row["candidate"], row["unit"]),
+            "{:+.1f}%".format(100 * row["change"]),
+            "{:.2f}x".format(row["speedup"]),
+            row["status"],
+        )
+        for row in comparison
+    ]
+    widths = [max(len(r[it]) for r in [header] + rows) for it in range(len(header))]
+    lines = [
+        "  ".join(
+            cell.ljust(width) if it == 0 else cell.rjust(width)
+            for it, (cell, width) in enumerate(zip(row, widths))
+        )
+        for row in [header] + rows
+    ]
+    return "\n".join(lines)
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    lines = []
+    for result in results:
+        lines.append(
+            "{}[{}]: {:.4g} {} (min {:.4g}, max {:.4g}, {} repeats)".format(
+                result["name"],
+                format_params(result["params"]),
+                result["value"],
+                result["unit"],
+                result["min"],
+                result["max"],
+                result["repeats"],
+            )
+        )
+    return "\n".join(lines)
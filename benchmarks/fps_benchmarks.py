@@ -0,0 +1,199 @@
+"""End-to-end training throughput (frames per second) of an
+`OnPolicyTrainer` in LightHouse, MiniGrid and synthetic tasks (64x64 RGB
+observations and 1ms steps), for several numbers of task samplers and
+packings of samplers into processes."""
+import queue
+import time
+from typing import Any, Dict, List, Optional
+
+import gym
+from torch import nn, optim
+
+from benchmarks.benchmark_utils import make_result, set_benchmark_seed
+from core.algorithms.onpolicy_sync.engine import OnPolicyTrainer
+from core.algorithms.onpolicy_sync.losses.ppo import PPO, PPOConfig
+from core.base_abstractions.experiment_config import ExperimentConfig
+from core.base_abstractions.sensor import SensorSuite
+from core.base_abstractions.task import TaskSampler
+from core.models.basic_models import RNNActorCritic
+from plugins.lighthouse_plugin.lighthouse_sensors import CornerSensor
+from plugins.lighthouse_plugin.lighthouse_tasks import FindGoalLightHouseTaskSampler
+from plugins.synthetic_plugin.configs.synthetic_base import (
+    SyntheticBaseExperimentConfig,
+)
+from projects.tutorials.minigrid_tutorial import MiniGridTutorialExperimentConfig
+from utils.experiment_utils import Builder, PipelineStage, TrainingPipeline
+
+
+class _FPSBenchmarkConfigMixin(object):
+    """Trains with PPO for `total_steps` steps with `num_samplers` task
+    samplers in the CPU."""
+
+    def __init__(
+        self, num_samplers: int, total_steps: int, rollout_steps: int = 32
+    ) -> None:
+        self.num_samplers = num_samplers
+        self.total_steps = total_steps
+        self.rollout_steps = rollout_steps
+
+    def training_pipeline(self, **kwargs) -> TrainingPipeline:
+        return TrainingPipeline(
+            named_losses=dict(ppo_loss=PPO(**PPOConfig)),  # type:ignore
+            pipeline_stages=[
+                PipelineStage(loss_names=["ppo_loss"], max_stage_steps=self.total_steps)
+            ],
+            optimizer_builder=Builder(optim.Adam, dict(lr=3e-4)),
+            num_mini_batch=1,
+            update_repeats=4,
+            max_grad_norm=0.5,
+            num_steps=self.rollout_steps,
+            gamma=0.99,
+            use_gae=True,
+            gae_lambda=0.95,
+            advance_scene_rollout_period=None,
+            save_interval=None,
+            metric_accumulate_interval=self.total_steps,
+        )
+
+    def machine_params(self, mode="train", **kwargs) -> Dict[str, Any]:
+        return {
+            "nprocesses": self.num_samplers if mode == "train" else 0,
+            "devices": [],
+        }
+
+
+class LightHouseFPSConfig(_FPSBenchmarkConfigMixin, ExperimentConfig):
+    WORLD_DIM = 2
+    WORLD_RADIUS = 15
+    VIEW_RADIUS = 1
+
+    SENSORS = [CornerSensor(view_radius=VIEW_RADIUS, world_dim=WORLD_DIM)]
+
+    @classmethod
+    def tag(cls) -> str:
+        return "LightHouseFPS"
+
+    @classmethod
+    def create_model(cls, **kwargs) -> nn.Module:
+        return RNNActorCritic(
+            input_uuid=cls.SENSORS[0].uuid,
+            action_space=gym.spaces.Discrete(2 * cls.WORLD_DIM),
+            observation_space=SensorSuite(cls.SENSORS).observation_spaces,
+            hidden_size=64,
+        )
+
+    @classmethod
+    def make_sampler_fn(cls, **kwargs) -> TaskSampler:
+        return FindGoalLightHouseTaskSampler(**kwargs)
+
+    def train_task_sampler_args(
+        self,
+        process_ind: int,
+        total_processes: int,
+        devices: Optional[List[int]] = None,
+        seeds: Optional[List[int]] = None,
+        deterministic_cudnn: bool = False,
+    ) -> Dict[str, Any]:
+        return dict(
+            world_dim=self.WORLD_DIM,
+            world_radius=self.WORLD_RADIUS,
+            sensors=self.SENSORS,
+            max_steps=100,
+            seed=seeds[process_ind] if seeds is not None else None,
+        )
+
+
+class MiniGridFPSConfig(_FPSBenchmarkConfigMixin, MiniGridTutorialExperimentConfig):
+    @classmethod
+    def tag(cls) -> str:
+        return "MiniGridFPS"
+
+
+class SyntheticFPSConfig(_FPSBenchmarkConfigMixin, SyntheticBaseExperimentConfig):
+    @classmethod
+    def tag(cls) -> str:
+        return "SyntheticFPS"
+
+
+FPS_CONFIGS = {
+    "lighthouse": LightHouseFPSConfig,
+    "minigrid": MiniGridFPSConfig,
+    "synthetic": SyntheticFPSConfig,
+}
+
+
+def benchmark_fps(
+    env: str,
+    num_samplers: int,
+    num_processes: int,
+    total_steps: int = 20000,
+    repeats: int = 1,
+) -> Dict[str, Any]:
+    """Frames per second of an `OnPolicyTrainer` training (in this process)
+    for `total_steps` steps with `num_samplers` task samplers in
+    `num_processes` processes.
+
+    Starting the task sampler processes is not timed.
+    """
+    samples = []
+    for _ in range(repeats):
+        set_benchmark_seed()
+        results_queue: queue.Queue = queue.Queue()
+        trainer = OnPolicyTrainer(
+            experiment_name="fps_benchmark",
+            config=FPS_CONFIGS[env](num_samplers=num_samplers, total_steps=total_steps),
+            results_queue=results_queue,  # type:ignore
+            checkpoints_queue=None,
+            checkpoints_dir="",
+            seed=0,
+            max_sampler_processes_per_worker=num_processes,
+            enable_timers=False,
+            report_memory=False,
+        )
+        # Starts the task sampler processes
+        assert trainer.vector_tasks is not None
+
+        start = time.perf_counter()
+        trainer.train()
+        elapsed = time.perf_counter() - start
+
+        while not results_queue.empty():
+            pkg = results_queue.get()
+            if isinstance(pkg, tuple) and pkg[0] == "train_stopped" and pkg[1] != 0:
+                raise RuntimeError("Training failed in {} FPS benchmark".format(env))
+
+        samples.append(trainer.training_pipeline.total_steps / elapsed)
+
+    return make_result(
+        "fps",
+        dict(
+            env=env,
+            num_samplers=num_samplers,
+            num_processes=num_processes,
+            total_steps=total_steps,
+        ),
+        samples,
+        unit="frames/s",
+        higher_is_better=True,
+    )
+
+
+def fps_scenarios(quick: bool = False) -> List[Dict[str, Any]]:
+    scenarios = []
+    for env in ["lighthouse", "minigrid", "synthetic"]:
+        for num_samplers, num_processes in (
+            [(4, 4), (4, 1)] if quick else [(4, 4), (8, 8), (8, 2), (16, 4), (16, 16)]
+        ):
+            scenarios.append(
+                dict(
+                    env=env,
+                    num_samplers=num_samplers,
+                    num_processes=num_processes,
+                    total_steps=4000 if quick else 20000,
+                )
+            )
+    return scenarios
+
+
+def run_fps_benchmarks(quick: bool = False, repeats: int = 1) -> List[Dict]:
+    return [benchmark_fps(**params, repeats=repeats) for params in fps_scenarios(quick)]
@@ -0,0 +1,94 @@
+"""Throughput of `VectorSampledTasks` stepping (zero latency) synthetic tasks
+with image observations, i.e. of moving observations from task sampler
+processes to the trainer."""
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.benchmark_utils import make_result, measure, set_benchmark_seed
+from core.algorithms.onpolicy_sync.vector_sampled_tasks import VectorSampledTasks
+from core.base_abstractions.task import TaskSampler
+from plugins.synthetic_plugin.synthetic_sensors import SyntheticImageSensor
+from plugins.synthetic_plugin.synthetic_tasks import SyntheticTaskSampler
+from utils.memory_utils import MB
+
+
+def _make_image_task_sampler(image_size: int, **kwargs) -> TaskSampler:
+    return SyntheticTaskSampler(
+        sensors=[SyntheticImageSensor(height=image_size, width=image_size)],
+        max_steps=10 ** 9,
+        min_episode_length=10 ** 9,
+        max_episode_length=10 ** 9,
+        seed=0,
+        **kwargs
+    )
+
+
+def benchmark_ipc(
+    num_samplers: int,
+    num_processes: int,
+    image_size: int,
+    steps_per_sample: int = 20,
+    **measure_kwargs
+) -> Dict[str, Any]:
+    """Frames per second stepped by a `VectorSampledTasks` with
+    `num_samplers` task samplers in `num_processes` processes, returning
+    `[image_size, image_size, 3]` images."""
+    vector_tasks = VectorSampledTasks(
+        make_sampler_fn=_make_image_task_sampler,
+        sampler_fn_args=[dict(image_size=image_size) for _ in range(num_samplers)],
+        multiprocessing_start_method="forkserver",
+        max_processes=num_processes,
+        should_log=False,
+    )
+    try:
+        vector_tasks.get_observations()
+        actions = [[0] for _ in range(num_samplers)]
+
+        def run():
+            for _ in range(steps_per_sample):
+                vector_tasks.step(actions)
+
+        samples = measure(run, **measure_kwargs)
+    finally:
+        vector_tasks.close()
+
+    frames_per_sample = steps_per_sample * num_samplers
+    fps = [frames_per_sample / seconds for seconds in samples]
+    frame_bytes = image_size * image_size * 3
+    return make_result(
+        "ipc",
+        dict(
+            num_samplers=num_samplers,
+            num_processes=num_processes,
+            image_size=image_size,
+        ),
+        fps,
+        unit="frames/s",
+        higher_is_better=True,
+        mb_per_second=float(np.median(fps)) * frame_bytes / MB,
+    )
+
+
+def ipc_scenarios(quick: bool = False) -> List[Dict[str, Any]]:
+    scenarios = []
+    for image_size in [64, 128] if quick else [64, 128, 256]:
+        for num_samplers, num_processes in (
+            [(4, 4), (4, 2)] if quick else [(4, 4), (8, 8), (8, 4), (16, 4)]
+        ):
+            scenarios.append(
+                dict(
+                    num_samplers=num_samplers,
+                    num_processes=num_processes,
+                    image_size=image_size,
+                )
+            )
+    return scenarios
+
+
+def run_ipc_benchmarks(quick: bool = False, **measure_kwargs) -> List[Dict]:
+    results = []
+    for params in ipc_scenarios(quick):
+        set_benchmark_seed()
+        results.append(benchmark_ipc(**params, **measure_kwargs))
+    return results
@@ -0,0 +1,216 @@
+"""Microbenchmarks of the rollout storage, observation batching, memory and
+loss code run by trainers at every rollout or step."""
+from typing import Any, Dict, List, Tuple
+
+import gym
+import numpy as np
+import torch
+from gym.spaces.dict import Dict as SpaceDict
+
+from benchmarks.benchmark_utils import make_result, measure, set_benchmark_seed
+from core.algorithms.onpolicy_sync.losses.ppo import PPO, PPOConfig
+from core.algorithms.onpolicy_sync.storage import RolloutStorage
+from core.base_abstractions.distributions import CategoricalDistr
+from core.base_abstractions.misc import ActorCriticOutput, Memory
+from core.models.basic_models import RNNActorCritic
+from utils.tensor_utils import batch_observations
+
+NUM_ACTIONS = 6
+
+
+def make_filled_storage(
+    num_steps: int, num_samplers: int, obs_dim: int = 64, hidden_size: int = 128
+) -> Tuple[RolloutStorage, RNNActorCritic]:
+    """A rollout storage (for an `RNNActorCritic` model) filled with random
+    data."""
+    model = RNNActorCritic(
+        input_uuid="state",
+        action_space=gym.spaces.Discrete(NUM_ACTIONS),
+        observation_space=SpaceDict(
+            {
+                "state": gym.spaces.Box(
+                    low=np.float32(-1.0), high=np.float32(1.0), shape=(obs_dim,)
+                )
+            }
+        ),
+        hidden_size=hidden_size,
+    )
+    storage = RolloutStorage(
+        num_steps=num_steps, num_samplers=num_samplers, actor_critic=model
+    )
+    storage.insert_observations({"state": torch.zeros(num_samplers, obs_dim)})
+
+    for name in storage.observations:
+        storage.observations.tensor(name).normal_()
+    for name in storage.memory:
+        storage.memory.tensor(name).normal_()
+    storage.actions.random_(0, NUM_ACTIONS)
+    storage.prev_actions.random_(0, NUM_ACTIONS)
+    storage.action_log_probs.uniform_(-3, 0)
+    storage.value_preds.normal_()
+    storage.rewards.normal_()
+    # Episodes ending every 10 steps (on average)
+    storage.masks.copy_((torch.rand_like(storage.masks) > 0.1).float())
+    return storage, model
+
+
+def benchmark_compute_returns(
+    num_steps: int, num_samplers: int, use_gae: bool = True, **measure_kwargs
+) -> Dict[str, Any]:
+    storage, _ = make_filled_storage(num_steps, num_samplers)
+    next_value = torch.randn(num_samplers, 1, 1)
+    samples = measure(
+        lambda: storage.compute_returns(
+            next_value=next_value, use_gae=use_gae, gamma=0.99, tau=0.95
+        ),
+        **measure_kwargs
+    )
+    return make_result(
+        "compute_returns",
+        dict(num_steps=num_steps, num_samplers=num_samplers, use_gae=use_gae),
+        samples,
+    )
+
+
+def benchmark_recurrent_generator(
+    num_steps: int, num_samplers: int, num_mini_batch: int, **measure_kwargs
+) -> Dict[str, Any]:
+    storage, _ = make_filled_storage(num_steps, num_samplers)
+    storage.compute_returns(
+        next_value=torch.randn(num_samplers, 1, 1), use_gae=True, gamma=0.99, tau=0.95
+    )
+    advantages = storage.returns[:-1] - storage.value_preds[:-1]
+
+    def run():
+        for _ in storage.recurrent_generator(advantages, num_mini_batch):
+            pass
+
+    samples = measure(run, **measure_kwargs)
+    return make_result(
+        "recurrent_generator",
+        dict(
+            num_steps=num_steps,
+            num_samplers=num_samplers,
+            num_mini_batch=num_mini_batch,
+        ),
+        samples,
+    )
+
+
+def benchmark_batch_observations(
+    num_samplers: int, image_size: int, **measure_kwargs
+) -> Dict[str, Any]:
+    rng = np.random.RandomState(0)
+    observations = [
+        {
+            "rgb": rng.randint(0, 256, (image_size, image_size, 3), dtype=np.uint8),
+            "depth": rng.rand(image_size, image_size, 1).astype(np.float32),
+            "goal": {"position": rng.rand(3).astype(np.float32), "index": it},
+        }
+        for it in range(num_samplers)
+    ]
+    samples = measure(lambda: batch_observations(observations), **measure_kwargs)
+    return make_result(
+        "batch_observations",
+        dict(num_samplers=num_samplers, image_size=image_size),
+        samples,
+    )
+
+
+def benchmark_memory_sampler_select(
+    num_samplers: int, hidden_size: int, num_kept: int, **measure_kwargs
+) -> Dict[str, Any]:
+    memory = Memory(
+        rnn=(torch.randn(1, num_samplers, hidden_size), 1),
+        other=(torch.randn(num_samplers, 2, hidden_size), 0),
+    )
+    keep = sorted(np.random.permutation(num_samplers)[:num_kept].tolist())
+    samples = measure(lambda: memory.sampler_select(keep), **measure_kwargs)
+    return make_result(
+        "memory_sampler_select",
+        dict(num_samplers=num_samplers, hidden_size=hidden_size, num_kept=num_kept),
+        samples,
+    )
+
+
+def benchmark_ppo_loss(
+    num_steps: int, num_samplers: int, backward: bool = False, **measure_kwargs
+) -> Dict[str, Any]:
+    shape = (num_steps, num_samplers, 1)
+    logits = torch.randn(*shape, NUM_ACTIONS, requires_grad=True)
+    values = torch.randn(*shape, 1, requires_grad=True)
+    batch = {
+        "actions": torch.randint(0, NUM_ACTIONS, (*shape, 1)),
+        "old_action_log_probs": torch.rand(*shape, 1).log(),
+        "norm_adv_targ": torch.randn(*shape, 1),
+        "values": torch.randn(*shape, 1),
+        "returns": torch.randn(*shape, 1),
+    }
+    loss = PPO(**PPOConfig)
+
+    def run():
+        total_loss, _ = loss.loss(
+            step_count=0,
+            batch=batch,
+            actor_critic_output=ActorCriticOutput(
+                distributions=CategoricalDistr(logits=logits), values=values, extras={}
+            ),
+        )
+        if backward:
+            total_loss.backward()
+
+    samples = measure(run, **measure_kwargs)
+    return make_result(
+        "ppo_loss",
+        dict(num_steps=num_steps, num_samplers=num_samplers, backward=backward),
+        samples,
+    )
+
+
+def micro_scenarios(quick: bool = False) -> List[Tuple[Any, Dict[str, Any]]]:
+    """(benchmark function, params) pairs of the micro suite."""
+    samplers = [8, 32] if quick else [8, 32, 128]
+    scenarios: List[Tuple[Any, Dict[str, Any]]] = []
+    for num_samplers in samplers:
+        scenarios.append(
+            (benchmark_compute_returns, dict(num_steps=128, num_samplers=num_samplers))
+        )
+        scenarios.append(
+            (
+                benchmark_recurrent_generator,
+                dict(num_steps=128, num_samplers=num_samplers, num_mini_batch=4),
+            )
+        )
+        for image_size in [64] if quick else [64, 224]:
+            scenarios.append(
+                (
+                    benchmark_batch_observations,
+                    dict(num_samplers=num_samplers, image_size=image_size),
+                )
+            )
+        scenarios.append(
+            (
+                benchmark_memory_sampler_select,
+                dict(
+                    num_samplers=num_samplers,
+                    hidden_size=512,
+                    num_kept=num_samplers // 2,
+                ),
+            )
+        )
+        for backward in [False, True]:
+            scenarios.append(
+                (
+                    benchmark_ppo_loss,
+                    dict(num_steps=128, num_samplers=num_samplers, backward=backward),
+                )
+            )
+    return scenarios
+
+
+def run_micro_benchmarks(quick: bool = False, **measure_kwargs) -> List[Dict]:
+    results = []
+    for benchmark, params in micro_scenarios(quick):
+        set_benchmark_seed()
+        results.append(benchmark(**params, **measure_kwargs))
+    return results
@@ -0,0 +1,551 @@
+"""Defines the asynchronous actor-learner engine, with actors continuously
+collecting experience with a periodically refreshed copy of the policy and a
+learner updating the policy with V-trace corrected losses."""
+import queue
+import random
+import time
+import traceback
+from multiprocessing.context import BaseContext
+from typing import Optional, Any, Dict, Union, List, Sequence, Callable, cast
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp  # type: ignore
+
+from core.algorithms.onpolicy_sync.engine import OnPolicyRLEngine, OnPolicyTrainer
+from core.algorithms.onpolicy_sync.policy import ActorCriticModel, ObservationType
+from core.algorithms.onpolicy_sync.storage import RolloutStorage
+from core.base_abstractions.experiment_config import ExperimentConfig
+from core.base_abstractions.misc import Memory
+from utils.system import get_logger
+from utils.tensor_utils import to_device_recursively
+
+
+def _map_observations(
+    fn: Callable[[torch.Tensor], torch.Tensor], observations: ObservationType
+) -> ObservationType:
+    return {
+        key: _map_observations(fn, cast(ObservationType, value))
+        if isinstance(value, Dict)
+        else fn(value)
+        for key, value in observations.items()
+    }
+
+
+def _cat_observations(
+    observations: Sequence[ObservationType], dim: int
+) -> ObservationType:
+    return {
+        key: _cat_observations([obs[key] for obs in observations], dim)
+        if isinstance(observations[0][key], Dict)
+        else torch.cat([obs[key] for obs in observations], dim=dim)
+        for key in observations[0]
+    }
+
+
+def _cat_memories(memories: Sequence[Memory]) -> Memory:
+    res = Memory()
+    for key in memories[0]:
+        sampler_dim = memories[0].sampler_dim(key)
+        res.check_append(
+            key,
+            torch.cat([memory.tensor(key) for memory in memories], dim=sampler_dim),
+            sampler_dim,
+        )
+    return res
+
+
+class ActorWorker(OnPolicyRLEngine):
+    """Collects experience for an asynchronous `VTraceLearner`.
+
+    Each actor steps its own `VectorSampledTasks` with a local copy of the
+    policy, refreshed from the shared parameters published by the learner
+    before collecting each segment, and streams fixed-length
+    (`training_pipeline.num_steps`) trajectory segments into the segments
+    queue. Segments hold the `[step, sampler, ...]` observations,
+    previous actions and masks for `num_steps + 1` steps (the last one to
+    bootstrap from), the actions, rewards and behaviour log probabilities for
+    `num_steps` steps, the recurrent memory at the first step, the version of
+    the parameters used to act, and the metrics of the tasks completed while
+    collecting.
+
+    Task samplers (and their seeds) are partitioned across actors as across
+    the workers of an `OnPolicyTrainer`.
+    """
+
+    def __init__(
+        self,
+        experiment_name: str,
+        config: ExperimentConfig,
+        results_queue: mp.Queue,
+        segments_queue: mp.Queue,
+        shared_actor_critic: ActorCriticModel,
+        params_version: Any,
+        params_lock: Any,
+        stop_event: Any,
+        num_running_actors: Any,
+        seed: Optional[int] = None,
+        deterministic_cudnn: bool = False,
+        mp_ctx: Optional[BaseContext] = None,
+        worker_id: int = 0,
+        num_workers: int = 1,
+        device: Union[str, torch.device, int] = "cpu",
+        max_sampler_processes_per_worker: Optional[int] = None,
+        **kwargs,
+    ):
+        """Initializer.
+
+        # Parameters
+
+        segments_queue : Queue where collected segments are put (blocking while full).
+        shared_actor_critic : Model (in shared memory) holding the latest parameters
+            published by the learner.
+        params_version : Shared counter incremented by the learner after each publication.
+        params_lock : Lock guarding `shared_actor_critic` while being written or read.
+        stop_event : Set by the learner once training is over.
+        num_running_actors : Shared counter of actors still collecting experience.
+        worker_id : Id of this actor, in `[0, num_workers)`.
+        num_workers : Number of actors.
+        """
+        kwargs["mode"] = "train"
+        super().__init__(
+            experiment_name=experiment_name,
+            config=config,
+            results_queue=results_queue,
+            checkpoints_queue=None,
+            checkpoints_dir="",
+            seed=seed,
+            deterministic_cudnn=deterministic_cudnn,
+            mp_ctx=mp_ctx,
+            worker_id=worker_id,
+            num_workers=num_workers,
+            device=device,
+            max_sampler_processes_per_worker=max_sampler_processes_per_worker,
+            **kwargs,
+        )
+
+        self.segments_queue = segments_queue
+        self.shared_actor_critic = shared_actor_critic
+        self.params_version = params_version
+        self.params_lock = params_lock
+        self.stop_event = stop_event
+        self.num_running_actors = num_running_actors
+
+        self.num_steps = config.training_pipeline().num_steps
+        self.local_params_version = 0
+
+    @property
+    def profiling_role(self) -> str:
+        return "actor"
+
+    def init_distributed(self) -> None:
+        # Actors only communicate with the learner (through queues), but they
+        # partition the task samplers like distributed workers
+        self.is_distributed = True
+
+    def refresh_params(self) -> bool:
+        """Copies the latest parameters published by the learner (if newer
+        than the local ones), waiting for the first publication.
+
+        # Returns
+
+        `False` if training finished while waiting.
+        """
+        while self.params_version.value == 0:
+            if self.stop_event.wait(0.1):
+                return False
+
+        if self.params_version.value != self.local_params_version:
+            with self.params_lock:
+                self.actor_critic.load_state_dict(self.shared_actor_critic.state_dict())
+                self.local_params_version = self.params_version.value
+        return True
+
+    def make_segment(self, rollouts: RolloutStorage) -> Dict[str, Any]:
+        task_metrics: List[Dict[str, Any]] = []
+        while not self.single_process_metrics_queue.empty():
+            task_metrics.append(self.single_process_metrics_queue.get_nowait())
+
+        memory = rollouts.pick_memory_step(0)
+
+        # Copies (on cpu), as rollouts are overwritten while the segment is sent
+        return {
+            "actor_id": self.worker_id,
+            "params_version": self.local_params_version,
+            "observations": _map_observations(
+                lambda t: t.to("cpu", copy=True),
+                rollouts.unflatten_observations(rollouts.observations),
+            ),
+            "memory": Memory(
+                [
+                    (
+                        key,
+                        (
+                            memory.tensor(key).to("cpu", copy=True),
+                            memory.sampler_dim(key),
+                        ),
+                    )
+                    for key in memory
+                ]
+            ),
+            "actions": rollouts.actions.to("cpu", copy=True),
+            "prev_actions": rollouts.prev_actions.to("cpu", copy=True),
+            "masks": rollouts.masks.to("cpu", copy=True),
+            "rewards": rollouts.rewards.to("cpu", copy=True),
+            "old_action_log_probs": rollouts.action_log_probs.to("cpu", copy=True),
+            "task_metrics": task_metrics,
+        }
+
+    def put_segment(self, segment: Dict[str, Any]) -> bool:
+        while not self.stop_event.is_set():
+            try:
+                self.segments_queue.put(segment, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self):
+        rollouts = RolloutStorage(
+            num_steps=self.num_steps,
+            num_samplers=self.num_samplers,
+            actor_critic=self.actor_critic,
+        )
+        self.initialize_rollouts(rollouts)
+
+        while not self.stop_event.is_set():
+            if not self.refresh_params():
+                break
+
+            self.profiling_unit_started()
+
+            for step in range(self.num_steps):
+                self.collect_rollout_step(rollouts=rollouts)
+
+            if rollouts.masks.shape[1] == 0:
+                get_logger().info(
+                    "actor {} all task samplers paused".format(self.worker_id)
+                )
+                break
+
+            if not self.put_segment(self.make_segment(rollouts)):
+                break
+
+            rollouts.after_update()
+
+            self.profiling_unit_finished()
+
+    def act_and_stream(self):
+        completed_successfully = False
+        try:
+            self.run()
+            completed_successfully = True
+        except KeyboardInterrupt:
+            get_logger().info(
+                "KeyboardInterrupt. Terminating actor {}".format(self.worker_id)
+            )
+        except Exception:
+            get_logger().error(
+                "Encountered Exception. Terminating actor {}".format(self.worker_id)
+            )
+            get_logger().exception(traceback.format_exc())
+        finally:
+            with self.num_running_actors.get_lock():
+                self.num_running_actors.value -= 1
+            if completed_successfully:
+                get_logger().info("actor {} COMPLETE".format(self.worker_id))
+            else:
+                self.results_queue.put(("train_stopped", 1 + self.worker_id))
+            # Segments left in the queue are discarded after training
+            self.segments_queue.cancel_join_thread()
+            self.close()
+
+
+class VTraceLearner(OnPolicyTrainer):
+    """Updates the policy with batches of the segments streamed by
+    `ActorWorker`s.
+
+    Each update consumes `segments_per_batch` segments (concatenated along
+    the sampler dimension), recomputes the model outputs and applies the
+    losses in the current pipeline stage. As actors act with parameters
+    lagging behind the learner's, losses should correct for the policy lag
+    (e.g. `VTrace`). Besides the keys in `RolloutStorage.recurrent_generator`
+    batches related to acting (`observations`, `memory`, `actions`,
+    `prev_actions`, `masks` and `old_action_log_probs`), batches provide
+    `rewards`, `discounts` and `bootstrap_values`.
+
+    After each update, the parameters are published (copied into
+    `shared_actor_critic`) for the actors to refresh their policies.
+    Steps, logging, checkpoints and learning rate schedules follow the
+    `TrainingPipeline` as in `OnPolicyTrainer`. Teacher forcing,
+    off-policy components and forced scene advances are not supported.
+    """
+
+    def __init__(
+        self,
+        experiment_name: str,
+        config: ExperimentConfig,
+        results_queue: mp.Queue,
+        checkpoints_queue: Optional[mp.Queue],
+        segments_queue: mp.Queue,
+        shared_actor_critic: ActorCriticModel,
+        params_version: Any,
+        params_lock: Any,
+        stop_event: Any,
+        num_running_actors: Any,
+        segments_per_batch: int,
+        checkpoints_dir: str = "",
+        seed: Optional[int] = None,
+        deterministic_cudnn: bool = False,
+        mp_ctx: Optional[BaseContext] = None,
+        device: Union[str, torch.device, int] = "cpu",
+        **kwargs,
+    ):
+        """Initializer.
+
+        # Parameters
+
+        segments_queue : Queue where actors put collected segments.
+        shared_actor_critic : Model (in shared memory) where parameters are published.
+        params_version : Shared counter incremented after each publication.
+        params_lock : Lock guarding `shared_actor_critic` while being written or read.
+        stop_event : Set once training is over, to stop the actors.
+        num_running_actors : Shared counter of actors still collecting experience.
+        segments_per_batch : Number of segments consumed by each update.
+        """
+        assert segments_per_batch >= 1, "segments_per_batch must be positive"
+
+        kwargs["worker_id"] = 0
+        kwargs["num_workers"] = 1
+        super().__init__(
+            experiment_name=experiment_name,
+            config=config,
+            results_queue=results_queue,
+            checkpoints_queue=checkpoints_queue,
+            checkpoints_dir=checkpoints_dir,
+            seed=seed,
+            deterministic_cudnn=deterministic_cudnn,
+            mp_ctx=mp_ctx,
+            device=device,
+            **kwargs,
+        )
+
+        self.segments_queue = segments_queue
+        self.shared_actor_critic = shared_actor_critic
+        self.params_version = params_version
+        self.params_lock = params_lock
+        self.stop_event = stop_event
+        self.num_running_actors = num_running_actors
+        self.segments_per_batch = segments_per_batch
+
+    @property
+    def profiling_role(self) -> str:
+        return "learner"
+
+    def deterministic_seeds(self) -> None:
+        # Task samplers (and their seeds) belong to the actors
+        pass
+
+    def publish_params(self) -> None:
+        with self.params_lock:
+            self.shared_actor_critic.load_state_dict(self.actor_critic.state_dict())
+            self.params_version.value += 1
+
+    def next_segments(self) -> List[Dict[str, Any]]:
+        segments: List[Dict[str, Any]] = []
+        while len(segments) < self.segments_per_batch:
+            try:
+                segments.append(self.segments_queue.get(timeout=1))
+            except queue.Empty:
+                if self.num_running_actors.value == 0:
+                    raise RuntimeError(
+                        "All actors stopped before completing the training pipeline"
+                    )
+        return segments
+
+    def make_batch(self, segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+        batch: Dict[str, Any] = {
+            "observations": _cat_observations(
+                [segment["observations"] for segment in segments], dim=1
+            ),
+            "memory": _cat_memories([segment["memory"] for segment in segments]),
+        }
+        for key in [
+            "actions",
+            "prev_actions",
+            "masks",
+            "rewards",
+            "old_action_log_probs",
+        ]:
+            batch[key] = torch.cat([segment[key] for segment in segments], dim=1)
+
+        return to_device_recursively(batch, device=self.device, inplace=True)
+
+    def mini_batches(self, batch: Dict[str, Any]):
+        """Splits `batch` along samplers into `num_mini_batch` mini-batches
+        (in random order), separating the last (bootstrap) step."""
+        num_samplers = batch["actions"].shape[1]
+        num_mini_batch = self.training_pipeline.num_mini_batch
+        assert num_samplers >= num_mini_batch, (
+            "The number of task samplers in a batch ({}) "
+            "must be greater than or equal to the number of "
+            "mini batches ({}).".format(num_samplers, num_mini_batch)
+        )
+
+        inds = np.round(
+            np.linspace(0, num_samplers, num_mini_batch + 1, endpoint=True)
+        ).astype(np.int32)
+        pairs = list(zip(inds[:-1], inds[1:]))
+        random.shuffle(pairs)
+
+        for start_ind, end_ind in pairs:
+            cur_samplers = list(range(start_ind, end_ind))
+
+            def select(t: torch.Tensor) -> torch.Tensor:
+                return t[:, start_ind:end_ind]
+
+            observations = _map_observations(select, batch["observations"])
+            masks = select(batch["masks"])
+            prev_actions = select(batch["prev_actions"])
+
+            yield {
+                "observations": _map_observations(lambda t: t[:-1], observations),
+                "memory": batch["memory"].sampler_select(cur_samplers),
+                "actions": select(batch["actions"]),
+                "prev_actions": prev_actions[:-1],
+                "masks": masks[:-1],
+                "rewards": select(batch["rewards"]),
+                "discounts": self.training_pipeline.gamma * masks[1:],
+                "old_action_log_probs": select(batch["old_action_log_probs"]),
+                "next_observations": _map_observations(lambda t: t[-1:], observations),
+                "next_prev_actions": prev_actions[-1:],
+                "next_masks": masks[-1:],
+            }
+
+    def update(self, batch: Dict[str, Any]):  # type: ignore
+        for e in range(self.training_pipeline.update_repeats):
+            for mini_batch in self.mini_batches(batch):
+                with self.timers.time("update_minibatch"):
+                    num_rollout_steps, num_samplers = mini_batch["masks"].shape[:2]
+                    bsize = num_rollout_steps * num_samplers
+
+                    actor_critic_output, memory = self.actor_critic(
+                        observations=mini_batch["observations"],
+                        memory=mini_batch["memory"],
+                        prev_actions=mini_batch["prev_actions"],
+                        masks=mini_batch["masks"],
+                    )
+
+                    with torch.no_grad():
+                        bootstrap_output, _ = self.actor_critic(
+                            observations=mini_batch["next_observations"],
+                            memory=memory,
+                            prev_actions=mini_batch["next_prev_actions"],
+                            masks=mini_batch["next_masks"],
+                        )
+                    mini_batch["bootstrap_values"] = bootstrap_output.values.detach()
+
+                    info: Dict[str, float] = {
+                        "lr": self.optimizer.param_groups[0]["lr"]  # type: ignore
+                    }
+
+                    total_loss: Optional[torch.Tensor] = None
+                    for loss_name in self.training_pipeline.current_stage_losses:
+                        loss, loss_weight = (
+                            self.training_pipeline.current_stage_losses[loss_name],
+                            self.training_pipeline.current_stage_loss_weights[
+                                loss_name
+                            ],
+                        )
+
+                        current_loss, current_info = loss.loss(
+                            step_count=self.step_count,
+                            batch=mini_batch,
+                            actor_critic_output=actor_critic_output,
+                        )
+                        if total_loss is None:
+                            total_loss = loss_weight * current_loss
+                        else:
+                            total_loss = total_loss + loss_weight * current_loss
+
+                        for key in current_info:
+                            info[loss_name + "/" + key] = current_info[key]
+
+                    assert (
+                        total_loss is not None
+                    ), "No losses specified for training in stage {}".format(
+                        self.training_pipeline.current_stage_index
+                    )
+
+                    info["total_loss"] = total_loss.item()
+                    self.tracking_info["update"].append(("update_package", info, bsize))
+
+                    self.backprop_step(total_loss)
+
+    def run_pipeline(self, rollouts: Optional[RolloutStorage] = None):
+        """Consumes segments and updates until the pipeline is complete
+        (`rollouts` is ignored, as batches are made of the actors'
+        segments)."""
+        self.tracking_info.clear()
+        self.timers.reset()
+
+        self.last_log = self.training_pipeline.total_steps
+        self.last_save = self.training_pipeline.total_steps
+
+        self.publish_params()
+
+        while True:
+            self.training_pipeline.before_rollout()
+            stage = self.training_pipeline.current_stage
+            if stage is None:
+                break
+
+            assert (
+                stage.teacher_forcing is None and stage.offpolicy_component is None
+            ), "Teacher forcing and off-policy components are not supported by {}".format(
+                self.__class__.__name__
+            )
+
+            self.profiling_unit_started()
+
+            wait_start = time.time()
+            segments = self.next_segments()
+            wait_time = time.time() - wait_start
+
+            for segment in segments:
+                for task_metrics in segment["task_metrics"]:
+                    self.single_process_metrics_queue.put(task_metrics)
+            self.tracking_info["learner"].append(
+                (
+                    "learner_package",
+                    {
+                        "learner/policy_lag": sum(
+                            self.params_version.value - segment["params_version"]
+                            for segment in segments
+                        )
+                        / len(segments),
+                        "learner/queue_wait_ms": 1000 * wait_time,
+                    },
+                    1,
+                )
+            )
+
+            batch = self.make_batch(segments)
+            self.step_count += batch["actions"].nelement()
+
+            self.update(batch)
+            self.training_pipeline.rollout_count += 1
+
+            self.publish_params()
+
+            if self.lr_scheduler is not None:
+                self.lr_scheduler.step(epoch=self.training_pipeline.total_steps)
+
+            self.log_and_checkpoint()
+
+            self.profiling_unit_finished()
+
+    def close(self, verbose=True):
+        if "stop_event" in self.__dict__:
+            self.stop_event.set()
+        super().close(verbose=verbose)
@@ -0,0 +1 @@
+from .vtrace import VTrace, vtrace_targets
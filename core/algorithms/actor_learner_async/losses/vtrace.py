@@ -0,0 +1,190 @@
+"""Implementation of the V-trace off-policy corrected actor critic loss
+(Espeholt et al., IMPALA, 2018)."""
+from typing import Dict, Optional, Tuple, cast
+
+import torch
+
+from core.algorithms.onpolicy_sync.losses.abstract_loss import (
+    AbstractActorCriticLoss,
+    ObservationType,
+)
+from core.base_abstractions.distributions import CategoricalDistr
+from core.base_abstractions.misc import ActorCriticOutput
+
+
+def vtrace_targets(
+    behaviour_log_probs: torch.Tensor,
+    target_log_probs: torch.Tensor,
+    rewards: torch.Tensor,
+    discounts: torch.Tensor,
+    values: torch.Tensor,
+    bootstrap_values: torch.Tensor,
+    clip_rho_threshold: Optional[float] = 1.0,
+    clip_pg_rho_threshold: Optional[float] = 1.0,
+    clip_c_threshold: Optional[float] = 1.0,
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Computes V-trace value targets and policy gradient advantages.
+
+    All inputs but `bootstrap_values` are `[step, sampler, agent, 1]`
+    tensors, and gradients are never propagated through the outputs.
+
+    # Parameters
+
+    behaviour_log_probs : Log probabilities of the taken actions under the policy used to act.
+    target_log_probs : Log probabilities of the taken actions under the policy being trained.
+    rewards : Rewards obtained after each action.
+    discounts : Discount applied to the value of the next step (zero at episode ends).
+    values : Values estimated by the policy being trained.
+    bootstrap_values : `[1, sampler, agent, 1]` values of the step after the last one.
+    clip_rho_threshold : Truncation of the importance weights in the value targets (`None` for no
+        truncation).
+    clip_pg_rho_threshold : Truncation of the importance weights in the policy gradient advantages
+        (`None` for no truncation).
+    clip_c_threshold : Truncation of the importance weights ("trace cutting" coefficients) used to
+        propagate temporal differences backwards (`None` for no truncation).
+
+    # Returns
+
+    The value targets `vs`, the policy gradient advantages and the (untruncated) importance weights.
+    """
+    with torch.no_grad():
+        rhos = torch.exp(target_log_probs - behaviour_log_probs)
+        clipped_rhos = (
+            rhos.clamp(max=clip_rho_threshold)
+            if clip_rho_threshold is not None
+            else rhos
+        )
+        cs = rhos.clamp(max=clip_c_threshold) if clip_c_threshold is not None else rhos
+
+        next_values = torch.cat([values[1:], bootstrap_values], dim=0)
+        deltas = clipped_rhos * (rewards + discounts * next_values - values)
+
+        vs_minus_values = torch.zeros_like(values)
+        acc = torch.zeros_like(bootstrap_values[0])
+        for step in reversed(range(values.shape[0])):
+            acc = deltas[step] + discounts[step] * cs[step] * acc
+            vs_minus_values[step] = acc
+        vs = vs_minus_values + values
+
+        next_vs = torch.cat([vs[1:], bootstrap_values], dim=0)
+        pg_rhos = (
+            rhos.clamp(max=clip_pg_rho_threshold)
+            if clip_pg_rho_threshold is not None
+            else rhos
+        )
+        pg_advantages = pg_rhos * (rewards + discounts * next_vs - values)
+
+    return vs, pg_advantages, rhos
+
+
+class VTrace(AbstractActorCriticLoss):
+    """Actor critic loss with V-trace off-policy corrections.
+
+    Experience collected with (possibly stale) behaviour policies is
+    corrected with truncated importance weights, so that the value function
+    regresses towards the V-trace targets of the policy being trained and
+    the policy gradient uses the corresponding advantages. Besides the
+    usual `actions` and `old_action_log_probs` (behaviour log
+    probabilities), the batch must provide `rewards`, `discounts` (`gamma`
+    times the mask of the next step) and `bootstrap_values` (values of the
+    step following the batch, under the policy being trained).
+
+    # Attributes
+
+    value_loss_coef : Weight of the value loss.
+    entropy_coef : Weight of the entropy (encouraging) loss.
+    clip_rho_threshold : Truncation of the importance weights in the value targets.
+    clip_pg_rho_threshold : Truncation of the importance weights in the policy gradient.
+    clip_c_threshold : Truncation of the trace cutting coefficients.
+    """
+
+    def __init__(
+        self,
+        value_loss_coef: float,
+        entropy_coef: float,
+        clip_rho_threshold: Optional[float] = 1.0,
+        clip_pg_rho_threshold: Optional[float] = 1.0,
+        clip_c_threshold: Optional[float] = 1.0,
+        *args,
+        **kwargs
+    ):
+        """Initializer.
+
+        See the class documentation for parameter definitions.
+        """
+        super().__init__(*args, **kwargs)
+        self.value_loss_coef = value_loss_coef
+        self.entropy_coef = entropy_coef
+        self.clip_rho_threshold = clip_rho_threshold
+        self.clip_pg_rho_threshold = clip_pg_rho_threshold
+        self.clip_c_threshold = clip_c_threshold
+
+    def loss_per_step(
+        self,
+        step_count: int,
+        batch: ObservationType,
+        actor_critic_output: ActorCriticOutput[CategoricalDistr],
+    ) -> Tuple[Dict[str, Tuple[torch.Tensor, Optional[float]]], torch.Tensor]:
+        actions = cast(torch.LongTensor, batch["actions"])
+        values = actor_critic_output.values
+        action_log_probs = actor_critic_output.distributions.log_probs(actions)
+        dist_entropy: torch.FloatTensor = actor_critic_output.distributions.entropy().unsqueeze(
+            -1
+        )
+
+        vs, pg_advantages, rhos = vtrace_targets(
+            behaviour_log_probs=cast(torch.Tensor, batch["old_action_log_probs"]),
+            target_log_probs=action_log_probs.detach(),
+            rewards=cast(torch.Tensor, batch["rewards"]),
+            discounts=cast(torch.Tensor, batch["discounts"]),
+            values=values.detach(),
+            bootstrap_values=cast(torch.Tensor, batch["bootstrap_values"]),
+            clip_rho_threshold=self.clip_rho_threshold,
+            clip_pg_rho_threshold=self.clip_pg_rho_threshold,
+            clip_c_threshold=self.clip_c_threshold,
+        )
+
+        return (
+            {
+                "value": (0.5 * (vs - values).pow(2), self.value_loss_coef),
+                "action": (-(pg_advantages * action_log_probs), None),
+                "entropy": (dist_entropy.mul_(-1.0), self.entropy_coef),  # type: ignore
+            },
+            rhos,
+        )
+
+    def loss(  # type: ignore
+        self,
+        step_count: int,
+        batch: ObservationType,
+        actor_critic_output: ActorCriticOutput[CategoricalDistr],
+        *args,
+        **kwargs
+    ):
+        losses_per_step, rhos = self.loss_per_step(
+            step_count=step_count, batch=batch, actor_critic_output=actor_critic_output,
+        )
+        losses = {
+            key: (loss.mean(), weight)
+            for (key, (loss, weight)) in losses_per_step.items()
+        }
+
+        total_loss = cast(
+            torch.Tensor,
+            sum(
+                loss * weight if weight is not None else loss
+                for loss, weight in losses.values()
+            ),
+        )
+
+        info = {
+            "vtrace_total": total_loss.item(),
+            **{key: loss.item() for key, (loss, _) in losses.items()},
+            "importance_weight": rhos.mean().item(),
+        }
+        if self.clip_rho_threshold is not None:
+            info["clipped_fraction"] = (
+                (rhos > self.clip_rho_threshold).float().mean().item()
+            )
+
+        return total_loss, info
@@ -0,0 +1,217 @@
+"""Defines the `ActorLearnerRunner`, training with asynchronous actors and a
+V-trace learner."""
+from multiprocessing.context import BaseContext
+from multiprocessing.process import BaseProcess
+from typing import Optional, Dict, cast
+
+from core.algorithms.actor_learner_async.engine import ActorWorker, VTraceLearner
+from core.algorithms.onpolicy_sync.policy import ActorCriticModel
+from core.algorithms.onpolicy_sync.runner import OnPolicyRunner
+from core.base_abstractions.experiment_config import ExperimentConfig, MachineParams
+from utils.experiment_utils import set_seed
+from utils.system import get_logger
+
+
+class ActorLearnerRunner(OnPolicyRunner):
+    """Runner training with one `ActorWorker` per entry in the train
+    `machine_params`' `nprocesses` (and `devices`) and a single
+    `VTraceLearner` (in the first device).
+
+    Actors stream segments to the learner through a bounded queue, and the
+    learner publishes its parameters through a model in shared memory.
+    Validation, logging and testing (checkpoints have the same format as
+    those from `OnPolicyTrainer`s) are as in `OnPolicyRunner`.
+    """
+
+    def __init__(
+        self,
+        config: ExperimentConfig,
+        output_dir: str,
+        loaded_config_src_files: Optional[Dict[str, str]],
+        seed: Optional[int] = None,
+        mode: str = "train",
+        deterministic_cudnn: bool = False,
+        deterministic_agents: bool = False,
+        mp_ctx: Optional[BaseContext] = None,
+        multiprocessing_start_method: str = "forkserver",
+        extra_tag: str = "",
+        segments_per_batch: Optional[int] = None,
+        max_queued_segments: Optional[int] = None,
+        **kwargs,
+    ):
+        """Initializer.
+
+        # Parameters
+
+        segments_per_batch : Number of segments consumed by each learner update (by
+            default, the number of actors).
+        max_queued_segments : Capacity of the segments queue, bounding the policy lag
+            (by default, twice `segments_per_batch`).
+        """
+        super().__init__(
+            config=config,
+            output_dir=output_dir,
+            loaded_config_src_files=loaded_config_src_files,
+            seed=seed,
+            mode=mode,
+            deterministic_cudnn=deterministic_cudnn,
+            deterministic_agents=deterministic_agents,
+            mp_ctx=mp_ctx,
+            multiprocessing_start_method=multiprocessing_start_method,
+            extra_tag=extra_tag,
+            **kwargs,
+        )
+        assert self.num_nodes == 1, "Multi-node actor-learner training is not supported"
+
+        self.segments_per_batch = segments_per_batch
+        self.max_queued_segments = max_queued_segments
+
+    @staticmethod
+    def learner_loop(
+        checkpoint: Optional[str] = None,
+        restart_pipeline: bool = False,
+        *engine_args,
+        **engine_kwargs,
+    ):
+        OnPolicyRunner.init_process("Learner", 0)
+        engine_kwargs["mode"] = "train"
+        engine_kwargs["worker_id"] = 0
+        get_logger().info("learner args {}".format(engine_kwargs))
+
+        learner: VTraceLearner = OnPolicyRunner.init_worker(
+            engine_class=VTraceLearner, args=engine_args, kwargs=engine_kwargs
+        )
+        if learner is not None:
+            learner.train(
+                checkpoint_file_name=checkpoint, restart_pipeline=restart_pipeline
+            )
+        else:
+            engine_kwargs["stop_event"].set()
+
+    @staticmethod
+    def actor_loop(id: int = 0, *engine_args, **engine_kwargs):
+        OnPolicyRunner.init_process("Actor", id)
+        engine_kwargs["mode"] = "train"
+        engine_kwargs["worker_id"] = id
+        get_logger().info("actor {} args {}".format(id, engine_kwargs))
+
+        actor: ActorWorker = OnPolicyRunner.init_worker(
+            engine_class=ActorWorker, args=engine_args, kwargs=engine_kwargs
+        )
+        if actor is not None:
+            actor.act_and_stream()
+        else:
+            with engine_kwargs["num_running_actors"].get_lock():
+                engine_kwargs["num_running_actors"].value -= 1
+
+    def start_train(
+        self,
+        checkpoint: Optional[str] = None,
+        restart_pipeline: bool = False,
+        max_sampler_processes_per_worker: Optional[int] = None,
+    ):
+        self.save_project_state()
+
+        devices = self.worker_devices("train")
+        num_actors = len(devices)
+        segments_per_batch = (
+            self.segments_per_batch
+            if self.segments_per_batch is not None
+            else num_actors
+        )
+        max_queued_segments = (
+            self.max_queued_segments
+            if self.max_queued_segments is not None
+            else 2 * segments_per_batch
+        )
+
+        # Parameters published by the learner, read by the actors
+        machine_params = MachineParams.instance_from(
+            self.config.machine_params("train")
+        )
+        set_seed(self.seed)
+        if machine_params.observation_set is not None:
+            shared_actor_critic = cast(
+                ActorCriticModel,
+                self.config.create_model(
+                    observation_set=machine_params.observation_set
+                ),
+            )
+        else:
+            shared_actor_critic = cast(ActorCriticModel, self.config.create_model())
+        shared_actor_critic.share_memory()
+
+        shared = dict(
+            segments_queue=self.mp_ctx.Queue(maxsize=max_queued_segments),
+            shared_actor_critic=shared_actor_critic,
+            params_version=self.mp_ctx.Value("l", 0),
+            params_lock=self.mp_ctx.Lock(),
+            stop_event=self.mp_ctx.Event(),
+            num_running_actors=self.mp_ctx.Value("i", num_actors),
+        )
+
+        learner: BaseProcess = self.mp_ctx.Process(
+            target=self.learner_loop,
+            kwargs=dict(
+                checkpoint=checkpoint,
+                restart_pipeline=restart_pipeline,
+                experiment_name=self.experiment_name,
+                config=self.config,
+                results_queue=self.queues["results"],
+                checkpoints_queue=self.queues["checkpoints"]
+                if self.running_validation
+                else None,
+                checkpoints_dir=self.checkpoint_dir(),
+                episode_metrics_dir=self.episode_metrics_dir(self.local_start_time_str),
+                segments_per_batch=segments_per_batch,
+                enable_timers=self.enable_timers,
+                sync_timers=self.sync_timers,
+                report_memory=self.report_memory,
+                **self.profiling_kwargs(self.local_start_time_str),
+                seed=self.seed,
+                deterministic_cudnn=self.deterministic_cudnn,
+                mp_ctx=self.mp_ctx,
+                device=devices[0],
+                **shared,
+            ),
+        )
+        learner.start()
+        self.processes["train"].append(learner)
+
+        for actor_it in range(num_actors):
+            actor: BaseProcess = self.mp_ctx.Process(
+                target=self.actor_loop,
+                kwargs=dict(
+                    id=actor_it,
+                    experiment_name=self.experiment_name,
+                    config=self.config,
+                    results_queue=self.queues["results"],
+                    seed=self.seed,
+                    deterministic_cudnn=self.deterministic_cudnn,
+                    mp_ctx=self.mp_ctx,
+                    num_workers=num_actors,
+                    device=devices[actor_it],
+                    max_sampler_processes_per_worker=max_sampler_processes_per_worker,
+                    enable_timers=False,  # actors don't send logging packages
+                    report_memory=False,
+                    **self.profiling_kwargs(self.local_start_time_str),
+                    **shared,
+                ),
+            )
+            actor.start()
+            self.processes["train"].append(actor)
+
+        get_logger().info(
+            "Started a learner and {} actor processes with {} segments per batch".format(
+                num_actors, segments_per_batch
+            )
+        )
+
+        self.start_valid(max_sampler_processes_per_worker)
+
+        # A single (learner) package per log interval
+        self.log(self.local_start_time_str, 1)
+
+        self.write_profiles_summary(self.local_start_time_str)
+
+        return self.local_start_time_str
@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Union
+
+import torch
+
+from utils.tensor_utils import to_device_recursively
+
+
+class _EndOfData(object):
+    """Marks the end of the wrapped iterator in the prefetching queue."""
+
+    def __init__(self, exception: Optional[BaseException] = None):
+        self.exception = exception
+
+
+class PrefetchingIterator(Iterator):
+    """Builds the next batches of an off-policy data iterator in a background
+    thread.
+
+    Up to `num_batches` batches are built (and, if `device` is given, copied to
+    the device) ahead of time, so that batch construction and host-to-device
+    copies overlap with rollout collection and on-policy updates. The wrapped
+    iterator's `StopIteration` (and any other exception) is raised by
+    `__next__` after all previously built batches have been consumed, so epoch
+    semantics are unchanged.
+
+    # Attributes
+
+    num_batches : Maximum number of prefetched batches.
+    device : Device where batches are moved in the background thread (if any).
+    """
+
+    def __init__(
+        self,
+        iterator: Iterator,
+        num_batches: int,
+        device: Optional[Union[str, torch.device, int]] = None,
+    ):
+        assert num_batches > 0, "num_batches must be positive"
+
+        self.iterator = iterator
+        self.num_batches = num_batches
+        self.device = device
+
+        self._queue: queue.Queue = queue.Queue(maxsize=num_batches)
+        self._stop = threading.Event()
+        self._done = False
+
+        self._num_fetches = 0
+        self._total_depth = 0
+        self._total_stall = 0.0
+
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def _worker(self):
+        copy_stream = (
+            torch.cuda.Stream(device=self.device)
+            if self.device is not None and torch.device(self.device).type == "cuda"
+            else None
+        )
+
+        while not self._stop.is_set():
+            try:
+                batch: Any = next(self.iterator)
+                if self.device is not None:
+                    if copy_stream is not None:
+                        with torch.cuda.stream(copy_stream):
+                            batch = to_device_recursively(
+                                batch, device=self.device, inplace=True
+                            )
+                        copy_stream.synchronize()
+                    else:
+                        batch = to_device_recursively(
+                            batch, device=self.device, inplace=True
+                        )
+            except StopIteration:
+                batch = _EndOfData()
+            except BaseException as e:
+                batch = _EndOfData(exception=e)
+
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(batch, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+            if isinstance(batch, _EndOfData):
+                break
+
+    def __next__(self) -> Any:
+        if self._done:
+            raise StopIteration()
+
+        self._total_depth += self._queue.qsize()
+        self._num_fetches += 1
+
+        start = time.time()
+        batch = self._queue.get()
+        self._total_stall += time.time() - start
+
+        if isinstance(batch, _EndOfData):
+            self._done = True
+            if batch.exception is not None:
+                raise batch.exception
+            raise StopIteration()
+
+        return batch
+
+    def pop_stats(self) -> Dict[str, float]:
+        """Mean queue depth (number of batches ready when requesting a batch)
+        and mean stall time (in ms) since the last call."""
+        if self._num_fetches == 0:
+            return {}
+
+        stats = {
+            "queue_depth": self._total_depth / self._num_fetches,
+            "stall_ms": 1000 * self._total_stall / self._num_fetches,
+        }
+        self._num_fetches = 0
+        self._total_depth = 0
+        self._total_stall = 0.0
+        return stats
+
+    def close(self) -> None:
+        """Stops the background thread (any prefetched batches are
+        discarded)."""
+        self._stop.set()
+        self._done = True
+        self._thread.join()
@@ -0,0 +1,284 @@
+import threading
+from typing import Any, Optional, Iterable, List
+
+import torch
+import torch.distributed as dist  # type: ignore
+from torch import nn
+
+from utils.system import get_logger
+
+
+class WorkersDoneWatcher(object):
+    """Tracks, in a background thread, a counter of workers done collecting
+    their rollouts.
+
+    The thread polls the counter through its own connection to the
+    distributed `TCPStore`, so reading the latest observed value
+    (`num_done`) never blocks the rollout loop. It only polls while a
+    rollout is being collected, i.e. between `reset` and `pause`.
+
+    # Attributes
+
+    poll_interval : Seconds between consecutive reads of the counter.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        num_workers: int,
+        prefix: str = "num_workers_done",
+        key: str = "done",
+        poll_interval: float = 0.005,
+    ):
+        self.host = host
+        self.port = port
+        self.num_workers = num_workers
+        self.prefix = prefix
+        self.key = key
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._num_done = 0
+        self._stop = threading.Event()
+        self._active = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def num_done(self) -> int:
+        """Latest observed value of the counter since the last `reset`."""
+        with self._lock:
+            return self._num_done
+
+    def reset(self) -> None:
+        """Discards previous observations.
+
+        To be called after the counter has been reset in the store (and
+        all workers have synchronized), at the beginning of each rollout.
+        Starts (or resumes) polling the counter, starting the background
+        thread on its first call.
+        """
+        with self._lock:
+            self._generation += 1
+            self._num_done = 0
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, daemon=True)
+            self._thread.start()
+        self._active.set()
+
+    def pause(self) -> None:
+        """Stops polling the counter until the next `reset` (to be called
+        once the worker is done collecting its rollout)."""
+        self._active.clear()
+
+    def _watch(self):
+        try:
+            store = dist.PrefixStore(  # type:ignore
+                self.prefix,
+                dist.TCPStore(  # type:ignore
+                    self.host, self.port, self.num_workers, False
+                ),
+            )
+            while True:
+                self._active.wait()
+                if self._stop.is_set():
+                    break
+                with self._lock:
+                    generation = self._generation
+                num_done = int(store.get(self.key))
+                with self._lock:
+                    # Ignore values read across a reset, which might be stale
+                    if generation == self._generation:
+                        self._num_done = num_done
+                self._stop.wait(self.poll_interval)
+        except Exception as e:
+            if not self._stop.is_set():
+                get_logger().warning(
+                    "Stopped watching {} due to {}".format(self.prefix, repr(e))
+                )
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Stops the background thread, waiting at most `timeout` seconds
+        for it to finish."""
+        self._stop.set()
+        self._active.set()  # wakes up the thread if paused
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+
+class GradientBucketReducer(object):
+    """Sums gradients across workers with bucketed all-reduce operations,
+    overlapped with the backward pass.
+
+    Gradients of parameters requiring grad are grouped into buckets of at most
+    `bucket_size_mb` megabytes. During the backward pass, each bucket is
+    flattened and its (asynchronous) all-reduce launched as soon as all of its
+    gradients are ready. Buckets are always launched in the same order, so all
+    workers issue their collectives consistently even if some parameters
+    receive no gradient in some workers. Parameters with no gradient after the
+    backward pass are given zero gradients (and reduced with the rest of their
+    bucket).
+
+    Buckets initially follow the reverse parameter order, which approximates the
+    order in which gradients are produced. After the first reduction, they are
+    rebuilt following the order in which gradients actually became ready in the
+    first worker (broadcast to all workers), with parameters without gradient
+    in any of the workers last, so that they don't delay the reduction of the
+    remaining buckets.
+
+    Typical usage:
+    ```python
+    reducer.prepare()
+    loss.backward()
+    reducer.reduce()
+    ```
+
+    # Attributes
+
+    buckets : List of lists of parameters, one list per bucket.
+    """
+
+    USE_POST_ACCUMULATE_GRAD_HOOKS = hasattr(
+        torch.Tensor, "register_post_accumulate_grad_hook"
+    )
+
+    def __init__(self, parameters: Iterable[nn.Parameter], bucket_size_mb: float = 5.0):
+        self.params = [p for p in parameters if p.requires_grad]
+        self.bucket_size_mb = bucket_size_mb
+        self._param_index = {id(p): it for it, p in enumerate(self.params)}
+
+        self._build_buckets(list(reversed(self.params)))
+        self._rebuilt = False
+        self._ready_order: List[int] = []
+
+        # Gradients are ready once accumulated into `p.grad`. Recent versions of
+        # pytorch have a hook for this, otherwise (as in `DistributedDataParallel`)
+        # we hook into each parameter's `AccumulateGrad` node, keeping references
+        # to the nodes so that the hooks stay alive.
+        self._grad_accs: List[Any] = []
+        if self.USE_POST_ACCUMULATE_GRAD_HOOKS:
+            for p in self.params:
+                p.register_post_accumulate_grad_hook(self._grad_ready)
+        else:
+            with torch.enable_grad():
+                for p in self.params:
+                    grad_acc = p.expand_as(p).grad_fn.next_functions[0][0]
+                    grad_acc.register_hook(self._make_accumulate_grad_hook(p))
+                    self._grad_accs.append(grad_acc)
+
+    def _make_accumulate_grad_hook(self, p: nn.Parameter):
+        def hook(*_):
+            self._grad_ready(p)
+
+        return hook
+
+    def _build_buckets(self, ordered_params: List[nn.Parameter]) -> None:
+        self.buckets: List[List[nn.Parameter]] = []
+        max_bytes = self.bucket_size_mb * 1024 * 1024
+        bucket_bytes = 0.0
+        for p in ordered_params:
+            nbytes = p.numel() * p.element_size()
+            if (
+                len(self.buckets) == 0
+                or bucket_bytes + nbytes > max_bytes
+                or p.dtype != self.buckets[-1][0].dtype
+                or p.device != self.buckets[-1][0].device
+            ):
+                self.buckets.append([])
+                bucket_bytes = 0.0
+            self.buckets[-1].append(p)
+            bucket_bytes += nbytes
+
+        self._param_bucket = {
+            id(p): bit for bit, bucket in enumerate(self.buckets) for p in bucket
+        }
+        self._active = False
+        self._num_ready = [0] * len(self.buckets)
+        self._next_bucket = 0
+        self._flat_grads: List[Optional[torch.Tensor]] = [None] * len(self.buckets)
+        self._works: List = []
+
+    def prepare(self) -> None:
+        """Starts tracking gradients (to be called before the backward
+        pass)."""
+        self._active = True
+        self._num_ready = [0] * len(self.buckets)
+        self._next_bucket = 0
+        self._flat_grads = [None] * len(self.buckets)
+        self._works = []
+
+    def _grad_ready(self, p: nn.Parameter) -> None:
+        if not self._active:
+            return
+        if not self._rebuilt:
+            self._ready_order.append(self._param_index[id(p)])
+        bit = self._param_bucket[id(p)]
+        self._num_ready[bit] += 1
+        while self._next_bucket < len(self.buckets) and self._num_ready[
+            self._next_bucket
+        ] >= len(self.buckets[self._next_bucket]):
+            self._launch(self._next_bucket)
+            self._next_bucket += 1
+
+    def _launch(self, bit: int) -> None:
+        bucket = self.buckets[bit]
+        for p in bucket:
+            if p.grad is None:
+                p.grad = torch.zeros_like(p.data)
+        self._flat_grads[bit] = torch.cat([p.grad.reshape(-1) for p in bucket])
+        self._works.append(dist.all_reduce(self._flat_grads[bit], async_op=True))
+
+    def reduce(self, extra_to_reduce: Optional[torch.Tensor] = None) -> None:
+        """Launches the remaining reductions (including the one for
+        `extra_to_reduce`, if given), waits for all of them and writes the
+        reduced gradients back into the parameters."""
+        while self._next_bucket < len(self.buckets):
+            self._launch(self._next_bucket)
+            self._next_bucket += 1
+        if extra_to_reduce is not None:
+            self._works.append(dist.all_reduce(extra_to_reduce, async_op=True))
+
+        for work in self._works:
+            work.wait()
+
+        for bucket, flat_grad in zip(self.buckets, self._flat_grads):
+            offset = 0
+            for p in bucket:
+                numel = p.numel()
+                p.grad.copy_(flat_grad[offset : offset + numel].view_as(p.grad))
+                offset += numel
+
+        self._active = False
+        self._flat_grads = [None] * len(self.buckets)
+        self._works = []
+
+        if not self._rebuilt:
+            self._rebuild_buckets()
+
+    def _rebuild_buckets(self) -> None:
+        ready = set(self._ready_order)
+        order = torch.tensor(
+            self._ready_order
+            + [it for it in range(len(self.params) - 1, -1, -1) if it not in ready],
+            dtype=torch.int64,
+            device=self.params[0].device if len(self.params) > 0 else "cpu",
+        )
+        dist.broadcast(order, src=0)
+
+        # Parameters without gradient in some worker would delay all later buckets
+        # in that worker, so they go last
+        ready_everywhere = torch.zeros_like(order)
+        ready_everywhere[list(ready)] = 1
+        dist.all_reduce(ready_everywhere, op=dist.ReduceOp.MIN)
+        ready_flags = ready_everywhere.tolist()
+        order_list = order.tolist()
+        order_list = [it for it in order_list if ready_flags[it]] + [
+            it for it in order_list if not ready_flags[it]
+        ]
+
+        self._build_buckets([self.params[it] for it in order_list])
+        self._rebuilt = True
+        self._ready_order = []
@@ -1,11 +1,14 @@
 """Defines the reinforcement learning `OnPolicyRLEngine`."""
+import copy
 import itertools
 import os
+import pickle
 import queue
 import random
 import time
 import traceback
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
 from multiprocessing.context import BaseContext
 from typing import (
     Optional,
@@ -17,6 +20,7 @@ from typing import (
     cast,
     Iterator,
     Callable,
+    Set,
 )
 
 import torch
@@ -29,15 +33,22 @@ from torch import optim
 # noinspection PyProtectedMember
 from torch.optim.lr_scheduler import _LRScheduler
 
+from core.algorithms.offpolicy_sync.prefetch import PrefetchingIterator
+from core.algorithms.onpolicy_sync.distributed_utils import (
+    WorkersDoneWatcher,
+    GradientBucketReducer,
+)
 from core.algorithms.onpolicy_sync.losses.abstract_loss import AbstractActorCriticLoss
 from core.algorithms.onpolicy_sync.policy import ActorCriticModel
 from core.algorithms.onpolicy_sync.storage import RolloutStorage
 from core.algorithms.onpolicy_sync.vector_sampled_tasks import (
     VectorSampledTasks,
     COMPLETE_TASK_METRICS_KEY,
+    TASK_TRAIN_INFO_KEY,
 )
 from core.base_abstractions.experiment_config import ExperimentConfig, MachineParams
 from core.base_abstractions.misc import RLStepResult
+from utils.episode_metrics_utils import EpisodeMetricsWriter
 from utils.experiment_utils import (
     set_deterministic_cudnn,
     set_seed,
@@ -46,12 +57,22 @@ from utils.experiment_utils import (
     PipelineStage,
     LoggingPackage,
 )
+from utils.memory_utils import (
+    MB,
+    module_nbytes,
+    optimizer_state_nbytes,
+    process_memory,
+    processes_memory,
+)
+from utils.profiling_utils import ProfilingWindow
 from utils.system import get_logger
 from utils.tensor_utils import (
     batch_observations,
     to_device_recursively,
     detach_recursively,
+    cpu_copy_recursively,
 )
+from utils.timing_utils import TimerRegistry
 from utils.viz_utils import VizSuite
 
 
@@ -81,9 +102,16 @@ class OnPolicyRLEngine(object):
         worker_id: int = 0,
         num_workers: int = 1,
         device: Union[str, torch.device, int] = "cpu",
+        distributed_ip: str = "127.0.0.1",
         distributed_port: int = 0,
         deterministic_agents: bool = False,
         max_sampler_processes_per_worker: Optional[int] = None,
+        episode_metrics_dir: Optional[str] = None,
+        enable_timers: bool = True,
+        sync_timers: bool = False,
+        report_memory: bool = True,
+        profile_units: Optional[Sequence[int]] = None,
+        profiles_dir: Optional[str] = None,
         **kwargs,
     ):
         """Initializer.
@@ -96,10 +124,34 @@ class OnPolicyRLEngine(object):
             completely deterministic behavior due to CUDA issues and nondeterminism
             in environments).
         mode : "train", "valid", or "test".
+        worker_id : Global id (rank) of this worker across all nodes.
+        num_workers : Total number of workers across all nodes.
+        distributed_ip : Address of the node running the worker with id 0 (hosting the
+            distributed `TCPStore`).
+        distributed_port : Port of the distributed `TCPStore`.
         deterministic_cudnn : Whether or not to use deterministic cudnn. If `True` this may lower
             training performance this is necessary (but not sufficient) if you desire
             deterministic behavior.
         extra_tag : An additional label to add to the experiment when saving tensorboard logs.
+        episode_metrics_dir : If given, the complete metrics dict of every task is appended
+            (along with the training steps) to a compressed file for this worker in this
+            directory, see `utils.episode_metrics_utils`. Otherwise, task metrics are only
+            summarized.
+        enable_timers : Whether to time the sections of the training loop (acting,
+            stepping the environments, updating...) in `timers`. Their mean durations
+            and fractions of the time are logged as train info (e.g. `timing/env_step_ms`).
+        sync_timers : Whether timers synchronize the (CUDA) device at the start and end of
+            each section, attributing kernels to the sections launching them at the cost
+            of a host-device sync per section (see `TimerRegistry`). Off by default.
+        report_memory : Whether trainers should log the memory held by their rollout
+            storages, model and optimizer, and the resident memory of their own and their
+            task samplers' processes as train info (under `memory/`, see `memory_info`).
+        profile_units : If given, the first rollout (counting from 0) and the number of
+            rollouts to profile (see `utils.profiling_utils.ProfilingWindow`). In validation
+            and testing, rollouts (of `training_pipeline.num_steps` steps) are counted across
+            evaluated checkpoints.
+        profiles_dir : Directory where profiles are written (required if `profile_units`
+            is given).
         """
         self.config = config
         self.results_queue = results_queue
@@ -109,8 +161,17 @@ class OnPolicyRLEngine(object):
         self.worker_id = worker_id
         self.num_workers = num_workers
         self.device = torch.device("cpu") if device == -1 else torch.device(device)  # type: ignore
+        self.distributed_ip = distributed_ip
         self.distributed_port = distributed_port
 
+        self.timers = TimerRegistry(
+            enabled=enable_timers,
+            synchronize_device=self.device
+            if sync_timers and self.device.type == "cuda"
+            else None,
+        )
+        self.report_memory = report_memory
+
         self.mode = mode.lower()
         assert self.mode in [
             "train",
@@ -133,6 +194,26 @@ class OnPolicyRLEngine(object):
         ), "`max_sampler_processes_per_worker` must be either `None` or a positive integer."
         self.max_sampler_processes_per_worker = max_sampler_processes_per_worker
 
+        self.profiling_window: Optional[ProfilingWindow] = None
+        if profile_units is not None:
+            assert (
+                profiles_dir is not None
+            ), "A `profiles_dir` must be given to profile units of work"
+            self.profiling_window = ProfilingWindow(
+                directory=profiles_dir,
+                name="{}_{}".format(self.profiling_role, self.worker_id),
+                role=self.profiling_role,
+                first_unit=profile_units[0],
+                num_units=profile_units[1],
+                device=self.device,
+            )
+
+        self.episode_metrics_writer: Optional[EpisodeMetricsWriter] = None
+        if episode_metrics_dir is not None:
+            self.episode_metrics_writer = EpisodeMetricsWriter(
+                directory=episode_metrics_dir, mode=self.mode, worker_id=self.worker_id
+            )
+
         machine_params = config.machine_params(self.mode)
         self.machine_params: MachineParams
         if isinstance(machine_params, MachineParams):
@@ -141,48 +222,37 @@ class OnPolicyRLEngine(object):
             self.machine_params = MachineParams(**machine_params)
 
         self.num_samplers_per_worker = self.machine_params.nprocesses
-        self.num_samplers = self.num_samplers_per_worker[self.worker_id]
+        # Workers in each node (all of them, unless training in multiple nodes)
+        self.num_local_workers = min(
+            self.num_workers, len(self.machine_params.nprocesses)
+        )
+        if self.num_workers > len(self.num_samplers_per_worker):
+            # Multi-node: all nodes share the same machine params, so workers with the
+            # same local id in different nodes use the same number of samplers
+            assert (
+                self.num_workers % len(self.num_samplers_per_worker) == 0
+            ), "The number of workers ({}) must be a multiple of the number of workers per node ({})".format(
+                self.num_workers, len(self.num_samplers_per_worker)
+            )
+            self.num_samplers_per_worker = tuple(self.num_samplers_per_worker) * (
+                self.num_workers // len(self.num_samplers_per_worker)
+            )
+        # Index of the partition of task samplers stepped by this worker (its own,
+        # unless testers evaluate shards, see `OnPolicyInference.process_shards`)
+        self.shard = self.worker_id
+        self.num_samplers = self.num_samplers_per_worker[self.shard]
 
         self._vector_tasks: Optional[VectorSampledTasks] = None
 
         self.observation_set = None
         self.actor_critic: Optional[ActorCriticModel] = None
         if self.num_samplers > 0:
-            if self.machine_params.observation_set is not None:
-                # centralized observation set,
-                self.observation_set = self.machine_params.observation_set.to(
-                    self.device
-                )
-                set_seed(self.seed)
-                self.actor_critic = cast(
-                    ActorCriticModel,
-                    self.config.create_model(observation_set=self.observation_set),
-                ).to(self.device)
-            else:
-                # no observation set
-                set_seed(self.seed)
-                self.actor_critic = cast(
-                    ActorCriticModel, self.config.create_model()
-                ).to(self.device)
+            self.create_actor_critic()
 
         self.is_distributed = False
         self.store: Optional[torch.distributed.TCPStore] = None  # type:ignore
         if self.num_workers > 1:
-            self.store = torch.distributed.TCPStore(  # type:ignore
-                "127.0.0.1",
-                self.distributed_port,
-                self.num_workers,
-                self.worker_id == 0,
-            )
-            cpu_device = self.device == torch.device("cpu")  # type:ignore
-
-            dist.init_process_group(  # type:ignore
-                backend="gloo" if cpu_device else "nccl",
-                store=self.store,
-                rank=self.worker_id,
-                world_size=self.num_workers,
-            )
-            self.is_distributed = True
+            self.init_distributed()
 
         self.deterministic_agents = deterministic_agents
 
@@ -193,6 +263,56 @@ class OnPolicyRLEngine(object):
         # Keeping track of metrics during training/inference
         self.single_process_metrics_queue: queue.Queue = queue.Queue()
 
+    def create_actor_critic(self) -> None:
+        if self.machine_params.observation_set is not None:
+            # centralized observation set,
+            self.observation_set = self.machine_params.observation_set.to(self.device)
+            set_seed(self.seed)
+            self.actor_critic = cast(
+                ActorCriticModel,
+                self.config.create_model(observation_set=self.observation_set),
+            ).to(self.device)
+        else:
+            # no observation set
+            set_seed(self.seed)
+            self.actor_critic = cast(ActorCriticModel, self.config.create_model()).to(
+                self.device
+            )
+
+    @property
+    def profiling_role(self) -> str:
+        """Role of this engine in profiles."""
+        return self.mode
+
+    def profiling_unit_started(self) -> None:
+        """Marks the start of a unit of work (e.g. a rollout) for the
+        profiling window (if any)."""
+        if self.profiling_window is not None:
+            self.profiling_window.unit_started(self._vector_tasks)
+
+    def profiling_unit_finished(self) -> None:
+        if self.profiling_window is not None:
+            self.profiling_window.unit_finished(self._vector_tasks)
+
+    def init_distributed(self) -> None:
+        """Connects to the distributed store and joins the process group of
+        all workers."""
+        self.store = torch.distributed.TCPStore(  # type:ignore
+            self.distributed_ip,
+            self.distributed_port,
+            self.num_workers,
+            self.worker_id == 0,
+        )
+        cpu_device = self.device == torch.device("cpu")  # type:ignore
+
+        dist.init_process_group(  # type:ignore
+            backend="gloo" if cpu_device else "nccl",
+            store=self.store,
+            rank=self.worker_id,
+            world_size=self.num_workers,
+        )
+        self.is_distributed = True
+
     @property
     def vector_tasks(self) -> VectorSampledTasks:
         if self._vector_tasks is None and self.num_samplers > 0:
@@ -248,7 +368,7 @@ class OnPolicyRLEngine(object):
 
         if self.is_distributed:
             total_processes = sum(self.num_samplers_per_worker)
-            process_offset = sum(self.num_samplers_per_worker[: self.worker_id])
+            process_offset = sum(self.num_samplers_per_worker[: self.shard])
         else:
             total_processes = self.num_samplers
             process_offset = 0
@@ -293,9 +413,14 @@ class OnPolicyRLEngine(object):
 
         return ckpt
 
-    # aggregates task metrics currently in queue
+    # aggregates task metrics currently in queue (waiting up to `timeout` seconds for each
+    # entry if given) and flushes the episode metrics written so far if `flush`
     def aggregate_task_metrics(
-        self, logging_pkg: LoggingPackage, num_tasks: int = -1,
+        self,
+        logging_pkg: LoggingPackage,
+        num_tasks: int = -1,
+        timeout: Optional[float] = 0.01,
+        flush: bool = True,
     ) -> LoggingPackage:
         done = num_tasks == 0
         num_empty_tasks_dequeued = 0
@@ -303,12 +428,21 @@ class OnPolicyRLEngine(object):
             try:
                 # This queue is on this process so we should be able to let the timeout be small
                 # TODO: This should be refactored so that single_process_metrics_queue is a list
-                metrics_dict = self.single_process_metrics_queue.get(timeout=0.01)
-
-                num_empty_tasks_dequeued += not logging_pkg.add_metrics_dict(
-                    single_task_metrics_dict=metrics_dict
+                metrics_dict = (
+                    self.single_process_metrics_queue.get(timeout=timeout)
+                    if timeout is not None
+                    else self.single_process_metrics_queue.get_nowait()
                 )
 
+                train_info = metrics_dict.pop(TASK_TRAIN_INFO_KEY, None)
+                if train_info is not None and self.mode == "train":
+                    logging_pkg.add_train_info_dict(train_info_dict=train_info, n=1)
+
+                if logging_pkg.add_metrics_dict(single_task_metrics_dict=metrics_dict):
+                    self.write_episode_metrics(logging_pkg, metrics_dict)
+                else:
+                    num_empty_tasks_dequeued += 1
+
                 if num_tasks > 0:
                     num_tasks -= 1
                 done = num_tasks == 0
@@ -330,27 +464,47 @@ class OnPolicyRLEngine(object):
                 "Discarded {} empty task metrics".format(num_empty_tasks_dequeued)
             )
 
+        if flush and self.episode_metrics_writer is not None:
+            self.episode_metrics_writer.flush()
+
         return logging_pkg
 
+    def write_episode_metrics(
+        self, logging_pkg: LoggingPackage, metrics_dict: Dict[str, Any]
+    ):
+        if self.episode_metrics_writer is None:
+            return
+
+        self.episode_metrics_writer.write(
+            {
+                "mode": self.mode,
+                "worker_id": self.worker_id,
+                "training_steps": logging_pkg.training_steps,
+                **metrics_dict,
+            }
+        )
+
     def _preprocess_observations(self, batched_observations):
         if self.observation_set is None:
             return batched_observations
-        return self.observation_set.get_observations(batched_observations)
+        with self.timers.time("preprocess"):
+            return self.observation_set.get_observations(batched_observations)
 
     def remove_paused(self, observations):
-        paused, keep, running = [], [], []
-        for it, obs in enumerate(observations):
-            if obs is None:
-                paused.append(it)
-            else:
-                keep.append(it)
-                running.append(obs)
+        with self.timers.time("remove_paused"):
+            paused, keep, running = [], [], []
+            for it, obs in enumerate(observations):
+                if obs is None:
+                    paused.append(it)
+                else:
+                    keep.append(it)
+                    running.append(obs)
 
-        for p in reversed(paused):
-            self.vector_tasks.pause_at(p)
+            for p in reversed(paused):
+                self.vector_tasks.pause_at(p)
 
-        # Group samplers along new dim:
-        batch = batch_observations(running, device=self.device)
+            # Group samplers along new dim:
+            batch = batch_observations(running, device=self.device)
 
         return len(paused), keep, batch
 
@@ -368,11 +522,17 @@ class OnPolicyRLEngine(object):
             visualizer.collect(vector_task=self.vector_tasks, alive=keep)
         return npaused
 
+    @property
+    def rollout_actor_critic(self) -> ActorCriticModel:
+        """Model used to act (and estimate values) while collecting
+        rollouts."""
+        return self.actor_critic
+
     def act(self, rollouts: RolloutStorage):
         with torch.no_grad():
             step_observation = rollouts.pick_observation_step(rollouts.step)
             memory = rollouts.pick_memory_step(rollouts.step)
-            actor_critic_output, memory = self.actor_critic(
+            actor_critic_output, memory = self.rollout_actor_critic(
                 step_observation,
                 memory,
                 rollouts.prev_actions[rollouts.step : rollouts.step + 1],
@@ -392,12 +552,14 @@ class OnPolicyRLEngine(object):
         return memory.sampler_select(keep) if memory is not None else memory
 
     def collect_rollout_step(self, rollouts: RolloutStorage, visualizer=None) -> int:
-        actions, actor_critic_output, memory, _ = self.act(rollouts=rollouts)
+        with self.timers.time("act"):
+            actions, actor_critic_output, memory, _ = self.act(rollouts=rollouts)
 
         # Squeeze step and action dimensions and send a list for each sampler's agents
-        outputs: List[RLStepResult] = self.vector_tasks.step(
-            [[a.item() for a in ac] for ac in actions.squeeze(0).squeeze(-1)]
-        )
+        with self.timers.time("env_step"):
+            outputs: List[RLStepResult] = self.vector_tasks.step(
+                [[a.item() for a in ac] for ac in actions.squeeze(0).squeeze(-1)]
+            )
 
         # Save after task completion metrics
         for step_result in outputs:
@@ -441,19 +603,21 @@ class OnPolicyRLEngine(object):
         if npaused > 0:
             rollouts.sampler_select(keep)
 
-        rollouts.insert(
-            observations=self._preprocess_observations(batch)
-            if len(keep) > 0
-            else batch,
-            memory=self._active_memory(memory, keep),
-            actions=actions[:, keep],
-            action_log_probs=actor_critic_output.distributions.log_probs(actions)[
-                :, keep
-            ],
-            value_preds=actor_critic_output.values[:, keep],
-            rewards=rewards[:, keep],
-            masks=masks[:, keep],
-        )
+        if len(keep) > 0:
+            batch = self._preprocess_observations(batch)
+
+        with self.timers.time("storage_insert"):
+            rollouts.insert(
+                observations=batch,
+                memory=self._active_memory(memory, keep),
+                actions=actions[:, keep],
+                action_log_probs=actor_critic_output.distributions.log_probs(actions)[
+                    :, keep
+                ],
+                value_preds=actor_critic_output.values[:, keep],
+                rewards=rewards[:, keep],
+                masks=masks[:, keep],
+            )
 
         # TODO we always miss tensors for the last action in the last episode of each worker
         if visualizer is not None:
@@ -482,6 +646,18 @@ class OnPolicyRLEngine(object):
                 else:
                     raise NotImplementedError()
 
+        if "profiling_window" in self.__dict__ and self.profiling_window is not None:
+            try:
+                # Writes the profiles if the window was still open
+                self.profiling_window.close(self.__dict__.get("_vector_tasks"))
+            except Exception as e:
+                logif(
+                    "{} worker {} Exception raised when closing the profiling window:".format(
+                        self.mode, self.worker_id
+                    )
+                )
+                logif(e)
+
         if "_vector_tasks" in self.__dict__ and self._vector_tasks is not None:
             try:
                 logif(
@@ -499,6 +675,12 @@ class OnPolicyRLEngine(object):
                 )
                 logif(e)
 
+        if (
+            "episode_metrics_writer" in self.__dict__
+            and self.episode_metrics_writer is not None
+        ):
+            self.episode_metrics_writer.close()
+
         self._is_closed = True
 
     def __del__(self):
@@ -525,6 +707,7 @@ class OnPolicyTrainer(OnPolicyRLEngine):
         worker_id: int = 0,
         num_workers: int = 1,
         device: Union[str, torch.device, int] = "cpu",
+        distributed_ip: str = "127.0.0.1",
         distributed_port: int = 0,
         deterministic_agents: bool = False,
         distributed_preemption_threshold: float = 0.7,
@@ -544,6 +727,7 @@ class OnPolicyTrainer(OnPolicyRLEngine):
             worker_id=worker_id,
             num_workers=num_workers,
             device=device,
+            distributed_ip=distributed_ip,
             distributed_port=distributed_port,
             deterministic_agents=deterministic_agents,
             max_sampler_processes_per_worker=max_sampler_processes_per_worker,
@@ -574,22 +758,76 @@ class OnPolicyTrainer(OnPolicyRLEngine):
             self.num_workers_steps = torch.distributed.PrefixStore(  # type:ignore
                 "num_workers_steps", self.store
             )
-            self.distributed_preemption_threshold = distributed_preemption_threshold
-            # Flag for finished worker in current epoch
-            self.offpolicy_epoch_done = torch.distributed.PrefixStore(  # type:ignore
-                "offpolicy_epoch_done", self.store
+            # Logging packages sent by workers in other nodes to the primary node
+            self.forwarded_logging_pkgs = torch.distributed.PrefixStore(  # type:ignore
+                "logging_pkgs", self.store
+            )
+            # Reads num_workers_done in the background (to preempt stragglers)
+            self.workers_done_watcher: Optional[
+                WorkersDoneWatcher
+            ] = WorkersDoneWatcher(
+                self.distributed_ip, self.distributed_port, self.num_workers
             )
+            self.distributed_preemption_threshold = distributed_preemption_threshold
+            # Sums gradients across workers, overlapped with the backward pass
+            self.gradient_reducer: Optional[
+                GradientBucketReducer
+            ] = GradientBucketReducer(self.actor_critic.parameters())
         else:
             self.num_workers_done = None
             self.num_workers_steps = None
+            self.forwarded_logging_pkgs = None
+            self.workers_done_watcher = None
+            self.gradient_reducer = None
             self.distributed_preemption_threshold = 1.0
-            self.offpolicy_epoch_done = None
+
+        # Collecting rollouts while updating (with a one-step policy lag)
+        self.inference_actor_critic: Optional[ActorCriticModel] = None
+        self.update_executor: Optional[ThreadPoolExecutor] = None
+        self.rollout_barrier_group = None
+        if self.training_pipeline.overlap_rollouts_and_updates:
+            # Holds the parameters before the update running in the background
+            self.inference_actor_critic = copy.deepcopy(self.actor_critic)
+            for p in self.inference_actor_critic.parameters():
+                p.requires_grad_(False)
+            self.update_executor = ThreadPoolExecutor(max_workers=1)
+            if self.is_distributed:
+                # Barriers while collecting can't share the process group with the
+                # (concurrent) gradient reductions, as their order may differ across workers
+                self.rollout_barrier_group = dist.new_group(backend="gloo")
+
+        # Checkpoints are written in the background, keeping at most
+        # `max_pending_checkpoints` snapshots in memory
+        self.checkpoint_executor: Optional[ThreadPoolExecutor] = None
+        self.checkpoint_futures: List[Future] = []
+        self.max_pending_checkpoints = 1
+
+        # Storages holding the rollouts being collected (and updated with)
+        self.rollout_storages: List[RolloutStorage] = []
+
+        # Off-policy data iterator of the current stage (and the index of that stage)
+        self.offpolicy_data_iterator: Optional[Iterator] = None
+        self.offpolicy_data_iterator_stage: Optional[int] = None
 
         # Keeping track of training state
         self.tracking_info: Dict[str, List] = defaultdict(lambda: [])
         self.former_steps: Optional[int] = None
         self.last_log: Optional[int] = None
         self.last_save: Optional[int] = None
+        # Number of logging packages sent so far (keys forwarded packages)
+        self.num_logging_pkgs_sent = 0
+
+    @property
+    def rollout_actor_critic(self) -> ActorCriticModel:
+        if self.inference_actor_critic is not None:
+            return self.inference_actor_critic
+        return self.actor_critic
+
+    def sync_inference_actor_critic(self) -> None:
+        """Copies the current parameters into the model used to collect
+        rollouts (if different from the model being trained)."""
+        if self.inference_actor_critic is not None:
+            self.inference_actor_critic.load_state_dict(self.actor_critic.state_dict())
 
     def advance_seed(
         self, seed: Optional[int], return_same_seed_per_worker=False
@@ -615,9 +853,26 @@ class OnPolicyTrainer(OnPolicyRLEngine):
             seeds = self.worker_seeds(
                 self.num_samplers, None
             )  # use latest seed for workers and update rng state
-            self.vector_tasks.set_seeds(seeds)
+            # Paused samplers (e.g. out of tasks) don't take new seeds
+            self.vector_tasks.set_seeds(seeds[: self.vector_tasks.num_unpaused_tasks])
 
     def checkpoint_save(self) -> str:
+        """Snapshots the training state (to cpu memory) and writes it into a
+        new checkpoint in the background.
+
+        Checkpoints are first written into a temporary file and then
+        renamed, so they are never seen partially written. Once written,
+        they are posted (if given a `checkpoints_queue`) for evaluation.
+        Writes happen in order, one at a time, and a new snapshot is only
+        taken once fewer than `max_pending_checkpoints` are pending.
+
+        # Returns
+
+        The path of the checkpoint (possibly not written yet, see
+        `wait_for_checkpoints`).
+        """
+        self._check_checkpoint_writes(max_pending=self.max_pending_checkpoints)
+
         model_path = os.path.join(
             self.checkpoints_dir,
             "exp_{}__stage_{:02d}__steps_{:012d}.pt".format(
@@ -640,9 +895,51 @@ class OnPolicyTrainer(OnPolicyRLEngine):
                 _LRScheduler, self.lr_scheduler
             ).state_dict()
 
-        torch.save(save_dict, model_path)
+        # Copies, as the state keeps being updated while writing
+        self._submit_checkpoint_write(cpu_copy_recursively(save_dict), model_path)
+
         return model_path
 
+    def _submit_checkpoint_write(
+        self, save_dict: Dict[str, Any], model_path: str
+    ) -> None:
+        if self.checkpoint_executor is None:
+            self.checkpoint_executor = ThreadPoolExecutor(max_workers=1)
+        self.checkpoint_futures.append(
+            self.checkpoint_executor.submit(
+                self._write_checkpoint, save_dict, model_path
+            )
+        )
+
+    def _write_checkpoint(self, save_dict: Dict[str, Any], model_path: str) -> None:
+        tmp_path = model_path + ".tmp"
+        torch.save(save_dict, tmp_path)
+        os.replace(tmp_path, model_path)
+        if self.checkpoints_queue is not None:
+            self.checkpoints_queue.put(("eval", model_path))
+
+    def _check_checkpoint_writes(self, max_pending: Optional[int] = None) -> None:
+        # Waits for the oldest writes until fewer than `max_pending` are pending
+        if max_pending is not None:
+            while len(self.checkpoint_futures) >= max(max_pending, 1):
+                self.checkpoint_futures.pop(0).result()
+
+        # Raises exceptions from completed writes (if any)
+        pending = []
+        for future in self.checkpoint_futures:
+            if future.done():
+                future.result()
+            else:
+                pending.append(future)
+        self.checkpoint_futures = pending
+
+    def wait_for_checkpoints(self) -> None:
+        """Waits until all saved checkpoints have been written (and
+        posted)."""
+        futures, self.checkpoint_futures = self.checkpoint_futures, []
+        for future in futures:
+            future.result()
+
     def checkpoint_load(
         self, ckpt: Union[str, Dict[str, Any]], restart_pipeline: bool = False
     ) -> Dict[str, Union[Dict[str, Any], torch.Tensor, float, int, str, List]]:
@@ -774,51 +1071,54 @@ class OnPolicyTrainer(OnPolicyRLEngine):
             )
 
             for bit, batch in enumerate(data_generator):
-                # masks is always [steps, samplers, agents, 1]:
-                num_rollout_steps, num_samplers = batch["masks"].shape[:2]
-                bsize = num_rollout_steps * num_samplers
-
-                actor_critic_output, memory = self.actor_critic(
-                    observations=batch["observations"],
-                    memory=batch["memory"],
-                    prev_actions=batch["prev_actions"],
-                    masks=batch["masks"],
-                )
-
-                info: Dict[str, float] = {
-                    "lr": self.optimizer.param_groups[0]["lr"]  # type: ignore
-                }
-
-                total_loss: Optional[torch.Tensor] = None
-                for loss_name in self.training_pipeline.current_stage_losses:
-                    loss, loss_weight = (
-                        self.training_pipeline.current_stage_losses[loss_name],
-                        self.training_pipeline.current_stage_loss_weights[loss_name],
+                with self.timers.time("update_minibatch"):
+                    # masks is always [steps, samplers, agents, 1]:
+                    num_rollout_steps, num_samplers = batch["masks"].shape[:2]
+                    bsize = num_rollout_steps * num_samplers
+
+                    actor_critic_output, memory = self.actor_critic(
+                        observations=batch["observations"],
+                        memory=batch["memory"],
+                        prev_actions=batch["prev_actions"],
+                        masks=batch["masks"],
                     )
 
-                    current_loss, current_info = loss.loss(
-                        step_count=self.step_count,
-                        batch=batch,
-                        actor_critic_output=actor_critic_output,
-                    )
-                    if total_loss is None:
-                        total_loss = loss_weight * current_loss
-                    else:
-                        total_loss = total_loss + loss_weight * current_loss
+                    info: Dict[str, float] = {
+                        "lr": self.optimizer.param_groups[0]["lr"]  # type: ignore
+                    }
+
+                    total_loss: Optional[torch.Tensor] = None
+                    for loss_name in self.training_pipeline.current_stage_losses:
+                        loss, loss_weight = (
+                            self.training_pipeline.current_stage_losses[loss_name],
+                            self.training_pipeline.current_stage_loss_weights[
+                                loss_name
+                            ],
+                        )
 
-                    for key in current_info:
-                        info[loss_name + "/" + key] = current_info[key]
+                        current_loss, current_info = loss.loss(
+                            step_count=self.step_count,
+                            batch=batch,
+                            actor_critic_output=actor_critic_output,
+                        )
+                        if total_loss is None:
+                            total_loss = loss_weight * current_loss
+                        else:
+                            total_loss = total_loss + loss_weight * current_loss
 
-                assert (
-                    total_loss is not None
-                ), "No losses specified for training in stage {}".format(
-                    self.training_pipeline.current_stage_index
-                )
+                        for key in current_info:
+                            info[loss_name + "/" + key] = current_info[key]
 
-                info["total_loss"] = total_loss.item()
-                self.tracking_info["update"].append(("update_package", info, bsize))
+                    assert (
+                        total_loss is not None
+                    ), "No losses specified for training in stage {}".format(
+                        self.training_pipeline.current_stage_index
+                    )
+
+                    info["total_loss"] = total_loss.item()
+                    self.tracking_info["update"].append(("update_package", info, bsize))
 
-                self.backprop_step(total_loss)
+                    self.backprop_step(total_loss)
 
         # # TODO Unit test to ensure correctness of distributed infrastructure
         # state_dict = self.actor_critic.state_dict()
@@ -849,6 +1149,12 @@ class OnPolicyTrainer(OnPolicyRLEngine):
         )
 
         offpolicy_iterator = data_iterator_builder(**kwargs)
+        if stage.offpolicy_component.prefetch_batches > 0:
+            offpolicy_iterator = PrefetchingIterator(
+                offpolicy_iterator,
+                num_batches=stage.offpolicy_component.prefetch_batches,
+                device=self.device,
+            )
 
         stage.offpolicy_memory.clear()
         if stage.offpolicy_epochs is None:
@@ -857,34 +1163,64 @@ class OnPolicyTrainer(OnPolicyRLEngine):
             stage.offpolicy_epochs += 1
 
         if self.is_distributed:
-            self.offpolicy_epoch_done.set("offpolicy_epoch_done", str(0))
-            dist.barrier()  # sync
+            dist.barrier()  # sync at epoch boundaries
 
         return offpolicy_iterator
 
-    def backprop_step(self, total_loss):
-        self.optimizer.zero_grad()  # type: ignore
-        if isinstance(total_loss, torch.Tensor):
-            total_loss.backward()
+    def backprop_step(
+        self, total_loss, extra_to_reduce: Optional[torch.Tensor] = None
+    ) -> Optional[torch.Tensor]:
+        """Computes gradients for `total_loss`, reduces them across workers (in
+        distributed mode) and takes an optimizer step.
 
-        if self.is_distributed:
-            # From https://github.com/pytorch/pytorch/issues/43135
-            reductions = []
-            for p in self.actor_critic.parameters():
-                # you can also organize grads to larger buckets to make allreduce more efficient
-                if p.requires_grad:
-                    if p.grad is None:
-                        p.grad = torch.zeros_like(p.data)
-                    reductions.append(
-                        dist.all_reduce(p.grad, async_op=True,)
-                    )  # synchronize
-            for reduction in reductions:
-                reduction.wait()
-
-        nn.utils.clip_grad_norm_(
-            self.actor_critic.parameters(), self.training_pipeline.max_grad_norm,  # type: ignore
-        )
-        self.optimizer.step()  # type: ignore
+        # Parameters
+
+        total_loss : The loss to minimize.
+        extra_to_reduce : Optional tensor (e.g. flags or counters) summed across
+            workers together with the gradients, so that workers can exchange
+            small amounts of information without additional synchronization.
+
+        # Returns
+
+        The reduced `extra_to_reduce` (`None` if not given).
+        """
+        with self.timers.time("backprop"):
+            self.optimizer.zero_grad()  # type: ignore
+            if self.is_distributed:
+                # Gradient buckets are reduced as soon as they are ready
+                self.gradient_reducer.prepare()
+
+            if isinstance(total_loss, torch.Tensor):
+                total_loss.backward()
+
+            if self.is_distributed:
+                # Reduces the remaining buckets (with zero gradients for parameters
+                # without gradient) and waits for all reductions (synchronize)
+                self.gradient_reducer.reduce(extra_to_reduce=extra_to_reduce)
+
+            nn.utils.clip_grad_norm_(
+                self.actor_critic.parameters(), self.training_pipeline.max_grad_norm,  # type: ignore
+            )
+            self.optimizer.step()  # type: ignore
+
+        return extra_to_reduce
+
+    def any_worker_flag(self, flag: bool) -> bool:
+        """Whether `flag` is set in any worker (requires a collective call in
+        distributed mode)."""
+        if not self.is_distributed:
+            return flag
+        flag_tensor = torch.tensor([float(flag)], device=self.device)
+        dist.all_reduce(flag_tensor)
+        return flag_tensor.item() > 0
+
+    def close_offpolicy_iterator(self) -> None:
+        """Drops the current off-policy data iterator, stopping its
+        background thread if it prefetches batches."""
+        if isinstance(self.offpolicy_data_iterator, PrefetchingIterator):
+            self.offpolicy_data_iterator.close()
+        self.offpolicy_data_iterator = None
+        self.offpolicy_data_iterator_stage = None
 
     def offpolicy_update(
         self,
@@ -894,33 +1230,36 @@ class OnPolicyTrainer(OnPolicyRLEngine):
     ) -> Iterator:
         stage = self.training_pipeline.current_stage
 
-        current_steps = 0
-        if self.is_distributed:
-            self.num_workers_steps.set("steps", str(0))
-            dist.barrier()
+        def next_batch(iterator: Iterator) -> Optional[Any]:
+            with self.timers.time("offpolicy_batch"):
+                try:
+                    return next(iterator)
+                except StopIteration:
+                    return None
 
-        for e in range(updates):
-            if data_iterator is None:
-                data_iterator = self.make_offpolicy_iterator(data_iterator_builder)
+        current_steps = 0
 
-            try:
-                batch = next(data_iterator)
-            except StopIteration:
-                batch = None
-                if self.is_distributed:
-                    self.offpolicy_epoch_done.add("offpolicy_epoch_done", 1)
+        if data_iterator is None:
+            data_iterator = self.make_offpolicy_iterator(data_iterator_builder)
 
-            if self.is_distributed:
-                dist.barrier()  # sync after every batch!
-                if int(self.offpolicy_epoch_done.get("offpolicy_epoch_done")) != 0:
-                    batch = None
+        # An epoch ends for all workers as soon as any of them exhausts its data.
+        # Workers look one batch ahead and piggyback their "epoch done" flag (and
+        # batch size) on the gradient all-reduce, so that they only need to
+        # synchronize at epoch boundaries.
+        batch = next_batch(data_iterator)
+        epoch_done = self.any_worker_flag(batch is None)
 
-            if batch is None:
+        for e in range(updates):
+            if epoch_done:
+                if isinstance(data_iterator, PrefetchingIterator):
+                    data_iterator.close()
                 data_iterator = self.make_offpolicy_iterator(data_iterator_builder)
                 # TODO: (batch, bsize) from iterator instead of waiting for the loss?
-                batch = next(data_iterator)
+                with self.timers.time("offpolicy_batch"):
+                    batch = next(data_iterator)
 
-            batch = to_device_recursively(batch, device=self.device, inplace=True)
+            with self.timers.time("offpolicy_to_device"):
+                batch = to_device_recursively(batch, device=self.device, inplace=True)
 
             info: Dict[str, float] = dict()
             info["lr"] = self.optimizer.param_groups[0]["lr"]  # type: ignore
@@ -956,29 +1295,35 @@ class OnPolicyTrainer(OnPolicyRLEngine):
 
             info["offpolicy/total_loss"] = total_loss.item()
             info["offpolicy/epoch"] = stage.offpolicy_epochs
+            if isinstance(data_iterator, PrefetchingIterator):
+                for key, value in data_iterator.pop_stats().items():
+                    info["offpolicy/prefetch/" + key] = value
             self.tracking_info["offpolicy_update"].append(
                 ("offpolicy_update_package", info, bsize)
             )
 
-            self.backprop_step(total_loss)
+            # Look ahead, unless this is the last update (the next call will fetch
+            # its first batch itself)
+            last_update = e == updates - 1
+            batch = None if last_update else next_batch(data_iterator)
+
+            reduced = self.backprop_step(
+                total_loss,
+                extra_to_reduce=torch.tensor(
+                    # epoch done flag, samplers x steps
+                    [float(batch is None and not last_update), float(bsize)],
+                    dtype=torch.float64,
+                    device=self.device,
+                ),
+            )
+            epoch_done = reduced[0].item() > 0
+            current_steps += int(reduced[1].item())
 
             stage.offpolicy_memory = detach_recursively(
                 input=stage.offpolicy_memory, inplace=True
             )
 
-            if self.is_distributed:
-                self.num_workers_steps.add("steps", bsize)  # counts samplers x steps
-            else:
-                current_steps += bsize
-
-        if self.is_distributed:
-            dist.barrier()
-            stage.offpolicy_steps_taken_in_stage += int(
-                self.num_workers_steps.get("steps")
-            )
-            dist.barrier()
-        else:
-            stage.offpolicy_steps_taken_in_stage += current_steps
+        stage.offpolicy_steps_taken_in_stage += current_steps
 
         return data_iterator
 
@@ -1021,6 +1366,23 @@ class OnPolicyTrainer(OnPolicyRLEngine):
             {"teacher_forcing_mask": teacher_forcing_mask},
         )
 
+    def close(self, verbose=True):
+        if (
+            "workers_done_watcher" in self.__dict__
+            and self.workers_done_watcher is not None
+        ):
+            self.workers_done_watcher.stop()
+        if "update_executor" in self.__dict__ and self.update_executor is not None:
+            self.update_executor.shutdown(wait=True)
+        if (
+            "checkpoint_executor" in self.__dict__
+            and self.checkpoint_executor is not None
+        ):
+            self.checkpoint_executor.shutdown(wait=True)
+        if "offpolicy_data_iterator" in self.__dict__:
+            self.close_offpolicy_iterator()
+        super().close(verbose=verbose)
+
     def send_package(self, tracking_info: Dict[str, List]):
         logging_pkg = LoggingPackage(
             mode=self.mode,
@@ -1040,78 +1402,158 @@ class OnPolicyTrainer(OnPolicyRLEngine):
             else:
                 logging_pkg.add_train_info_dict(train_info_dict=train_info_dict, n=n)
 
-        self.results_queue.put(logging_pkg)
+        timing_info = self.timers.pop_summary()
+        if len(timing_info) > 0:
+            logging_pkg.add_train_info_dict(train_info_dict=timing_info, n=1)
 
-    def run_pipeline(self, rollouts: RolloutStorage):
-        self.initialize_rollouts(rollouts)
-        self.tracking_info.clear()
+        if self.report_memory:
+            logging_pkg.add_train_info_dict(train_info_dict=self.memory_info(), n=1)
 
-        self.last_log = self.training_pipeline.total_steps
-        self.last_save = self.training_pipeline.total_steps
+        self.send_logging_package(logging_pkg)
 
-        offpolicy_data_iterator: Optional[Iterator] = None
+    def send_logging_package(self, logging_pkg: LoggingPackage) -> None:
+        """Sends a logging package to the (primary) runner.
 
-        while True:
-            self.training_pipeline.before_rollout()
-            if self.training_pipeline.current_stage is None:
-                break
+        Only the runner in the primary node writes logs, so, when training in
+        multiple nodes, workers in other nodes send their packages through the
+        distributed store to worker 0, which forwards them to its runner (after
+        its own package, as all workers send their packages at the same steps).
+
+        # Parameters
+
+        logging_pkg : The package to send.
+        """
+        if self.num_local_workers == self.num_workers:
+            self.results_queue.put(logging_pkg)
+            return
 
+        if self.worker_id >= self.num_local_workers:
+            self.forwarded_logging_pkgs.set(
+                "{}/{}".format(self.worker_id, self.num_logging_pkgs_sent),
+                pickle.dumps(logging_pkg),
+            )
+        else:
+            self.results_queue.put(logging_pkg)
+            if self.worker_id == 0:
+                for worker_id in range(self.num_local_workers, self.num_workers):
+                    key = "{}/{}".format(worker_id, self.num_logging_pkgs_sent)
+                    # Blocks until the worker has sent its package
+                    self.results_queue.put(
+                        pickle.loads(self.forwarded_logging_pkgs.get(key))
+                    )
+                    if hasattr(self.forwarded_logging_pkgs, "delete_key"):
+                        self.forwarded_logging_pkgs.delete_key(key)
+
+        self.num_logging_pkgs_sent += 1
+
+    def memory_info(self) -> Dict[str, float]:
+        """Memory (in MiB) held by the rollout storages (per buffer, see
+        `RolloutStorage.buffer_nbytes`), model and optimizer state, and
+        resident memory (current and peak) of this worker's process and peak
+        resident memory of each of its task sampler processes."""
+        info: Dict[str, float] = OrderedDict()
+
+        storage_nbytes: Dict[str, int] = defaultdict(int)
+        for rollouts in self.rollout_storages:
+            for name, nbytes in rollouts.buffer_nbytes().items():
+                storage_nbytes[name] += nbytes
+        for name, nbytes in storage_nbytes.items():
+            info["memory/storage/{}_mb".format(name)] = nbytes / MB
+        info["memory/storage_mb"] = sum(storage_nbytes.values()) / MB
+
+        models = [self.actor_critic]
+        if self.inference_actor_critic is not None:
+            models.append(self.inference_actor_critic)
+        info["memory/model_mb"] = sum(module_nbytes(model) for model in models) / MB
+        info["memory/optimizer_mb"] = optimizer_state_nbytes(self.optimizer) / MB
+
+        for name, nbytes in process_memory().items():
+            info["memory/worker_{}_mb".format(name)] = nbytes / MB
+
+        if self._vector_tasks is not None:
+            peaks = [
+                memory["peak_rss"]
+                for memory in processes_memory(self._vector_tasks.worker_pids).values()
+                if "peak_rss" in memory
+            ]
+            for it, peak in enumerate(peaks):
+                info["memory/sampler_process_{}/peak_rss_mb".format(it)] = peak / MB
+            if len(peaks) > 0:
+                info["memory/sampler_processes_peak_rss_mb"] = sum(peaks) / MB
+
+        if self.device.type == "cuda":
+            info["memory/cuda_peak_allocated_mb"] = (
+                torch.cuda.max_memory_allocated(self.device) / MB
+            )
+
+        return info
+
+    def collect_rollout(self, rollouts: RolloutStorage) -> None:
+        """Collects a rollout (of at most `num_steps` steps per sampler) and
+        computes its returns."""
+        if self.is_distributed:
+            self.num_workers_done.set("done", str(0))
+            self.num_workers_steps.set("steps", str(0))
+            # Ensure all workers are done before incrementing num_workers_{steps, done}
+            dist.barrier(group=self.rollout_barrier_group)
+            self.workers_done_watcher.reset()
+
+        self.former_steps = self.step_count
+        for step in range(self.training_pipeline.num_steps):
+            self.collect_rollout_step(rollouts=rollouts)
             if self.is_distributed:
-                self.num_workers_done.set("done", str(0))
-                self.num_workers_steps.set("steps", str(0))
-                # Ensure all workers are done before incrementing num_workers_{steps, done}
-                dist.barrier()
-
-            self.former_steps = self.step_count
-            for step in range(self.training_pipeline.num_steps):
-                self.collect_rollout_step(rollouts=rollouts)
-                if self.is_distributed:
-                    # Preempt stragglers
-                    # Each worker will stop collecting steps for the current rollout whenever a
-                    # 100 * distributed_preemption_threshold percentage of workers are finished collecting their
-                    # rollout steps and we have collected at least 25% but less than 90% of the steps.
-                    num_done = int(self.num_workers_done.get("done"))
-                    if (
-                        num_done
-                        > self.distributed_preemption_threshold * self.num_workers
-                        and 0.25 * self.training_pipeline.num_steps
-                        <= step
-                        < 0.9 * self.training_pipeline.num_steps
-                    ):
-                        get_logger().debug(
-                            "{} worker {} narrowed rollouts after {} steps (out of {}) with {} workers done".format(
-                                self.mode, self.worker_id, rollouts.step, step, num_done
-                            )
+                # Preempt stragglers
+                # Each worker will stop collecting steps for the current rollout whenever a
+                # 100 * distributed_preemption_threshold percentage of workers are finished collecting their
+                # rollout steps and we have collected at least 25% but less than 90% of the steps.
+                # (the number of workers done is read in the background by
+                # workers_done_watcher, so checking it doesn't block)
+                num_done = self.workers_done_watcher.num_done
+                if (
+                    num_done > self.distributed_preemption_threshold * self.num_workers
+                    and 0.25 * self.training_pipeline.num_steps
+                    <= step
+                    < 0.9 * self.training_pipeline.num_steps
+                ):
+                    get_logger().debug(
+                        "{} worker {} narrowed rollouts after {} steps (out of {}) with {} workers done".format(
+                            self.mode, self.worker_id, rollouts.step, step, num_done
                         )
-                        rollouts.narrow()
-                        break
+                    )
+                    rollouts.narrow()
+                    break
 
-            with torch.no_grad():
-                actor_critic_output, _ = self.actor_critic(
-                    observations=rollouts.pick_observation_step(-1),
-                    memory=rollouts.pick_memory_step(-1),
-                    prev_actions=rollouts.prev_actions[-1:],
-                    masks=rollouts.masks[-1:],
-                )
+        if self.is_distributed:
+            # No need to watch other workers once this one is done collecting
+            self.workers_done_watcher.pause()
 
-            if self.is_distributed:
-                # Mark that a worker is done collecting experience
-                self.num_workers_done.add("done", 1)
-                self.num_workers_steps.add("steps", self.step_count - self.former_steps)
+        with torch.no_grad():
+            actor_critic_output, _ = self.rollout_actor_critic(
+                observations=rollouts.pick_observation_step(-1),
+                memory=rollouts.pick_memory_step(-1),
+                prev_actions=rollouts.prev_actions[-1:],
+                masks=rollouts.masks[-1:],
+            )
 
-                # Ensure all workers are done before updating step counter
-                dist.barrier()
+        if self.is_distributed:
+            # Mark that a worker is done collecting experience
+            self.num_workers_done.add("done", 1)
+            self.num_workers_steps.add("steps", self.step_count - self.former_steps)
 
-                ndone = int(self.num_workers_done.get("done"))
-                assert (
-                    ndone == self.num_workers
-                ), "# workers done {} != # workers {}".format(ndone, self.num_workers)
+            # Ensure all workers are done before updating step counter
+            dist.barrier(group=self.rollout_barrier_group)
 
-                # get the actual step_count
-                self.step_count = (
-                    int(self.num_workers_steps.get("steps")) + self.former_steps
-                )
+            ndone = int(self.num_workers_done.get("done"))
+            assert (
+                ndone == self.num_workers
+            ), "# workers done {} != # workers {}".format(ndone, self.num_workers)
 
+            # get the actual step_count
+            self.step_count = (
+                int(self.num_workers_steps.get("steps")) + self.former_steps
+            )
+
+        with self.timers.time("compute_returns"):
             rollouts.compute_returns(
                 next_value=actor_critic_output.values.detach(),
                 use_gae=self.training_pipeline.use_gae,
@@ -1119,48 +1561,138 @@ class OnPolicyTrainer(OnPolicyRLEngine):
                 tau=self.training_pipeline.gae_lambda,
             )
 
-            self.update(rollouts=rollouts)  # here we synchronize
+    def can_collect_during_update(self) -> bool:
+        """Whether the next rollout can be collected while updating with the
+        last one.
+
+        The next rollout is expected to take as many steps as the last
+        one. If those would complete the current stage, the next rollout
+        is collected after updating instead, so that each rollout is
+        used to update in the same stage it was collected in.
+        """
+        stage = self.training_pipeline.current_stage
+        last_rollout_steps = self.step_count - self.former_steps
+        return (
+            not stage.is_complete
+            and self.step_count + last_rollout_steps < stage.max_stage_steps
+        )
+
+    def log_and_checkpoint(self) -> None:
+        """Sends the tracked training info for logging and saves a checkpoint
+        (posted for validation) whenever their intervals have elapsed or the
+        current stage is complete."""
+        if (
+            self.training_pipeline.total_steps - self.last_log >= self.log_interval
+            or self.training_pipeline.current_stage.is_complete
+        ):
+            self.send_package(tracking_info=self.tracking_info)
+            self.tracking_info.clear()
+            self.last_log = self.training_pipeline.total_steps
+
+        # save for every interval-th episode or for the last epoch
+        if (
+            self.checkpoints_dir != ""
+            and self.training_pipeline.save_interval > 0
+            and (
+                self.training_pipeline.total_steps - self.last_save
+                >= self.training_pipeline.save_interval
+                or self.training_pipeline.current_stage.is_complete
+            )
+        ):
+            self.deterministic_seeds()
+            if self.worker_id == 0:
+                self.checkpoint_save()
+            self.last_save = self.training_pipeline.total_steps
+
+    def run_pipeline(self, rollouts: RolloutStorage):
+        self.initialize_rollouts(rollouts)
+        self.tracking_info.clear()
+        self.timers.reset()
+
+        self.last_log = self.training_pipeline.total_steps
+        self.last_save = self.training_pipeline.total_steps
+
+        self.close_offpolicy_iterator()
+
+        # With overlapped rollouts and updates, the next rollout is collected in
+        # `next_rollouts` while updating with `rollouts`, and then they're swapped
+        overlap = self.training_pipeline.overlap_rollouts_and_updates
+        next_rollouts: Optional[RolloutStorage] = None
+        if overlap:
+            next_rollouts = RolloutStorage(
+                num_steps=self.training_pipeline.num_steps,
+                num_samplers=self.num_samplers,
+                actor_critic=self.actor_critic
+                if isinstance(self.actor_critic, ActorCriticModel)
+                else cast(ActorCriticModel, self.actor_critic.module),
+            )
+            next_rollouts.to(self.device)
+        self.rollout_storages = [r for r in [rollouts, next_rollouts] if r is not None]
+        collected_next = False
+        tasks_reset = False
+
+        while True:
+            self.training_pipeline.before_rollout()
+            if self.training_pipeline.current_stage is None:
+                break
+
+            self.profiling_unit_started()
+
+            if collected_next:
+                rollouts, next_rollouts = next_rollouts, rollouts
+                collected_next = False
+            else:
+                if tasks_reset:
+                    self.initialize_rollouts(rollouts)
+                    tasks_reset = False
+                self.sync_inference_actor_critic()
+                self.collect_rollout(rollouts)
+
+            if overlap and self.can_collect_during_update():
+                # Collect the next rollout with the parameters before this update
+                self.sync_inference_actor_critic()
+                if tasks_reset:
+                    self.initialize_rollouts(next_rollouts)
+                    tasks_reset = False
+                else:
+                    next_rollouts.continue_from(rollouts)
+
+                update_future = self.update_executor.submit(self.update, rollouts)
+                try:
+                    self.collect_rollout(next_rollouts)
+                finally:
+                    update_future.result()  # here we synchronize
+                collected_next = True
+            else:
+                self.update(rollouts=rollouts)  # here we synchronize
             self.training_pipeline.rollout_count += 1
 
             rollouts.after_update()
 
+            if (
+                self.offpolicy_data_iterator_stage
+                != self.training_pipeline.current_stage_index
+            ):
+                # The iterator belongs to a former stage
+                self.close_offpolicy_iterator()
+
             if self.training_pipeline.current_stage.offpolicy_component is not None:
                 offpolicy_component = (
                     self.training_pipeline.current_stage.offpolicy_component
                 )
-                offpolicy_data_iterator = self.offpolicy_update(
+                self.offpolicy_data_iterator = self.offpolicy_update(
                     updates=offpolicy_component.updates,
-                    data_iterator=offpolicy_data_iterator,
+                    data_iterator=self.offpolicy_data_iterator,
                     data_iterator_builder=offpolicy_component.data_iterator_builder,
                 )
+                self.offpolicy_data_iterator_stage = (
+                    self.training_pipeline.current_stage_index
+                )
 
             if self.lr_scheduler is not None:
                 self.lr_scheduler.step(epoch=self.training_pipeline.total_steps)
 
-            if (
-                self.training_pipeline.total_steps - self.last_log >= self.log_interval
-                or self.training_pipeline.current_stage.is_complete
-            ):
-                self.send_package(tracking_info=self.tracking_info)
-                self.tracking_info.clear()
-                self.last_log = self.training_pipeline.total_steps
-
-            # save for every interval-th episode or for the last epoch
-            if (
-                self.checkpoints_dir != ""
-                and self.training_pipeline.save_interval > 0
-                and (
-                    self.training_pipeline.total_steps - self.last_save
-                    >= self.training_pipeline.save_interval
-                    or self.training_pipeline.current_stage.is_complete
-                )
-            ):
-                self.deterministic_seeds()
-                if self.worker_id == 0:
-                    model_path = self.checkpoint_save()
-                    if self.checkpoints_queue is not None:
-                        self.checkpoints_queue.put(("eval", model_path))
-                self.last_save = self.training_pipeline.total_steps
+            self.log_and_checkpoint()
 
             if (self.training_pipeline.advance_scene_rollout_period is not None) and (
                 self.training_pipeline.rollout_count
@@ -1173,7 +1705,15 @@ class OnPolicyTrainer(OnPolicyRLEngine):
                     )
                 )
                 self.vector_tasks.next_task(force_advance_scene=True)
-                self.initialize_rollouts(rollouts)
+                if collected_next:
+                    # The rollout collected during the update is still used for the next update
+                    tasks_reset = True
+                else:
+                    self.initialize_rollouts(rollouts)
+
+            self.profiling_unit_finished()
+
+        self.close_offpolicy_iterator()
 
     def train(
         self, checkpoint_file_name: Optional[str] = None, restart_pipeline: bool = False
@@ -1195,6 +1735,9 @@ class OnPolicyTrainer(OnPolicyRLEngine):
                 )
             )
 
+            # Checkpoints must be posted before the runner is told training is over
+            self.wait_for_checkpoints()
+
             training_completed_successfully = True
         except KeyboardInterrupt:
             get_logger().info(
@@ -1236,6 +1779,7 @@ class OnPolicyInference(OnPolicyRLEngine):
         deterministic_agents: bool = False,
         worker_id: int = 0,
         num_workers: int = 1,
+        distributed_ip: str = "127.0.0.1",
         distributed_port: int = 0,
         **kwargs,
     ):
@@ -1253,6 +1797,7 @@ class OnPolicyInference(OnPolicyRLEngine):
             device=device,
             worker_id=worker_id,
             num_workers=num_workers,
+            distributed_ip=distributed_ip,
             distributed_port=distributed_port,
             **kwargs,
         )
@@ -1301,14 +1846,43 @@ class OnPolicyInference(OnPolicyRLEngine):
                 )
             )
 
-        logging_pkg = LoggingPackage(mode=self.mode, training_steps=total_steps)
+        stopping_criterion = self.machine_params.eval_stopping_criterion
+
+        logging_pkg = LoggingPackage(
+            mode=self.mode,
+            training_steps=total_steps,
+            keep_metric_dicts=visualizer is not None,
+        )
         while num_paused < self.num_samplers:
+            if steps % rollout_steps == 0:
+                self.profiling_unit_started()
+
             frames += self.num_samplers - num_paused
             num_paused += self.collect_rollout_step(rollouts, visualizer=visualizer)
             steps += 1
 
             if steps % rollout_steps == 0:
                 rollouts.after_update()
+                self.profiling_unit_finished()
+
+            if (
+                stopping_criterion is not None
+                and not self.single_process_metrics_queue.empty()
+            ):
+                # The criterion only changes with new episodes, which are already queued
+                num_episodes = logging_pkg.num_non_empty_metrics_dicts_added
+                self.aggregate_task_metrics(
+                    logging_pkg=logging_pkg, timeout=None, flush=False
+                )
+                if logging_pkg.num_non_empty_metrics_dicts_added > num_episodes:
+                    logging_pkg.stopping_reason = stopping_criterion(
+                        metrics=logging_pkg.metrics_tracker,
+                        num_episodes=logging_pkg.num_non_empty_metrics_dicts_added,
+                        elapsed_seconds=time.time() - init_time,
+                        num_steps=steps,
+                    )
+                    if logging_pkg.stopping_reason is not None:
+                        break
 
             cur_time = time.time()
             if num_paused >= self.num_samplers or cur_time - last_time >= update_secs:
@@ -1358,14 +1932,38 @@ class OnPolicyInference(OnPolicyRLEngine):
 
                     last_time = cur_time
 
-        get_logger().info(
-            "worker {}: {} complete, all task samplers paused".format(
-                self.mode, self.worker_id
+        if steps % rollout_steps != 0:
+            # Last (partial) rollout
+            self.profiling_unit_finished()
+
+        if logging_pkg.stopping_reason is not None:
+            get_logger().info(
+                "worker {}: {} stopped after {} episodes ({})".format(
+                    self.mode,
+                    self.worker_id,
+                    logging_pkg.num_non_empty_metrics_dicts_added,
+                    logging_pkg.stopping_reason,
+                )
             )
-        )
+        else:
+            get_logger().info(
+                "worker {}: {} complete, all task samplers paused".format(
+                    self.mode, self.worker_id
+                )
+            )
+
+        if self.is_distributed:
+            # The seeds this shard's samplers were created with (see `vector_tasks`), so
+            # that results don't depend on which worker evaluates the shard
+            process_offset = sum(self.num_samplers_per_worker[: self.shard])
+            seeds = self.worker_seeds(sum(self.num_samplers_per_worker), self.seed)[
+                process_offset : process_offset + self.num_samplers
+            ]
+        else:
+            seeds = self.worker_seeds(self.num_samplers, self.seed)
 
         self.vector_tasks.resume_all()
-        self.vector_tasks.set_seeds(self.worker_seeds(self.num_samplers, self.seed))
+        self.vector_tasks.set_seeds(seeds)
         self.vector_tasks.reset_all()
 
         self.aggregate_task_metrics(logging_pkg=logging_pkg)
@@ -1413,6 +2011,97 @@ class OnPolicyInference(OnPolicyRLEngine):
             cond = not checkpoints_queue.empty()
         return data
 
+    def set_shard(self, shard: int) -> None:
+        """Steps the task samplers of the given shard (the partition of the
+        task samplers initially assigned to the worker with id `shard`),
+        replacing the current ones if needed."""
+        if shard == self.shard:
+            return
+
+        if self._vector_tasks is not None:
+            self._vector_tasks.close()
+            self._vector_tasks = None
+
+        self.shard = shard
+        self.num_samplers = self.num_samplers_per_worker[self.shard]
+
+        if self.actor_critic is None and self.num_samplers > 0:
+            # Workers without task samplers of their own have no model yet
+            self.create_actor_critic()
+
+    def process_shards(self, shard_queues: Sequence[mp.Queue]):
+        """Evaluates (checkpoint, shard) units until all of them have been
+        evaluated.
+
+        Each queue in `shard_queues` holds the checkpoints to evaluate on one
+        shard, followed by (at least) one `quit` command per tester. Testers
+        start with their own shard and, once it is exhausted, pull units from
+        the next shard with pending work, sticking to a shard as long as it
+        has units left to avoid recreating task samplers. A package is sent
+        for each unit, so that results are merged by the runner as shards
+        complete.
+        """
+        assert self.mode == "test", "process_shards only to be called in test mode"
+
+        visualizer: Optional[VizSuite] = None
+
+        exhausted: Set[int] = set()
+        shard = self.worker_id
+        finalized = False
+        try:
+            while len(exhausted) < len(shard_queues):
+                while shard in exhausted:
+                    shard = (shard + 1) % len(shard_queues)
+
+                command, data = shard_queues[shard].get()
+                if command in ["quit", "exit", "close"]:
+                    exhausted.add(shard)
+                    continue
+                elif command != "eval":
+                    raise NotImplementedError()
+
+                self.set_shard(shard)
+                assert (
+                    self.num_samplers > 0
+                ), "Got checkpoint {} for shard {} without task samplers".format(
+                    data, shard
+                )
+
+                if visualizer is None and self.machine_params.visualizer is not None:
+                    visualizer = self.machine_params.visualizer
+
+                get_logger().info(
+                    "{} worker {} evaluating shard {} of {}".format(
+                        self.mode, self.worker_id, shard, data
+                    )
+                )
+                self.results_queue.put(
+                    self.run_eval(checkpoint_file_name=data, visualizer=visualizer)
+                )
+            finalized = True
+        except KeyboardInterrupt:
+            get_logger().info(
+                "KeyboardInterrupt. Terminating {} worker {}".format(
+                    self.mode, self.worker_id
+                )
+            )
+        except Exception:
+            get_logger().error(
+                "Encountered Exception. Terminating {} worker {}".format(
+                    self.mode, self.worker_id
+                )
+            )
+            get_logger().error(traceback.format_exc())
+        finally:
+            if finalized:
+                self.results_queue.put(("test_stopped", 0))
+                get_logger().info(
+                    "{} worker {} complete".format(self.mode, self.worker_id)
+                )
+            else:
+                self.results_queue.put(("test_stopped", self.worker_id + 1))
+            self.close(verbose=True)
+
     def process_checkpoints(self):
         assert (
             self.mode != "train"
@@ -1462,13 +2151,14 @@ class OnPolicyInference(OnPolicyRLEngine):
                         )
 
                         self.results_queue.put(eval_package)
-
-                        if self.is_distributed:
-                            dist.barrier()
                     else:
                         self.results_queue.put(
                             LoggingPackage(mode=self.mode, training_steps=None,)
                         )
+
+                    # All workers (also those without task samplers) wait for each other
+                    if self.is_distributed:
+                        dist.barrier()
                 elif command in ["quit", "exit", "close"]:
                     finalized = True
                     break
@@ -1,25 +1,32 @@
 """Defines the reinforcement learning `OnPolicyRunner`."""
 import copy
 import glob
+import hashlib
 import itertools
 import json
 import os
 import queue
+import re
 import signal
+import subprocess
 import time
 import traceback
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from multiprocessing.context import BaseContext
 from multiprocessing.process import BaseProcess
 from typing import Optional, Dict, Union, Tuple, Sequence, List, Any
 
+import torch
 import torch.multiprocessing as mp
 from setproctitle import setproctitle as ptitle
 
 from core.algorithms.onpolicy_sync.engine import (
     OnPolicyTrainer,
     OnPolicyInference,
+    OnPolicyRLEngine,
 )
+from core.algorithms.onpolicy_sync.storage import RolloutStorage
+from core.algorithms.onpolicy_sync.vector_sampled_tasks import VectorSampledTasks
 from core.base_abstractions.experiment_config import ExperimentConfig, MachineParams
 from utils.experiment_utils import (
     ScalarMeanTracker,
@@ -27,9 +34,19 @@ from utils.experiment_utils import (
     set_seed,
     LoggingPackage,
 )
+from utils.memory_utils import (
+    format_bytes,
+    module_nbytes,
+    optimizer_state_nbytes,
+    process_memory,
+    processes_memory,
+    log_memory_table,
+)
 from utils.misc_utils import all_equal, get_git_diff_of_project
+from utils.profiling_utils import summarize_profiles
+from utils.sketch_utils import ScalarSketchTracker
 from utils.system import get_logger, find_free_port
-from utils.tensor_utils import SummaryWriter
+from utils.tensor_utils import SummaryWriter, batch_observations
 # Has results queue (aggregated per trainer), checkpoints queue and mp context
 # Instantiates train, validate, and test workers
 # Logging
@@ -50,7 +67,52 @@ class OnPolicyRunner(object):
         mp_ctx: Optional[BaseContext] = None,
         multiprocessing_start_method: str = "forkserver",
         extra_tag: str = "",
+        node_rank: int = 0,
+        num_nodes: int = 1,
+        distributed_ip: str = "127.0.0.1",
+        distributed_port: int = 0,
+        save_episode_metrics: Optional[bool] = None,
+        enable_timers: bool = True,
+        sync_timers: bool = False,
+        report_memory: bool = True,
+        profile_units: Optional[Tuple[int, int]] = None,
     ):
+        """Initializer.
+
+        Training can span several nodes (machines), each one running its own
+        `OnPolicyRunner` with the same config (and hence the same `machine_params`,
+        describing the workers in each node) and seed. Workers are given global ids
+        (`node_rank * workers_per_node + local_id`) and connect to the distributed
+        store hosted by the worker with id 0, in the node with rank 0. Only the runner
+        in that node (the primary runner) saves the project state, runs validation
+        and writes logs (with metrics aggregated over the workers in its node).
+        Checkpoints are saved by worker 0, so all nodes should share the output
+        directory if training is to be resumed.
+
+        # Parameters
+
+        node_rank : Rank of this node, in `[0, num_nodes)`.
+        num_nodes : Number of nodes taking part in training.
+        distributed_ip : Address of the node with rank 0, reachable from all nodes.
+        distributed_port : Port of the distributed store in the node with rank 0. Must
+            be given if `num_nodes > 1` (otherwise a free port is used if 0).
+        save_episode_metrics : Whether workers should write the complete metrics of every
+            task to compressed append-only files (see `episode_metrics_dir` and
+            `utils.episode_metrics_utils.read_episode_metrics`). Otherwise, only summaries
+            are logged. By default, only testers write them.
+        enable_timers : Whether trainers should time the sections of their training loop
+            (logged as train info under `timing/`, see `OnPolicyRLEngine`).
+        sync_timers : Whether timers synchronize the CUDA device around each timed section
+            (more precise but slower, see `utils.timing_utils.TimerRegistry`).
+        report_memory : Whether trainers should log the memory held by their rollout
+            storages, model, optimizer and processes (as train info under `memory/`, see
+            `OnPolicyTrainer.memory_info` and `memory_budget` for a projection before
+            training).
+        profile_units : If given, the first rollout (counting from 0) and the number of
+            rollouts profiled by each worker (including validation and test workers, see
+            `OnPolicyRLEngine`), together with its task sampler processes. Profiles and their summary (see `utils.profiling_utils`) are written
+            into `profiles_dir`.
+        """
         self.config = config
         self.output_dir = output_dir
         self.loaded_config_src_files = loaded_config_src_files
@@ -62,6 +124,39 @@ class OnPolicyRunner(object):
         self.visualizer: Optional[VizSuite] = None
         self.deterministic_agents = deterministic_agents
 
+        # Seed for all testers, part of the keys of the evaluation cache
+        self.test_seed = 12345
+        self.eval_cache_dir: Optional[str] = None
+        self.eval_cache_keys: Dict[str, str] = {}
+
+        self.node_rank = node_rank
+        self.num_nodes = num_nodes
+        self.distributed_ip = distributed_ip
+        self.distributed_port = distributed_port
+        self.save_episode_metrics = (
+            save_episode_metrics if save_episode_metrics is not None else mode == "test"
+        )
+        self.enable_timers = enable_timers
+        self.sync_timers = sync_timers
+        self.report_memory = report_memory
+        self.profile_units = profile_units
+
+        # Percentiles of task metrics logged to tensorboard
+        self.logged_percentiles: Sequence[float] = (5, 25, 50, 75, 95)
+
+        assert (
+            0 <= self.node_rank < self.num_nodes
+        ), "node_rank ({}) must be in [0, num_nodes) with num_nodes {}".format(
+            self.node_rank, self.num_nodes
+        )
+        if self.num_nodes > 1:
+            assert (
+                self.distributed_port != 0
+            ), "A distributed port must be given for multi-node training"
+            assert (
+                self.seed is not None
+            ), "A seed (the same in all nodes) must be given for multi-node training"
+
         assert self.mode in [
             "train",
             "test",
@@ -101,6 +196,10 @@ class OnPolicyRunner(object):
             > 0
         )
 
+    @property
+    def is_primary_node(self):
+        return self.node_rank == 0
+
     @staticmethod
     def init_context(
         mp_ctx: Optional[BaseContext] = None,
@@ -209,9 +308,14 @@ class OnPolicyRunner(object):
         engine_kwargs["worker_id"] = id
         get_logger().info("test {} args {}".format(id, engine_kwargs))
 
+        shard_queues = engine_kwargs.pop("shard_queues", None)
+
         test = OnPolicyRunner.init_worker(OnPolicyInference, engine_args, engine_kwargs)
         if test is not None:
-            test.process_checkpoints()  # gets checkpoints via queue
+            if shard_queues is not None:
+                test.process_shards(shard_queues)  # gets (checkpoint, shard) units
+            else:
+                test.process_checkpoints()  # gets checkpoints via queue
 
     def start_train(
         self,
@@ -219,20 +323,23 @@ class OnPolicyRunner(object):
         restart_pipeline: bool = False,
         max_sampler_processes_per_worker: Optional[int] = None,
     ):
-        self.save_project_state()
+        if self.is_primary_node:
+            self.save_project_state()
 
         devices = self.worker_devices("train")
-        num_workers = len(devices)
+        num_local_workers = len(devices)
+        num_workers = num_local_workers * self.num_nodes
 
         seed = (
             self.seed
         )  # same for all workers. used during initialization of the model
 
-        distributed_port = 0
-        if num_workers > 1:
+        distributed_port = self.distributed_port
+        if num_workers > 1 and distributed_port == 0:
             distributed_port = find_free_port()
 
-        for trainer_it in range(num_workers):
+        for local_it in range(num_local_workers):
+            trainer_it = self.node_rank * num_local_workers + local_it
             train: BaseProcess = self.mp_ctx.Process(
                 target=self.train_loop,
                 kwargs=dict(
@@ -243,16 +350,24 @@ class OnPolicyRunner(object):
                     config=self.config,
                     results_queue=self.queues["results"],
                     checkpoints_queue=self.queues["checkpoints"]
-                    if self.running_validation
+                    if self.running_validation and self.is_primary_node
                     else None,
                     checkpoints_dir=self.checkpoint_dir(),
+                    episode_metrics_dir=self.episode_metrics_dir(
+                        self.local_start_time_str
+                    ),
                     seed=seed,
                     deterministic_cudnn=self.deterministic_cudnn,
                     mp_ctx=self.mp_ctx,
                     num_workers=num_workers,
-                    device=devices[trainer_it],
+                    device=devices[local_it],
+                    distributed_ip=self.distributed_ip,
                     distributed_port=distributed_port,
                     max_sampler_processes_per_worker=max_sampler_processes_per_worker,
+                    enable_timers=self.enable_timers,
+                    sync_timers=self.sync_timers,
+                    report_memory=self.report_memory,
+                    **self.profiling_kwargs(self.local_start_time_str),
                 ),
             )
             train.start()
@@ -263,38 +378,57 @@ class OnPolicyRunner(object):
         )
 
         # Validation
-        if self.running_validation:
-            device = self.worker_devices("valid")[0]
-            self.init_visualizer("valid")
-            valid: BaseProcess = self.mp_ctx.Process(
-                target=self.valid_loop,
-                args=(0,),
-                kwargs=dict(
-                    config=self.config,
-                    results_queue=self.queues["results"],
-                    checkpoints_queue=self.queues["checkpoints"],
-                    seed=12345,  # TODO allow same order for randomly sampled tasks? Is this any useful anyway?
-                    deterministic_cudnn=self.deterministic_cudnn,
-                    deterministic_agents=self.deterministic_agents,
-                    mp_ctx=self.mp_ctx,
-                    device=device,
-                    max_sampler_processes_per_worker=max_sampler_processes_per_worker,
-                ),
-            )
-            valid.start()
-            self.processes["valid"].append(valid)
-
+        if not self.is_primary_node:
             get_logger().info(
-                "Started {} valid processes".format(len(self.processes["valid"]))
+                "Validation (and logging) handled by the runner in the node with rank 0."
             )
         else:
+            self.start_valid(max_sampler_processes_per_worker)
+
+        # Workers in other nodes forward their logging packages to the primary node
+        self.log(
+            self.local_start_time_str,
+            num_workers if self.is_primary_node else num_local_workers,
+        )
+
+        self.write_profiles_summary(self.local_start_time_str)
+
+        return self.local_start_time_str
+
+    def start_valid(self, max_sampler_processes_per_worker: Optional[int] = None):
+        """Starts the validation process (if any samplers are allocated to
+        validation), which evaluates the checkpoints posted by the trainers."""
+        if not self.running_validation:
             get_logger().info(
                 "No processes allocated to validation, no validation will be run."
             )
+            return
 
-        self.log(self.local_start_time_str, num_workers)
+        device = self.worker_devices("valid")[0]
+        self.init_visualizer("valid")
+        valid: BaseProcess = self.mp_ctx.Process(
+            target=self.valid_loop,
+            args=(0,),
+            kwargs=dict(
+                config=self.config,
+                results_queue=self.queues["results"],
+                checkpoints_queue=self.queues["checkpoints"],
+                episode_metrics_dir=self.episode_metrics_dir(self.local_start_time_str),
+                seed=12345,  # TODO allow same order for randomly sampled tasks? Is this any useful anyway?
+                deterministic_cudnn=self.deterministic_cudnn,
+                deterministic_agents=self.deterministic_agents,
+                mp_ctx=self.mp_ctx,
+                device=device,
+                max_sampler_processes_per_worker=max_sampler_processes_per_worker,
+                **self.profiling_kwargs(self.local_start_time_str),
+            ),
+        )
+        valid.start()
+        self.processes["valid"].append(valid)
 
-        return self.local_start_time_str
+        get_logger().info(
+            "Started {} valid processes".format(len(self.processes["valid"]))
+        )
 
     def start_test(
         self,
@@ -302,15 +436,89 @@ class OnPolicyRunner(object):
         checkpoint: Optional[str] = None,
         skip_checkpoints: int = 0,
         max_sampler_processes_per_worker: Optional[int] = None,
+        checkpoint_parallel: bool = False,
+        use_eval_cache: bool = True,
     ):
+        """Evaluates the given checkpoints.
+
+        # Parameters
+
+        checkpoint_parallel : If `True`, the unit of work is a (checkpoint, shard) pair, where
+            shards are the partitions of the test task samplers given by the test `machine_params`'
+            `nprocesses`, and idle testers pull pending units from other shards instead of waiting
+            for all testers to complete each checkpoint. Otherwise, all testers evaluate each
+            checkpoint in turn.
+        use_eval_cache : If `True`, checkpoints with results in the evaluation cache of the metrics
+            folder (see `eval_cache_key`) are not evaluated again, and the results of evaluated
+            checkpoints are added to the cache. The cache is not used if the git state of the
+            project can't be determined.
+        """
+        assert self.num_nodes == 1, "Multi-node testing is not supported"
+
         devices = self.worker_devices("test")
         self.init_visualizer("test")
         num_testers = len(devices)
 
-        distributed_port = 0
-        if num_testers > 1:
+        distributed_port = self.distributed_port
+        if num_testers > 1 and distributed_port == 0:
             distributed_port = find_free_port()
 
+        # Testers without task samplers don't contribute results
+        nprocesses = MachineParams.instance_from(
+            self.config.machine_params("test")
+        ).nprocesses
+        shards = [it for it in range(num_testers) if nprocesses[it] > 0]
+
+        shard_queues: Optional[List[mp.Queue]] = None
+        if checkpoint_parallel:
+            shard_queues = [self.mp_ctx.Queue() for _ in range(num_testers)]
+
+        checkpoints = self.get_checkpoint_files(
+            experiment_date, checkpoint, skip_checkpoints
+        )
+        steps = [self.step_from_checkpoint(cp) for cp in checkpoints]
+
+        get_logger().info("Running test on {} steps {}".format(len(steps), steps))
+
+        metric_folder = self.metric_path(experiment_date)
+        os.makedirs(metric_folder, exist_ok=True)
+
+        self.eval_cache_dir = None
+        cached_results: List[Dict[str, Any]] = []
+        code_hash = self.code_hash() if use_eval_cache else None
+        if code_hash is not None:
+            self.eval_cache_dir = os.path.join(metric_folder, "eval_cache")
+            os.makedirs(self.eval_cache_dir, exist_ok=True)
+
+            config_hash = self.test_config_hash(devices)
+            pending = []
+            for checkpoint in checkpoints:
+                self.eval_cache_keys[checkpoint] = self.eval_cache_key(
+                    checkpoint, config_hash, code_hash
+                )
+                results = self.load_cached_eval(self.eval_cache_keys[checkpoint])
+                if results is not None:
+                    get_logger().info(
+                        "Using cached results for {} ({})".format(
+                            checkpoint, self.eval_cache_keys[checkpoint]
+                        )
+                    )
+                    cached_results.append(results)
+                else:
+                    pending.append(checkpoint)
+
+            if len(cached_results) > 0:
+                get_logger().info(
+                    "Using cached results for {} of {} checkpoints in {}".format(
+                        len(cached_results), len(checkpoints), self.eval_cache_dir
+                    )
+                )
+        else:
+            pending = checkpoints
+
+        if len(pending) == 0:
+            num_testers = 0  # nothing to evaluate
+
         for tester_it in range(num_testers):
             test: BaseProcess = self.mp_ctx.Process(
                 target=self.test_loop,
@@ -319,14 +527,18 @@ class OnPolicyRunner(object):
                     config=self.config,
                     results_queue=self.queues["results"],
                     checkpoints_queue=self.queues["checkpoints"],
-                    seed=12345,  # TODO allow same order for randomly sampled tasks? Is this any useful anyway?
+                    episode_metrics_dir=self.episode_metrics_dir(experiment_date),
+                    seed=self.test_seed,  # TODO allow same order for randomly sampled tasks? Is this any useful anyway?
                     deterministic_cudnn=self.deterministic_cudnn,
                     deterministic_agents=self.deterministic_agents,
                     mp_ctx=self.mp_ctx,
                     num_workers=num_testers,
                     device=devices[tester_it],
                     max_sampler_processes_per_worker=max_sampler_processes_per_worker,
+                    distributed_ip=self.distributed_ip,
                     distributed_port=distributed_port,
+                    shard_queues=shard_queues,
+                    **self.profiling_kwargs(experiment_date),
                 ),
             )
 
@@ -337,34 +549,324 @@ class OnPolicyRunner(object):
             "Started {} test processes".format(len(self.processes["test"]))
         )
 
-        checkpoints = self.get_checkpoint_files(
-            experiment_date, checkpoint, skip_checkpoints
-        )
-        steps = [self.step_from_checkpoint(cp) for cp in checkpoints]
-
-        get_logger().info("Running test on {} steps {}".format(len(steps), steps))
-
-        for checkpoint in checkpoints:
-            # Make all testers work on each checkpoint
-            for tester_it in range(num_testers):
-                self.queues["checkpoints"].put(("eval", checkpoint))
-        # Signal all testers to terminate cleanly
-        for _ in range(num_testers):
-            self.queues["checkpoints"].put(("quit", None))
+        if shard_queues is not None:
+            for checkpoint in pending:
+                # One unit per shard with task samplers
+                for shard in shards:
+                    shard_queues[shard].put(("eval", checkpoint))
+            # Every tester exhausts every shard before terminating cleanly
+            for shard_queue in shard_queues:
+                for _ in range(num_testers):
+                    shard_queue.put(("quit", None))
+        else:
+            for checkpoint in pending:
+                # Make all testers work on each checkpoint
+                for tester_it in range(num_testers):
+                    self.queues["checkpoints"].put(("eval", checkpoint))
+            # Signal all testers to terminate cleanly
+            for _ in range(num_testers):
+                self.queues["checkpoints"].put(("quit", None))
 
-        metric_folder = self.metric_path(experiment_date)
-        os.makedirs(metric_folder, exist_ok=True)
         suffix = "__test_{}".format(self.local_start_time_str)
         fname = os.path.join(metric_folder, "metrics" + suffix + ".json")
 
         get_logger().info("Saving metrics in {}".format(fname))
+        if self.save_episode_metrics:
+            get_logger().info(
+                "Saving episode metrics in {}".format(
+                    self.episode_metrics_dir(experiment_date)
+                )
+            )
 
         # Check output file can be written
         with open(fname, "w") as f:
             json.dump([], f, indent=4, sort_keys=True)
 
-        return self.log(
-            self.checkpoint_start_time_str(checkpoints[0]), num_testers, steps, fname
+        test_results = self.log(
+            self.checkpoint_start_time_str(checkpoints[0]),
+            num_testers,
+            steps,
+            fname,
+            packages_per_test=len(shards),
+            cached_test_results=cached_results,
+        )
+
+        self.write_profiles_summary(experiment_date)
+
+        return test_results
+
+    def test_config_hash(self, devices: Sequence[torch.device]) -> str:
+        """Hash of the test task sampler args for all testers (computed as in
+        `OnPolicyRLEngine.get_sampler_fn_args`) and the evaluation stopping
+        criterion."""
+        machine_params = MachineParams.instance_from(self.config.machine_params("test"))
+        nprocesses = machine_params.nprocesses
+        total_processes = sum(nprocesses)
+        seeds = OnPolicyRLEngine.worker_seeds(total_processes, self.test_seed)
+
+        all_args = []
+        for tester_it, device in enumerate(devices):
+            if device.index is not None:
+                sampler_devices_as_ints: Optional[List[int]] = [device.index]
+            elif machine_params.sampler_devices is not None:
+                sampler_devices_as_ints = [
+                    -1 if sd.index is None else sd.index
+                    for sd in machine_params.sampler_devices
+                ]
+            else:
+                sampler_devices_as_ints = None
+
+            process_offset = sum(nprocesses[:tester_it])
+            all_args.extend(
+                self.config.test_task_sampler_args(
+                    process_ind=process_offset + it,
+                    total_processes=total_processes,
+                    devices=sampler_devices_as_ints,
+                    seeds=seeds,
+                )
+                for it in range(nprocesses[tester_it])
+            )
+
+        test_config = dict(
+            sampler_args=all_args,
+            eval_stopping_criterion=machine_params.eval_stopping_criterion,
+        )
+        return hashlib.sha1(
+            json.dumps(self._hashable(test_config), sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def _hashable(obj: Any, depth: int = 0) -> Any:
+        """Converts (nested) task sampler args into a JSON serializable
+        structure without memory addresses."""
+        if depth > 8:
+            return type(obj).__name__
+        if obj is None or isinstance(obj, (bool, int, float, str)):
+            return obj
+        if isinstance(obj, dict):
+            return {
+                str(k): OnPolicyRunner._hashable(v, depth + 1) for k, v in obj.items()
+            }
+        if isinstance(obj, (list, tuple, set)):
+            items = [OnPolicyRunner._hashable(v, depth + 1) for v in obj]
+            return sorted(items, key=str) if isinstance(obj, set) else items
+        if hasattr(obj, "tolist"):  # numpy arrays and torch tensors
+            return obj.tolist()
+        if hasattr(obj, "__qualname__"):  # functions and classes
+            return "{}.{}".format(getattr(obj, "__module__", ""), obj.__qualname__)
+        if hasattr(obj, "__dict__"):
+            return {
+                "type": type(obj).__qualname__,
+                "attrs": OnPolicyRunner._hashable(vars(obj), depth + 1),
+            }
+        return re.sub(r" at 0x[0-9a-fA-F]+", "", repr(obj))
+
+    def code_hash(self) -> Optional[str]:
+        """Hash of the contents of the loaded config source files and of the
+        git state (commit and diff) of the project, or `None` if the git state
+        can't be determined."""
+        try:
+            sha, diff_str = get_git_diff_of_project()
+        except (subprocess.CalledProcessError, OSError) as e:
+            get_logger().warning(
+                "Not using the evaluation cache, as the git state of the project"
+                " is unknown ({})".format(e)
+            )
+            return None
+
+        hasher = hashlib.sha1()
+        hasher.update("{}\n{}".format(sha, diff_str).encode("utf-8"))
+        if self.loaded_config_src_files is not None:
+            for src_path in sorted(self.loaded_config_src_files):
+                hasher.update(src_path.encode("utf-8"))
+                with open(src_path, "rb") as f:
+                    hasher.update(f.read())
+        return hasher.hexdigest()
+
+    def eval_cache_key(
+        self, checkpoint_file_name: str, config_hash: str, code_hash: str
+    ) -> str:
+        """Key of the results of a checkpoint in the evaluation cache.
+
+        Hashes the checkpoint's model weights (so that renamed or copied
+        checkpoints share results), the hash of the test configuration
+        (see `test_config_hash`), the hash of the code (see `code_hash`), the
+        test seed and whether agents act deterministically.
+        """
+        model_state_dict = torch.load(checkpoint_file_name, map_location="cpu")[
+            "model_state_dict"
+        ]
+
+        hasher = hashlib.sha1()
+        for name in sorted(model_state_dict.keys()):
+            tensor = model_state_dict[name]
+            hasher.update(
+                "{} {} {}".format(name, tensor.dtype, tuple(tensor.shape)).encode(
+                    "utf-8"
+                )
+            )
+            hasher.update(tensor.contiguous().numpy().tobytes())
+        hasher.update(
+            "{} {} {} {}".format(
+                config_hash, code_hash, self.test_seed, self.deterministic_agents
+            ).encode("utf-8")
+        )
+        return hasher.hexdigest()
+
+    def load_cached_eval(self, key: str) -> Optional[Dict[str, Any]]:
+        fname = os.path.join(self.eval_cache_dir, key + ".json")
+        if not os.path.exists(fname):
+            return None
+        try:
+            with open(fname, "r") as f:
+                return json.load(f)
+        except ValueError:
+            get_logger().warning("Ignoring corrupted cached results {}".format(fname))
+            return None
+
+    def save_cached_eval(self, checkpoint_file_name: str, results: Dict[str, Any]):
+        if self.eval_cache_dir is None:
+            return
+        fname = os.path.join(
+            self.eval_cache_dir, self.eval_cache_keys[checkpoint_file_name] + ".json"
+        )
+        # Write and rename, so that interrupted runs don't leave partial entries
+        with open(fname + ".tmp", "w") as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+        os.replace(fname + ".tmp", fname)
+
+    def memory_budget(
+        self, max_sampler_processes_per_worker: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Projects (and logs) the memory required by the train workers,
+        without training.
+
+        The model and optimizer are built, and the optimizer state is
+        materialized with a step with zero gradients. A single task sampler is
+        run in its own process to measure its resident memory, and its first
+        observation is stored in a rollout storage for a single sampler (the
+        storage grows linearly with the number of samplers). Processes running
+        several samplers (see `max_sampler_processes_per_worker`) are assumed to
+        hold as much memory as the measured one, which underestimates them.
+
+        # Parameters
+
+        max_sampler_processes_per_worker : As in `start_train`.
+
+        # Returns
+
+        A dictionary with the bytes held by the storage of a single sampler per buffer
+        (`"storage_per_sampler"`), the projected bytes per train worker (`"workers"`,
+        a list of dictionaries) and their sum (`"total"`).
+        """
+        machine_params = MachineParams.instance_from(
+            self.config.machine_params("train")
+        )
+        pipeline = self.config.training_pipeline()
+        num_samplers_per_worker = machine_params.nprocesses
+        devices = self.worker_devices("train")
+
+        set_seed(self.seed)
+        observation_set = machine_params.observation_set
+        if observation_set is not None:
+            actor_critic = self.config.create_model(observation_set=observation_set)
+        else:
+            actor_critic = self.config.create_model()
+
+        optimizer = pipeline.optimizer_builder(
+            params=[p for p in actor_critic.parameters() if p.requires_grad]
+        )
+        for group in optimizer.param_groups:
+            for p in group["params"]:
+                p.grad = torch.zeros_like(p)
+        optimizer.step()
+
+        sampler_devices = machine_params.sampler_devices
+        vector_tasks = VectorSampledTasks(
+            make_sampler_fn=self.config.make_sampler_fn,
+            sampler_fn_args=[
+                self.config.train_task_sampler_args(
+                    process_ind=0,
+                    total_processes=max(sum(num_samplers_per_worker), 1),
+                    devices=None
+                    if sampler_devices is None
+                    else [
+                        -1 if sd.index is None else sd.index for sd in sampler_devices
+                    ],
+                    seeds=None,
+                )
+            ],
+            multiprocessing_start_method=None,
+            mp_ctx=self.mp_ctx,
+            should_log=False,
+        )
+        try:
+            observations = vector_tasks.get_observations()
+            sampler_rss = 0
+            for memory in processes_memory(vector_tasks.worker_pids).values():
+                sampler_rss = memory.get("rss", memory.get("peak_rss", 0))
+        finally:
+            vector_tasks.close()
+
+        batch = batch_observations(observations)
+        if observation_set is not None:
+            batch = observation_set.get_observations(batch)
+        rollouts = RolloutStorage(
+            num_steps=pipeline.num_steps, num_samplers=1, actor_critic=actor_critic
+        )
+        rollouts.insert_observations(batch)
+        storage_per_sampler = rollouts.buffer_nbytes()
+
+        log_memory_table(
+            "Rollout storage per task sampler ({} steps):".format(pipeline.num_steps),
+            storage_per_sampler,
+        )
+
+        # With overlapped rollouts and updates, trainers hold two storages and models
+        copies = 2 if pipeline.overlap_rollouts_and_updates else 1
+        workers = []
+        for it, (num_samplers, device) in enumerate(
+            zip(num_samplers_per_worker, devices)
+        ):
+            num_processes = (
+                num_samplers
+                if max_sampler_processes_per_worker is None
+                else min(num_samplers, max_sampler_processes_per_worker)
+            )
+            worker = OrderedDict(
+                [
+                    (
+                        "storage",
+                        copies * num_samplers * sum(storage_per_sampler.values()),
+                    ),
+                    ("model", copies * module_nbytes(actor_critic)),
+                    ("optimizer", optimizer_state_nbytes(optimizer)),
+                    ("sampler_processes", num_processes * sampler_rss),
+                ]
+            )
+            workers.append(worker)
+            log_memory_table(
+                "Train worker {} ({} samplers in {} processes, tensors in {}):".format(
+                    it, num_samplers, num_processes, device
+                ),
+                worker,
+            )
+
+        total: Dict[str, int] = OrderedDict()
+        for worker in workers:
+            for name, nbytes in worker.items():
+                total[name] = total.get(name, 0) + nbytes
+        total["all"] = sum(total.values())
+        log_memory_table(
+            "Total over {} train workers, excluding the workers' own processes (this"
+            " process holds {} with the model built):".format(
+                len(workers), format_bytes(process_memory().get("rss", 0))
+            ),
+            total,
+        )
+
+        return dict(
+            storage_per_sampler=storage_per_sampler, workers=workers, total=total
         )
 
     @staticmethod
@@ -418,6 +920,52 @@ class OnPolicyRunner(object):
             start_time_str,
         )
 
+    def episode_metrics_dir(self, start_time_str: str) -> Optional[str]:
+        """Directory where workers write the metrics of every task, if
+        `save_episode_metrics`."""
+        if not self.save_episode_metrics:
+            return None
+        return os.path.join(self.metric_path(start_time_str), "episodes")
+
+    def profiles_dir(self, start_time_str: str) -> str:
+        path = os.path.join(
+            self.output_dir,
+            "profiles",
+            self.config.tag()
+            if self.extra_tag == ""
+            else os.path.join(self.config.tag(), self.extra_tag),
+            start_time_str,
+        )
+        if self.mode == "test":
+            path = os.path.join(path, "test", self.local_start_time_str)
+        return path
+
+    def profiling_kwargs(self, start_time_str: str) -> Dict[str, Any]:
+        """Engine keyword arguments to profile `profile_units` (if
+        given)."""
+        if self.profile_units is None:
+            return {}
+        return dict(
+            profile_units=self.profile_units,
+            profiles_dir=self.profiles_dir(start_time_str),
+        )
+
+    def write_profiles_summary(self, start_time_str: str) -> None:
+        """Writes the summary of the profiles written by the workers (if
+        profiling)."""
+        if self.profile_units is None or not self.is_primary_node:
+            return
+        directory = self.profiles_dir(start_time_str)
+        if not os.path.isdir(directory):
+            get_logger().warning("No profiles written to {}".format(directory))
+            return
+        summary = summarize_profiles(directory)
+        get_logger().info(
+            "Profiles of {} process roles summarized in {}".format(
+                len(summary), os.path.join(directory, "summary.txt")
+            )
+        )
+
     def save_project_state(self):
         base_dir = os.path.join(
             self.output_dir,
@@ -468,6 +1016,19 @@ class OnPolicyRunner(object):
 
         get_logger().info("Config files saved to {}".format(base_dir))
 
+    def log_percentiles(
+        self,
+        log_writer: SummaryWriter,
+        mode: str,
+        percentiles: Dict[str, Dict[Any, float]],
+        training_steps: int,
+    ):
+        for k in sorted(percentiles.keys()):
+            for p, value in percentiles[k].items():
+                log_writer.add_scalar(
+                    f"{mode}_percentiles/{k}_p{p}", value, training_steps
+                )
+
     def process_eval_package(self, log_writer: SummaryWriter, pkg: LoggingPackage):
         training_steps = pkg.training_steps
         checkpoint_file_name = pkg.checkpoint_file_name
@@ -480,12 +1041,20 @@ class OnPolicyRunner(object):
         mode = pkg.mode
 
         log_writer.add_scalar(f"{mode}/num_tasks_evaled", num_tasks, training_steps)
+        self.log_percentiles(
+            log_writer=log_writer,
+            mode=mode,
+            percentiles=pkg.metrics_sketches.percentiles(self.logged_percentiles),
+            training_steps=training_steps,
+        )
 
         message = [f"{mode} {training_steps} steps:"]
         for k in sorted(metric_means.keys()):
             log_writer.add_scalar(f"{mode}/{k}", metric_means[k], training_steps)
             message.append(f"{k} {metric_means[k]}")
         message.append(f"tasks {num_tasks} checkpoint {checkpoint_file_name}")
+        if pkg.stopping_reason is not None:
+            message.append(f"(stopped early: {pkg.stopping_reason})")
         get_logger().info(" ".join(message))
 
         if self.visualizer is not None:
@@ -517,6 +1086,7 @@ class OnPolicyRunner(object):
         )
 
         metrics_and_train_info_tracker = ScalarMeanTracker()
+        metrics_sketches = ScalarSketchTracker()
         for pkg in pkgs:
             metrics_and_train_info_tracker.add_scalars(
                 scalars=pkg.metrics_tracker.means(), n=pkg.metrics_tracker.counts()
@@ -525,6 +1095,14 @@ class OnPolicyRunner(object):
                 scalars=pkg.train_info_tracker.means(),
                 n=pkg.train_info_tracker.counts(),
             )
+            metrics_sketches.merge(pkg.metrics_sketches)
+
+        self.log_percentiles(
+            log_writer=log_writer,
+            mode=self.mode,
+            percentiles=metrics_sketches.percentiles(self.logged_percentiles),
+            training_steps=training_steps,
+        )
 
         message = [
             "train {} steps {} offpolicy:".format(training_steps, offpolicy_steps)
@@ -537,7 +1115,8 @@ class OnPolicyRunner(object):
                 )
             else:
                 log_writer.add_scalar(k, means[k], training_steps)
-            message.append(k + " {:.3g}".format(means[k]))
+            if not k.startswith("memory/"):  # too many for the console
+                message.append(k + " {:.3g}".format(means[k]))
         message += ["elapsed_time {:.3g}s".format(current_time - last_time)]
 
         if last_steps > 0:
@@ -566,11 +1145,13 @@ class OnPolicyRunner(object):
         training_steps = pkgs[0].training_steps
 
         all_metrics_tracker = ScalarMeanTracker()
+        all_metrics_sketches = ScalarSketchTracker()
         metric_dicts_list, render, checkpoint_file_name = [], {}, []
         for pkg in pkgs:
             all_metrics_tracker.add_scalars(
                 scalars=pkg.metrics_tracker.means(), n=pkg.metrics_tracker.counts()
             )
+            all_metrics_sketches.merge(pkg.metrics_sketches)
             metric_dicts_list.extend(pkg.metric_dicts)
             if pkg.viz_data is not None:
                 render.update(pkg.viz_data)
@@ -585,19 +1166,41 @@ class OnPolicyRunner(object):
             log_writer.add_scalar(f"{mode}/{k}", metric_means[k], training_steps)
             message.append(k + " {:.3g}".format(metric_means[k]))
 
+        percentiles = all_metrics_sketches.percentiles(self.logged_percentiles)
+        self.log_percentiles(
+            log_writer=log_writer,
+            mode=mode,
+            percentiles=percentiles,
+            training_steps=training_steps,
+        )
+
+        num_tasks = sum([pkg.num_non_empty_metrics_dicts_added for pkg in pkgs])
+        log_writer.add_scalar(f"{mode}/num_tasks_evaled", num_tasks, training_steps)
+
         if all_results is not None:
             results = copy.deepcopy(metric_means)
             results.update(
-                {"training_steps": training_steps, "tasks": metric_dicts_list}
+                {
+                    "training_steps": training_steps,
+                    "num_tasks": num_tasks,
+                    "percentiles": {
+                        k: {str(p): v for p, v in ps.items()}
+                        for k, ps in percentiles.items()
+                    },
+                    # Only kept if required by visualizers, see `episode_metrics_dir`
+                    "tasks": metric_dicts_list,
+                }
             )
             all_results.append(results)
 
-        num_tasks = sum([pkg.num_non_empty_metrics_dicts_added for pkg in pkgs])
-        log_writer.add_scalar(f"{mode}/num_tasks_evaled", num_tasks, training_steps)
-
         message.append(
             "tasks {} checkpoint {}".format(num_tasks, checkpoint_file_name[0])
         )
+        num_stopped_early = sum(pkg.stopping_reason is not None for pkg in pkgs)
+        if num_stopped_early > 0:
+            message.append(
+                "({} of {} testers stopped early)".format(num_stopped_early, len(pkgs))
+            )
         get_logger().info(" ".join(message))
 
         if self.visualizer is not None:
@@ -608,22 +1211,65 @@ class OnPolicyRunner(object):
                 num_steps=training_steps,
             )
 
+    def process_cached_test_results(
+        self,
+        log_writer: SummaryWriter,
+        results: Dict[str, Any],
+        all_results: Optional[List[Any]] = None,
+    ):
+        mode = "test"
+        training_steps = results["training_steps"]
+
+        message = [f"{mode} {training_steps} steps (cached):"]
+        for k in sorted(results.keys()):
+            if k in ["training_steps", "num_tasks", "percentiles", "tasks"]:
+                continue
+            log_writer.add_scalar(f"{mode}/{k}", results[k], training_steps)
+            message.append(k + " {:.3g}".format(results[k]))
+
+        self.log_percentiles(
+            log_writer=log_writer,
+            mode=mode,
+            percentiles=results.get("percentiles", {}),
+            training_steps=training_steps,
+        )
+
+        num_tasks = results.get("num_tasks", len(results["tasks"]))
+        log_writer.add_scalar(f"{mode}/num_tasks_evaled", num_tasks, training_steps)
+        message.append("tasks {}".format(num_tasks))
+        get_logger().info(" ".join(message))
+
+        if all_results is not None:
+            all_results.append(results)
+
     def log(
         self,
         start_time_str: str,
         nworkers: int,
         test_steps: Sequence[int] = (),
         metrics_file: Optional[str] = None,
+        packages_per_test: Optional[int] = None,
+        cached_test_results: Sequence[Dict[str, Any]] = (),
     ):
         finalized = False
 
-        log_writer = SummaryWriter(
-            log_dir=self.log_writer_path(start_time_str),
-            filename_suffix="__{}_{}".format(self.mode, self.local_start_time_str),
+        # Number of test packages to merge for each checkpoint
+        packages_per_test = (
+            packages_per_test if packages_per_test is not None else nworkers
         )
 
+        # Only the primary runner writes logs (workers in other nodes forward their
+        # packages to it). Other runners just monitor their workers
+        log_writer: Optional[SummaryWriter] = None
+        if self.is_primary_node:
+            log_writer = SummaryWriter(
+                log_dir=self.log_writer_path(start_time_str),
+                filename_suffix="__{}_{}".format(self.mode, self.local_start_time_str),
+            )
+
         # To aggregate/buffer metrics from trainers/testers
         collected: List[LoggingPackage] = []
+        tests_collected: Dict[str, List[LoggingPackage]] = defaultdict(list)
         last_train_steps = 0
         last_offpolicy_steps = 0
         last_train_time = time.time()
@@ -631,6 +1277,15 @@ class OnPolicyRunner(object):
         test_results: List[Dict] = []
         unfinished_workers = nworkers
 
+        if log_writer is not None and len(cached_test_results) > 0:
+            for results in cached_test_results:
+                self.process_cached_test_results(
+                    log_writer=log_writer, results=results, all_results=test_results
+                )
+            test_results.sort(key=lambda x: x["training_steps"])
+            with open(metrics_file, "w") as f:
+                json.dump(test_results, f, indent=4, sort_keys=True)
+
         try:
             while True:
                 try:
@@ -641,6 +1296,9 @@ class OnPolicyRunner(object):
                     if isinstance(package, LoggingPackage):
                         pkg_mode = package.mode
 
+                        if not self.is_primary_node:
+                            continue
+
                         if pkg_mode == "train":
                             collected.append(package)
                             if len(collected) >= nworkers:
@@ -690,31 +1348,32 @@ class OnPolicyRunner(object):
                             ):  # assume queue is actually empty after trainer finished and no checkpoints in queue
                                 break
                         elif pkg_mode == "test":
-                            collected.append(package)
-                            if len(collected) >= nworkers:
-                                collected = sorted(
-                                    collected, key=lambda x: x.training_steps
-                                )  # sort by num_steps
-                                if (
-                                    collected[nworkers - 1].training_steps
-                                    == collected[0].training_steps
-                                ):  # ensure nworkers have provided the same num_steps
-                                    self.process_test_packages(
-                                        log_writer=log_writer,
-                                        pkgs=collected[:nworkers],
-                                        all_results=test_results,
-                                    )
-                                    collected = collected[nworkers:]
-                                    with open(metrics_file, "w") as f:
-                                        json.dump(
-                                            test_results, f, indent=4, sort_keys=True
-                                        )
-                                        get_logger().debug(
-                                            "Updated {} up to checkpoint {}".format(
-                                                metrics_file,
-                                                test_steps[len(test_results) - 1],
-                                            )
+                            if package.training_steps is None:  # no test samplers
+                                continue
+
+                            # Packages for different checkpoints can interleave
+                            pkgs = tests_collected[package.checkpoint_file_name]
+                            pkgs.append(package)
+                            if len(pkgs) == packages_per_test:
+                                self.process_test_packages(
+                                    log_writer=log_writer,
+                                    pkgs=pkgs,
+                                    all_results=test_results,
+                                )
+                                self.save_cached_eval(
+                                    package.checkpoint_file_name, test_results[-1]
+                                )
+                                del tests_collected[package.checkpoint_file_name]
+                                test_results.sort(key=lambda x: x["training_steps"])
+                                with open(metrics_file, "w") as f:
+                                    json.dump(test_results, f, indent=4, sort_keys=True)
+                                    get_logger().debug(
+                                        "Updated {} with {} of {} checkpoints".format(
+                                            metrics_file,
+                                            len(test_results),
+                                            len(test_steps),
                                         )
+                                    )
                         else:
                             get_logger().error(
                                 f"Runner received unknown package of type {pkg_mode}"
@@ -2,7 +2,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 import random
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from typing import Union, List, Dict, Tuple, DefaultDict, Sequence, cast, Optional
 
 import numpy as np
@@ -14,6 +14,7 @@ from core.algorithms.onpolicy_sync.policy import (
     ObservationType,
 )
 from core.base_abstractions.misc import Memory
+from utils.memory_utils import tensors_nbytes
 from utils.system import get_logger
 
 
@@ -116,6 +117,32 @@ class RolloutStorage(object):
         self.prev_actions = self.prev_actions.to(device)
         self.masks = self.masks.to(device)
 
+    def buffer_nbytes(self) -> Dict[str, int]:
+        """Bytes held by each buffer, keyed by `observations/<key>` (with the
+        keys of nested observations joined by `/`), `memory/<key>` and the
+        names of the remaining tensors (`actions`, `rewards`...)."""
+        nbytes: Dict[str, int] = OrderedDict()
+        for storage_name in ["observations", "memory"]:
+            storage: Memory = getattr(self, storage_name)
+            for key in storage:
+                path = self.flattened_to_unflattened[storage_name].get(key, [key])
+                nbytes["{}/{}".format(storage_name, "/".join(path))] = tensors_nbytes(
+                    storage.tensor(key)
+                )
+
+        for name in [
+            "actions",
+            "prev_actions",
+            "action_log_probs",
+            "value_preds",
+            "returns",
+            "rewards",
+            "masks",
+        ]:
+            nbytes[name] = tensors_nbytes(getattr(self, name))
+
+        return nbytes
+
     def insert_observations(
         self, observations: ObservationType, time_step: int = 0,
     ):
@@ -323,6 +350,29 @@ class RolloutStorage(object):
         if len(self.unnarrow_data) > 0:
             self.unnarrow()
 
+    def continue_from(self, other: "RolloutStorage"):
+        """Sets the first step (observations, memory, masks and previous
+        actions) to the last step of `other`, so that the next rollout
+        collected in this storage continues the one collected in `other`.
+
+        All remaining data is overwritten while collecting, so only the
+        number of samplers is adjusted if some samplers were paused
+        while collecting in `other`.
+        """
+        num_samplers = other.masks.shape[1]
+        if self.masks.shape[1] != num_samplers:
+            self.sampler_select(list(range(num_samplers)))
+
+        self.insert_observations(
+            other.unflatten_observations(other.observations.step_squeeze(-1)),
+            time_step=0,
+        )
+        if len(other.memory) > 0:
+            self.insert_memory(other.pick_memory_step(-1), time_step=0)
+
+        self.masks[0].copy_(other.masks[-1])
+        self.prev_actions[0].copy_(other.prev_actions[-1])
+
     def compute_returns(
         self, next_value: torch.Tensor, use_gae: bool, gamma: float, tau: float
     ):
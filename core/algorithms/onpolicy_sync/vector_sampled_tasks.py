@@ -30,6 +30,7 @@ from setproctitle import setproctitle as ptitle
 from core.base_abstractions.misc import RLStepResult
 from core.base_abstractions.task import TaskSampler
 from utils.misc_utils import partition_sequence
+from utils.profiling_utils import SamplingProfiler, write_profile
 from utils.system import get_logger
 from utils.tensor_utils import tile_images
 
@@ -44,6 +45,10 @@ except ImportError:
 
 DEFAULT_MP_CONTEXT_TYPE = "forkserver"
 COMPLETE_TASK_METRICS_KEY = "__AFTER_TASK_METRICS__"
+# Key of an optional dictionary in task metrics with statistics of the task sampler
+# or environment (e.g. cache hit ratios), logged as train info rather than as task
+# metrics
+TASK_TRAIN_INFO_KEY = "__TASK_TRAIN_INFO__"
 
 STEP_COMMAND = "step"
 NEXT_TASK_COMMAND = "next_task"
@@ -59,6 +64,8 @@ RESET_COMMAND = "reset"
 SEED_COMMAND = "seed"
 PAUSE_COMMAND = "pause"
 RESUME_COMMAND = "resume"
+PROFILE_START_COMMAND = "start_profiling"
+PROFILE_STOP_COMMAND = "stop_profiling"
 
 
 class VectorSampledTasks(object):
@@ -232,6 +239,11 @@ class VectorSampledTasks(object):
         """
         return self._mp_ctx
 
+    @property
+    def worker_pids(self) -> List[int]:
+        """Process ids of the worker processes running the task samplers."""
+        return [ps.pid for ps in self._workers] if self._workers is not None else []
+
     @staticmethod
     def _task_sampling_loop_worker(
         worker_id: Union[int, str],
@@ -258,6 +270,7 @@ class VectorSampledTasks(object):
 
         if parent_pipe is not None:
             parent_pipe.close()
+        profiler: Optional[SamplingProfiler] = None
         try:
             while True:
                 read_input = connection_read_fn()
@@ -292,6 +305,20 @@ class VectorSampledTasks(object):
                     elif commands == RESUME_COMMAND:
                         sp_vector_sampled_tasks.resume_all()
                         connection_write_fn("done")
+                    elif commands == PROFILE_START_COMMAND:
+                        if profiler is None:
+                            profiler = SamplingProfiler(interval=data_list)
+                            profiler.start()
+                        connection_write_fn("done")
+                    elif commands == PROFILE_STOP_COMMAND:
+                        if profiler is not None:
+                            profiler.stop()
+                            directory, name, role = data_list
+                            write_profile(
+                                directory, name, role, "python", profiler.state_dict()
+                            )
+                            profiler = None
+                        connection_write_fn("done")
                     else:
                         if isinstance(commands, str):
                             commands = [
@@ -605,6 +632,30 @@ class VectorSampledTasks(object):
         for i in range(len(self.npaused_per_process)):
             self.npaused_per_process[i] = 0
 
+    def start_profiling(self, interval: float = 0.005) -> None:
+        """Starts a `SamplingProfiler` in each worker process."""
+        self._is_waiting = True
+        for connection_write_fn in self._connection_write_fns:
+            connection_write_fn((PROFILE_START_COMMAND, interval))
+
+        for connection_read_fn in self._connection_read_fns:
+            connection_read_fn()
+        self._is_waiting = False
+
+    def stop_profiling(self, directory: str, name: str, role: str) -> None:
+        """Stops the profilers started by `start_profiling` and writes their
+        profiles into `directory` (named `<name>_<process index>`, see
+        `utils.profiling_utils.write_profile`)."""
+        self._is_waiting = True
+        for it, connection_write_fn in enumerate(self._connection_write_fns):
+            connection_write_fn(
+                (PROFILE_STOP_COMMAND, (directory, "{}_{}".format(name, it), role))
+            )
+
+        for connection_read_fn in self._connection_read_fns:
+            connection_read_fn()
+        self._is_waiting = False
+
     def command(
         self, commands: Union[List[str], str], data_list: Optional[List]
     ) -> List[Any]:
@@ -823,6 +874,12 @@ class SingleProcessVectorSampledTasks(object):
     def mp_ctx(self) -> Optional[BaseContext]:
         return None
 
+    @property
+    def worker_pids(self) -> List[int]:
+        """Task samplers run in the calling process, so there are no worker
+        processes."""
+        return []
+
     @property
     def num_unpaused_tasks(self) -> int:
         """Number of unpaused processes.
@@ -1104,6 +1161,14 @@ class SingleProcessVectorSampledTasks(object):
             self._vector_task_generators.insert(index, generator)
         self._paused = []
 
+    def start_profiling(self, interval: float = 0.005) -> None:
+        """Task samplers run in the calling process, which is expected to
+        profile itself."""
+        pass
+
+    def stop_profiling(self, directory: str, name: str, role: str) -> None:
+        pass
+
     def command_at(
         self, sampler_index: int, command: str, data: Optional[Any] = None
     ) -> Any:
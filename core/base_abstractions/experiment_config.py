@@ -9,7 +9,7 @@ import torch.nn as nn
 
 from core.base_abstractions.preprocessor import ObservationSet
 from core.base_abstractions.task import TaskSampler
-from utils.experiment_utils import TrainingPipeline, Builder
+from utils.experiment_utils import TrainingPipeline, Builder, EvalStoppingCriterion
 from utils.system import get_logger
 from utils.viz_utils import VizSuite
 
@@ -29,6 +29,7 @@ class MachineParams(object):
         ] = None,
         visualizer: Optional[Union[VizSuite, Builder[VizSuite]]] = None,
         gpu_ids: Union[int, Sequence[int]] = None,
+        eval_stopping_criterion: Optional[EvalStoppingCriterion] = None,
     ):
         assert (
             gpu_ids is None or devices is None
@@ -55,6 +56,9 @@ class MachineParams(object):
         )
         self._visualizer_maybe_builder = visualizer
 
+        # For valid/test, allows stopping evaluations before exhausting all tasks
+        self.eval_stopping_criterion = eval_stopping_criterion
+
         self._observation_set_cached: Optional[ObservationSet] = None
         self._visualizer_cached: Optional[VizSuite] = None
 
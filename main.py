@@ -11,6 +11,7 @@ import gin
 from setproctitle import setproctitle as ptitle
 
 from constants import ABS_PATH_OF_TOP_LEVEL_DIR
+from core.algorithms.actor_learner_async.runner import ActorLearnerRunner
 from core.algorithms.onpolicy_sync.runner import OnPolicyRunner
 from core.base_abstractions.experiment_config import ExperimentConfig
 from utils.system import get_logger, init_logging, HUMAN_LOG_LEVELS
@@ -108,6 +109,90 @@ def get_args():
         help="optional number of skipped checkpoints between runs in test if no checkpoint specified",
     )
 
+    parser.add_argument(
+        "--checkpoint_parallel",
+        dest="checkpoint_parallel",
+        action="store_true",
+        required=False,
+        help="if you pass the `--checkpoint_parallel` flag, idle testers will pull (checkpoint, shard) units"
+        " of work from a shared queue instead of all testers evaluating each checkpoint in turn",
+    )
+    parser.set_defaults(checkpoint_parallel=False)
+
+    parser.add_argument(
+        "--no_eval_cache",
+        dest="use_eval_cache",
+        action="store_false",
+        required=False,
+        help="if you pass the `--no_eval_cache` flag, all checkpoints will be evaluated in test, even if"
+        " the evaluation cache in the metrics folder already holds their results",
+    )
+    parser.set_defaults(use_eval_cache=True)
+
+    parser.add_argument(
+        "--save_episode_metrics",
+        dest="save_episode_metrics",
+        action="store_true",
+        required=False,
+        help="if you pass the `--save_episode_metrics` flag, workers will write the complete metrics of every"
+        " task to the metrics folder (by default, only testers do, and otherwise only summaries are logged)",
+    )
+    parser.set_defaults(save_episode_metrics=None)
+
+    parser.add_argument(
+        "--disable_timers",
+        dest="enable_timers",
+        action="store_false",
+        required=False,
+        help="if you pass the `--disable_timers` flag, trainers will not time the sections of their training"
+        " loop (otherwise logged as train info under `timing/`)",
+    )
+    parser.set_defaults(enable_timers=True)
+
+    parser.add_argument(
+        "--sync_timers",
+        dest="sync_timers",
+        action="store_true",
+        required=False,
+        help="if you pass the `--sync_timers` flag, trainers will synchronize their CUDA device around each timed"
+        " section, so that GPU work is timed in the section launching it (slower, and serializes overlapped"
+        " rollouts and updates)",
+    )
+    parser.set_defaults(sync_timers=False)
+
+    parser.add_argument(
+        "--disable_memory_report",
+        dest="report_memory",
+        action="store_false",
+        required=False,
+        help="if you pass the `--disable_memory_report` flag, trainers will not log the memory held by their"
+        " rollout storages, model, optimizer and processes (otherwise logged as train info under `memory/`)",
+    )
+    parser.set_defaults(report_memory=True)
+
+    parser.add_argument(
+        "--profile",
+        dest="profile_units",
+        nargs=2,
+        type=int,
+        metavar=("FIRST", "NUM"),
+        default=None,
+        required=False,
+        help="profile NUM rollouts of every worker (including validation and test workers) and its task sampler"
+        " processes, starting at rollout FIRST (counting from 0). Profiles and their summary are written into"
+        " the profiles folder of the output dir",
+    )
+
+    parser.add_argument(
+        "--dry_run",
+        dest="dry_run",
+        action="store_true",
+        required=False,
+        help="if you pass the `--dry_run` flag, the projected memory budget of the train workers for the given"
+        " config will be printed (running a single task sampler) and no training will take place",
+    )
+    parser.set_defaults(dry_run=False)
+
     parser.add_argument(
         "-m",
         "--max_sampler_processes_per_worker",
@@ -142,6 +227,59 @@ def get_args():
         ),
     )
 
+    parser.add_argument(
+        "--node_rank",
+        default=0,
+        type=int,
+        required=False,
+        help="rank of this node (machine) in multi-node training, in [0, num_nodes)",
+    )
+
+    parser.add_argument(
+        "--num_nodes",
+        default=1,
+        type=int,
+        required=False,
+        help="number of nodes (machines) for multi-node training. Each node runs this script with the same"
+        " arguments (including seed) except for node_rank.",
+    )
+
+    parser.add_argument(
+        "--distributed_ip",
+        default="127.0.0.1",
+        type=str,
+        required=False,
+        help="address of the node with rank 0 (the master node), reachable from all nodes",
+    )
+
+    parser.add_argument(
+        "--distributed_port",
+        default=0,
+        type=int,
+        required=False,
+        help="port in the master node used to connect all workers. Required for multi-node training (a free port"
+        " is used if 0).",
+    )
+
+    parser.add_argument(
+        "--actor_learner",
+        dest="actor_learner",
+        action="store_true",
+        required=False,
+        help="train with asynchronous actors (one per train worker in the machine params) streaming experience"
+        " to a single learner, which should use off-policy corrected losses (e.g. V-trace)",
+    )
+    parser.set_defaults(actor_learner=False)
+
+    parser.add_argument(
+        "--segments_per_batch",
+        default=None,
+        type=int,
+        required=False,
+        help="number of actor segments consumed by each learner update with --actor_learner (by default, the"
+        " number of actors)",
+    )
+
     return parser.parse_args()
 
 
@@ -248,7 +386,41 @@ def main():
 
     cfg, srcs = load_config(args)
 
-    if args.test_date is None:
+    if args.dry_run:
+        with OnPolicyRunner(
+            config=cfg,
+            output_dir=args.output_dir,
+            loaded_config_src_files=srcs,
+            seed=args.seed,
+            mode="train",
+        ) as runner:
+            runner.memory_budget(
+                max_sampler_processes_per_worker=args.max_sampler_processes_per_worker
+            )
+        return
+
+    if args.test_date is None and args.actor_learner:
+        ActorLearnerRunner(
+            config=cfg,
+            output_dir=args.output_dir,
+            loaded_config_src_files=srcs,
+            seed=args.seed,
+            mode="train",
+            deterministic_cudnn=args.deterministic_cudnn,
+            deterministic_agents=args.deterministic_agents,
+            extra_tag=args.extra_tag,
+            segments_per_batch=args.segments_per_batch,
+            save_episode_metrics=args.save_episode_metrics,
+            enable_timers=args.enable_timers,
+            sync_timers=args.sync_timers,
+            report_memory=args.report_memory,
+            profile_units=args.profile_units,
+        ).start_train(
+            checkpoint=args.checkpoint,
+            restart_pipeline=args.restart_pipeline,
+            max_sampler_processes_per_worker=args.max_sampler_processes_per_worker,
+        )
+    elif args.test_date is None:
         OnPolicyRunner(
             config=cfg,
             output_dir=args.output_dir,
@@ -258,6 +430,15 @@ def main():
             deterministic_cudnn=args.deterministic_cudnn,
             deterministic_agents=args.deterministic_agents,
             extra_tag=args.extra_tag,
+            node_rank=args.node_rank,
+            num_nodes=args.num_nodes,
+            distributed_ip=args.distributed_ip,
+            distributed_port=args.distributed_port,
+            save_episode_metrics=args.save_episode_metrics,
+            enable_timers=args.enable_timers,
+            sync_timers=args.sync_timers,
+            report_memory=args.report_memory,
+            profile_units=args.profile_units,
         ).start_train(
             checkpoint=args.checkpoint,
             restart_pipeline=args.restart_pipeline,
@@ -273,11 +454,17 @@ def main():
             deterministic_cudnn=args.deterministic_cudnn,
             deterministic_agents=args.deterministic_agents,
             extra_tag=args.extra_tag,
+            distributed_ip=args.distributed_ip,
+            distributed_port=args.distributed_port,
+            save_episode_metrics=args.save_episode_metrics,
+            profile_units=args.profile_units,
         ).start_test(
             experiment_date=args.test_date,
             checkpoint=args.checkpoint,
             skip_checkpoints=args.skip_checkpoints,
             max_sampler_processes_per_worker=args.max_sampler_processes_per_worker,
+            checkpoint_parallel=args.checkpoint_parallel,
+            use_eval_cache=args.use_eval_cache,
         )
 
 
@@ -0,0 +1,23 @@
+import glob
+import os
+
+from plugins.babyai_plugin.babyai_constants import BABYAI_EXPERT_TRAJECTORIES_DIR
+from plugins.minigrid_plugin.minigrid_offpolicy import convert_minigrid_expert_demos
+
+
+def convert_demos(dir: str):
+    for file_path in glob.glob(os.path.join(dir, "*.pkl")):
+        new_path = file_path.replace(".pkl", "-memmap")
+        if os.path.exists(new_path):
+            continue
+        print(
+            "Converting {} to memory-mapped arrays in {}...".format(
+                os.path.basename(file_path), new_path
+            )
+        )
+        convert_minigrid_expert_demos(file_path, new_path)
+        print("Done.")
+
+
+if __name__ == "__main__":
+    convert_demos(BABYAI_EXPERT_TRAJECTORIES_DIR)
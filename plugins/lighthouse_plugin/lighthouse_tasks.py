@@ -125,7 +125,7 @@ class FindGoalLightHouseTask(LightHouseTask):
             observation=self.get_observations(),
             reward=reward,
             done=self.is_done(),
-            info=None,
+            info={},
         )
 
     def reached_terminal_state(self) -> bool:
@@ -95,8 +95,14 @@ class ExpertTrajectoryIterator(Iterator):
         num_data_length_clusters: int = 8,
         current_worker: Optional[int] = None,
         num_workers: Optional[int] = None,
+        seed: Optional[int] = None,
     ):
         super(ExpertTrajectoryIterator, self).__init__()
+        # Own generator (seeded from the main thread's global `random` if no seed is given)
+        # so that the order of trajectories does not depend on which thread builds batches
+        self.rng = random.Random(
+            seed if seed is not None else random.randint(0, 2 ** 31 - 1)
+        )
         self.restrict_max_steps_in_dataset = restrict_max_steps_in_dataset
 
         if restrict_max_steps_in_dataset is not None:
@@ -132,7 +138,7 @@ class ExpertTrajectoryIterator(Iterator):
             for i in range(self.num_data_lengths)
         ]
         for i in range(self.num_data_lengths):
-            random.shuffle(self.trajectory_inds[i])
+            self.rng.shuffle(self.trajectory_inds[i])
         assert nrollouts <= sum(
             len(ti) for ti in self.trajectory_inds
         ), "Too many rollouts requested."
@@ -141,7 +147,7 @@ class ExpertTrajectoryIterator(Iterator):
         self.rollout_len = rollout_len
 
         self.current_data_length = [
-            random.randint(0, self.num_data_lengths - 1) for _ in range(nrollouts)
+            self.rng.randint(0, self.num_data_lengths - 1) for _ in range(nrollouts)
         ]
 
         self.rollout_queues: List[queue.Queue] = [
@@ -253,6 +259,7 @@ def create_minigrid_offpolicy_data_iterator(
     restrict_max_steps_in_dataset: Optional[int] = None,
     current_worker: Optional[int] = None,
     num_workers: Optional[int] = None,
+    seed: Optional[int] = None,
 ) -> ExpertTrajectoryIterator:
     path = os.path.abspath(path)
 
@@ -280,4 +287,282 @@ def create_minigrid_offpolicy_data_iterator(
         restrict_max_steps_in_dataset=restrict_max_steps_in_dataset,
         current_worker=current_worker,
         num_workers=num_workers,
+        seed=seed,
+    )
+
+
+class ExpertTrajectoryStore(object):
+    """Expert trajectories preconverted (see `convert_minigrid_expert_demos`)
+    into contiguous, memory-mapped numpy arrays.
+
+    # Attributes
+
+    images : `nsteps x height x width x channels` array of egocentric images.
+    actions : `nsteps` array of expert actions.
+    missions : `nepisodes x max_mission_len` array of tokenized missions (padded
+        with 0).
+    episode_offsets : `nepisodes + 1` array, the steps of episode `i` are
+        `episode_offsets[i]:episode_offsets[i + 1]`.
+    episodes_by_length : Episode indices sorted by (length, index).
+    """
+
+    ARRAYS = ("images", "actions", "missions", "episode_offsets", "episodes_by_length")
+
+    def __init__(self, path: str):
+        self.path = path
+        for name in self.ARRAYS:
+            setattr(
+                self, name, np.load(os.path.join(path, name + ".npy"), mmap_mode="r"),
+            )
+
+    @property
+    def num_episodes(self) -> int:
+        return self.episode_offsets.shape[0] - 1
+
+    @property
+    def episode_lengths(self) -> np.ndarray:
+        return np.diff(self.episode_offsets)
+
+
+def convert_minigrid_expert_demos(demos_path: str, output_path: str) -> None:
+    """Converts a BabyAI demos pickle (as loaded by `babyai.utils.load_demos`)
+    into the memory-mapped format read by `ExpertTrajectoryStore`."""
+    demos = babyai.utils.load_demos(demos_path)
+    assert demos is not None and len(demos) != 0
+
+    os.makedirs(output_path, exist_ok=True)
+
+    lengths = np.array([len(demo[3]) for demo in demos], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+    mission_sensor = MiniGridMissionSensor(instr_len=1)
+    missions = [
+        mission_sensor.instr_preprocessor([{"mission": demo[0]}]).view(-1).numpy()
+        for demo in demos
+    ]
+    padded_missions = np.zeros(
+        (len(missions), max(len(m) for m in missions)), dtype=np.int64
+    )
+    for it, mission in enumerate(missions):
+        padded_missions[it, : len(mission)] = mission
+
+    images: Optional[np.ndarray] = None
+    actions = np.zeros((int(offsets[-1]),), dtype=np.int64)
+    for it, demo in enumerate(demos):
+        steps = babyai.utils.demos.transform_demos([demo])[0]
+        if images is None:
+            image = steps[0][0]["image"]
+            images = np.lib.format.open_memmap(
+                os.path.join(output_path, "images.npy"),
+                mode="w+",
+                dtype=image.dtype,
+                shape=(int(offsets[-1]),) + image.shape,
+            )
+        images[offsets[it] : offsets[it + 1]] = np.stack(
+            [step[0]["image"] for step in steps], axis=0
+        )
+        actions[offsets[it] : offsets[it + 1]] = [int(step[1]) for step in steps]
+    cast(np.ndarray, images).flush()
+    del images
+
+    np.save(os.path.join(output_path, "actions.npy"), actions)
+    np.save(os.path.join(output_path, "missions.npy"), padded_missions)
+    np.save(os.path.join(output_path, "episode_offsets.npy"), offsets)
+    np.save(
+        os.path.join(output_path, "episodes_by_length.npy"),
+        np.argsort(lengths, kind="stable"),
+    )
+
+
+class MemmapExpertTrajectoryIterator(Iterator):
+    """Counterpart of `ExpertTrajectoryIterator` reading from an
+    `ExpertTrajectoryStore`.
+
+    Instead of decoding and enqueueing each step, the steps of each rollout
+    are computed as index ranges into the store and every batch is gathered
+    with a single (vectorized) indexing operation per array.
+    """
+
+    def __init__(
+        self,
+        store: ExpertTrajectoryStore,
+        nrollouts: int,
+        rollout_len: int,
+        instr_len: Optional[int],
+        restrict_max_steps_in_dataset: Optional[int] = None,
+        num_data_length_clusters: int = 8,
+        current_worker: Optional[int] = None,
+        num_workers: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        super(MemmapExpertTrajectoryIterator, self).__init__()
+        # Own generator (seeded from the main thread's global `random` if no seed is given)
+        # so that the order of trajectories does not depend on which thread builds batches
+        self.rng = random.Random(
+            seed if seed is not None else random.randint(0, 2 ** 31 - 1)
+        )
+        self.store = store
+        self.restrict_max_steps_in_dataset = restrict_max_steps_in_dataset
+
+        num_episodes = store.num_episodes
+        if restrict_max_steps_in_dataset is not None:
+            num_episodes = int(
+                (store.episode_offsets[:-1] < restrict_max_steps_in_dataset).sum()
+            )
+
+        first, last = 0, num_episodes
+        if num_workers is not None:
+            parts = partition_limits(num_episodes, num_workers)
+            first, last = parts[current_worker], parts[current_worker + 1]
+
+        episodes_by_length = np.asarray(store.episodes_by_length)
+        sorted_inds = episodes_by_length[
+            (episodes_by_length >= first) & (episodes_by_length < last)
+        ]
+
+        self.num_data_lengths = min(
+            num_data_length_clusters, len(sorted_inds) // nrollouts
+        )
+        data_limits = partition_limits(
+            num_items=len(sorted_inds), num_parts=self.num_data_lengths
+        )
+
+        self.instr_len = instr_len
+
+        self.trajectory_inds: List[List[int]] = [
+            sorted_inds[data_limits[i] : data_limits[i + 1]].tolist()
+            for i in range(self.num_data_lengths)
+        ]
+        for i in range(self.num_data_lengths):
+            self.rng.shuffle(self.trajectory_inds[i])
+        assert nrollouts <= sum(
+            len(ti) for ti in self.trajectory_inds
+        ), "Too many rollouts requested."
+
+        self.nrollouts = nrollouts
+        self.rollout_len = rollout_len
+
+        self.current_data_length = [
+            self.rng.randint(0, self.num_data_lengths - 1) for _ in range(nrollouts)
+        ]
+
+        # Remaining (episode, next step, end step) for each rollout
+        self.rollout_cursors: List[Optional[Tuple[int, int, int]]] = [None] * nrollouts
+
+    def next_episode(self, sampler: int) -> Optional[int]:
+        start = self.current_data_length[sampler]
+        cond = True
+        while cond:
+            self.current_data_length[sampler] = (
+                self.current_data_length[sampler] + 1
+            ) % self.num_data_lengths
+            cond = (
+                len(self.trajectory_inds[self.current_data_length[sampler]]) == 0
+                and self.current_data_length[sampler] != start
+            )
+
+        if len(self.trajectory_inds[self.current_data_length[sampler]]) == 0:
+            return None
+
+        return self.trajectory_inds[self.current_data_length[sampler]].pop()
+
+    def rollout_steps(self, rollout_ind: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Step indices into the store and episode index of each step for the
+        next `rollout_len` steps of the given rollout."""
+        steps: List[np.ndarray] = []
+        episodes: List[np.ndarray] = []
+        remaining = self.rollout_len
+        while remaining > 0:
+            cursor = self.rollout_cursors[rollout_ind]
+            if cursor is None or cursor[1] == cursor[2]:
+                episode = self.next_episode(rollout_ind)
+                if episode is None:
+                    raise StopIteration()
+                cursor = (
+                    episode,
+                    int(self.store.episode_offsets[episode]),
+                    int(self.store.episode_offsets[episode + 1]),
+                )
+
+            episode, step, end = cursor
+            nsteps = min(remaining, end - step)
+            steps.append(np.arange(step, step + nsteps))
+            episodes.append(np.full((nsteps,), episode))
+            self.rollout_cursors[rollout_ind] = (episode, step + nsteps, end)
+            remaining -= nsteps
+
+        return np.concatenate(steps), np.concatenate(episodes)
+
+    def __next__(self) -> Dict[str, torch.Tensor]:
+        steps, episodes = zip(
+            *[self.rollout_steps(rollout_ind) for rollout_ind in range(self.nrollouts)]
+        )
+        step_inds = np.stack(steps, axis=1)  # steps x rollouts
+        episode_inds = np.stack(episodes, axis=1)
+
+        masks = step_inds != self.store.episode_offsets[episode_inds]
+
+        to_return = {
+            "masks": torch.from_numpy(
+                masks.astype(np.float32)[..., None, None]
+            ),  # steps x rollouts x agent x mask
+            "minigrid_ego_image": torch.from_numpy(
+                self.store.images[step_inds.reshape(-1)].reshape(
+                    step_inds.shape + self.store.images.shape[1:]
+                )
+            ),  # steps x rollouts x height x width x channels
+            "expert_action": torch.from_numpy(
+                self.store.actions[step_inds][..., None, None].astype(np.int64)
+            ),  # steps x rollouts x agent x action
+        }
+        if self.instr_len is not None:
+            missions = self.store.missions[:, : self.instr_len]
+            if missions.shape[1] < self.instr_len:
+                missions = np.pad(
+                    missions, ((0, 0), (0, self.instr_len - missions.shape[1]))
+                )
+            to_return["minigrid_mission"] = torch.from_numpy(
+                np.ascontiguousarray(missions[episode_inds]).astype(np.int64)
+            )  # steps x rollouts x mission_dims
+        return to_return
+
+
+_STORE_CACHE: Dict[str, ExpertTrajectoryStore] = {}
+
+
+def create_minigrid_offpolicy_memmap_data_iterator(
+    path: str,
+    nrollouts: int,
+    rollout_len: int,
+    instr_len: Optional[int],
+    restrict_max_steps_in_dataset: Optional[int] = None,
+    current_worker: Optional[int] = None,
+    num_workers: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> MemmapExpertTrajectoryIterator:
+    """Counterpart of `create_minigrid_offpolicy_data_iterator` for expert
+    demonstrations converted with `convert_minigrid_expert_demos`."""
+    path = os.path.abspath(path)
+
+    assert (current_worker is None) == (
+        num_workers is None
+    ), "both current_worker and num_workers must be simultaneously defined or undefined"
+
+    if path not in _STORE_CACHE:
+        _STORE_CACHE[path] = ExpertTrajectoryStore(path)
+        get_logger().info(
+            "Memory-mapped minigrid dataset from {}, it contains {} trajectories".format(
+                path, _STORE_CACHE[path].num_episodes
+            )
+        )
+
+    return MemmapExpertTrajectoryIterator(
+        store=_STORE_CACHE[path],
+        nrollouts=nrollouts,
+        rollout_len=rollout_len,
+        instr_len=instr_len,
+        restrict_max_steps_in_dataset=restrict_max_steps_in_dataset,
+        current_worker=current_worker,
+        num_workers=num_workers,
+        seed=seed,
     )
@@ -0,0 +1,249 @@
+"""Precomputed geodesic distance fields for RoboTHOR scenes.
+
+A distance field stores, for every reachable grid point in a scene, the
+geodesic distance to a target (an object type or a point goal). Fields are
+computed offline (see `plugins/robothor_plugin/scripts/make_distance_fields.py`)
+with a multi-source Dijkstra search over the graph of reachable grid points
+and are queried at runtime with bilinear interpolation between grid points.
+"""
+import heapq
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.cache_utils import pos_to_str_for_cache, str_to_pos_for_cache
+
+_NEIGHBOR_OFFSETS: Tuple[Tuple[int, int], ...] = (
+    (1, 0),
+    (-1, 0),
+    (0, 1),
+    (0, -1),
+    (1, 1),
+    (1, -1),
+    (-1, 1),
+    (-1, -1),
+)
+
+
+class SceneDistanceFields(object):
+    """Distance fields for all targets in a scene.
+
+    # Attributes
+
+    grid_size : Size of the grid of reachable points.
+    origin : (x, z) coordinates of the grid point with indices (0, 0).
+    fields : `ntargets x nx x nz` array of geodesic distances (`inf` for
+        unreachable or non-grid points).
+    target_keys : Name of each target, either an object type or a point goal in
+        `pos_to_str_for_cache` format.
+    """
+
+    def __init__(
+        self,
+        grid_size: float,
+        origin: Tuple[float, float],
+        fields: np.ndarray,
+        target_keys: Sequence[str],
+    ):
+        assert len(target_keys) == fields.shape[0]
+
+        self.grid_size = grid_size
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.fields = fields.astype(np.float32)
+        self.target_keys = list(target_keys)
+
+        self._object_type_index: Dict[str, int] = {}
+        self._point_index: Dict[Tuple[int, int], int] = {}
+        for it, key in enumerate(self.target_keys):
+            try:
+                pos = str_to_pos_for_cache(key)
+                self._point_index[self._grid_key(pos["x"], pos["z"])] = it
+            except (ValueError, IndexError):
+                self._object_type_index[key] = it
+
+    @property
+    def object_types(self) -> List[str]:
+        return list(self._object_type_index.keys())
+
+    def _grid_key(self, x: float, z: float) -> Tuple[int, int]:
+        return round(x / self.grid_size), round(z / self.grid_size)
+
+    def distance_to_object_type(
+        self, position: Dict[str, float], object_type: str
+    ) -> Optional[float]:
+        """Interpolated geodesic distance to the closest object of the given
+        type, or `None` if it cannot be answered from the fields."""
+        if object_type not in self._object_type_index:
+            return None
+        return self._interpolate(self._object_type_index[object_type], position)
+
+    def distance_to_point(
+        self, position: Dict[str, float], target: Dict[str, float]
+    ) -> Optional[float]:
+        """Interpolated geodesic distance to a point goal, or `None` if it
+        cannot be answered from the fields."""
+        index = self._point_index.get(self._grid_key(target["x"], target["z"]))
+        if index is None:
+            return None
+        return self._interpolate(index, position)
+
+    def _interpolate(self, index: int, position: Dict[str, float]) -> Optional[float]:
+        field = self.fields[index]
+        fx = (position["x"] - self.origin[0]) / self.grid_size
+        fz = (position["z"] - self.origin[1]) / self.grid_size
+        ix, iz = math.floor(fx), math.floor(fz)
+        wx, wz = fx - ix, fz - iz
+
+        total_weight, total = 0.0, 0.0
+        for dx, weight_x in ((0, 1.0 - wx), (1, wx)):
+            for dz, weight_z in ((0, 1.0 - wz), (1, wz)):
+                weight = weight_x * weight_z
+                cx, cz = ix + dx, iz + dz
+                if (
+                    weight <= 0
+                    or not (0 <= cx < field.shape[0] and 0 <= cz < field.shape[1])
+                    or not np.isfinite(field[cx, cz])
+                ):
+                    continue
+                total_weight += weight
+                total += weight * float(field[cx, cz])
+
+        if total_weight == 0:
+            return None
+        return total / total_weight
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez_compressed(
+            path,
+            grid_size=np.array(self.grid_size),
+            origin=np.array(self.origin),
+            fields=self.fields,
+            target_keys=np.array(self.target_keys),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "SceneDistanceFields":
+        with np.load(path) as data:
+            return cls(
+                grid_size=float(data["grid_size"]),
+                origin=tuple(data["origin"].tolist()),
+                fields=data["fields"],
+                target_keys=[str(k) for k in data["target_keys"]],
+            )
+
+
+def distance_fields_path(fields_dir: str, scene: str) -> str:
+    return os.path.join(fields_dir, scene + ".npz")
+
+
+def _dijkstra(
+    reachable: np.ndarray, sources: Dict[Tuple[int, int], float], grid_size: float
+) -> np.ndarray:
+    """Multi-source Dijkstra over the 8-connected grid of reachable points.
+
+    Diagonal moves are only allowed if both adjacent orthogonal points are
+    reachable (so that paths don't cut corners).
+    """
+    dists = np.full(reachable.shape, np.inf, dtype=np.float64)
+    heap: List[Tuple[float, int, int]] = []
+    for (ix, iz), d in sources.items():
+        if d < dists[ix, iz]:
+            dists[ix, iz] = d
+            heapq.heappush(heap, (d, ix, iz))
+
+    nx, nz = reachable.shape
+    while len(heap) > 0:
+        d, ix, iz = heapq.heappop(heap)
+        if d > dists[ix, iz]:
+            continue
+        for dx, dz in _NEIGHBOR_OFFSETS:
+            cx, cz = ix + dx, iz + dz
+            if not (0 <= cx < nx and 0 <= cz < nz) or not reachable[cx, cz]:
+                continue
+            if dx != 0 and dz != 0:
+                if not (reachable[ix + dx, iz] and reachable[ix, iz + dz]):
+                    continue
+                nd = d + grid_size * math.sqrt(2)
+            else:
+                nd = d + grid_size
+            if nd < dists[cx, cz]:
+                dists[cx, cz] = nd
+                heapq.heappush(heap, (nd, cx, cz))
+
+    return dists
+
+
+def compute_scene_distance_fields(
+    reachable_points: Sequence[Dict[str, float]],
+    object_positions: Dict[str, Sequence[Dict[str, float]]],
+    point_targets: Sequence[Dict[str, float]],
+    grid_size: float = 0.25,
+    object_sources_per_instance: int = 4,
+) -> SceneDistanceFields:
+    """Computes distance fields for the given object types and point goals.
+
+    # Parameters
+
+    reachable_points : Reachable (x, y, z) positions in the scene (e.g. from
+        `RoboThorEnvironment.currently_reachable_points`).
+    object_positions : Positions of all object instances, by object type.
+    point_targets : Point goals (e.g. the target positions in a PointNav dataset).
+    grid_size : Size of the grid of reachable points.
+    object_sources_per_instance : Number of reachable points (closest to each
+        object instance) seeding the search for an object type, each initialized
+        with its horizontal distance to the object.
+    """
+    keys = np.array(
+        [
+            [round(p["x"] / grid_size), round(p["z"] / grid_size)]
+            for p in reachable_points
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    kmin = keys.min(0)
+    shape = tuple((keys.max(0) - kmin + 1).tolist())
+    reachable = np.zeros(shape, dtype=bool)
+    reachable[keys[:, 0] - kmin[0], keys[:, 1] - kmin[1]] = True
+    origin = (float(kmin[0] * grid_size), float(kmin[1] * grid_size))
+
+    cells = np.stack(np.nonzero(reachable), axis=1)
+    cell_coords = cells * grid_size + np.array(origin)
+
+    def closest_sources(
+        point: Dict[str, float], k: int
+    ) -> Dict[Tuple[int, int], float]:
+        deltas = np.sqrt(
+            ((cell_coords - np.array([point["x"], point["z"]])) ** 2).sum(1)
+        )
+        closest = np.argsort(deltas)[:k]
+        return {(int(cells[c, 0]), int(cells[c, 1])): float(deltas[c]) for c in closest}
+
+    target_keys: List[str] = []
+    fields: List[np.ndarray] = []
+
+    for object_type in sorted(object_positions.keys()):
+        sources: Dict[Tuple[int, int], float] = {}
+        for pos in object_positions[object_type]:
+            for cell, d in closest_sources(pos, object_sources_per_instance).items():
+                sources[cell] = min(d, sources.get(cell, float("inf")))
+        target_keys.append(object_type)
+        fields.append(_dijkstra(reachable, sources, grid_size))
+
+    for target in point_targets:
+        key = pos_to_str_for_cache(target)
+        if key in target_keys:
+            continue
+        target_keys.append(key)
+        fields.append(_dijkstra(reachable, closest_sources(target, 1), grid_size))
+
+    return SceneDistanceFields(
+        grid_size=grid_size,
+        origin=origin,
+        fields=np.stack(fields, axis=0)
+        if len(fields) > 0
+        else np.zeros((0,) + shape, dtype=np.float32),
+        target_keys=target_keys,
+    )
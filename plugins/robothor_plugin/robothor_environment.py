@@ -1,6 +1,7 @@
 import copy
 import glob
 import math
+import os
 import pickle
 import random
 from typing import Any, Optional, Dict, List, Union, Tuple, Collection
@@ -11,6 +12,14 @@ import numpy as np
 from ai2thor.controller import Controller
 from ai2thor.util import metrics
 
+from plugins.robothor_plugin.robothor_distance_fields import (
+    SceneDistanceFields,
+    distance_fields_path,
+)
+from plugins.robothor_plugin.robothor_view_cache import (
+    MemmapViewCache,
+    is_memmap_view_cache,
+)
 from utils.cache_utils import (
     DynamicDistanceCache,
     pos_to_str_for_cache,
@@ -31,9 +40,30 @@ class RoboThorEnvironment:
 
     controller : The AI2THOR controller.
     config : The AI2THOR controller configuration
+    distance_cache : Cache of geodesic distances queried to the controller.
+    distance_fields_dir : Optional directory with precomputed distance fields
+        (one `<scene>.npz` file per scene).
     """
 
-    def __init__(self, **kwargs):
+    def __init__(
+        self,
+        distance_cache_kwargs: Optional[Dict[str, Any]] = None,
+        distance_fields_dir: Optional[str] = None,
+        **kwargs,
+    ):
+        """Initializer.
+
+        # Parameters
+
+        distance_cache_kwargs : Optional keyword arguments for the
+            `DynamicDistanceCache` (e.g. `max_size` or a `store_path` shared by all
+            samplers in the machine).
+        distance_fields_dir : Optional directory with precomputed distance fields
+            (see `plugins/robothor_plugin/scripts/make_distance_fields.py`). Distance
+            queries are answered from the fields whenever possible, and otherwise by
+            the controller.
+        kwargs : AI2THOR controller configuration.
+        """
         self.config = dict(
             rotateStepDegrees=30.0,
             visibilityDistance=1.0,
@@ -52,7 +82,11 @@ class RoboThorEnvironment:
         self.known_good_locations: Dict[str, Any] = {
             self.scene_name: copy.deepcopy(self.currently_reachable_points)
         }
-        self.distance_cache = DynamicDistanceCache(rounding=1)
+        self.distance_cache = DynamicDistanceCache(
+            **{"rounding": 1, **(distance_cache_kwargs or {})}
+        )
+        self.distance_fields_dir = distance_fields_dir
+        self._distance_fields: Dict[str, Optional[SceneDistanceFields]] = {}
         assert len(self.known_good_locations[self.scene_name]) > 10
 
     def initialize_grid_dimensions(
@@ -112,16 +146,41 @@ class RoboThorEnvironment:
             return metrics.path_distance(path)
         return -1.0
 
+    @property
+    def distance_fields(self) -> Optional[SceneDistanceFields]:
+        """Precomputed distance fields for the current scene (if available)."""
+        if self.distance_fields_dir is None:
+            return None
+        scene_name = self.scene_name
+        if scene_name not in self._distance_fields:
+            path = distance_fields_path(self.distance_fields_dir, scene_name)
+            if os.path.exists(path):
+                self._distance_fields[scene_name] = SceneDistanceFields.load(path)
+            else:
+                get_logger().warning(
+                    "No distance fields found for {} at {}".format(scene_name, path)
+                )
+                self._distance_fields[scene_name] = None
+        return self._distance_fields[scene_name]
+
     def distance_to_object_type(self, object_type: str) -> float:
         """Minimal geodesic distance to object of given type from agent's
         current location.
 
         It might return -1.0 for unreachable targets.
         """
+        if self.distance_fields is not None:
+            dist = self.distance_fields.distance_to_object_type(
+                self.controller.last_event.metadata["agent"]["position"], object_type
+            )
+            if dist is not None:
+                return dist
+
         return self.distance_cache.find_distance(
             self.controller.last_event.metadata["agent"]["position"],
             object_type,
             self.distance_from_point_to_object_type,
+            scene_name=self.scene_name,
         )
 
     def path_from_point_to_point(
@@ -161,10 +220,18 @@ class RoboThorEnvironment:
 
         It might return -1.0 for unreachable targets.
         """
+        if self.distance_fields is not None:
+            dist = self.distance_fields.distance_to_point(
+                self.controller.last_event.metadata["agent"]["position"], target
+            )
+            if dist is not None:
+                return dist
+
         return self.distance_cache.find_distance(
             self.controller.last_event.metadata["agent"]["position"],
             target,
             self.distance_from_point_to_point,
+            scene_name=self.scene_name,
         )
 
     def agent_state(self) -> Dict:
@@ -316,6 +383,7 @@ class RoboThorEnvironment:
 
     def stop(self):
         """Stops the ai2thor controller."""
+        self.distance_cache.close()
         try:
             self.controller.stop()
         except Exception as e:
@@ -521,3 +589,86 @@ class RoboThorCachedEnvironment:
     def visible_objects(self) -> List[Dict[str, Any]]:
         """Return all visible objects."""
         return self.all_objects_with_properties({"visible": True})
+
+
+class RoboThorMemmapCachedEnvironment(RoboThorCachedEnvironment):
+    """Wrapper for the robo2thor controller providing additional functionality
+    and bookkeeping, reading from view caches in the memory-mapped format (see
+    `plugins/robothor_plugin/robothor_view_cache.py`).
+
+    Frames, depth and metadata are read lazily from memory-mapped files, so all
+    samplers in a machine share a single page-cached copy of each scene and
+    switching scenes does not require loading the whole scene into memory.
+    Pickled view caches can be converted with
+    `plugins/robothor_plugin/scripts/convert_view_caches.py`.
+
+    # Attributes
+
+    view_cache : The `MemmapViewCache` for the current scene.
+    """
+
+    def __init__(self, **kwargs):
+        self.config = dict(
+            rotateStepDegrees=30.0,
+            visibilityDistance=1.0,
+            gridSize=0.25,
+            continuousMode=True,
+            snapToGrid=False,
+            agentMode="bot",
+            width=640,
+            height=480,
+        )
+        self.env_root_dir = kwargs["env_root_dir"]
+        scene_dirs = [
+            scene_dir
+            for scene_dir in glob.glob(os.path.join(self.env_root_dir, "*"))
+            if is_memmap_view_cache(scene_dir)
+        ]
+        assert len(scene_dirs) > 0, "No memory-mapped view caches found in {}".format(
+            self.env_root_dir
+        )
+        self.known_good_locations: Dict[str, Any] = {}
+        self._load_scene(random.choice(scene_dirs))
+
+    def _load_scene(self, scene_dir: str) -> None:
+        self.view_cache = MemmapViewCache(scene_dir)
+        self.agent_position = self.view_cache.position_keys[0]
+        self.agent_rotation = self.view_cache[self.agent_position].keys()[0]
+        self.known_good_locations[self.scene_name] = copy.deepcopy(
+            self.currently_reachable_points
+        )
+        self._last_action = "None"
+        assert len(self.known_good_locations[self.scene_name]) > 10
+
+    def reset(self, scene_name: str = None) -> None:
+        """Resets scene to a known initial state."""
+        scene_dir = os.path.join(self.env_root_dir, scene_name)
+        if not is_memmap_view_cache(scene_dir):
+            raise RuntimeError("Could not load scene:", scene_name)
+        self._load_scene(scene_dir)
+
+    @property
+    def currently_reachable_points(self) -> List[Dict[str, float]]:
+        """List of {"x": x, "y": y, "z": z} locations in the scene that are
+        currently reachable."""
+        return self.view_cache.reachable_points
+
+    @property
+    def scene_name(self) -> str:
+        """Current ai2thor scene."""
+        return self.view_cache.scene_name
+
+    @property
+    def current_frame(self) -> np.ndarray:
+        """Returns rgb image corresponding to the agent's egocentric view."""
+        return self.view_cache.frames[
+            self.view_cache.view_row(self.agent_position, self.agent_rotation)
+        ]
+
+    @property
+    def current_depth(self) -> np.ndarray:
+        """Returns depth image corresponding to the agent's egocentric view."""
+        assert self.view_cache.depth is not None, "No depth frames in view cache"
+        return self.view_cache.depth[
+            self.view_cache.view_row(self.agent_position, self.agent_rotation)
+        ]
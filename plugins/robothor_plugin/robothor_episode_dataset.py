@@ -0,0 +1,283 @@
+"""Compiled (binary, indexed) RoboTHOR episode datasets.
+
+The gzipped json episode files (one per scene) used by
+`ObjectNavDatasetTaskSampler` and `PointNavDatasetTaskSampler` can be compiled
+(see `plugins/robothor_plugin/scripts/compile_episode_datasets.py`) into a
+single directory of columnar arrays:
+
+* `index.json`: `[start, end)` rows of each scene, and the object type and
+    object id vocabularies.
+* `ids.npy`: episode ids.
+* `initial_positions.npy`, `target_positions.npy`: `nepisodes x 3` (x, y, z)
+    arrays (`nan` for missing targets).
+* `initial_orientations.npy`: rotation around the y axis of each episode.
+* `object_types.npy`, `object_ids.npy`: indices into the vocabularies (-1 if
+    missing).
+* `shortest_path_lengths.npy`: shortest path length of each episode.
+* `path_offsets.npy`, `path_points.npy`: the `shortest_path` of episode `i`
+    is `path_points[path_offsets[i]:path_offsets[i + 1]]`.
+
+Episodes within a scene are stored contiguously. All arrays are memory-mapped,
+so all samplers in a machine share a single page-cached copy and episodes are
+only decoded into dictionaries when sampled.
+"""
+import glob
+import gzip
+import json
+import os
+import random
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from utils.cache_utils import str_to_pos_for_cache
+
+INDEX_FILE = "index.json"
+
+_ARRAYS = (
+    "ids",
+    "initial_positions",
+    "initial_orientations",
+    "target_positions",
+    "object_types",
+    "object_ids",
+    "shortest_path_lengths",
+    "path_offsets",
+    "path_points",
+)
+
+
+def _pos_to_array(pos: Union[str, Dict[str, float], None]) -> List[float]:
+    if pos is None:
+        return [np.nan] * 3
+    if isinstance(pos, str):
+        pos = str_to_pos_for_cache(pos)
+    return [pos["x"], pos["y"], pos["z"]]
+
+
+def _rotation_to_float(rotation: Union[float, str, Dict[str, float]]) -> float:
+    if isinstance(rotation, str):
+        rotation = str_to_pos_for_cache(rotation)
+    if isinstance(rotation, dict):
+        return float(rotation["y"])
+    return float(rotation)
+
+
+def _array_to_pos(array: np.ndarray) -> Dict[str, float]:
+    return {"x": float(array[0]), "y": float(array[1]), "z": float(array[2])}
+
+
+class CompiledEpisodeDataset(object):
+    """Memory-mapped episode dataset in the compiled format.
+
+    # Attributes
+
+    scenes : Scenes in the dataset.
+    object_type_names : Vocabulary of object types.
+    object_id_names : Vocabulary of object ids.
+    """
+
+    def __init__(self, dataset_dir: str):
+        with open(os.path.join(dataset_dir, INDEX_FILE), "r") as f:
+            index = json.load(f)
+
+        self.dataset_dir = dataset_dir
+        self.scene_ranges: Dict[str, List[int]] = index["scenes"]
+        self.object_type_names: List[str] = index["object_types"]
+        self.object_id_names: List[str] = index["object_ids"]
+
+        self.arrays: Dict[str, np.ndarray] = {
+            name: np.load(os.path.join(dataset_dir, name + ".npy"), mmap_mode="r")
+            for name in _ARRAYS
+        }
+
+        self._id_index: Optional[Dict[str, int]] = None
+
+    @property
+    def scenes(self) -> List[str]:
+        return list(self.scene_ranges.keys())
+
+    def __len__(self) -> int:
+        return self.arrays["ids"].shape[0]
+
+    def scene_rows(self, scene: str) -> range:
+        start, end = self.scene_ranges[scene]
+        return range(start, end)
+
+    def row_of(self, episode_id: str) -> int:
+        """Row of the episode with the given id."""
+        if self._id_index is None:
+            self._id_index = {
+                str(episode_id): row
+                for row, episode_id in enumerate(self.arrays["ids"])
+            }
+        return self._id_index[episode_id]
+
+    def episode(self, row: int) -> Dict[str, Any]:
+        """Decodes an episode into the dictionary format of the json datasets,
+        with positions as `{"x": x, "y": y, "z": z}` dictionaries."""
+        arrays = self.arrays
+        start, end = arrays["path_offsets"][row], arrays["path_offsets"][row + 1]
+        episode: Dict[str, Any] = {
+            "id": str(arrays["ids"][row]),
+            "initial_position": _array_to_pos(arrays["initial_positions"][row]),
+            "initial_orientation": float(arrays["initial_orientations"][row]),
+            "shortest_path_length": float(arrays["shortest_path_lengths"][row]),
+            "shortest_path": [
+                _array_to_pos(p) for p in arrays["path_points"][start:end]
+            ],
+        }
+        if not np.isnan(arrays["target_positions"][row, 0]):
+            episode["target_position"] = _array_to_pos(arrays["target_positions"][row])
+        if arrays["object_types"][row] >= 0:
+            episode["object_type"] = self.object_type_names[arrays["object_types"][row]]
+        if arrays["object_ids"][row] >= 0:
+            episode["object_id"] = self.object_id_names[arrays["object_ids"][row]]
+        return episode
+
+    def episode_by_id(self, episode_id: str) -> Dict[str, Any]:
+        return self.episode(self.row_of(episode_id))
+
+    def scene_episodes(self, scene: str, shuffle: bool = True) -> "SceneEpisodes":
+        return SceneEpisodes(self, scene, shuffle=shuffle)
+
+
+class SceneEpisodes(object):
+    """Sequence of the (lazily decoded) episodes of a scene in a
+    `CompiledEpisodeDataset`, which can be used in place of the lists of
+    episode dictionaries returned by
+    `ObjectNavDatasetTaskSampler.load_dataset`."""
+
+    def __init__(
+        self, dataset: CompiledEpisodeDataset, scene: str, shuffle: bool = True
+    ):
+        self.dataset = dataset
+        self.scene = scene
+        self.rows = list(dataset.scene_rows(scene))
+        if shuffle:
+            self.shuffle()
+
+    def shuffle(self) -> None:
+        random.shuffle(self.rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return self.dataset.episode(self.rows[index])
+
+    def _unique_names(self, column: str, names: List[str]) -> List[str]:
+        start, end = self.dataset.scene_ranges[self.scene]
+        values = np.unique(self.dataset.arrays[column][start:end])
+        return [names[v] for v in values if v >= 0]
+
+    def object_types(self) -> List[str]:
+        """Unique object types of the episodes in the scene."""
+        return self._unique_names("object_types", self.dataset.object_type_names)
+
+    def object_ids(self) -> List[str]:
+        """Unique target object ids of the episodes in the scene."""
+        return self._unique_names("object_ids", self.dataset.object_id_names)
+
+
+def shuffle_episodes(episodes: Union[List[Dict[str, Any]], SceneEpisodes]) -> None:
+    """Shuffles (in place) either a list of episodes or a `SceneEpisodes`."""
+    if isinstance(episodes, SceneEpisodes):
+        episodes.shuffle()
+    else:
+        random.shuffle(episodes)
+
+
+def is_compiled_episode_dataset(dataset_dir: str) -> bool:
+    return os.path.exists(os.path.join(dataset_dir, INDEX_FILE))
+
+
+def compile_episode_dataset(
+    episodes_dir: str, output_dir: str, scenes: Optional[Sequence[str]] = None
+) -> None:
+    """Compiles the gzipped json episode files (`<scene>.json.gz`) in
+    `episodes_dir` into `output_dir`.
+
+    # Parameters
+
+    episodes_dir : Directory with one `<scene>.json.gz` file per scene.
+    output_dir : Output directory for the compiled dataset.
+    scenes : Scenes to compile (all scenes in `episodes_dir` if `None`).
+    """
+    if scenes is None:
+        scenes = sorted(
+            os.path.basename(path)[: -len(".json.gz")]
+            for path in glob.glob(os.path.join(episodes_dir, "*.json.gz"))
+        )
+    assert len(scenes) > 0, "No episodes found in {}".format(episodes_dir)
+
+    os.makedirs(output_dir, exist_ok=True)
+    if is_compiled_episode_dataset(output_dir):
+        os.remove(os.path.join(output_dir, INDEX_FILE))
+
+    object_types: Dict[str, int] = {}
+    object_ids: Dict[str, int] = {}
+    scene_ranges: Dict[str, List[int]] = {}
+    columns: Dict[str, List[Any]] = {name: [] for name in _ARRAYS}
+    columns["path_offsets"].append(0)
+
+    for scene in scenes:
+        with gzip.GzipFile(os.path.join(episodes_dir, scene + ".json.gz"), "r") as f:
+            episodes = json.loads(f.read().decode("utf-8"))
+
+        start = len(columns["ids"])
+        for episode in episodes:
+            columns["ids"].append(episode["id"])
+            columns["initial_positions"].append(
+                _pos_to_array(episode["initial_position"])
+            )
+            columns["initial_orientations"].append(
+                _rotation_to_float(episode["initial_orientation"])
+            )
+            columns["target_positions"].append(
+                _pos_to_array(episode.get("target_position"))
+            )
+            columns["object_types"].append(
+                object_types.setdefault(episode["object_type"], len(object_types))
+                if "object_type" in episode
+                else -1
+            )
+            columns["object_ids"].append(
+                object_ids.setdefault(episode["object_id"], len(object_ids))
+                if "object_id" in episode
+                else -1
+            )
+            columns["shortest_path_lengths"].append(episode["shortest_path_length"])
+            path = [_pos_to_array(p) for p in episode.get("shortest_path", [])]
+            columns["path_points"].extend(path)
+            columns["path_offsets"].append(columns["path_offsets"][-1] + len(path))
+        scene_ranges[scene] = [start, len(columns["ids"])]
+
+    dtypes = {
+        "ids": str,
+        "initial_positions": np.float64,
+        "initial_orientations": np.float64,
+        "target_positions": np.float64,
+        "object_types": np.int32,
+        "object_ids": np.int32,
+        "shortest_path_lengths": np.float64,
+        "path_offsets": np.int64,
+        "path_points": np.float64,
+    }
+    for name in _ARRAYS:
+        array = np.array(columns[name], dtype=dtypes[name])
+        if name in ["initial_positions", "target_positions", "path_points"]:
+            array = array.reshape(-1, 3)
+        np.save(os.path.join(output_dir, name + ".npy"), array)
+
+    # The index is written last, so that partial compilations are not mistaken
+    # for valid datasets.
+    with open(os.path.join(output_dir, INDEX_FILE), "w") as f:
+        json.dump(
+            {
+                "scenes": scene_ranges,
+                "object_types": list(object_types.keys()),
+                "object_ids": list(object_ids.keys()),
+            },
+            f,
+        )
@@ -5,6 +5,7 @@ import gym
 import numpy as np
 import torch
 from gym.spaces.dict import Dict as SpaceDict
+from torch.nn.utils.rnn import pad_sequence
 
 from core.base_abstractions.preprocessor import Preprocessor
 from utils.cacheless_frcnn import fasterrcnn_resnet50_fpn
@@ -39,55 +40,88 @@ class BatchedFasterRCNN(torch.nn.Module):
         self.maxdets = maxdets
         self.res = res
 
-    def detector_tensor(self, boxes, classes, scores, aspect_ratio=1.0):
-        res, maxdets = self.res, self.maxdets
-        bins = np.array(list(range(res + 1)))[1:-1] / res
-
-        res_classes = torch.zeros(
-            res, res, maxdets, dtype=torch.int64
-        )  # 0 is background
-        res_boxes = -1 * torch.ones(
-            res, res, maxdets, 5
-        )  # regular range is [0, 1] (vert) or [0, aspect_ratio] (horiz)
+    def detector_tensor(self, boxes, classes, scores, valid, aspect_ratio=1.0):
+        """Bin a batch of detections into a `res x res` grid keeping, per cell,
+        the top `maxdets` detections.
 
-        temp = [[[] for _ in range(res)] for _ in range(res)]  # grid of arrays
+        Detections within a cell are ordered (descending) by the tuple
+        `(prob, width, height, x, y, class)`; all images in the batch are
+        processed at once.
 
-        # # TODO Debug
-        # print('NEW IMAGE')
+        # Parameters
 
-        for it in range(classes.shape[0]):
-            cx = (boxes[it, 0].item() + boxes[it, 2].item()) / 2
-            cy = (boxes[it, 1].item() + boxes[it, 3].item()) / 2
+        boxes : `nimgs x ndets x 4` boxes `(x0, y0, x1, y1)` normalized by the image height.
+        classes : `nimgs x ndets` detected classes.
+        scores : `nimgs x ndets` scores of the detected classes.
+        valid : `nimgs x ndets` boolean mask of the (non padding) detections to use.
+        aspect_ratio : Image width divided by image height.
 
-            px = np.digitize(cx, bins=aspect_ratio * bins).item()
-            py = np.digitize(cy, bins=bins).item()
+        # Returns
 
-            temp[py][px].append(
-                (
-                    scores[it][classes[it]].item(),  # prob
-                    (boxes[it, 2] - boxes[it, 0]).item() / aspect_ratio,  # width
-                    (boxes[it, 3] - boxes[it, 1]).item(),  # height
-                    boxes[it, 0].item() / aspect_ratio,  # x
-                    boxes[it, 1].item(),  # y
-                    classes[it].item(),  # class
-                )
-            )
-
-            # # TODO Debug:
-            # print(self.COCO_INSTANCE_CATEGORY_NAMES[classes[it].item()])
+        Tuple with a `nimgs x maxdets x res x res` tensor of classes (0 is
+        background) and a `nimgs x (5 * maxdets) x res x res` tensor of boxes
+        `(prob, width, height, x, y)` (-1 for empty slots).
+        """
+        res, maxdets = self.res, self.maxdets
+        nimgs, ndets = classes.shape[:2]
+        device = boxes.device
+
+        # Replicate the double precision arithmetic of the former per-box implementation
+        bins = (
+            torch.arange(1, res, dtype=torch.float64, device=device) / res
+        )  # inner bin edges
+        cx = (boxes[..., 0].double() + boxes[..., 2].double()) / 2
+        cy = (boxes[..., 1].double() + boxes[..., 3].double()) / 2
+        px = torch.bucketize(cx, aspect_ratio * bins, right=True)
+        py = torch.bucketize(cy, bins, right=True)
+        cells = py * res + px  # nimgs x ndets
+
+        fields = torch.stack(
+            [
+                scores.double(),  # prob
+                (boxes[..., 2] - boxes[..., 0]).double() / aspect_ratio,  # width
+                (boxes[..., 3] - boxes[..., 1]).double(),  # height
+                boxes[..., 0].double() / aspect_ratio,  # x
+                boxes[..., 1].double(),  # y
+                classes.double(),  # class
+            ],
+            dim=-1,
+        )  # nimgs x ndets x 6
+
+        # beats[b, i, j] is True iff detection j precedes detection i in lexicographic
+        # descending order (ties between identical detections broken by index)
+        idx = torch.arange(ndets, device=device)
+        beats = (idx.view(1, 1, -1) < idx.view(1, -1, 1)).expand(nimgs, -1, -1)
+        for field in reversed(range(fields.shape[-1])):
+            fi = fields[:, :, None, field]
+            fj = fields[:, None, :, field]
+            beats = (fj > fi) | ((fj == fi) & beats)
+
+        same_cell = (cells.unsqueeze(2) == cells.unsqueeze(1)) & valid.unsqueeze(1)
+        rank = (beats & same_cell).sum(-1)  # position of each detection in its cell
+        keep = valid & (rank < maxdets)
+
+        slots = (
+            torch.arange(nimgs, device=device).unsqueeze(1) * (res * res) + cells
+        ) * maxdets + rank
+        slots = slots[keep]
 
-        for py in range(res):
-            for px in range(res):
-                order = sorted(temp[py][px], reverse=True)[:maxdets]
-                for it, data in enumerate(order):
-                    res_classes[py, px, it] = data[-1]
-                    res_boxes[py, px, it, :] = torch.tensor(
-                        list(data[:-1])
-                    )  # prob, size, top left
+        res_classes = torch.zeros(
+            nimgs * res * res * maxdets, dtype=torch.int64, device=device
+        )  # 0 is background
+        res_classes[slots] = classes[keep].long()
+        res_boxes = -1 * torch.ones(
+            nimgs * res * res * maxdets, 5, device=device
+        )  # regular range is [0, 1] (vert) or [0, aspect_ratio] (horiz)
+        res_boxes[slots] = fields[keep][:, :5].float()  # prob, size, top left
 
-        res_classes = res_classes.permute(2, 0, 1).unsqueeze(0).contiguous()
+        res_classes = (
+            res_classes.view(nimgs, res, res, maxdets).permute(0, 3, 1, 2).contiguous()
+        )
         res_boxes = (
-            res_boxes.view(res, res, -1).permute(2, 0, 1).unsqueeze(0).contiguous()
+            res_boxes.view(nimgs, res, res, maxdets * 5)
+            .permute(0, 3, 1, 2)
+            .contiguous()
         )
 
         return res_classes, res_boxes
@@ -104,53 +138,38 @@ class BatchedFasterRCNN(torch.nn.Module):
 
             preds = self.model(imglist)
 
-            keeps = [
-                pred["scores"] > self.min_score for pred in preds
-            ]  # already  after nms
+            # Pad the per-image detections into batch tensors
+            lengths = torch.tensor(
+                [pred["scores"].shape[0] for pred in preds], device=imbatch.device
+            )
+            ndets = int(lengths.max().item())
+            valid = torch.arange(ndets, device=imbatch.device).unsqueeze(
+                0
+            ) < lengths.unsqueeze(1)
 
             # [0, 1] for rows, [0, aspect_ratio] for cols (im_in is C x H x W), with all images of same size (batch)
-            all_boxes = [
-                pred["boxes"][keep] / imbatch.shape[-2]
-                for pred, keep in zip(preds, keeps)
-            ]
-            all_classes = [pred["labels"][keep] for pred, keep in zip(preds, keeps)]
-            all_pred_scores = [pred["scores"][keep] for pred, keep in zip(preds, keeps)]
-
-            # hack: fill in a full prob score (all classes, 0 score if undetected) for each box, for backwards compatibility
-            all_scores = [
-                torch.zeros(pred_scores.shape[0], 91, device=pred_scores.device)
-                for pred_scores in all_pred_scores
-            ]
-            all_scores = [
-                torch.where(
-                    torch.arange(91, device=pred_scores.device).unsqueeze(0)
-                    == merged_classes.unsqueeze(1),
-                    pred_scores.unsqueeze(1),
-                    scores,
-                )
-                for merged_classes, pred_scores, scores in zip(
-                    all_classes, all_pred_scores, all_scores
-                )
-            ]
-
-            all_classes_boxes = [
-                self.detector_tensor(
-                    boxes,
-                    classes,
-                    scores,
-                    aspect_ratio=imbatch.shape[-1] / imbatch.shape[-2],
-                )
-                for boxes, classes, scores in zip(all_boxes, all_classes, all_scores)
-            ]
-
-            classes = torch.cat(
-                [classes_boxes[0] for classes_boxes in all_classes_boxes], dim=0
-            ).to(imbatch.device)
-            boxes = torch.cat(
-                [classes_boxes[1] for classes_boxes in all_classes_boxes], dim=0
-            ).to(imbatch.device)
-
-        return classes, boxes
+            all_boxes = (
+                pad_sequence([pred["boxes"] for pred in preds], batch_first=True)
+                / imbatch.shape[-2]
+            )
+            all_classes = pad_sequence(
+                [pred["labels"] for pred in preds], batch_first=True
+            )
+            all_scores = pad_sequence(
+                [pred["scores"] for pred in preds], batch_first=True
+            )
+
+            valid = valid & (all_scores > self.min_score)  # already  after nms
+
+            classes, boxes = self.detector_tensor(
+                all_boxes,
+                all_classes,
+                all_scores,
+                valid,
+                aspect_ratio=imbatch.shape[-1] / imbatch.shape[-2],
+            )
+
+        return classes.to(imbatch.device), boxes.to(imbatch.device)
 
 
 class FasterRCNNPreProcessorRoboThor(Preprocessor):
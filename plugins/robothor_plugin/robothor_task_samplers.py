@@ -1,6 +1,7 @@
 import copy
 import gzip
 import json
+import os
 import random
 from typing import List, Optional, Union, Dict, Any, cast, Tuple
 
@@ -9,8 +10,13 @@ import gym
 from core.base_abstractions.sensor import Sensor
 from core.base_abstractions.task import TaskSampler
 from plugins.robothor_plugin.robothor_environment import RoboThorEnvironment
+from plugins.robothor_plugin.robothor_episode_dataset import (
+    CompiledEpisodeDataset,
+    SceneEpisodes,
+    shuffle_episodes,
+)
 from plugins.robothor_plugin.robothor_tasks import ObjectNavTask, PointNavTask
-from utils.cache_utils import str_to_pos_for_cache
+from utils.cache_utils import str_to_pos_for_cache, GridDistanceCache
 from utils.experiment_utils import set_seed, set_deterministic_cudnn
 from utils.system import get_logger
 
@@ -299,21 +305,25 @@ class ObjectNavDatasetTaskSampler(TaskSampler):
         loop_dataset: bool = True,
         allow_flipping=False,
         env_class=RoboThorEnvironment,
+        compiled_dataset_dir: Optional[str] = None,
         **kwargs,
     ) -> None:
         self.rewards_config = rewards_config
         self.env_args = env_args
         self.scenes = scenes
-        self.episodes = {
-            scene: ObjectNavDatasetTaskSampler.load_dataset(
-                scene, scene_directory + "/episodes"
-            )
-            for scene in scenes
-        }
+        self.episodes = ObjectNavDatasetTaskSampler.load_scene_episodes(
+            scenes, scene_directory, compiled_dataset_dir
+        )
         self.env_class = env_class
-        self.object_types = [
-            ep["object_type"] for scene in self.episodes for ep in self.episodes[scene]
-        ]
+        self.object_types = sorted(
+            set(
+                object_type
+                for scene in self.episodes
+                for object_type in ObjectNavDatasetTaskSampler._episodes_column(
+                    self.episodes[scene], "object_type"
+                )
+            )
+        )
         self.env: Optional[RoboThorEnvironment] = None
         self.sensors = sensors
         self.max_steps = max_steps
@@ -361,6 +371,32 @@ class ObjectNavDatasetTaskSampler(TaskSampler):
         random.shuffle(data)
         return data
 
+    @staticmethod
+    def load_scene_episodes(
+        scenes: List[str], scene_directory: str, compiled_dataset_dir: Optional[str]
+    ) -> Dict[str, Union[List[Dict], SceneEpisodes]]:
+        """Shuffled episodes for each scene, either loaded from the json
+        dataset in `scene_directory` or, if `compiled_dataset_dir` is given,
+        lazily read from the memory-mapped compiled dataset (see
+        `plugins/robothor_plugin/robothor_episode_dataset.py`)."""
+        if compiled_dataset_dir is not None:
+            dataset = CompiledEpisodeDataset(compiled_dataset_dir)
+            return {scene: dataset.scene_episodes(scene) for scene in scenes}
+        return {
+            scene: ObjectNavDatasetTaskSampler.load_dataset(
+                scene, scene_directory + "/episodes"
+            )
+            for scene in scenes
+        }
+
+    @staticmethod
+    def _episodes_column(
+        episodes: Union[List[Dict], SceneEpisodes], key: str
+    ) -> List[str]:
+        if isinstance(episodes, SceneEpisodes):
+            return getattr(episodes, key + "s")()
+        return [ep[key] for ep in episodes]
+
     @staticmethod
     def load_distance_cache_from_file(scene: str, base_directory: str) -> Dict:
         filename = (
@@ -376,6 +412,30 @@ class ObjectNavDatasetTaskSampler(TaskSampler):
         data = json.loads(json_str)
         return data
 
+    @staticmethod
+    def load_grid_distance_cache_from_file(
+        scene: str, base_directory: str, grid_size: float = 0.25
+    ) -> GridDistanceCache:
+        """Array-backed (grid indexed) version of
+        `load_distance_cache_from_file`, to be used with
+        `utils.cache_utils.get_distance` and `get_distance_to_object`."""
+        filename = (
+            "/".join([base_directory, scene])
+            if base_directory[-1] != "/"
+            else "".join([base_directory, scene])
+        )
+        filename += ".json.gz"
+        return GridDistanceCache.from_file(filename, grid_size=grid_size)
+
+    @staticmethod
+    def load_compiled_distance_cache(
+        scene: str, base_directory: str
+    ) -> GridDistanceCache:
+        """Memory-mapped version of `load_grid_distance_cache_from_file`, for
+        distance caches compiled with `GridDistanceCache.save` (e.g. by
+        `plugins/robothor_plugin/scripts/compile_episode_datasets.py`)."""
+        return GridDistanceCache.load(os.path.join(base_directory, scene))
+
     @property
     def __len__(self) -> Union[int, float]:
         """Length.
@@ -426,7 +486,7 @@ class ObjectNavDatasetTaskSampler(TaskSampler):
         if self.episode_index >= len(self.episodes[self.scenes[self.scene_index]]):
             self.scene_index = (self.scene_index + 1) % len(self.scenes)
             # shuffle the new list of episodes to train on
-            random.shuffle(self.episodes[self.scenes[self.scene_index]])
+            shuffle_episodes(self.episodes[self.scenes[self.scene_index]])
             self.episode_index = 0
         scene = self.scenes[self.scene_index]
         episode = self.episodes[scene][self.episode_index]
@@ -437,7 +497,7 @@ class ObjectNavDatasetTaskSampler(TaskSampler):
                 self.env.reset(
                     scene_name=scene,
                     filtered_objects=list(
-                        set([e["object_id"] for e in self.episodes[scene]])
+                        set(self._episodes_column(self.episodes[scene], "object_id"))
                     ),
                 )
         else:
@@ -445,7 +505,7 @@ class ObjectNavDatasetTaskSampler(TaskSampler):
             self.env.reset(
                 scene_name=scene,
                 filtered_objects=list(
-                    set([e["object_id"] for e in self.episodes[scene]])
+                    set(self._episodes_column(self.episodes[scene], "object_id"))
                 ),
             )
         task_info = {"scene": scene, "object_type": episode["object_type"]}
@@ -731,18 +791,16 @@ class PointNavDatasetTaskSampler(TaskSampler):
         shuffle_dataset: bool = True,
         allow_flipping=False,
         env_class=RoboThorEnvironment,
+        compiled_dataset_dir: Optional[str] = None,
         **kwargs,
     ) -> None:
         self.rewards_config = rewards_config
         self.env_args = env_args
         self.scenes = scenes
         self.shuffle_dataset: bool = shuffle_dataset
-        self.episodes = {
-            scene: ObjectNavDatasetTaskSampler.load_dataset(
-                scene, scene_directory + "/episodes"
-            )
-            for scene in scenes
-        }
+        self.episodes = ObjectNavDatasetTaskSampler.load_scene_episodes(
+            scenes, scene_directory, compiled_dataset_dir
+        )
         self.env_class = env_class
         self.env: Optional[RoboThorEnvironment] = None
         self.sensors = sensors
@@ -816,7 +874,7 @@ class PointNavDatasetTaskSampler(TaskSampler):
             self.scene_index = (self.scene_index + 1) % len(self.scenes)
             # shuffle the new list of episodes to train on
             if self.shuffle_dataset:
-                random.shuffle(self.episodes[self.scenes[self.scene_index]])
+                shuffle_episodes(self.episodes[self.scenes[self.scene_index]])
             self.episode_index = 0
 
         scene = self.scenes[self.scene_index]
@@ -4,6 +4,7 @@ from typing import Tuple, List, Dict, Any, Optional, Union, Sequence, cast
 import gym
 import numpy as np
 
+from core.algorithms.onpolicy_sync.vector_sampled_tasks import TASK_TRAIN_INFO_KEY
 from core.base_abstractions.misc import RLStepResult
 from core.base_abstractions.sensor import Sensor
 from core.base_abstractions.task import Task
@@ -175,13 +176,17 @@ class PointNavTask(Task[RoboThorEnvironment]):
         dist2tget = self.dist_to_target()
         spl = self.spl()
 
-        return {
+        metrics = {
             **super(PointNavTask, self).metrics(),
             "success": self._success,  # False also if no path to target
             "total_reward": total_reward,
             "dist_to_target": dist2tget,
             "spl": spl,
         }
+        cache_stats = self.env.distance_cache.pop_stats()
+        if len(cache_stats) > 0:
+            metrics[TASK_TRAIN_INFO_KEY] = cache_stats
+        return metrics
 
 
 class ObjectNavTask(Task[RoboThorEnvironment]):
@@ -387,6 +392,9 @@ class ObjectNavTask(Task[RoboThorEnvironment]):
         }
         if spl >= 0:
             metrics["spl"] = spl
+        cache_stats = self.env.distance_cache.pop_stats()
+        if len(cache_stats) > 0:
+            metrics[TASK_TRAIN_INFO_KEY] = cache_stats
         return metrics
 
     def query_expert(self, end_action_only: bool = False, **kwargs) -> Tuple[int, bool]:
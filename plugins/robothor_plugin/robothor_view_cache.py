@@ -0,0 +1,281 @@
+"""Memory-mapped view caches for `RoboThorMemmapCachedEnvironment`.
+
+Each scene is stored in its own directory containing:
+
+* `index.json`: scene name, position keys (in `pos_to_str_for_cache` format),
+    rotations and the shape of the stored frames.
+* `views.npy`: `npositions x nrotations` int32 array with the row of each view
+    in the data arrays (-1 for missing views).
+* `frames.npy`: `nviews x height x width x 3` uint8 RGB frames.
+* `depth.npy`: `nviews x height x width` float32 depth frames (optional).
+* `metadata.bin` and `metadata_offsets.npy`: concatenated JSON-encoded event
+    metadata and the `nviews + 1` byte offsets delimiting each view.
+
+All arrays are opened with `mmap_mode="r"`, so all processes in a machine
+share a single page-cached copy of each scene and only the views actually
+visited are read from disk. Metadata is decoded only when requested.
+"""
+import json
+import os
+import pickle
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from utils.cache_utils import str_to_pos_for_cache
+
+INDEX_FILE = "index.json"
+
+
+class CachedEvent(object):
+    """Minimal stand-in for `ai2thor.server.Event` backed by a
+    `MemmapViewCache`.
+
+    # Attributes
+
+    frame : RGB frame (read-only memory map).
+    depth_frame : Depth frame (read-only memory map) or `None`.
+    """
+
+    def __init__(self, view_cache: "MemmapViewCache", row: int):
+        self._view_cache = view_cache
+        self._row = row
+        self._metadata: Optional[Dict[str, Any]] = None
+
+    @property
+    def frame(self) -> np.ndarray:
+        return self._view_cache.frames[self._row]
+
+    @property
+    def depth_frame(self) -> Optional[np.ndarray]:
+        if self._view_cache.depth is None:
+            return None
+        return self._view_cache.depth[self._row]
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            self._metadata = self._view_cache.metadata(self._row)
+        return self._metadata
+
+
+class _PositionViews(object):
+    def __init__(self, view_cache: "MemmapViewCache", position_index: int):
+        self._view_cache = view_cache
+        self._position_index = position_index
+
+    def keys(self) -> List[float]:
+        views = self._view_cache.views[self._position_index]
+        return [rot for rot, row in zip(self._view_cache.rotations, views) if row >= 0]
+
+    def __contains__(self, rotation: float) -> bool:
+        return self._view_cache.row(self._position_index, rotation) is not None
+
+    def __getitem__(self, rotation: float) -> CachedEvent:
+        row = self._view_cache.row(self._position_index, rotation)
+        if row is None:
+            raise KeyError(rotation)
+        return self._view_cache.event(row)
+
+
+class MemmapViewCache(object):
+    """Read-only view cache for a scene stored in the memory-mapped format.
+
+    Behaves like the `position_str -> rotation -> event` dictionaries of the
+    pickled view caches (`view_cache[position][rotation]` returns a
+    `CachedEvent`), and additionally exposes the underlying arrays. The
+    events of the `max_cached_events` most recently visited views are kept,
+    so revisiting a view (e.g. rotating in place) reuses its event and its
+    decoded metadata.
+
+    # Attributes
+
+    scene_name : Name of the scene.
+    position_keys : Reachable positions in `pos_to_str_for_cache` format.
+    rotations : Rotations available for each position.
+    views : `npositions x nrotations` array of data rows (-1 if missing).
+    frames : Memory-mapped RGB frames.
+    depth : Memory-mapped depth frames (or `None`).
+    max_cached_events : Maximum number of events kept in memory.
+    """
+
+    def __init__(self, scene_dir: str, max_cached_events: int = 16):
+        with open(os.path.join(scene_dir, INDEX_FILE), "r") as f:
+            index = json.load(f)
+
+        self.scene_dir = scene_dir
+        self.scene_name: str = index["scene_name"]
+        self.position_keys: List[str] = index["positions"]
+        self.rotations: List[float] = [float(r) for r in index["rotations"]]
+
+        self._position_index = {key: it for it, key in enumerate(self.position_keys)}
+        self._rotation_index = {rot: it for it, rot in enumerate(self.rotations)}
+        self._reachable_points: Optional[List[Dict[str, float]]] = None
+        self.max_cached_events = max_cached_events
+        self._events: "OrderedDict[int, CachedEvent]" = OrderedDict()
+
+        self.views = np.load(os.path.join(scene_dir, "views.npy"))
+        self.frames = np.load(os.path.join(scene_dir, "frames.npy"), mmap_mode="r")
+        depth_path = os.path.join(scene_dir, "depth.npy")
+        self.depth = (
+            np.load(depth_path, mmap_mode="r") if os.path.exists(depth_path) else None
+        )
+        self._metadata_offsets = np.load(
+            os.path.join(scene_dir, "metadata_offsets.npy")
+        )
+        self._metadata_bytes = np.memmap(
+            os.path.join(scene_dir, "metadata.bin"), dtype=np.uint8, mode="r"
+        )
+
+    def __len__(self) -> int:
+        return len(self.position_keys)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.position_keys)
+
+    def __contains__(self, position: str) -> bool:
+        return position in self._position_index
+
+    def __getitem__(self, position: str) -> _PositionViews:
+        return _PositionViews(self, self._position_index[position])
+
+    def keys(self) -> List[str]:
+        return self.position_keys
+
+    def row(self, position_index: int, rotation: float) -> Optional[int]:
+        rotation_index = self._rotation_index.get(float(rotation))
+        if rotation_index is None:
+            return None
+        row = int(self.views[position_index, rotation_index])
+        return row if row >= 0 else None
+
+    def view_row(self, position: str, rotation: float) -> int:
+        row = self.row(self._position_index[position], rotation)
+        if row is None:
+            raise KeyError((position, rotation))
+        return row
+
+    def event(self, row: int) -> CachedEvent:
+        event = self._events.get(row)
+        if event is not None:
+            self._events.move_to_end(row)
+            return event
+
+        event = CachedEvent(self, row)
+        self._events[row] = event
+        if len(self._events) > self.max_cached_events:
+            self._events.popitem(last=False)
+        return event
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        start, end = self._metadata_offsets[row], self._metadata_offsets[row + 1]
+        return json.loads(self._metadata_bytes[start:end].tobytes().decode("utf-8"))
+
+    @property
+    def reachable_points(self) -> List[Dict[str, float]]:
+        if self._reachable_points is None:
+            self._reachable_points = [
+                str_to_pos_for_cache(pos) for pos in self.position_keys
+            ]
+        return self._reachable_points
+
+
+def is_memmap_view_cache(scene_dir: str) -> bool:
+    return os.path.exists(os.path.join(scene_dir, INDEX_FILE))
+
+
+def convert_view_cache(
+    view_cache: Dict[str, Dict[float, Any]], scene_dir: str, include_depth: bool = True
+) -> None:
+    """Writes a (pickled) `position_str -> rotation -> event` view cache to
+    `scene_dir` in the memory-mapped format.
+
+    # Parameters
+
+    view_cache : The view cache, as loaded from the pickle files used by
+        `RoboThorCachedEnvironment`.
+    scene_dir : Output directory.
+    include_depth : Whether to store depth frames (only if present in all views).
+    """
+    os.makedirs(scene_dir, exist_ok=True)
+    if is_memmap_view_cache(scene_dir):
+        os.remove(os.path.join(scene_dir, INDEX_FILE))
+
+    position_keys = list(view_cache.keys())
+    rotations = sorted(
+        {float(rot) for views in view_cache.values() for rot in views.keys()}
+    )
+    rotation_index = {rot: it for it, rot in enumerate(rotations)}
+
+    events = []
+    views = np.full((len(position_keys), len(rotations)), -1, dtype=np.int32)
+    for pit, pos in enumerate(position_keys):
+        for rot, event in view_cache[pos].items():
+            views[pit, rotation_index[float(rot)]] = len(events)
+            events.append(event)
+    assert len(events) > 0, "Empty view cache"
+
+    frame_shape = events[0].frame.shape
+    frames = np.lib.format.open_memmap(
+        os.path.join(scene_dir, "frames.npy"),
+        mode="w+",
+        dtype=np.uint8,
+        shape=(len(events),) + frame_shape,
+    )
+    for it, event in enumerate(events):
+        frames[it] = event.frame
+    frames.flush()
+    del frames
+
+    depth_path = os.path.join(scene_dir, "depth.npy")
+    if include_depth and all(
+        getattr(event, "depth_frame", None) is not None for event in events
+    ):
+        depth = np.lib.format.open_memmap(
+            depth_path,
+            mode="w+",
+            dtype=np.float32,
+            shape=(len(events),) + events[0].depth_frame.shape,
+        )
+        for it, event in enumerate(events):
+            depth[it] = event.depth_frame
+        depth.flush()
+        del depth
+    elif os.path.exists(depth_path):
+        os.remove(depth_path)
+
+    offsets = np.zeros((len(events) + 1,), dtype=np.int64)
+    with open(os.path.join(scene_dir, "metadata.bin"), "wb") as f:
+        for it, event in enumerate(events):
+            encoded = json.dumps(event.metadata).encode("utf-8")
+            f.write(encoded)
+            offsets[it + 1] = offsets[it] + len(encoded)
+    np.save(os.path.join(scene_dir, "metadata_offsets.npy"), offsets)
+    np.save(os.path.join(scene_dir, "views.npy"), views)
+
+    # The index is written last, so that partial conversions are not mistaken
+    # for valid view caches.
+    with open(os.path.join(scene_dir, INDEX_FILE), "w") as f:
+        json.dump(
+            {
+                "scene_name": events[0].metadata["sceneName"],
+                "positions": position_keys,
+                "rotations": rotations,
+                "frame_shape": list(frame_shape),
+            },
+            f,
+        )
+
+
+def convert_pickled_view_cache(
+    pickle_path: str, output_dir: str, include_depth: bool = True
+) -> str:
+    """Converts a pickled view cache into a `<output_dir>/<scene>` directory
+    in the memory-mapped format and returns the path to that directory."""
+    with open(pickle_path, "rb") as f:
+        view_cache = pickle.load(f)
+    scene = os.path.splitext(os.path.basename(pickle_path))[0]
+    scene_dir = os.path.join(output_dir, scene)
+    convert_view_cache(view_cache, scene_dir, include_depth=include_depth)
+    return scene_dir
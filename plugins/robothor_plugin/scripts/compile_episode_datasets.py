@@ -0,0 +1,48 @@
+import glob
+import os
+from typing import Optional
+
+from constants import ABS_PATH_OF_TOP_LEVEL_DIR
+from plugins.robothor_plugin.robothor_episode_dataset import compile_episode_dataset
+from utils.cache_utils import GridDistanceCache
+from utils.system import get_logger
+
+
+def compile_dataset(
+    scene_directory: str,
+    output_dir: str,
+    distance_cache_dir: Optional[str] = None,
+    grid_size: float = 0.25,
+):
+    """Compiles the episodes in `<scene_directory>/episodes` (and, optionally,
+    the distance caches in `distance_cache_dir`) into the memory-mapped formats
+    read by the RoboTHOR dataset task samplers.
+
+    Episodes are written to `<output_dir>/episodes` (to be passed as
+    `compiled_dataset_dir` to the task samplers) and distance caches to
+    `<output_dir>/distance_caches/<scene>` (to be loaded with
+    `ObjectNavDatasetTaskSampler.load_compiled_distance_cache`).
+    """
+    episodes_out = os.path.join(output_dir, "episodes")
+    compile_episode_dataset(os.path.join(scene_directory, "episodes"), episodes_out)
+    get_logger().info("Compiled episodes to {}".format(episodes_out))
+
+    if distance_cache_dir is not None:
+        for path in sorted(glob.glob(os.path.join(distance_cache_dir, "*.json.gz"))):
+            scene = os.path.basename(path)[: -len(".json.gz")]
+            cache_out = os.path.join(output_dir, "distance_caches", scene)
+            GridDistanceCache.from_file(path, grid_size=grid_size).save(cache_out)
+            get_logger().info("Compiled {} to {}".format(path, cache_out))
+
+
+if __name__ == "__main__":
+    for DATASET in ["robothor-objectnav", "robothor-pointnav"]:
+        for SPLIT in ["train", "val"]:
+            compile_dataset(
+                scene_directory=os.path.join(
+                    ABS_PATH_OF_TOP_LEVEL_DIR, "datasets", DATASET, SPLIT
+                ),
+                output_dir=os.path.join(
+                    ABS_PATH_OF_TOP_LEVEL_DIR, "datasets", DATASET, SPLIT, "compiled"
+                ),
+            )
@@ -0,0 +1,27 @@
+import glob
+import os
+
+from constants import ABS_PATH_OF_TOP_LEVEL_DIR
+from plugins.robothor_plugin.robothor_view_cache import convert_pickled_view_cache
+from utils.system import get_logger
+
+
+def convert_view_caches(pickle_dir: str, output_dir: str, include_depth: bool = True):
+    """Converts all pickled view caches (`<scene>.pkl`) in `pickle_dir` to the
+    memory-mapped format used by `RoboThorMemmapCachedEnvironment`."""
+    pickle_paths = sorted(glob.glob(os.path.join(pickle_dir, "*.pkl")))
+    assert len(pickle_paths) > 0, "No view caches found in {}".format(pickle_dir)
+    for pickle_path in pickle_paths:
+        scene_dir = convert_pickled_view_cache(
+            pickle_path, output_dir, include_depth=include_depth
+        )
+        get_logger().info("Converted {} to {}".format(pickle_path, scene_dir))
+
+
+if __name__ == "__main__":
+    PICKLE_DIR = os.path.join(ABS_PATH_OF_TOP_LEVEL_DIR, "datasets", "robothor-cache")
+    OUTPUT_DIR = os.path.join(
+        ABS_PATH_OF_TOP_LEVEL_DIR, "datasets", "robothor-cache-memmap"
+    )
+
+    convert_view_caches(pickle_dir=PICKLE_DIR, output_dir=OUTPUT_DIR)
@@ -0,0 +1,103 @@
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+from constants import ABS_PATH_OF_TOP_LEVEL_DIR
+from plugins.robothor_plugin.robothor_distance_fields import (
+    compute_scene_distance_fields,
+    distance_fields_path,
+)
+from plugins.robothor_plugin.robothor_environment import RoboThorEnvironment
+from plugins.robothor_plugin.robothor_task_samplers import ObjectNavDatasetTaskSampler
+from utils.system import get_logger
+
+
+def make_scene_distance_fields(
+    env: RoboThorEnvironment,
+    scene: str,
+    output_dir: str,
+    object_types: Optional[Sequence[str]] = None,
+    dataset_dir: Optional[str] = None,
+    grid_size: float = 0.25,
+):
+    """Computes and saves the distance fields for the object types (and,
+    optionally, the point goals in a dataset) of a scene.
+
+    # Parameters
+
+    env : Environment used to obtain the reachable points and object positions.
+    scene : Scene to process.
+    output_dir : Directory where `<scene>.npz` will be written.
+    object_types : Object types to include (all object types in the scene if `None`).
+    dataset_dir : Optional directory with `<scene>.json.gz` episodes whose
+        `target_position`s will be included as point goals.
+    grid_size : Size of the grid of reachable points.
+    """
+    env.reset(scene_name=scene)
+
+    object_positions: Dict[str, List[Dict[str, float]]] = defaultdict(list)
+    for obj in env.all_objects():
+        if object_types is None or obj["objectType"] in object_types:
+            object_positions[obj["objectType"]].append(obj["position"])
+
+    point_targets: List[Dict[str, float]] = []
+    if dataset_dir is not None:
+        episodes = ObjectNavDatasetTaskSampler.load_dataset(
+            scene=scene, base_directory=dataset_dir
+        )
+        point_targets = [
+            ep["target_position"] for ep in episodes if "target_position" in ep
+        ]
+
+    fields = compute_scene_distance_fields(
+        reachable_points=env.currently_reachable_points,
+        object_positions=object_positions,
+        point_targets=point_targets,
+        grid_size=grid_size,
+    )
+    path = distance_fields_path(output_dir, scene)
+    fields.save(path)
+    get_logger().info(
+        "Saved {} distance fields for {} to {}".format(
+            len(fields.target_keys), scene, path
+        )
+    )
+
+
+if __name__ == "__main__":
+    SCENES = [
+        "FloorPlan_Train{}_{}".format(i, j) for i in range(1, 13) for j in range(1, 6)
+    ]
+    OBJECT_TYPES = [
+        "AlarmClock",
+        "Apple",
+        "BaseballBat",
+        "BasketBall",
+        "Bowl",
+        "GarbageCan",
+        "HousePlant",
+        "Laptop",
+        "Mug",
+        "SprayBottle",
+        "Television",
+        "Vase",
+    ]
+    DATASET_DIR = os.path.join(
+        ABS_PATH_OF_TOP_LEVEL_DIR, "datasets", "robothor-pointnav", "train", "episodes"
+    )
+    OUTPUT_DIR = os.path.join(
+        ABS_PATH_OF_TOP_LEVEL_DIR, "datasets", "robothor-distance-fields", "train"
+    )
+
+    env = RoboThorEnvironment(rotateStepDegrees=30.0, gridSize=0.25)
+    try:
+        for scene in SCENES:
+            make_scene_distance_fields(
+                env=env,
+                scene=scene,
+                output_dir=OUTPUT_DIR,
+                object_types=OBJECT_TYPES,
+                dataset_dir=DATASET_DIR,
+            )
+    finally:
+        env.stop()
@@ -0,0 +1,158 @@
+"""Experiment config training PPO on synthetic tasks, to measure the
+framework's overheads (sampler processes, observation transfer, rollout
+storage, engine) without a simulator.
+
+Observations, episode lengths and step and reset latencies are set by the
+class attributes below, which subclasses override to model other workloads.
+"""
+from typing import Any, Dict, List, Optional
+
+import gym
+import numpy as np
+from torch import nn, optim
+
+from core.algorithms.onpolicy_sync.losses.ppo import PPO, PPOConfig
+from core.base_abstractions.experiment_config import ExperimentConfig
+from core.base_abstractions.sensor import Sensor, SensorSuite
+from core.base_abstractions.task import TaskSampler
+from plugins.synthetic_plugin.synthetic_environment import StepLatency
+from plugins.synthetic_plugin.synthetic_models import SyntheticPooledRNNActorCritic
+from plugins.synthetic_plugin.synthetic_sensors import make_synthetic_image_sensors
+from plugins.synthetic_plugin.synthetic_tasks import SyntheticTaskSampler
+from utils.experiment_utils import Builder, PipelineStage, TrainingPipeline
+
+
+class SyntheticBaseExperimentConfig(ExperimentConfig):
+    """Single 64x64 RGB observation, 1ms steps and 10ms resets."""
+
+    NUM_SENSORS = 1
+    IMAGE_SIZE = 64
+    CHANNELS = 3
+    DTYPE: Any = np.uint8
+
+    NUM_ACTIONS = 4
+    MIN_EPISODE_LENGTH = 50
+    MAX_EPISODE_LENGTH = 150
+    MAX_STEPS = 500
+
+    STEP_LATENCY: Optional[StepLatency] = StepLatency(mean=0.001)
+    RESET_LATENCY: Optional[StepLatency] = StepLatency(mean=0.01)
+    BUSY_WAIT = False
+
+    NUM_TRAIN_SAMPLERS = 8
+    NUM_TEST_SAMPLERS = 2
+    NUM_TEST_TASKS_PER_SAMPLER = 10
+
+    TOTAL_STEPS = int(2e5)
+
+    @classmethod
+    def tag(cls) -> str:
+        return "SyntheticBase"
+
+    @classmethod
+    def sensors(cls) -> List[Sensor]:
+        return make_synthetic_image_sensors(
+            num_sensors=cls.NUM_SENSORS,
+            height=cls.IMAGE_SIZE,
+            width=cls.IMAGE_SIZE,
+            channels=cls.CHANNELS,
+            dtype=cls.DTYPE,
+        )
+
+    @classmethod
+    def training_pipeline(cls, **kwargs) -> TrainingPipeline:
+        return TrainingPipeline(
+            named_losses=dict(ppo_loss=PPO(**PPOConfig)),  # type:ignore
+            pipeline_stages=[
+                PipelineStage(loss_names=["ppo_loss"], max_stage_steps=cls.TOTAL_STEPS)
+            ],
+            optimizer_builder=Builder(optim.Adam, dict(lr=3e-4)),
+            num_mini_batch=1,
+            update_repeats=4,
+            max_grad_norm=0.5,
+            num_steps=64,
+            gamma=0.99,
+            use_gae=True,
+            gae_lambda=0.95,
+            advance_scene_rollout_period=None,
+            save_interval=cls.TOTAL_STEPS // 4,
+            metric_accumulate_interval=10000,
+        )
+
+    @classmethod
+    def machine_params(cls, mode="train", **kwargs) -> Dict[str, Any]:
+        return {
+            "nprocesses": cls.NUM_TRAIN_SAMPLERS
+            if mode == "train"
+            else (cls.NUM_TEST_SAMPLERS if mode == "test" else 0),
+            "devices": [],
+        }
+
+    @classmethod
+    def create_model(cls, **kwargs) -> nn.Module:
+        sensors = cls.sensors()
+        return SyntheticPooledRNNActorCritic(
+            input_uuids=[sensor.uuid for sensor in sensors],
+            action_space=gym.spaces.Discrete(cls.NUM_ACTIONS),
+            observation_space=SensorSuite(sensors).observation_spaces,
+        )
+
+    @classmethod
+    def make_sampler_fn(cls, **kwargs) -> TaskSampler:
+        return SyntheticTaskSampler(**kwargs)
+
+    def _get_sampler_args(
+        self, process_ind: int, mode: str, seeds: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        if mode == "train":
+            max_tasks = None
+            seed = seeds[process_ind] if seeds is not None else process_ind
+        else:
+            # Fixed seeds so that every evaluation runs the same episodes
+            max_tasks = self.NUM_TEST_TASKS_PER_SAMPLER
+            seed = 10 ** 6 + process_ind
+
+        return dict(
+            sensors=self.sensors(),
+            max_steps=self.MAX_STEPS,
+            num_actions=self.NUM_ACTIONS,
+            min_episode_length=self.MIN_EPISODE_LENGTH,
+            max_episode_length=self.MAX_EPISODE_LENGTH,
+            step_latency=self.STEP_LATENCY,
+            reset_latency=self.RESET_LATENCY,
+            busy_wait=self.BUSY_WAIT,
+            max_tasks=max_tasks,
+            seed=seed,
+        )
+
+    def train_task_sampler_args(
+        self,
+        process_ind: int,
+        total_processes: int,
+        devices: Optional[List[int]] = None,
+        seeds: Optional[List[int]] = None,
+        deterministic_cudnn: bool = False,
+    ) -> Dict[str, Any]:
+        return self._get_sampler_args(
+            process_ind=process_ind, mode="train", seeds=seeds
+        )
+
+    def valid_task_sampler_args(
+        self,
+        process_ind: int,
+        total_processes: int,
+        devices: Optional[List[int]] = None,
+        seeds: Optional[List[int]] = None,
+        deterministic_cudnn: bool = False,
+    ) -> Dict[str, Any]:
+        return self._get_sampler_args(process_ind=process_ind, mode="valid")
+
+    def test_task_sampler_args(
+        self,
+        process_ind: int,
+        total_processes: int,
+        devices: Optional[List[int]] = None,
+        seeds: Optional[List[int]] = None,
+        deterministic_cudnn: bool = False,
+    ) -> Dict[str, Any]:
+        return self._get_sampler_args(process_ind=process_ind, mode="test")
@@ -0,0 +1,44 @@
+"""Experiment config with simulator-sized observations (224x224 RGB and
+depth) and lognormal step latencies around 10ms."""
+from typing import List
+
+import numpy as np
+
+from core.base_abstractions.sensor import Sensor
+from plugins.synthetic_plugin.configs.synthetic_base import (
+    SyntheticBaseExperimentConfig,
+)
+from plugins.synthetic_plugin.synthetic_environment import StepLatency
+from plugins.synthetic_plugin.synthetic_sensors import SyntheticImageSensor
+
+
+class SyntheticLargeImagesExperimentConfig(SyntheticBaseExperimentConfig):
+    IMAGE_SIZE = 224
+
+    STEP_LATENCY = StepLatency(mean=0.01, distribution="lognormal", sigma=0.5)
+    RESET_LATENCY = StepLatency(mean=0.2, distribution="lognormal", sigma=0.5)
+
+    @classmethod
+    def tag(cls) -> str:
+        return "SyntheticLargeImages"
+
+    @classmethod
+    def sensors(cls) -> List[Sensor]:
+        return [
+            SyntheticImageSensor(
+                height=cls.IMAGE_SIZE,
+                width=cls.IMAGE_SIZE,
+                channels=3,
+                dtype=np.uint8,
+                seed=0,
+                uuid="synthetic_rgb",
+            ),
+            SyntheticImageSensor(
+                height=cls.IMAGE_SIZE,
+                width=cls.IMAGE_SIZE,
+                channels=1,
+                dtype=np.float32,
+                seed=1,
+                uuid="synthetic_depth",
+            ),
+        ]
@@ -0,0 +1,38 @@
+"""Experiment config with heavy-tailed stragglers: 1% of steps take at least
+20x the (5ms) mean latency, with a Pareto tail of shape 1.2, and episode
+lengths vary widely.
+
+Training task samplers are seeded from the trainer's seed, so runs with
+the same seed see the same stragglers at the same steps.
+"""
+from plugins.synthetic_plugin.configs.synthetic_base import (
+    SyntheticBaseExperimentConfig,
+)
+from plugins.synthetic_plugin.synthetic_environment import StepLatency
+
+
+class SyntheticStragglersExperimentConfig(SyntheticBaseExperimentConfig):
+    MIN_EPISODE_LENGTH = 10
+    MAX_EPISODE_LENGTH = 400
+
+    STEP_LATENCY = StepLatency(
+        mean=0.005,
+        distribution="exponential",
+        straggler_prob=0.01,
+        straggler_scale=20.0,
+        straggler_shape=1.2,
+        max_latency=2.0,
+    )
+    RESET_LATENCY = StepLatency(
+        mean=0.05,
+        distribution="lognormal",
+        sigma=1.0,
+        straggler_prob=0.05,
+        straggler_scale=10.0,
+        straggler_shape=1.5,
+        max_latency=5.0,
+    )
+
+    @classmethod
+    def tag(cls) -> str:
+        return "SyntheticStragglers"
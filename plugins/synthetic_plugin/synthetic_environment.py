@@ -0,0 +1,178 @@
+"""A simulator stand-in whose step and reset costs are drawn from
+configurable (and seeded) latency distributions."""
+import math
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class StepLatency(object):
+    """Distribution of the seconds taken by a (simulated) environment step or
+    reset.
+
+    Regular latencies follow `distribution`. With probability `straggler_prob`, a
+    step is instead a straggler taking `mean * straggler_scale * (1 + X)` seconds, with
+    `X` drawn from a Lomax (Pareto II) distribution of shape `straggler_shape`. This
+    gives a heavy tail (the smaller the shape, the heavier the tail), capped at
+    `max_latency` seconds.
+
+    # Attributes
+
+    mean : Mean latency (in seconds) of regular steps.
+    distribution : One of `"constant"`, `"uniform"` (in `[0, 2 * mean]`), `"exponential"`
+        or `"lognormal"`.
+    sigma : Standard deviation of the log of `"lognormal"` latencies.
+    straggler_prob : Probability of a step being a straggler.
+    straggler_scale : Minimum straggler latency, as a multiple of `mean`.
+    straggler_shape : Shape of the straggler tail.
+    max_latency : Maximum latency (in seconds).
+    """
+
+    DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+
+    def __init__(
+        self,
+        mean: float,
+        distribution: str = "constant",
+        sigma: float = 0.5,
+        straggler_prob: float = 0.0,
+        straggler_scale: float = 10.0,
+        straggler_shape: float = 1.5,
+        max_latency: float = 10.0,
+    ):
+        assert mean >= 0, "`mean` must be non-negative."
+        assert (
+            distribution in self.DISTRIBUTIONS
+        ), "`distribution` must be one of {}.".format(self.DISTRIBUTIONS)
+        assert 0 <= straggler_prob <= 1, "`straggler_prob` must be in [0, 1]."
+        assert straggler_shape > 0, "`straggler_shape` must be positive."
+
+        self.mean = mean
+        self.distribution = distribution
+        self.sigma = sigma
+        self.straggler_prob = straggler_prob
+        self.straggler_scale = straggler_scale
+        self.straggler_shape = straggler_shape
+        self.max_latency = max_latency
+
+    def sample(self, rng: np.random.RandomState) -> Tuple[float, bool]:
+        """Draws a latency (in seconds) and whether it is a straggler's.
+
+        The same number of random values is drawn regardless of the
+        outcome, so the sequence of latencies only depends on the initial
+        state of `rng`.
+        """
+        uniform, straggler_draw, tail = rng.random_sample(3)
+        normal = rng.standard_normal()
+
+        if self.distribution == "constant":
+            latency = self.mean
+        elif self.distribution == "uniform":
+            latency = 2 * self.mean * uniform
+        elif self.distribution == "exponential":
+            latency = -self.mean * math.log1p(-uniform)
+        else:
+            mu = math.log(max(self.mean, 1e-12)) - self.sigma ** 2 / 2
+            latency = math.exp(mu + self.sigma * normal)
+
+        is_straggler = bool(straggler_draw < self.straggler_prob)
+        if is_straggler:
+            # Lomax sample by inversion of its CDF
+            lomax = (1 - tail) ** (-1 / self.straggler_shape) - 1
+            latency = self.mean * self.straggler_scale * (1 + lomax)
+
+        return min(latency, self.max_latency), is_straggler
+
+    def __repr__(self) -> str:
+        return "StepLatency(mean={}, distribution={}, straggler_prob={})".format(
+            self.mean, self.distribution, self.straggler_prob
+        )
+
+
+def wait(seconds: float, busy: bool = False) -> None:
+    """Waits for `seconds` either sleeping (as when waiting on a renderer or
+    another process) or spinning the CPU (as a simulator computing in this
+    process would)."""
+    if seconds <= 0:
+        return
+    if not busy:
+        time.sleep(seconds)
+        return
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class SyntheticEnvironment(object):
+    """Environment whose episodes last between `min_episode_length` and
+    `max_episode_length` steps and whose steps and resets take time drawn from
+    `step_latency` and `reset_latency`.
+
+    All randomness comes from generators seeded in `set_seed`, so two
+    environments with the same seed produce the same episode lengths and
+    latencies (and, in particular, the same stragglers).
+    """
+
+    def __init__(
+        self,
+        min_episode_length: int,
+        max_episode_length: int,
+        step_latency: Optional[StepLatency] = None,
+        reset_latency: Optional[StepLatency] = None,
+        busy_wait: bool = False,
+        seed: Optional[int] = None,
+    ):
+        assert (
+            1 <= min_episode_length <= max_episode_length
+        ), "Episode lengths must satisfy `1 <= min_episode_length <= max_episode_length`."
+
+        self.min_episode_length = min_episode_length
+        self.max_episode_length = max_episode_length
+        self.step_latency = step_latency
+        self.reset_latency = reset_latency
+        self.busy_wait = busy_wait
+
+        self.episode_length = min_episode_length
+        self.num_steps = 0
+        self.last_latency = 0.0
+        self.total_latency = 0.0
+        self.num_stragglers = 0
+
+        self._rng: Optional[np.random.RandomState] = None
+        self._latency_rng: Optional[np.random.RandomState] = None
+        self.set_seed(seed if seed is not None else np.random.randint(0, 2 ** 31 - 1))
+
+    def set_seed(self, seed: int) -> None:
+        # Latencies are drawn from their own generator so they do not depend on how many
+        # episodes were sampled (and vice versa)
+        self._rng = np.random.RandomState(seed)
+        self._latency_rng = np.random.RandomState([seed, 1])
+
+    def _sample_latency(self, latency: Optional[StepLatency]) -> Tuple[float, bool]:
+        if latency is None:
+            return 0.0, False
+        return latency.sample(self._latency_rng)
+
+    def reset(self) -> None:
+        wait(self._sample_latency(self.reset_latency)[0], busy=self.busy_wait)
+
+        self.episode_length = int(
+            self._rng.randint(self.min_episode_length, self.max_episode_length + 1)
+        )
+        self.num_steps = 0
+        self.last_latency = 0.0
+        self.total_latency = 0.0
+        self.num_stragglers = 0
+
+    def step(self, action: int) -> None:
+        self.last_latency, is_straggler = self._sample_latency(self.step_latency)
+        wait(self.last_latency, busy=self.busy_wait)
+
+        self.num_steps += 1
+        self.total_latency += self.last_latency
+        self.num_stragglers += int(is_straggler)
+
+    @property
+    def episode_finished(self) -> bool:
+        return self.num_steps >= self.episode_length
@@ -0,0 +1,121 @@
+from typing import Dict, Optional, Sequence, Tuple, cast
+
+import gym
+import numpy as np
+import torch
+from gym.spaces.dict import Dict as SpaceDict
+from torch import nn
+from torch.nn import functional as F
+
+from core.algorithms.onpolicy_sync.policy import ActorCriticModel, DistributionType
+from core.base_abstractions.distributions import CategoricalDistr
+from core.base_abstractions.misc import ActorCriticOutput, Memory
+from core.models.basic_models import RNNStateEncoder
+
+
+class SyntheticPooledRNNActorCritic(ActorCriticModel[CategoricalDistr]):
+    """Average pools each image observation down to `pooled_size x
+    pooled_size`, embeds the concatenated result and feeds it to a GRU
+    followed by linear actor and critic heads.
+
+    The model is deliberately cheap, so that training time is dominated by
+    moving and storing the (possibly large) observations.
+    """
+
+    def __init__(
+        self,
+        input_uuids: Sequence[str],
+        action_space: gym.spaces.Discrete,
+        observation_space: SpaceDict,
+        pooled_size: int = 4,
+        hidden_size: int = 128,
+    ):
+        super().__init__(action_space=action_space, observation_space=observation_space)
+
+        self.input_uuids = list(input_uuids)
+        self.pooled_size = pooled_size
+        self.hidden_size = hidden_size
+
+        self._scales: Dict[str, float] = {}
+        in_dim = 0
+        for uuid in self.input_uuids:
+            assert (
+                uuid in observation_space.spaces
+            ), "Missing observation space for {}".format(uuid)
+            box_space: gym.spaces.Box = observation_space[uuid]
+            assert (
+                len(box_space.shape) == 3
+            ), "SyntheticPooledRNNActorCritic expects [height, width, channels] inputs."
+            in_dim += box_space.shape[2] * pooled_size * pooled_size
+            # Integer images are rescaled to [0, 1]
+            self._scales[uuid] = (
+                1.0 / float(box_space.high.max())
+                if np.issubdtype(box_space.dtype, np.integer)
+                else 1.0
+            )
+
+        self.embedding = nn.Sequential(nn.Linear(in_dim, hidden_size), nn.ReLU())
+        self.state_encoder = RNNStateEncoder(
+            input_size=hidden_size, hidden_size=hidden_size
+        )
+        self.actor = nn.Linear(hidden_size, action_space.n)
+        self.critic = nn.Linear(hidden_size, 1)
+
+        self.memory_key = "rnn"
+
+    @property
+    def recurrent_hidden_state_size(self) -> int:
+        return self.hidden_size
+
+    @property
+    def num_recurrent_layers(self) -> int:
+        return self.state_encoder.num_recurrent_layers
+
+    def _recurrent_memory_specification(self):
+        return {
+            self.memory_key: (
+                (
+                    ("layer", self.num_recurrent_layers),
+                    ("sampler", None),
+                    ("hidden", self.recurrent_hidden_state_size),
+                ),
+                torch.float32,
+            )
+        }
+
+    def _pool(self, uuid: str, images: torch.Tensor) -> torch.Tensor:
+        # [step, sampler, height, width, channels] -> [step * sampler, channels, height, width]
+        nsteps, nsamplers = images.shape[:2]
+        images = images.reshape(-1, *images.shape[2:]).permute(0, 3, 1, 2).float()
+        pooled = F.adaptive_avg_pool2d(images, self.pooled_size) * self._scales[uuid]
+        return pooled.reshape(nsteps, nsamplers, -1)
+
+    def forward(  # type:ignore
+        self,
+        observations: Dict[str, torch.Tensor],
+        memory: Memory,
+        prev_actions: torch.Tensor,
+        masks: torch.FloatTensor,
+    ) -> Tuple[ActorCriticOutput[DistributionType], Optional[Memory]]:
+        x = self.embedding(
+            torch.cat(
+                [self._pool(uuid, observations[uuid]) for uuid in self.input_uuids],
+                dim=-1,
+            )
+        )
+        x, rnn_hidden_states = self.state_encoder(
+            x, memory.tensor(self.memory_key), masks
+        )
+
+        # [step, sampler, data] -> [step, sampler, agent, data]
+        x = x.unsqueeze(-2)
+
+        # noinspection PyArgumentList
+        return (
+            ActorCriticOutput(
+                distributions=CategoricalDistr(logits=self.actor(x)),
+                values=cast(torch.FloatTensor, self.critic(x)),
+                extras={},
+            ),
+            memory.set_tensor(self.memory_key, rnn_hidden_states),
+        )
@@ -0,0 +1,93 @@
+from typing import Any, List, Optional
+
+import gym
+import numpy as np
+
+from core.base_abstractions.sensor import Sensor
+from core.base_abstractions.task import Task
+from plugins.synthetic_plugin.synthetic_environment import SyntheticEnvironment
+
+
+class SyntheticImageSensor(Sensor[SyntheticEnvironment, Any]):
+    """Random `[height, width, channels]` images of the given `dtype`.
+
+    Images are generated once (cycling through `num_images` of them as
+    steps are taken) so that producing observations costs no more than a
+    simulator handing over a rendered frame.
+    """
+
+    def __init__(
+        self,
+        height: int,
+        width: int,
+        channels: int = 3,
+        dtype: Any = np.uint8,
+        num_images: int = 4,
+        seed: int = 0,
+        uuid: str = "synthetic_rgb",
+        **kwargs: Any
+    ):
+        self.height = height
+        self.width = width
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.num_images = num_images
+        self.seed = seed
+
+        if np.issubdtype(self.dtype, np.integer):
+            low, high = 0, min(255, np.iinfo(self.dtype).max)
+        else:
+            low, high = 0.0, 1.0
+
+        observation_space = gym.spaces.Box(
+            low=low, high=high, shape=(height, width, channels), dtype=self.dtype
+        )
+        self._images: Optional[np.ndarray] = None
+        super().__init__(uuid=uuid, observation_space=observation_space)
+
+    def _generate_images(self) -> np.ndarray:
+        rng = np.random.RandomState(self.seed)
+        shape = (self.num_images, self.height, self.width, self.channels)
+        if np.issubdtype(self.dtype, np.integer):
+            return rng.randint(
+                int(self.observation_space.low.min()),
+                int(self.observation_space.high.max()) + 1,
+                size=shape,
+            ).astype(self.dtype)
+        return rng.random_sample(shape).astype(self.dtype)
+
+    def get_observation(
+        self, env: SyntheticEnvironment, task: Optional[Task], *args: Any, **kwargs: Any
+    ) -> Any:
+        # Generated lazily, in the task sampler process, so that sensors stay cheap to pickle
+        if self._images is None:
+            self._images = self._generate_images()
+        return self._images[env.num_steps % self.num_images]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+
+def make_synthetic_image_sensors(
+    num_sensors: int,
+    height: int,
+    width: int,
+    channels: int = 3,
+    dtype: Any = np.uint8,
+    uuid_prefix: str = "synthetic",
+) -> List[SyntheticImageSensor]:
+    """`num_sensors` `SyntheticImageSensor`s with uuids
+    `"{uuid_prefix}_{index}"`."""
+    return [
+        SyntheticImageSensor(
+            height=height,
+            width=width,
+            channels=channels,
+            dtype=dtype,
+            seed=it,
+            uuid="{}_{}".format(uuid_prefix, it),
+        )
+        for it in range(num_sensors)
+    ]
@@ -0,0 +1,200 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, cast
+
+import gym
+import numpy as np
+
+from core.base_abstractions.misc import RLStepResult
+from core.base_abstractions.sensor import Sensor, SensorSuite
+from core.base_abstractions.task import Task, TaskSampler
+from plugins.synthetic_plugin.synthetic_environment import (
+    StepLatency,
+    SyntheticEnvironment,
+)
+
+TARGET_ACTION_REWARD = 0.1
+
+
+class SyntheticTask(Task[SyntheticEnvironment]):
+    """A task with no dynamics other than its cost: each step takes the time
+    drawn by the environment and the episode ends after the environment's
+    episode length (or `max_steps`).
+
+    The agent is rewarded for taking the (unobserved) `task_info["target_action"]`.
+    """
+
+    _CACHED_ACTION_NAMES: Dict[int, Tuple[str, ...]] = {}
+
+    def __init__(
+        self,
+        env: SyntheticEnvironment,
+        sensors: Union[SensorSuite, List[Sensor]],
+        task_info: Dict[str, Any],
+        max_steps: int,
+        num_actions: int,
+        **kwargs,
+    ) -> None:
+        super().__init__(
+            env=env, sensors=sensors, task_info=task_info, max_steps=max_steps, **kwargs
+        )
+        self.num_actions = num_actions
+
+    @property
+    def action_space(self) -> gym.spaces.Discrete:
+        return gym.spaces.Discrete(self.num_actions)
+
+    def render(self, mode: str = "rgb", *args, **kwargs) -> np.ndarray:
+        raise NotImplementedError("Synthetic tasks cannot be rendered.")
+
+    def _step(self, action: Union[int, Sequence[int]]) -> RLStepResult:
+        assert isinstance(action, int)
+        action = cast(int, action)
+
+        self.env.step(action)
+
+        return RLStepResult(
+            observation=self.get_observations(),
+            reward=TARGET_ACTION_REWARD * (action == self.task_info["target_action"]),
+            done=self.is_done(),
+            info={"step_latency": self.env.last_latency},
+        )
+
+    def reached_terminal_state(self) -> bool:
+        return self.env.episode_finished
+
+    @classmethod
+    def class_action_names(cls, num_actions: int = 4, **kwargs) -> Tuple[str, ...]:
+        if num_actions not in cls._CACHED_ACTION_NAMES:
+            cls._CACHED_ACTION_NAMES[num_actions] = tuple(
+                "action_{}".format(it) for it in range(num_actions)
+            )
+        return cls._CACHED_ACTION_NAMES[num_actions]
+
+    def action_names(self) -> Tuple[str, ...]:
+        return self.class_action_names(num_actions=self.num_actions)
+
+    def close(self) -> None:
+        pass
+
+    def metrics(self) -> Dict[str, Any]:
+        if not self.is_done():
+            return {}
+        return {
+            **super().metrics(),
+            "step_latency": self.env.total_latency / max(self.num_steps_taken(), 1),
+            "stragglers": self.env.num_stragglers,
+        }
+
+
+class SyntheticTaskSampler(TaskSampler):
+    """Samples `SyntheticTask`s whose observation sizes, episode lengths, step
+    latencies and reset costs are configurable, to load test the framework
+    without a simulator.
+
+    # Parameters
+
+    sensors : Sensors of the tasks (e.g. `SyntheticImageSensor`s).
+    max_steps : Maximum number of steps per task.
+    num_actions : Number of actions of the tasks.
+    min_episode_length : Minimum length of episodes.
+    max_episode_length : Maximum length of episodes (lengths are uniformly sampled in
+        `[min_episode_length, max_episode_length]`).
+    step_latency : Distribution of the seconds taken by steps (`None` for no latency).
+    reset_latency : Distribution of the seconds taken by sampling a task (`None` for no
+        latency).
+    busy_wait : Whether latencies are spent spinning the CPU (as a simulator in the
+        sampler process) rather than sleeping (as when waiting on another process).
+    max_tasks : Maximum number of tasks sampled (`None` for infinitely many).
+    seed : Seed of the episode lengths, target actions and latencies; samplers with the
+        same seed reproduce the same sequence of episodes and stragglers.
+    """
+
+    def __init__(
+        self,
+        sensors: Union[SensorSuite, List[Sensor]],
+        max_steps: int,
+        num_actions: int = 4,
+        min_episode_length: int = 50,
+        max_episode_length: int = 150,
+        step_latency: Optional[StepLatency] = None,
+        reset_latency: Optional[StepLatency] = None,
+        busy_wait: bool = False,
+        max_tasks: Optional[int] = None,
+        seed: Optional[int] = None,
+        **kwargs,
+    ):
+        self.sensors = (
+            SensorSuite(sensors) if not isinstance(sensors, SensorSuite) else sensors
+        )
+        self.max_steps = max_steps
+        self.num_actions = num_actions
+        self.max_tasks = max_tasks
+        self.num_tasks_generated = 0
+
+        self.seed: int = int(
+            seed if seed is not None else np.random.randint(0, 2 ** 31 - 1)
+        )
+        self.env = SyntheticEnvironment(
+            min_episode_length=min_episode_length,
+            max_episode_length=max_episode_length,
+            step_latency=step_latency,
+            reset_latency=reset_latency,
+            busy_wait=busy_wait,
+            seed=self.seed,
+        )
+        self.np_seeded_random_gen: Optional[np.random.RandomState] = None
+        self.set_seed(self.seed)
+
+        self._last_sampled_task: Optional[SyntheticTask] = None
+
+    @property
+    def length(self) -> Union[int, float]:
+        return (
+            float("inf")
+            if self.max_tasks is None
+            else self.max_tasks - self.num_tasks_generated
+        )
+
+    @property
+    def total_unique(self) -> Optional[Union[int, float]]:
+        return self.max_tasks
+
+    @property
+    def last_sampled_task(self) -> Optional[Task]:
+        return self._last_sampled_task
+
+    def next_task(self, force_advance_scene: bool = False) -> Optional[Task]:
+        if self.length <= 0:
+            return None
+
+        self.num_tasks_generated += 1
+        self.env.reset()
+
+        self._last_sampled_task = SyntheticTask(
+            env=self.env,
+            sensors=self.sensors,
+            task_info={
+                "target_action": int(
+                    self.np_seeded_random_gen.randint(self.num_actions)
+                ),
+                "episode_length": self.env.episode_length,
+            },
+            max_steps=self.max_steps,
+            num_actions=self.num_actions,
+        )
+        return self._last_sampled_task
+
+    def close(self) -> None:
+        pass
+
+    @property
+    def all_observation_spaces_equal(self) -> bool:
+        return True
+
+    def reset(self) -> None:
+        self.num_tasks_generated = 0
+        self.set_seed(self.seed)
+
+    def set_seed(self, seed: int) -> None:
+        self.seed = seed
+        self.np_seeded_random_gen = np.random.RandomState(seed)
+        self.env.set_seed(seed)
@@ -40,7 +40,9 @@ class DistributedBCOffPolicyBabyAIGoToLocalExperimentConfig(
     def expert_ce_loss_kwargs_generator(
         cls, worker_id: int, rollouts_per_worker: Sequence[int], seed: Optional[int]
     ):
-        return dict(num_workers=len(rollouts_per_worker), current_worker=worker_id)
+        return dict(
+            num_workers=len(rollouts_per_worker), current_worker=worker_id, seed=seed
+        )
 
     @classmethod
     def training_pipeline(cls, **kwargs):
@@ -0,0 +1,72 @@
+import torch
+
+from core.algorithms.actor_learner_async.losses.vtrace import vtrace_targets
+
+
+def _discounted_returns(rewards, discounts, bootstrap_values):
+    returns = torch.zeros_like(rewards)
+    acc = bootstrap_values[0]
+    for step in reversed(range(rewards.shape[0])):
+        acc = rewards[step] + discounts[step] * acc
+        returns[step] = acc
+    return returns
+
+
+class TestVTrace(object):
+    def test_on_policy_targets_are_discounted_returns(self):
+        torch.manual_seed(0)
+        num_steps, num_samplers = 6, 3
+        shape = (num_steps, num_samplers, 1, 1)
+
+        log_probs = -torch.rand(shape)
+        rewards = torch.randn(shape)
+        discounts = 0.9 * (torch.rand(shape) > 0.2).float()
+        values = torch.randn(shape)
+        bootstrap_values = torch.randn(1, num_samplers, 1, 1)
+
+        vs, pg_advantages, rhos = vtrace_targets(
+            behaviour_log_probs=log_probs,
+            target_log_probs=log_probs,
+            rewards=rewards,
+            discounts=discounts,
+            values=values,
+            bootstrap_values=bootstrap_values,
+        )
+
+        returns = _discounted_returns(rewards, discounts, bootstrap_values)
+        assert torch.allclose(rhos, torch.ones_like(rhos))
+        assert torch.allclose(vs, returns, atol=1e-5)
+        next_returns = torch.cat([returns[1:], bootstrap_values], dim=0)
+        assert torch.allclose(
+            pg_advantages, rewards + discounts * next_returns - values, atol=1e-5
+        )
+
+    def test_importance_weights_are_truncated(self):
+        shape = (1, 2, 1, 1)
+        behaviour_log_probs = torch.log(torch.full(shape, 0.25))
+        target_log_probs = torch.log(torch.tensor([0.5, 0.125]).view(shape))
+        rewards = torch.ones(shape)
+        discounts = torch.zeros(shape)
+        values = torch.zeros(shape)
+        bootstrap_values = torch.zeros(1, 2, 1, 1)
+
+        vs, pg_advantages, rhos = vtrace_targets(
+            behaviour_log_probs=behaviour_log_probs,
+            target_log_probs=target_log_probs,
+            rewards=rewards,
+            discounts=discounts,
+            values=values,
+            bootstrap_values=bootstrap_values,
+            clip_rho_threshold=1.0,
+            clip_pg_rho_threshold=1.0,
+        )
+
+        # rho = 2 is truncated to 1, rho = 0.5 is kept
+        assert torch.allclose(rhos.flatten(), torch.tensor([2.0, 0.5]))
+        assert torch.allclose(vs.flatten(), torch.tensor([1.0, 0.5]))
+        assert torch.allclose(pg_advantages.flatten(), torch.tensor([1.0, 0.5]))
+
+
+if __name__ == "__main__":
+    TestVTrace().test_on_policy_targets_are_discounted_returns()
+    TestVTrace().test_importance_weights_are_truncated()
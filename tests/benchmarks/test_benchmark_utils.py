@@ -0,0 +1,69 @@
+import os
+import tempfile
+
+from benchmarks.benchmark_utils import (
+    compare_results,
+    format_comparison,
+    load_results,
+    machine_metadata,
+    make_result,
+    measure,
+    save_results,
+)
+
+
+class TestBenchmarkUtils(object):
+    def test_measure(self):
+        calls = []
+        samples = measure(
+            lambda: calls.append(1), warmup=2, min_repeats=3, min_seconds=0.0
+        )
+        assert len(samples) == 3
+        assert len(calls) == 5
+        assert all(sample >= 0 for sample in samples)
+
+        samples = measure(lambda: None, min_seconds=10.0, max_repeats=7)
+        assert len(samples) == 7
+
+    def test_make_result(self):
+        result = make_result("bench", dict(a=1), [3.0, 1.0, 2.0], extra=5)
+        assert result["value"] == 2.0
+        assert result["min"] == 1.0 and result["max"] == 3.0
+        assert result["repeats"] == 3
+        assert result["extra"] == 5
+
+    def test_compare_results(self):
+        baseline = [
+            make_result("time", dict(n=1), [1.0]),
+            make_result("time", dict(n=2), [1.0]),
+            make_result("fps", dict(n=1), [100.0], higher_is_better=True),
+            make_result("fps", dict(n=2), [100.0], higher_is_better=True),
+            make_result("missing", dict(), [1.0]),
+        ]
+        candidate = [
+            make_result("fps", dict(n=2), [80.0], higher_is_better=True),
+            make_result("fps", dict(n=1), [102.0], higher_is_better=True),
+            make_result("time", dict(n=2), [1.5]),
+            make_result("time", dict(n=1), [0.5]),
+        ]
+        comparison = compare_results(baseline, candidate, threshold=0.05)
+
+        assert [row["status"] for row in comparison] == [
+            "improved",
+            "regressed",
+            "unchanged",
+            "regressed",
+        ]
+        assert abs(comparison[0]["speedup"] - 2.0) < 1e-6
+        assert abs(comparison[3]["speedup"] - 0.8) < 1e-6
+        assert len(format_comparison(comparison).split("\n")) == 5
+
+    def test_save_load_results(self):
+        results = [make_result("time", dict(n=1), [1.0, 2.0])]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "results", "run.json")
+            save_results(path, results, machine_metadata())
+            loaded = load_results(path)
+
+        assert loaded["results"] == results
+        assert loaded["metadata"]["cpu_count"] == os.cpu_count()
@@ -0,0 +1,196 @@
+import os
+import random
+
+import babyai
+import blosc
+import numpy as np
+import torch
+
+from core.algorithms.offpolicy_sync.prefetch import PrefetchingIterator
+from plugins.minigrid_plugin.minigrid_offpolicy import (
+    ExpertTrajectoryIterator,
+    ExpertTrajectoryStore,
+    MemmapExpertTrajectoryIterator,
+    convert_minigrid_expert_demos,
+)
+from plugins.minigrid_plugin.minigrid_sensors import MiniGridMissionSensor
+
+MISSIONS = ["go to the red ball", "pick up a key", "open the door"]
+
+
+def write_store(path: str, lengths, image_shape=(7, 7, 3), seed: int = 0) -> None:
+    rng = np.random.RandomState(seed)
+    lengths = np.array(lengths, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    nsteps = int(offsets[-1])
+
+    os.makedirs(path, exist_ok=True)
+    np.save(
+        os.path.join(path, "images.npy"),
+        rng.randint(0, 11, size=(nsteps,) + tuple(image_shape)).astype(np.uint8),
+    )
+    np.save(os.path.join(path, "actions.npy"), rng.randint(0, 7, size=(nsteps,)))
+    np.save(
+        os.path.join(path, "missions.npy"),
+        rng.randint(1, 20, size=(len(lengths), 5)).astype(np.int64),
+    )
+    np.save(os.path.join(path, "episode_offsets.npy"), offsets)
+    np.save(
+        os.path.join(path, "episodes_by_length.npy"),
+        np.argsort(lengths, kind="stable"),
+    )
+
+
+def make_demos(lengths, image_shape=(7, 7, 3), seed: int = 0):
+    """Demos in the format saved by BabyAI, i.e. (mission, compressed images,
+    directions, actions) tuples."""
+    rng = np.random.RandomState(seed)
+    demos = []
+    for it, length in enumerate(lengths):
+        images = rng.randint(0, 11, size=(length,) + tuple(image_shape))
+        demos.append(
+            (
+                MISSIONS[it % len(MISSIONS)],
+                blosc.pack_array(images.astype(np.uint8)),
+                rng.randint(0, 4, size=(length,)).tolist(),
+                rng.randint(0, 7, size=(length,)).tolist(),
+            )
+        )
+    return demos
+
+
+def epoch_episodes(iterator):
+    """All episodes (as tuples of missions, images and actions) in one epoch of
+    a single-rollout iterator with `rollout_len=1`."""
+    episodes = []
+    for batch in all_batches(iterator):
+        if batch["masks"].view(-1)[0] == 0:
+            episodes.append([])
+        episodes[-1].append(
+            (
+                tuple(batch["minigrid_mission"].view(-1).tolist()),
+                batch["minigrid_ego_image"].numpy().tobytes(),
+                int(batch["expert_action"].view(-1)[0]),
+            )
+        )
+    return sorted(tuple(episode) for episode in episodes)
+
+
+def all_batches(iterator):
+    batches = []
+    while True:
+        try:
+            batches.append(next(iterator))
+        except StopIteration:
+            return batches
+
+
+class TestMinigridOffPolicy(object):
+    def test_seeded_prefetched_iterators_are_reproducible(self, tmpdir):
+        path = str(tmpdir.mkdir("store"))
+        write_store(path, lengths=[3, 5, 8, 2, 9, 4, 6, 7, 5, 3, 8, 6])
+        store = ExpertTrajectoryStore(path)
+
+        def make_iterator():
+            return PrefetchingIterator(
+                MemmapExpertTrajectoryIterator(
+                    store=store,
+                    nrollouts=2,
+                    rollout_len=4,
+                    instr_len=None,
+                    num_data_length_clusters=3,
+                    seed=12345,
+                ),
+                num_batches=2,
+            )
+
+        random.seed(1)
+        first = make_iterator()
+        first_batches = all_batches(first)
+
+        # Draws from the global generator (e.g. by other threads) don't matter
+        random.seed(2)
+        second = make_iterator()
+        for _ in range(100):
+            random.random()
+        second_batches = all_batches(second)
+
+        assert len(first_batches) == len(second_batches) > 0
+        for b1, b2 in zip(first_batches, second_batches):
+            assert b1.keys() == b2.keys()
+            for key in b1:
+                assert torch.equal(b1[key], b2[key])
+
+        first.close()
+        second.close()
+        assert not first._thread.is_alive() and not second._thread.is_alive()
+
+    def test_converted_store(self, tmpdir):
+        lengths = [3, 5, 2, 6]
+        demos = make_demos(lengths)
+        demos_path = str(tmpdir.join("demos.pkl"))
+        babyai.utils.save_demos(demos, demos_path)
+
+        convert_minigrid_expert_demos(demos_path, str(tmpdir.join("store")))
+        store = ExpertTrajectoryStore(str(tmpdir.join("store")))
+
+        assert store.num_episodes == len(demos)
+        assert store.episode_lengths.tolist() == lengths
+        assert store.episodes_by_length.tolist() == [2, 0, 1, 3]
+
+        mission_sensor = MiniGridMissionSensor(instr_len=store.missions.shape[1])
+        for it, steps in enumerate(babyai.utils.demos.transform_demos(demos)):
+            start, end = store.episode_offsets[it], store.episode_offsets[it + 1]
+            assert np.array_equal(
+                store.images[start:end], np.stack([s[0]["image"] for s in steps])
+            )
+            assert store.actions[start:end].tolist() == [int(s[1]) for s in steps]
+            assert np.array_equal(
+                store.missions[it],
+                mission_sensor.get_observation(
+                    env=None, task=None, minigrid_output_obs=steps[0][0]
+                ),
+            )
+
+    def test_same_epochs_as_demos_iterator(self, tmpdir):
+        demos = make_demos([3, 5, 8, 2, 9, 4, 6, 7, 5, 3])
+        demos_path = str(tmpdir.join("demos.pkl"))
+        babyai.utils.save_demos(demos, demos_path)
+        convert_minigrid_expert_demos(demos_path, str(tmpdir.join("store")))
+        store = ExpertTrajectoryStore(str(tmpdir.join("store")))
+
+        def iterator_kwargs(**kwargs):
+            return dict(
+                nrollouts=1,
+                rollout_len=1,
+                instr_len=6,
+                num_data_length_clusters=3,
+                seed=1,
+                **kwargs
+            )
+
+        # Length clusters (and hence the order of episodes) differ, the
+        # contents of an epoch don't
+        expected = epoch_episodes(
+            ExpertTrajectoryIterator(
+                data=babyai.utils.load_demos(demos_path), **iterator_kwargs()
+            )
+        )
+        assert len(expected) == len(demos)
+        assert (
+            epoch_episodes(
+                MemmapExpertTrajectoryIterator(store=store, **iterator_kwargs())
+            )
+            == expected
+        )
+
+        # Also when splitting the data among workers
+        for worker in range(2):
+            worker_kwargs = iterator_kwargs(current_worker=worker, num_workers=2)
+            assert epoch_episodes(
+                MemmapExpertTrajectoryIterator(store=store, **worker_kwargs)
+            ) == epoch_episodes(
+                ExpertTrajectoryIterator(
+                    data=babyai.utils.load_demos(demos_path), **worker_kwargs
+                )
+            )
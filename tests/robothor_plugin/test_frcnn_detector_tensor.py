@@ -0,0 +1,120 @@
+import numpy as np
+import torch
+
+from plugins.robothor_plugin.robothor_preprocessors import BatchedFasterRCNN
+
+
+class DetectorTensorOnly(BatchedFasterRCNN):
+    """Skips loading the (pretrained) detection model."""
+
+    def __init__(self, thres=0.12, maxdets=3, res=7):
+        torch.nn.Module.__init__(self)
+        self.min_score = thres
+        self.maxdets = maxdets
+        self.res = res
+
+
+def reference_detector_tensor(
+    boxes, classes, scores, res: int, maxdets: int, aspect_ratio=1.0
+):
+    """Per-box implementation previously used by `BatchedFasterRCNN`."""
+    bins = np.array(list(range(res + 1)))[1:-1] / res
+
+    res_classes = torch.zeros(res, res, maxdets, dtype=torch.int64)
+    res_boxes = -1 * torch.ones(res, res, maxdets, 5)
+
+    temp = [[[] for _ in range(res)] for _ in range(res)]
+
+    for it in range(classes.shape[0]):
+        cx = (boxes[it, 0].item() + boxes[it, 2].item()) / 2
+        cy = (boxes[it, 1].item() + boxes[it, 3].item()) / 2
+
+        px = np.digitize(cx, bins=aspect_ratio * bins).item()
+        py = np.digitize(cy, bins=bins).item()
+
+        temp[py][px].append(
+            (
+                scores[it].item(),
+                (boxes[it, 2] - boxes[it, 0]).item() / aspect_ratio,
+                (boxes[it, 3] - boxes[it, 1]).item(),
+                boxes[it, 0].item() / aspect_ratio,
+                boxes[it, 1].item(),
+                classes[it].item(),
+            )
+        )
+
+    for py in range(res):
+        for px in range(res):
+            order = sorted(temp[py][px], reverse=True)[:maxdets]
+            for it, data in enumerate(order):
+                res_classes[py, px, it] = data[-1]
+                res_boxes[py, px, it, :] = torch.tensor(list(data[:-1]))
+
+    res_classes = res_classes.permute(2, 0, 1).unsqueeze(0).contiguous()
+    res_boxes = res_boxes.view(res, res, -1).permute(2, 0, 1).unsqueeze(0).contiguous()
+
+    return res_classes, res_boxes
+
+
+class TestFasterRCNNDetectorTensor(object):
+    def random_detections(self, nimgs: int, max_ndets: int, aspect_ratio: float):
+        lengths = torch.randint(0, max_ndets + 1, (nimgs,))
+        ndets = int(lengths.max().item())
+
+        corners = torch.rand(nimgs, ndets, 2, 2)
+        corners[..., 0] *= aspect_ratio
+        boxes = torch.cat(
+            [corners.min(dim=2)[0], corners.max(dim=2)[0]], dim=-1
+        )  # x0, y0, x1, y1
+        classes = torch.randint(1, 91, (nimgs, ndets))
+        scores = torch.rand(nimgs, ndets)
+
+        # Force some score ties, which must be broken by the remaining fields
+        scores[:, ::4] = 0.5
+        valid = torch.arange(ndets).unsqueeze(0) < lengths.unsqueeze(1)
+
+        return boxes, classes, scores, valid
+
+    def test_matches_reference(self):
+        torch.manual_seed(12345)
+
+        for res, maxdets, aspect_ratio in [(7, 3, 1.0), (5, 2, 4.0 / 3.0), (3, 5, 0.5)]:
+            frcnn = DetectorTensorOnly(maxdets=maxdets, res=res)
+            boxes, classes, scores, valid = self.random_detections(
+                nimgs=6, max_ndets=60, aspect_ratio=aspect_ratio
+            )
+
+            res_classes, res_boxes = frcnn.detector_tensor(
+                boxes, classes, scores, valid, aspect_ratio=aspect_ratio
+            )
+
+            assert res_classes.shape == (6, maxdets, res, res)
+            assert res_boxes.shape == (6, 5 * maxdets, res, res)
+
+            for it in range(boxes.shape[0]):
+                ref_classes, ref_boxes = reference_detector_tensor(
+                    boxes[it][valid[it]],
+                    classes[it][valid[it]],
+                    scores[it][valid[it]],
+                    res=res,
+                    maxdets=maxdets,
+                    aspect_ratio=aspect_ratio,
+                )
+                assert torch.equal(res_classes[it : it + 1], ref_classes)
+                assert torch.equal(res_boxes[it : it + 1], ref_boxes)
+
+    def test_no_detections(self):
+        frcnn = DetectorTensorOnly(maxdets=3, res=7)
+        res_classes, res_boxes = frcnn.detector_tensor(
+            torch.zeros(2, 0, 4),
+            torch.zeros(2, 0, dtype=torch.int64),
+            torch.zeros(2, 0),
+            torch.zeros(2, 0, dtype=torch.bool),
+        )
+        assert torch.equal(res_classes, torch.zeros(2, 3, 7, 7, dtype=torch.int64))
+        assert torch.equal(res_boxes, -torch.ones(2, 15, 7, 7))
+
+
+if __name__ == "__main__":
+    TestFasterRCNNDetectorTensor().test_matches_reference()  # type: ignore
+    TestFasterRCNNDetectorTensor().test_no_detections()  # type: ignore
@@ -0,0 +1,123 @@
+import math
+
+import numpy as np
+import pytest
+
+from plugins.robothor_plugin.robothor_distance_fields import (
+    SceneDistanceFields,
+    compute_scene_distance_fields,
+)
+
+GRID_SIZE = 0.25
+Y = 0.9
+
+
+def make_reachable_points():
+    """5x5 grid of points starting at (1, 1), with a wall at x = 1.5 except for
+    a gap at the top row."""
+    points = []
+    for ix in range(5):
+        for iz in range(5):
+            if ix == 2 and iz < 4:
+                continue
+            points.append(
+                {"x": 1.0 + GRID_SIZE * ix, "y": Y, "z": 1.0 + GRID_SIZE * iz}
+            )
+    return points
+
+
+class TestRoboThorDistanceFields(object):
+    def test_fields_at_grid_points(self):
+        target = {"x": 1.0, "y": Y, "z": 1.0}
+        fields = compute_scene_distance_fields(
+            make_reachable_points(),
+            object_positions={"Apple": [{"x": 2.0, "y": Y, "z": 0.9}]},
+            point_targets=[target],
+            grid_size=GRID_SIZE,
+            object_sources_per_instance=1,
+        )
+        assert fields.origin == (1.0, 1.0)
+        assert fields.object_types == ["Apple"]
+
+        def point(ix, iz):
+            return {"x": 1.0 + GRID_SIZE * ix, "y": Y, "z": 1.0 + GRID_SIZE * iz}
+
+        assert fields.distance_to_point(point(0, 0), target) == pytest.approx(0.0)
+        assert fields.distance_to_point(point(1, 1), target) == pytest.approx(
+            GRID_SIZE * math.sqrt(2)
+        )
+        # Through the gap, without cutting the corners of the wall at (2, 3)
+        assert fields.distance_to_point(point(3, 0), target) == pytest.approx(
+            GRID_SIZE * (math.sqrt(2) + 3 + 2 + 4)
+        )
+        # Unreachable
+        assert fields.distance_to_point(point(2, 0), target) is None
+
+        # Object types are seeded with the distance to the closest instance
+        assert fields.distance_to_object_type(point(4, 0), "Apple") == pytest.approx(
+            0.1
+        )
+
+        # Unknown targets are not answered
+        assert fields.distance_to_object_type(point(0, 0), "Mug") is None
+        assert fields.distance_to_point(point(0, 0), point(4, 4)) is None
+
+    def test_bilinear_interpolation(self):
+        # Field value ix + 10 * iz in a 3x3 grid, with (2, 2) unreachable
+        field = np.array(
+            [[ix + 10.0 * iz for iz in range(3)] for ix in range(3)], dtype=np.float32
+        )
+        field[2, 2] = np.inf
+        fields = SceneDistanceFields(
+            grid_size=GRID_SIZE,
+            origin=(1.0, 2.0),
+            fields=field[None],
+            target_keys=["Apple"],
+        )
+
+        def distance(fx, fz):
+            return fields.distance_to_object_type(
+                {"x": 1.0 + GRID_SIZE * fx, "y": Y, "z": 2.0 + GRID_SIZE * fz}, "Apple"
+            )
+
+        # Exact at grid points, linear in between
+        assert distance(1, 1) == pytest.approx(11.0)
+        assert distance(0.5, 0) == pytest.approx(0.5)
+        assert distance(0.25, 0.5) == pytest.approx(5.25)
+        assert distance(0.5, 0.5) == pytest.approx(5.5)
+
+        # Unreachable corners are left out and the remaining weights normalized
+        weights = np.array([0.25, 0.25, 0.25])
+        values = np.array([11.0, 21.0, 12.0])
+        assert distance(1.5, 1.5) == pytest.approx(
+            (weights * values).sum() / weights.sum()
+        )
+
+        # Outside of the grid
+        assert distance(-2, 0) is None
+        assert distance(0, 3.5) is None
+
+    def test_save_and_load(self, tmpdir):
+        target = {"x": 1.25, "y": Y, "z": 2.0}
+        fields = compute_scene_distance_fields(
+            make_reachable_points(),
+            object_positions={"Apple": [{"x": 2.0, "y": Y, "z": 0.9}]},
+            point_targets=[target],
+            grid_size=GRID_SIZE,
+        )
+        path = str(tmpdir.join("fields", "FloorPlan_Train1_1.npz"))
+        fields.save(path)
+        loaded = SceneDistanceFields.load(path)
+
+        assert loaded.grid_size == fields.grid_size
+        assert loaded.origin == fields.origin
+        assert loaded.target_keys == fields.target_keys
+        assert np.array_equal(loaded.fields, fields.fields)
+
+        position = {"x": 1.1, "y": Y, "z": 1.6}
+        assert loaded.distance_to_point(position, target) == fields.distance_to_point(
+            position, target
+        )
+        assert loaded.distance_to_object_type(
+            position, "Apple"
+        ) == fields.distance_to_object_type(position, "Apple")
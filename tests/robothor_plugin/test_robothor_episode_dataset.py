@@ -0,0 +1,128 @@
+import gzip
+import json
+import os
+
+from plugins.robothor_plugin.robothor_episode_dataset import (
+    CompiledEpisodeDataset,
+    SceneEpisodes,
+    compile_episode_dataset,
+    is_compiled_episode_dataset,
+    shuffle_episodes,
+)
+from plugins.robothor_plugin.robothor_task_samplers import ObjectNavDatasetTaskSampler
+
+SCENES = ["FloorPlan_Train1_1", "FloorPlan_Train1_2"]
+OBJECT_TYPES = ["Apple", "Mug", "Television"]
+
+
+def pos(x, z):
+    return {"x": x, "y": 0.9, "z": z}
+
+
+def make_episodes(scene: str, num_episodes: int, pointnav: bool):
+    episodes = []
+    for it in range(num_episodes):
+        path = [pos(0.25 * p, 0.5 * it) for p in range(it % 3 + 1)]
+        episode = {
+            "id": "{}_{}".format(scene, it),
+            "scene": scene,
+            "initial_position": pos(0.25 * it, 1.0),
+            "initial_orientation": 90 * (it % 4),
+            "shortest_path_length": 0.25 * len(path),
+            "shortest_path": path,
+        }
+        if pointnav:
+            episode["target_position"] = pos(1.5, 0.25 * it)
+        else:
+            object_type = OBJECT_TYPES[it % len(OBJECT_TYPES)]
+            episode["object_type"] = object_type
+            episode["object_id"] = "{}|{}|{}".format(object_type, scene, it % 2)
+        episodes.append(episode)
+    return episodes
+
+
+def write_json_dataset(scene_directory: str, pointnav: bool):
+    episodes_dir = os.path.join(scene_directory, "episodes")
+    os.makedirs(episodes_dir)
+    all_episodes = {}
+    for num_episodes, scene in zip([5, 7], SCENES):
+        episodes = make_episodes(scene, num_episodes, pointnav)
+        with gzip.GzipFile(os.path.join(episodes_dir, scene + ".json.gz"), "w") as f:
+            f.write(json.dumps(episodes).encode("utf-8"))
+        all_episodes[scene] = episodes
+    return episodes_dir, all_episodes
+
+
+def without_scene(episode):
+    return {k: v for k, v in episode.items() if k != "scene"}
+
+
+class TestRoboThorEpisodeDataset(object):
+    def test_same_episodes_as_json_dataset(self, tmpdir):
+        for pointnav in [False, True]:
+            scene_directory = str(tmpdir.mkdir("pointnav" if pointnav else "objnav"))
+            episodes_dir, all_episodes = write_json_dataset(scene_directory, pointnav)
+            compiled_dir = os.path.join(scene_directory, "compiled")
+            compile_episode_dataset(episodes_dir, compiled_dir)
+            assert is_compiled_episode_dataset(compiled_dir)
+
+            dataset = CompiledEpisodeDataset(compiled_dir)
+            assert dataset.scenes == SCENES
+            assert len(dataset) == sum(len(eps) for eps in all_episodes.values())
+
+            json_episodes = ObjectNavDatasetTaskSampler.load_scene_episodes(
+                SCENES, scene_directory, None
+            )
+            compiled_episodes = ObjectNavDatasetTaskSampler.load_scene_episodes(
+                SCENES, scene_directory, compiled_dir
+            )
+            for scene in SCENES:
+                assert isinstance(compiled_episodes[scene], SceneEpisodes)
+                assert len(compiled_episodes[scene]) == len(json_episodes[scene])
+
+                by_id = {ep["id"]: without_scene(ep) for ep in json_episodes[scene]}
+                decoded = [
+                    compiled_episodes[scene][it]
+                    for it in range(len(compiled_episodes[scene]))
+                ]
+                assert {ep["id"]: ep for ep in decoded} == by_id
+                for episode_id, episode in by_id.items():
+                    assert dataset.episode_by_id(episode_id) == episode
+
+                if not pointnav:
+                    for column in ["object_type", "object_id"]:
+                        assert sorted(
+                            ObjectNavDatasetTaskSampler._episodes_column(
+                                compiled_episodes[scene], column
+                            )
+                        ) == sorted(
+                            set(
+                                ObjectNavDatasetTaskSampler._episodes_column(
+                                    json_episodes[scene], column
+                                )
+                            )
+                        )
+
+    def test_shuffling_permutes_rows(self, tmpdir):
+        scene_directory = str(tmpdir)
+        episodes_dir, all_episodes = write_json_dataset(scene_directory, False)
+        compiled_dir = os.path.join(scene_directory, "compiled")
+        compile_episode_dataset(episodes_dir, compiled_dir)
+        # Recompiling over an existing dataset
+        compile_episode_dataset(episodes_dir, compiled_dir, scenes=SCENES[1:])
+
+        dataset = CompiledEpisodeDataset(compiled_dir)
+        assert dataset.scenes == SCENES[1:]
+
+        episodes = dataset.scene_episodes(SCENES[1], shuffle=False)
+        assert [episodes[it]["id"] for it in range(len(episodes))] == [
+            ep["id"] for ep in all_episodes[SCENES[1]]
+        ]
+
+        rows = list(episodes.rows)
+        for _ in range(3):
+            shuffle_episodes(episodes)
+            assert sorted(episodes.rows) == rows
+            assert [episodes[it]["id"] for it in range(len(episodes))] == [
+                dataset.episode(row)["id"] for row in episodes.rows
+            ]
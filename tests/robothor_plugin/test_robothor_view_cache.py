@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from plugins.robothor_plugin.robothor_environment import RoboThorMemmapCachedEnvironment
+from plugins.robothor_plugin.robothor_view_cache import (
+    MemmapViewCache,
+    convert_view_cache,
+)
+from utils.cache_utils import pos_to_str_for_cache
+
+ROTATIONS = [0.0, 90.0, 180.0, 270.0]
+
+
+def make_view_cache(scene_name: str = "FloorPlan_Train1_1", num_positions: int = 12):
+    rng = np.random.RandomState(0)
+    view_cache = {}
+    for it in range(num_positions):
+        pos = pos_to_str_for_cache({"x": 0.25 * it, "y": 0.9, "z": 0.0})
+        view_cache[pos] = {
+            rot: SimpleNamespace(
+                frame=rng.randint(0, 256, size=(4, 6, 3)).astype(np.uint8),
+                depth_frame=rng.rand(4, 6).astype(np.float32),
+                metadata={
+                    "sceneName": scene_name,
+                    "actionReturn": None,
+                    "objects": [{"objectId": "Apple|{}|{}".format(it, rot)}],
+                },
+            )
+            for rot in ROTATIONS
+        }
+    return view_cache
+
+
+class TestRoboThorViewCache(object):
+    def test_round_trip(self, tmpdir):
+        view_cache = make_view_cache()
+        scene_dir = str(tmpdir.join("FloorPlan_Train1_1"))
+        convert_view_cache(view_cache, scene_dir)
+
+        memmap_cache = MemmapViewCache(scene_dir)
+        assert memmap_cache.scene_name == "FloorPlan_Train1_1"
+        assert list(memmap_cache.keys()) == list(view_cache.keys())
+        for pos, views in view_cache.items():
+            assert memmap_cache[pos].keys() == ROTATIONS
+            for rot, event in views.items():
+                cached = memmap_cache[pos][rot]
+                assert np.array_equal(cached.frame, event.frame)
+                assert np.array_equal(cached.depth_frame, event.depth_frame)
+                assert cached.metadata == event.metadata
+
+    def test_metadata_decoded_once_per_view(self, tmpdir, monkeypatch):
+        view_cache = make_view_cache()
+        convert_view_cache(view_cache, str(tmpdir.join("FloorPlan_Train1_1")))
+
+        decoded_rows = []
+        metadata = MemmapViewCache.metadata
+
+        def counting_metadata(self, row):
+            decoded_rows.append(row)
+            return metadata(self, row)
+
+        monkeypatch.setattr(MemmapViewCache, "metadata", counting_metadata)
+
+        env = RoboThorMemmapCachedEnvironment(env_root_dir=str(tmpdir))
+        start = env.last_event
+        for _ in range(3):
+            assert env.last_event is start
+            assert env.all_objects() == start.metadata["objects"]
+            env.step({"action": "RotateRight"})
+            env.step({"action": "RotateRight"})
+            env.step({"action": "RotateRight"})
+            env.step({"action": "RotateRight"})
+
+        assert len(decoded_rows) == len(set(decoded_rows)) == 1
+
+    def test_cached_events_are_bounded(self, tmpdir):
+        view_cache = make_view_cache()
+        scene_dir = str(tmpdir.join("FloorPlan_Train1_1"))
+        convert_view_cache(view_cache, scene_dir)
+
+        memmap_cache = MemmapViewCache(scene_dir, max_cached_events=2)
+        first = memmap_cache.event(0)
+        second = memmap_cache.event(1)
+        assert memmap_cache.event(0) is first
+        # Evicts the least recently used event (1)
+        memmap_cache.event(2)
+        assert len(memmap_cache._events) == 2
+        assert memmap_cache.event(0) is first
+        assert memmap_cache.event(1) is not second
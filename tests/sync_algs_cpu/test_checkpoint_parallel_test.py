@@ -0,0 +1,94 @@
+from typing import Any, Dict, List, Optional
+
+from core.algorithms.onpolicy_sync.runner import OnPolicyRunner
+from plugins.synthetic_plugin.configs.synthetic_base import (
+    SyntheticBaseExperimentConfig,
+)
+
+
+class ShardedTestExperimentConfig(SyntheticBaseExperimentConfig):
+    """Three testers, the second one without task samplers of its own."""
+
+    IMAGE_SIZE = 8
+    MIN_EPISODE_LENGTH = 5
+    MAX_EPISODE_LENGTH = 20
+    STEP_LATENCY = None
+    RESET_LATENCY = None
+
+    NUM_TRAIN_SAMPLERS = 2
+    TEST_NPROCESSES = [2, 0, 1]
+    NUM_TEST_TASKS_PER_SAMPLER = 3
+
+    TOTAL_STEPS = 3 * 64 * 2
+
+    @classmethod
+    def tag(cls) -> str:
+        return "ShardedTest"
+
+    @classmethod
+    def machine_params(cls, mode="train", **kwargs) -> Dict[str, Any]:
+        if mode == "test":
+            return {"nprocesses": cls.TEST_NPROCESSES, "devices": []}
+        return super().machine_params(mode=mode, **kwargs)
+
+    def test_task_sampler_args(
+        self,
+        process_ind: int,
+        total_processes: int,
+        devices: Optional[List[int]] = None,
+        seeds: Optional[List[int]] = None,
+        deterministic_cudnn: bool = False,
+    ) -> Dict[str, Any]:
+        # Seeded as after resetting samplers between checkpoints
+        args = super().test_task_sampler_args(
+            process_ind=process_ind, total_processes=total_processes
+        )
+        args["seed"] = seeds[process_ind]
+        return args
+
+
+class TestCheckpointParallelTest(object):
+    def test_same_results_as_sequential_test(self, tmpdir):
+        cfg = ShardedTestExperimentConfig()
+        output_dir = tmpdir.mkdir("experiment_output")
+
+        start_time_str = OnPolicyRunner(
+            config=cfg, output_dir=output_dir, loaded_config_src_files=None, seed=1
+        ).start_train(max_sampler_processes_per_worker=1)
+
+        def run_test(checkpoint_parallel: bool):
+            return OnPolicyRunner(
+                config=cfg,
+                output_dir=output_dir,
+                loaded_config_src_files=None,
+                seed=1,
+                mode="test",
+                deterministic_agents=True,  # results don't depend on the tester's RNG
+            ).start_test(
+                experiment_date=start_time_str,
+                max_sampler_processes_per_worker=1,
+                checkpoint_parallel=checkpoint_parallel,
+                use_eval_cache=False,
+            )
+
+        def summary(results):
+            return [
+                (
+                    r["training_steps"],
+                    r["num_tasks"],
+                    round(r["reward"], 6),
+                    round(r["ep_length"], 6),
+                )
+                for r in results
+            ]
+
+        sequential_results = run_test(checkpoint_parallel=False)
+        parallel_results = run_test(checkpoint_parallel=True)
+
+        assert len(sequential_results) > 1
+        # Each (checkpoint, shard) unit is evaluated exactly once
+        num_test_tasks = sum(cfg.TEST_NPROCESSES) * cfg.NUM_TEST_TASKS_PER_SAMPLER
+        for result in parallel_results:
+            assert result["num_tasks"] == num_test_tasks
+
+        assert summary(parallel_results) == summary(sequential_results)
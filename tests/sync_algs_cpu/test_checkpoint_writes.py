@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+
+import pytest
+import torch
+
+import core.algorithms.onpolicy_sync.engine as engine_module
+from core.algorithms.onpolicy_sync.engine import OnPolicyTrainer
+
+
+class EventsQueue(object):
+    """Records checkpoints posted for evaluation, and whether they were
+    complete when posted."""
+
+    def __init__(self, events):
+        self.events = events
+
+    def put(self, item):
+        command, path = item
+        self.events.append(
+            ("post", command, os.path.exists(path), os.path.exists(path + ".tmp"))
+        )
+
+
+def make_trainer(checkpoints_queue=None) -> OnPolicyTrainer:
+    # Only the attributes used to write checkpoints
+    trainer = OnPolicyTrainer.__new__(OnPolicyTrainer)
+    trainer.checkpoints_queue = checkpoints_queue
+    trainer.checkpoint_executor = None
+    trainer.checkpoint_futures = []
+    trainer.max_pending_checkpoints = 1
+    return trainer
+
+
+class TestCheckpointWrites(object):
+    def test_write_rename_post_order(self, tmpdir, monkeypatch):
+        events = []
+        torch_save = torch.save
+
+        def recording_save(obj, path):
+            events.append(("write", os.path.basename(path)))
+            torch_save(obj, path)
+
+        def recording_replace(src, dst):
+            events.append(("rename", os.path.basename(src), os.path.basename(dst)))
+            os.rename(src, dst)
+
+        monkeypatch.setattr(engine_module.torch, "save", recording_save)
+        monkeypatch.setattr(engine_module.os, "replace", recording_replace)
+
+        trainer = make_trainer(EventsQueue(events))
+        paths = [str(tmpdir.join("ckpt_{}.pt".format(it))) for it in range(2)]
+        for it, path in enumerate(paths):
+            trainer._submit_checkpoint_write({"step": it}, path)
+        trainer.wait_for_checkpoints()
+        trainer.checkpoint_executor.shutdown(wait=True)
+
+        expected = []
+        for path in paths:
+            name = os.path.basename(path)
+            expected += [
+                ("write", name + ".tmp"),
+                ("rename", name + ".tmp", name),
+                ("post", "eval", True, False),
+            ]
+        assert events == expected
+        assert [torch.load(path)["step"] for path in paths] == [0, 1]
+
+    def test_writer_errors_reach_caller(self, tmpdir):
+        trainer = make_trainer()
+        missing_dir_path = str(tmpdir.join("missing", "ckpt.pt"))
+
+        trainer._submit_checkpoint_write({"step": 0}, missing_dir_path)
+        with pytest.raises(Exception):
+            trainer.wait_for_checkpoints()
+
+        # Also raised when saving the next checkpoint, if the write already failed
+        trainer._submit_checkpoint_write({"step": 1}, missing_dir_path)
+        trainer.checkpoint_futures[0].exception()  # wait for the write
+        with pytest.raises(Exception):
+            trainer._check_checkpoint_writes(
+                max_pending=trainer.max_pending_checkpoints
+            )
+
+        trainer.checkpoint_executor.shutdown(wait=True)
+
+    def test_pending_snapshots_are_capped(self, tmpdir, monkeypatch):
+        release = threading.Event()
+        torch_save = torch.save
+
+        def blocked_save(obj, path):
+            release.wait()
+            torch_save(obj, path)
+
+        monkeypatch.setattr(engine_module.torch, "save", blocked_save)
+
+        trainer = make_trainer()
+        trainer._submit_checkpoint_write({"step": 0}, str(tmpdir.join("ckpt_0.pt")))
+
+        # A new snapshot must wait for the pending write
+        waiter = threading.Thread(
+            target=trainer._check_checkpoint_writes,
+            kwargs=dict(max_pending=trainer.max_pending_checkpoints),
+        )
+        waiter.start()
+        time.sleep(0.2)
+        assert waiter.is_alive()
+
+        release.set()
+        waiter.join(timeout=10)
+        assert not waiter.is_alive()
+        assert len(trainer.checkpoint_futures) == 0
+        assert os.path.exists(str(tmpdir.join("ckpt_0.pt")))
+
+        trainer.checkpoint_executor.shutdown(wait=True)
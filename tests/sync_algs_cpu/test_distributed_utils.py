@@ -0,0 +1,200 @@
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch import nn, optim
+
+from core.algorithms.onpolicy_sync.distributed_utils import (
+    GradientBucketReducer,
+    WorkersDoneWatcher,
+)
+from core.algorithms.onpolicy_sync.engine import OnPolicyTrainer
+from utils.system import find_free_port
+from utils.timing_utils import TimerRegistry
+
+NUM_WORKERS = 2
+BATCHES_PER_EPOCH = [3, 5]  # per worker
+UPDATES_PER_CALL = 4
+NUM_CALLS = 3
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    start = time.time()
+    while not condition():
+        if time.time() - start > timeout:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class RecordingLoss(object):
+    """Sum of the model's outputs, recording the (epoch, batch) indices of
+    the batches it's given."""
+
+    def __init__(self):
+        self.seen = []
+
+    def loss(self, model, batch, step_count, memory):
+        self.seen.append(tuple(int(x) for x in batch["index"]))
+        return model(batch["data"]).sum(), {}, memory, batch["data"].shape[0]
+
+
+def offpolicy_worker(worker_id: int, port: int, results: mp.Queue):
+    dist.init_process_group(
+        backend="gloo",
+        init_method="tcp://127.0.0.1:{}".format(port),
+        world_size=NUM_WORKERS,
+        rank=worker_id,
+    )
+    torch.manual_seed(0)
+
+    model = nn.Linear(2, 1)
+    loss = RecordingLoss()
+    stage = SimpleNamespace(
+        offpolicy_named_loss_weights={"loss": 1.0},
+        offpolicy_memory={},
+        offpolicy_epochs=None,
+        steps_taken_in_stage=0,
+        offpolicy_steps_taken_in_stage=0,
+    )
+
+    # Only the attributes used by off-policy updates
+    trainer = OnPolicyTrainer.__new__(OnPolicyTrainer)
+    trainer.is_distributed = True
+    trainer.device = torch.device("cpu")
+    trainer.timers = TimerRegistry()
+    trainer.actor_critic = model
+    trainer.optimizer = optim.SGD(model.parameters(), lr=0.01)
+    trainer.gradient_reducer = GradientBucketReducer(model.parameters())
+    trainer.tracking_info = defaultdict(list)
+    trainer.training_pipeline = SimpleNamespace(
+        current_stage=stage,
+        current_stage_offpolicy_losses={"loss": loss},
+        current_stage_index=0,
+        max_grad_norm=1.0,
+    )
+
+    def make_offpolicy_iterator(data_iterator_builder):
+        stage.offpolicy_epochs = (
+            0 if stage.offpolicy_epochs is None else stage.offpolicy_epochs + 1
+        )
+        return data_iterator_builder(stage.offpolicy_epochs)
+
+    trainer.make_offpolicy_iterator = make_offpolicy_iterator
+
+    def builder(epoch: int):
+        return iter(
+            {
+                "index": torch.tensor([epoch, it]),
+                "data": torch.ones(worker_id + 1, 2),  # batch size differs per worker
+            }
+            for it in range(BATCHES_PER_EPOCH[worker_id])
+        )
+
+    data_iterator = None
+    for _ in range(NUM_CALLS):
+        data_iterator = trainer.offpolicy_update(
+            updates=UPDATES_PER_CALL,
+            data_iterator=data_iterator,
+            data_iterator_builder=builder,
+        )
+
+    flags = [trainer.any_worker_flag(worker_id == it) for it in range(NUM_WORKERS)]
+    flags.append(trainer.any_worker_flag(False))
+
+    results.put(
+        (
+            worker_id,
+            loss.seen,
+            stage.offpolicy_steps_taken_in_stage,
+            flags,
+            [p.detach().clone() for p in model.parameters()],
+        )
+    )
+    dist.destroy_process_group()
+
+
+class TestDistributedUtils(object):
+    def test_workers_done_watcher(self):
+        port = find_free_port()
+        server = dist.TCPStore("127.0.0.1", port, 1, True)
+        store = dist.PrefixStore("num_workers_done", server)
+        store.set("done", str(0))
+
+        watcher = WorkersDoneWatcher("127.0.0.1", port, 1, poll_interval=0.001)
+        assert watcher.num_done == 0
+
+        try:
+            # Polls between reset and pause
+            watcher.reset()
+            store.add("done", 2)
+            assert wait_for(lambda: watcher.num_done == 2)
+
+            watcher.pause()
+            time.sleep(0.05)  # lets a read in flight complete
+            store.add("done", 1)
+            time.sleep(0.1)
+            assert watcher.num_done == 2
+
+            # Starts from scratch after resetting
+            watcher.reset()
+            assert watcher.num_done == 0
+            assert wait_for(lambda: watcher.num_done == 3)
+        finally:
+            thread = watcher._thread
+            watcher.stop()
+
+        assert not thread.is_alive()
+
+        # Also stops when paused
+        watcher = WorkersDoneWatcher("127.0.0.1", port, 1, poll_interval=0.001)
+        watcher.reset()
+        watcher.pause()
+        thread = watcher._thread
+        watcher.stop()
+        assert not thread.is_alive()
+
+    def test_offpolicy_epochs_end_together(self):
+        ctx = mp.get_context("spawn")
+        results = ctx.Queue()
+        port = find_free_port()
+        workers = [
+            ctx.Process(target=offpolicy_worker, args=(it, port, results))
+            for it in range(NUM_WORKERS)
+        ]
+        for worker in workers:
+            worker.start()
+
+        worker_results = {}
+        for _ in range(NUM_WORKERS):
+            worker_id, *rest = results.get(timeout=60)
+            worker_results[worker_id] = rest
+        for worker in workers:
+            worker.join(timeout=30)
+            assert worker.exitcode == 0
+
+        seen = [worker_results[it][0] for it in range(NUM_WORKERS)]
+        steps = [worker_results[it][1] for it in range(NUM_WORKERS)]
+        flags = [worker_results[it][2] for it in range(NUM_WORKERS)]
+        params = [worker_results[it][3] for it in range(NUM_WORKERS)]
+
+        # Epochs end for all workers as soon as the shortest one ends
+        epoch_len = min(BATCHES_PER_EPOCH)
+        num_updates = UPDATES_PER_CALL * NUM_CALLS
+        expected = [(it // epoch_len, it % epoch_len) for it in range(num_updates)]
+        assert seen[0] == seen[1] == expected
+
+        # Steps are summed across workers
+        assert (
+            steps[0]
+            == steps[1]
+            == num_updates * sum(it + 1 for it in range(NUM_WORKERS))
+        )
+
+        assert flags[0] == flags[1] == [True] * NUM_WORKERS + [False]
+
+        for p0, p1 in zip(*params):
+            assert torch.allclose(p0, p1)
@@ -0,0 +1,91 @@
+import glob
+import os
+
+import core.algorithms.onpolicy_sync.runner as runner_module
+from core.algorithms.onpolicy_sync.runner import OnPolicyRunner
+from plugins.synthetic_plugin.configs.synthetic_base import (
+    SyntheticBaseExperimentConfig,
+)
+
+
+class EvalCacheExperimentConfig(SyntheticBaseExperimentConfig):
+    IMAGE_SIZE = 8
+    MIN_EPISODE_LENGTH = 5
+    MAX_EPISODE_LENGTH = 20
+    STEP_LATENCY = None
+    RESET_LATENCY = None
+
+    NUM_TRAIN_SAMPLERS = 2
+    NUM_TEST_SAMPLERS = 2
+    NUM_TEST_TASKS_PER_SAMPLER = 3
+
+    TOTAL_STEPS = 2 * 64 * 2
+
+    @classmethod
+    def tag(cls) -> str:
+        return "EvalCache"
+
+
+class TestEvalCache(object):
+    def test_hit_miss_and_invalidation(self, tmpdir, monkeypatch):
+        cfg = EvalCacheExperimentConfig()
+        output_dir = tmpdir.mkdir("experiment_output")
+
+        start_time_str = OnPolicyRunner(
+            config=cfg, output_dir=output_dir, loaded_config_src_files=None, seed=1
+        ).start_train(max_sampler_processes_per_worker=1)
+
+        git_state = {"diff": "diff_a"}
+        monkeypatch.setattr(
+            runner_module,
+            "get_git_diff_of_project",
+            lambda: ("abcdef0", git_state["diff"]),
+        )
+        config_src = tmpdir.join("config_src.py")
+        config_src.write("TOTAL_STEPS = 256\n")
+
+        def run_test():
+            test_runner = OnPolicyRunner(
+                config=cfg,
+                output_dir=output_dir,
+                loaded_config_src_files={str(config_src): "config_src"},
+                seed=1,
+                mode="test",
+            )
+            results = test_runner.start_test(
+                experiment_date=start_time_str, max_sampler_processes_per_worker=1
+            )
+            return results, len(test_runner.processes["test"])
+
+        def num_cache_entries():
+            return len(
+                glob.glob(
+                    os.path.join(str(output_dir), "**", "eval_cache", "*.json"),
+                    recursive=True,
+                )
+            )
+
+        # Miss: all checkpoints are evaluated and added to the cache
+        results, num_testers = run_test()
+        num_checkpoints = len(results)
+        assert num_checkpoints > 1
+        assert num_testers == 1
+        assert num_cache_entries() == num_checkpoints
+
+        # Hit: no tester is started and the results are the same
+        cached_results, num_testers = run_test()
+        assert num_testers == 0
+        assert [
+            (r["training_steps"], r["num_tasks"], r["reward"]) for r in cached_results
+        ] == [(r["training_steps"], r["num_tasks"], r["reward"]) for r in results]
+
+        # Changes in the code invalidate the cache
+        git_state["diff"] = "diff_b"
+        _, num_testers = run_test()
+        assert num_testers == 1
+        assert num_cache_entries() == 2 * num_checkpoints
+
+        config_src.write("TOTAL_STEPS = 512\n")
+        _, num_testers = run_test()
+        assert num_testers == 1
+        assert num_cache_entries() == 3 * num_checkpoints
@@ -0,0 +1,127 @@
+import torch
+import torch.distributed as dist  # type: ignore
+import torch.multiprocessing as mp  # type: ignore
+from torch import nn
+
+from core.algorithms.onpolicy_sync.distributed_utils import GradientBucketReducer
+from utils.system import find_free_port
+
+
+class SmallRecurrentModel(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.embedding = nn.Embedding(10, 8)
+        self.gru = nn.GRU(8, 16)
+        self.actor = nn.Linear(16, 4)
+        self.critic = nn.Linear(16, 1)
+        self.unused = nn.Linear(16, 16)  # never receives gradients
+        self.only_in_worker_0 = nn.Linear(16, 1)
+
+    def forward(self, x: torch.Tensor, worker_id: int) -> torch.Tensor:
+        out, _ = self.gru(self.embedding(x))
+        loss = self.actor(out).pow(2).mean() + self.critic(out).mean()
+        if worker_id == 0:
+            loss = loss + self.only_in_worker_0(out).mean()
+        return loss
+
+
+def _reduced_grads(worker_id: int, num_workers: int, port: int, bucketed: bool):
+    num_launched_in_backward = 0
+    torch.manual_seed(0)
+    model = SmallRecurrentModel()
+
+    torch.manual_seed(worker_id + 1)
+    x = torch.randint(0, 10, (5, 3))
+
+    extra = torch.tensor([float(worker_id), 1.0], dtype=torch.float64)
+    if bucketed:
+        # Small buckets, to test reductions launched during the backward pass.
+        # Buckets are rebuilt after the first reduction, so we check the second.
+        reducer = GradientBucketReducer(model.parameters(), bucket_size_mb=0.001)
+        for it in range(2):
+            model.zero_grad()
+            reducer.prepare()
+            model(x, worker_id).backward()
+            num_launched_in_backward = len(reducer._works)
+            reducer.reduce(extra_to_reduce=extra if it == 1 else extra.clone())
+    else:
+        model(x, worker_id).backward()
+        for p in model.parameters():
+            if p.requires_grad:
+                if p.grad is None:
+                    p.grad = torch.zeros_like(p.data)
+                dist.all_reduce(p.grad)
+        dist.all_reduce(extra)
+
+    return [p.grad.clone() for p in model.parameters()], extra, num_launched_in_backward
+
+
+def _worker(
+    worker_id: int,
+    num_workers: int,
+    port: int,
+    post_accumulate_grad_hooks: bool,
+    results: mp.Queue,
+):
+    GradientBucketReducer.USE_POST_ACCUMULATE_GRAD_HOOKS = post_accumulate_grad_hooks
+    store = dist.TCPStore("127.0.0.1", port, num_workers, worker_id == 0)
+    dist.init_process_group(
+        backend="gloo", store=store, rank=worker_id, world_size=num_workers
+    )
+    try:
+        reference_grads, reference_extra, _ = _reduced_grads(
+            worker_id, num_workers, port, bucketed=False
+        )
+        grads, extra, num_launched_in_backward = _reduced_grads(
+            worker_id, num_workers, port, bucketed=True
+        )
+        results.put(
+            (
+                worker_id,
+                all(torch.allclose(g, rg) for g, rg in zip(grads, reference_grads)),
+                torch.equal(extra, reference_extra),
+                num_launched_in_backward > 0,
+            )
+        )
+    finally:
+        dist.destroy_process_group()
+
+
+def _run_workers(post_accumulate_grad_hooks: bool):
+    num_workers = 2
+    port = find_free_port()
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(
+            target=_worker,
+            args=(wid, num_workers, port, post_accumulate_grad_hooks, results),
+        )
+        for wid in range(num_workers)
+    ]
+    for w in workers:
+        w.start()
+
+    outputs = sorted(results.get(timeout=120) for _ in range(num_workers))
+    for w in workers:
+        w.join()
+    return outputs
+
+
+class TestGradientBucketReducer(object):
+    def test_matches_per_parameter_all_reduce(self):
+        # AccumulateGrad hooks (the only ones in older versions of pytorch) and,
+        # if available, post accumulate grad hooks
+        for post_accumulate_grad_hooks in sorted(
+            {False, GradientBucketReducer.USE_POST_ACCUMULATE_GRAD_HOOKS}
+        ):
+            outputs = _run_workers(post_accumulate_grad_hooks)
+            assert [output[:3] for output in outputs] == [
+                (wid, True, True) for wid in range(2)
+            ], "Bucketed gradient reduction doesn't match the per-parameter one"
+            # Some buckets are reduced during the backward pass
+            assert all(output[3] for output in outputs)
+
+
+if __name__ == "__main__":
+    TestGradientBucketReducer().test_matches_per_parameter_all_reduce()
@@ -0,0 +1,206 @@
+import glob
+import json
+import os
+import queue
+import re
+from typing import Any, Dict, List, Optional
+
+import torch
+import torch.multiprocessing as mp
+
+from core.algorithms.onpolicy_sync.engine import OnPolicyTrainer
+from core.algorithms.onpolicy_sync.runner import OnPolicyRunner
+from plugins.synthetic_plugin.configs.synthetic_base import (
+    SyntheticBaseExperimentConfig,
+)
+from utils.experiment_utils import LoggingPackage
+from utils.system import find_free_port
+
+NUM_NODES = 2
+
+
+class MultiNodeExperimentConfig(SyntheticBaseExperimentConfig):
+    """One worker per node, recording the arguments of every train sampler in
+    `record_dir`."""
+
+    IMAGE_SIZE = 8
+    MIN_EPISODE_LENGTH = 5
+    MAX_EPISODE_LENGTH = 20
+    STEP_LATENCY = None
+    RESET_LATENCY = None
+
+    NUM_TRAIN_SAMPLERS = 2
+    TOTAL_STEPS = 3 * 64 * NUM_NODES * 2
+    NUM_WORKERS = 1
+
+    def __init__(self, record_dir: str):
+        self.record_dir = record_dir
+
+    @classmethod
+    def tag(cls) -> str:
+        return "MultiNode"
+
+    @classmethod
+    def machine_params(cls, mode="train", **kwargs) -> Dict[str, Any]:
+        if mode == "train":
+            return {
+                "nprocesses": [cls.NUM_TRAIN_SAMPLERS] * cls.NUM_WORKERS,
+                "devices": [],
+            }
+        return super().machine_params(mode=mode, **kwargs)
+
+    def train_task_sampler_args(
+        self,
+        process_ind: int,
+        total_processes: int,
+        devices: Optional[List[int]] = None,
+        seeds: Optional[List[int]] = None,
+        deterministic_cudnn: bool = False,
+    ) -> Dict[str, Any]:
+        args = super().train_task_sampler_args(
+            process_ind=process_ind, total_processes=total_processes, seeds=seeds
+        )
+        with open(
+            os.path.join(self.record_dir, "{}.json".format(process_ind)), "w"
+        ) as f:
+            json.dump(
+                {
+                    "node_rank": int(os.environ.get("TEST_NODE_RANK", 0)),
+                    "pid": os.getpid(),
+                    "total_processes": total_processes,
+                    "seed": args["seed"],
+                },
+                f,
+            )
+        return args
+
+
+class SingleNodeExperimentConfig(MultiNodeExperimentConfig):
+    """All workers of `MultiNodeExperimentConfig` in a single node."""
+
+    NUM_WORKERS = NUM_NODES
+
+
+def run_node(node_rank: int, port: int, output_dir: str, record_dir: str):
+    os.environ["TEST_NODE_RANK"] = str(node_rank)
+    OnPolicyRunner(
+        config=MultiNodeExperimentConfig(record_dir),
+        output_dir=output_dir,
+        loaded_config_src_files=None,
+        seed=1,
+        node_rank=node_rank,
+        num_nodes=NUM_NODES,
+        distributed_port=port,
+    ).start_train(max_sampler_processes_per_worker=1)
+
+
+def read_records(record_dir: str) -> Dict[int, Dict[str, Any]]:
+    records = {}
+    for path in glob.glob(os.path.join(record_dir, "*.json")):
+        with open(path, "r") as f:
+            records[int(os.path.basename(path)[: -len(".json")])] = json.load(f)
+    return records
+
+
+def checkpoints_summary(output_dir: str):
+    checkpoints = sorted(
+        glob.glob(os.path.join(output_dir, "**", "*.pt"), recursive=True)
+    )
+    stages_and_steps = [
+        tuple(
+            int(x)
+            for x in re.search(
+                r"__stage_(\d+)__steps_(\d+)\.pt$", os.path.basename(cp)
+            ).groups()
+        )
+        for cp in checkpoints
+    ]
+    last = torch.load(checkpoints[-1], map_location="cpu")
+    return stages_and_steps, last["total_steps"]
+
+
+def make_trainer(
+    worker_id: int, store: torch.distributed.PrefixStore  # type:ignore
+) -> OnPolicyTrainer:
+    # Only the attributes used to send logging packages, with one worker per node
+    trainer = OnPolicyTrainer.__new__(OnPolicyTrainer)
+    trainer.worker_id = worker_id
+    trainer.num_workers = NUM_NODES
+    trainer.num_local_workers = 1
+    trainer.results_queue = queue.Queue()
+    trainer.forwarded_logging_pkgs = store
+    trainer.num_logging_pkgs_sent = 0
+    return trainer
+
+
+class TestMultiNode(object):
+    def test_logging_packages_forwarded_to_primary_node(self):
+        store = torch.distributed.PrefixStore(  # type:ignore
+            "logging_pkgs",
+            torch.distributed.TCPStore(  # type:ignore
+                "127.0.0.1", find_free_port(), 1, True
+            ),
+        )
+        trainers = [make_trainer(worker_id, store) for worker_id in range(NUM_NODES)]
+
+        for training_steps in [64, 128]:
+            # Workers in other nodes don't wait for the primary one
+            for trainer in trainers[::-1]:
+                pkg = LoggingPackage(mode="train", training_steps=training_steps)
+                pkg.add_train_info_dict({"worker_id": trainer.worker_id}, n=1)
+                trainer.send_logging_package(pkg)
+
+        for trainer in trainers[1:]:
+            assert trainer.results_queue.empty()
+        received = []
+        while not trainers[0].results_queue.empty():
+            pkg = trainers[0].results_queue.get()
+            received.append(
+                (pkg.training_steps, pkg.train_info_tracker.means()["worker_id"])
+            )
+        assert received == [(64, 0), (64, 1), (128, 0), (128, 1)]
+
+    def test_two_nodes_on_localhost(self, tmpdir):
+        output_dir = str(tmpdir.mkdir("multi_node"))
+        record_dir = str(tmpdir.mkdir("multi_node_records"))
+
+        ctx = mp.get_context("spawn")
+        port = find_free_port()
+        nodes = [
+            ctx.Process(target=run_node, args=(node_rank, port, output_dir, record_dir))
+            for node_rank in range(NUM_NODES)
+        ]
+        for node in nodes:
+            node.start()
+        for node in nodes:
+            node.join(timeout=300)
+            assert node.exitcode == 0
+
+        single_node_dir = str(tmpdir.mkdir("single_node"))
+        single_node_record_dir = str(tmpdir.mkdir("single_node_records"))
+        OnPolicyRunner(
+            config=SingleNodeExperimentConfig(single_node_record_dir),
+            output_dir=single_node_dir,
+            loaded_config_src_files=None,
+            seed=1,
+        ).start_train(max_sampler_processes_per_worker=1)
+
+        # Each node's worker gets its own (global) range of samplers
+        num_samplers = MultiNodeExperimentConfig.NUM_TRAIN_SAMPLERS
+        records = read_records(record_dir)
+        assert sorted(records.keys()) == list(range(NUM_NODES * num_samplers))
+        for process_ind, record in records.items():
+            assert record["node_rank"] == process_ind // num_samplers
+            assert record["total_processes"] == NUM_NODES * num_samplers
+        assert len(set(record["pid"] for record in records.values())) == NUM_NODES
+
+        # Same samplers (and seeds) as with all workers in one node
+        single_node_records = read_records(single_node_record_dir)
+        assert {k: r["seed"] for k, r in records.items()} == {
+            k: r["seed"] for k, r in single_node_records.items()
+        }
+
+        # Steps are counted over the combined world size
+        stages_and_steps, total_steps = checkpoints_summary(output_dir)
+        assert total_steps == MultiNodeExperimentConfig.TOTAL_STEPS
+        assert (stages_and_steps, total_steps) == checkpoints_summary(single_node_dir)
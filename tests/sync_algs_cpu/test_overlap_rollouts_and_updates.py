@@ -0,0 +1,115 @@
+import glob
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import torch
+from torch import optim
+
+from core.algorithms.onpolicy_sync.losses.ppo import PPO, PPOConfig
+from core.algorithms.onpolicy_sync.runner import OnPolicyRunner
+from plugins.synthetic_plugin.configs.synthetic_base import (
+    SyntheticBaseExperimentConfig,
+)
+from utils.experiment_utils import Builder, PipelineStage, TrainingPipeline
+
+
+class OverlapExperimentConfig(SyntheticBaseExperimentConfig):
+    """Two stages, forced scene advances and a train sampler running out of
+    tasks (and being paused) early on."""
+
+    IMAGE_SIZE = 8
+    MIN_EPISODE_LENGTH = 5
+    MAX_EPISODE_LENGTH = 20
+    STEP_LATENCY = None
+    RESET_LATENCY = None
+
+    NUM_TRAIN_SAMPLERS = 3
+    NUM_STEPS = 16
+    STAGE_STEPS = 200
+
+    OVERLAP = False
+
+    @classmethod
+    def tag(cls) -> str:
+        return "Overlap" if cls.OVERLAP else "NoOverlap"
+
+    @classmethod
+    def training_pipeline(cls, **kwargs) -> TrainingPipeline:
+        return TrainingPipeline(
+            named_losses=dict(ppo_loss=PPO(**PPOConfig)),  # type:ignore
+            pipeline_stages=[
+                PipelineStage(loss_names=["ppo_loss"], max_stage_steps=cls.STAGE_STEPS)
+                for _ in range(2)
+            ],
+            optimizer_builder=Builder(optim.Adam, dict(lr=3e-4)),
+            num_mini_batch=1,
+            update_repeats=2,
+            max_grad_norm=0.5,
+            num_steps=cls.NUM_STEPS,
+            gamma=0.99,
+            use_gae=True,
+            gae_lambda=0.95,
+            advance_scene_rollout_period=3,
+            save_interval=64,
+            metric_accumulate_interval=1,
+            overlap_rollouts_and_updates=cls.OVERLAP,
+        )
+
+    def _get_sampler_args(
+        self, process_ind: int, mode: str, seeds: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        args = super()._get_sampler_args(process_ind=process_ind, mode=mode)
+        if mode == "train" and process_ind == self.NUM_TRAIN_SAMPLERS - 1:
+            # Paused after its first episode (within the first two rollouts)
+            args["max_tasks"] = 1
+        return args
+
+
+class OverlapOnExperimentConfig(OverlapExperimentConfig):
+    OVERLAP = True
+
+
+def train_and_get_checkpoints(cfg, output_dir):
+    OnPolicyRunner(
+        config=cfg, output_dir=output_dir, loaded_config_src_files=None, seed=1
+    ).start_train(max_sampler_processes_per_worker=1)
+
+    checkpoints = sorted(
+        glob.glob(os.path.join(str(output_dir), "**", "*.pt"), recursive=True)
+    )
+    stages_and_steps = [
+        tuple(
+            int(x)
+            for x in re.search(
+                r"__stage_(\d+)__steps_(\d+)\.pt$", os.path.basename(cp)
+            ).groups()
+        )
+        for cp in checkpoints
+    ]
+    last = torch.load(checkpoints[-1], map_location="cpu")
+    return stages_and_steps, last["total_steps"], last["training_pipeline_state_dict"]
+
+
+class TestOverlapRolloutsAndUpdates(object):
+    def test_same_steps_and_stages_as_without_overlap(self, tmpdir):
+        no_overlap = train_and_get_checkpoints(
+            OverlapExperimentConfig(), tmpdir.mkdir("no_overlap")
+        )
+        overlap = train_and_get_checkpoints(
+            OverlapOnExperimentConfig(), tmpdir.mkdir("overlap")
+        )
+
+        stages_and_steps, total_steps, pipeline_state = no_overlap
+
+        # Both stages were trained, with fewer samplers after one was paused
+        assert {stage for stage, _ in stages_and_steps} == {0, 1}
+        num_samplers = OverlapExperimentConfig.NUM_TRAIN_SAMPLERS
+        assert (
+            total_steps
+            < pipeline_state["rollout_count"]
+            * num_samplers
+            * OverlapExperimentConfig.NUM_STEPS
+        )
+
+        assert overlap == no_overlap
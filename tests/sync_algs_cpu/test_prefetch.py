@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from core.algorithms.offpolicy_sync.prefetch import PrefetchingIterator
+
+
+def wait_for_full_queue(iterator: PrefetchingIterator, timeout: float = 10.0):
+    start = time.time()
+    while iterator._queue.qsize() < iterator.num_batches:
+        assert time.time() - start < timeout, "Prefetching queue never filled"
+        time.sleep(0.01)
+
+
+class TestPrefetchingIterator(object):
+    def test_batches_drained_before_stop_iteration(self):
+        iterator = PrefetchingIterator(iter(range(5)), num_batches=2)
+        assert list(iterator) == list(range(5))
+        # Exhausted iterators keep raising StopIteration
+        with pytest.raises(StopIteration):
+            next(iterator)
+        iterator.close()
+
+    def test_exceptions_reraised_in_consumer(self):
+        def failing():
+            yield 0
+            yield 1
+            raise ValueError("corrupt batch")
+
+        iterator = PrefetchingIterator(failing(), num_batches=4)
+        assert next(iterator) == 0
+        assert next(iterator) == 1
+        with pytest.raises(ValueError, match="corrupt batch"):
+            next(iterator)
+        with pytest.raises(StopIteration):
+            next(iterator)
+        iterator.close()
+
+    def test_close_stops_thread_blocked_on_full_queue(self):
+        produced = []
+
+        def endless():
+            while True:
+                produced.append(len(produced))
+                yield produced[-1]
+
+        iterator = PrefetchingIterator(endless(), num_batches=2)
+        wait_for_full_queue(iterator)
+        # One more batch built, waiting for space in the queue
+        time.sleep(0.2)
+        assert len(produced) == iterator.num_batches + 1
+
+        closer = threading.Thread(target=iterator.close)
+        closer.start()
+        closer.join(timeout=10)
+        assert not closer.is_alive()
+        assert not iterator._thread.is_alive()
+        with pytest.raises(StopIteration):
+            next(iterator)
+
+    def test_stats(self):
+        def slow():
+            for it in range(4):
+                if it == 3:
+                    time.sleep(0.2)
+                yield it
+
+        iterator = PrefetchingIterator(slow(), num_batches=3)
+        assert iterator.pop_stats() == {}
+
+        wait_for_full_queue(iterator)
+        assert [next(iterator) for _ in range(3)] == [0, 1, 2]
+        stats = iterator.pop_stats()
+        # 3, 2 and 1 batches ready
+        assert stats["queue_depth"] == pytest.approx(2.0)
+        assert stats["stall_ms"] < 100
+
+        # Waits for the slow batch
+        assert next(iterator) == 3
+        stats = iterator.pop_stats()
+        assert stats["queue_depth"] == 0
+        assert stats["stall_ms"] > 50
+        assert iterator.pop_stats() == {}
+        iterator.close()
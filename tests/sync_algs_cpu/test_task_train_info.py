@@ -0,0 +1,52 @@
+import queue
+
+import pytest
+
+from core.algorithms.onpolicy_sync.engine import OnPolicyTrainer
+from core.algorithms.onpolicy_sync.vector_sampled_tasks import TASK_TRAIN_INFO_KEY
+from utils.experiment_utils import LoggingPackage
+
+
+def make_trainer(mode: str = "train") -> OnPolicyTrainer:
+    # Only the attributes used to aggregate task metrics
+    trainer = OnPolicyTrainer.__new__(OnPolicyTrainer)
+    trainer.mode = mode
+    trainer.single_process_metrics_queue = queue.Queue()
+    trainer.episode_metrics_writer = None
+    return trainer
+
+
+class TestTaskTrainInfo(object):
+    def test_task_train_info_is_logged_as_train_info(self):
+        trainer = make_trainer()
+        for hit_ratio in [0.5, 1.0]:
+            trainer.single_process_metrics_queue.put(
+                {
+                    "success": True,
+                    "ep_length": 10,
+                    TASK_TRAIN_INFO_KEY: {"distance_cache/hit_ratio": hit_ratio},
+                }
+            )
+        trainer.single_process_metrics_queue.put({"success": False, "ep_length": 20})
+
+        pkg = trainer.aggregate_task_metrics(
+            LoggingPackage(mode="train", training_steps=0)
+        )
+        assert pkg.num_non_empty_metrics_dicts_added == 3
+        assert pkg.metrics_tracker.means() == {"success": 2 / 3, "ep_length": 40 / 3}
+        assert pkg.train_info_tracker.means() == {
+            "distance_cache/hit_ratio": pytest.approx(0.75)
+        }
+        assert pkg.train_info_tracker.counts() == {"distance_cache/hit_ratio": 2}
+
+    def test_task_train_info_is_dropped_when_testing(self):
+        trainer = make_trainer(mode="test")
+        trainer.single_process_metrics_queue.put(
+            {"success": True, TASK_TRAIN_INFO_KEY: {"distance_cache/hit_ratio": 1.0}}
+        )
+
+        pkg = trainer.aggregate_task_metrics(
+            LoggingPackage(mode="test", training_steps=0)
+        )
+        assert pkg.metrics_tracker.means() == {"success": 1.0}
+        assert pkg.train_info_tracker.means() == {}
@@ -0,0 +1,126 @@
+import numpy as np
+
+from core.algorithms.onpolicy_sync.runner import OnPolicyRunner
+from plugins.synthetic_plugin.configs.synthetic_base import (
+    SyntheticBaseExperimentConfig,
+)
+from plugins.synthetic_plugin.synthetic_environment import StepLatency
+from plugins.synthetic_plugin.synthetic_sensors import make_synthetic_image_sensors
+from plugins.synthetic_plugin.synthetic_tasks import SyntheticTaskSampler
+
+
+def _run_episodes(sampler: SyntheticTaskSampler, num_episodes: int):
+    episodes = []
+    for _ in range(num_episodes):
+        task = sampler.next_task()
+        while not task.is_done():
+            task.step(0)
+        episodes.append(
+            (task.task_info["episode_length"], task.num_steps_taken(), task.metrics())
+        )
+    return episodes
+
+
+class TinySyntheticExperimentConfig(SyntheticBaseExperimentConfig):
+    IMAGE_SIZE = 8
+    MIN_EPISODE_LENGTH = 5
+    MAX_EPISODE_LENGTH = 20
+    STEP_LATENCY = None
+    RESET_LATENCY = None
+
+    NUM_TRAIN_SAMPLERS = 2
+    NUM_TEST_SAMPLERS = 2
+    NUM_TEST_TASKS_PER_SAMPLER = 3
+
+    TOTAL_STEPS = 4 * 64 * 2
+
+    @classmethod
+    def tag(cls) -> str:
+        return "TinySynthetic"
+
+
+class TestSyntheticTasks(object):
+    def test_step_latency(self):
+        latency = StepLatency(
+            mean=0.01,
+            distribution="lognormal",
+            straggler_prob=0.1,
+            straggler_scale=20.0,
+            max_latency=1.0,
+        )
+
+        samples = [latency.sample(np.random.RandomState(0)) for _ in range(2)]
+        assert samples[0] == samples[1]
+
+        rng = np.random.RandomState(1)
+        samples = [latency.sample(rng) for _ in range(5000)]
+        regular = [s for s, is_straggler in samples if not is_straggler]
+        stragglers = [s for s, is_straggler in samples if is_straggler]
+
+        assert 400 < len(stragglers) < 600
+        assert abs(np.mean(regular) - 0.01) < 0.001
+        assert min(stragglers) >= 0.2
+        assert max(stragglers) <= 1.0
+
+    def test_sampler(self):
+        sensors = make_synthetic_image_sensors(
+            num_sensors=2, height=8, width=6, channels=1, dtype=np.float32
+        )
+        sampler = SyntheticTaskSampler(
+            sensors=sensors,
+            max_steps=30,
+            num_actions=3,
+            min_episode_length=5,
+            max_episode_length=40,
+            step_latency=StepLatency(mean=0.0, straggler_prob=0.2),
+            max_tasks=20,
+            seed=1,
+        )
+
+        task = sampler.next_task()
+        observations = task.get_observations()
+        assert set(observations.keys()) == {"synthetic_0", "synthetic_1"}
+        assert observations["synthetic_0"].shape == (8, 6, 1)
+        assert observations["synthetic_0"].dtype == np.float32
+        assert task.action_space.n == 3
+
+        sampler.reset()
+        episodes = _run_episodes(sampler, 19)
+        assert sampler.length == 1
+        for episode_length, num_steps, metrics in episodes:
+            assert 5 <= episode_length <= 40
+            assert num_steps == min(episode_length, 30)
+            assert metrics["ep_length"] == num_steps
+
+        # Same seed, same episodes and stragglers
+        sampler.reset()
+        assert _run_episodes(sampler, 19) == episodes
+        assert sum(metrics["stragglers"] for _, _, metrics in episodes) > 0
+
+    def test_train_and_test(self, tmpdir):
+        cfg = TinySyntheticExperimentConfig()
+        output_dir = tmpdir.mkdir("experiment_output")
+
+        train_runner = OnPolicyRunner(
+            config=cfg, output_dir=output_dir, loaded_config_src_files=None, seed=1
+        )
+        start_time_str = train_runner.start_train(max_sampler_processes_per_worker=1)
+
+        test_runner = OnPolicyRunner(
+            config=cfg,
+            output_dir=output_dir,
+            loaded_config_src_files=None,
+            seed=1,
+            mode="test",
+        )
+        test_results = test_runner.start_test(
+            experiment_date=start_time_str, max_sampler_processes_per_worker=1
+        )
+
+        assert len(test_results) > 1
+        assert test_results[-1]["training_steps"] == cfg.TOTAL_STEPS
+        for result in test_results:
+            assert (
+                result["num_tasks"]
+                == cfg.NUM_TEST_SAMPLERS * cfg.NUM_TEST_TASKS_PER_SAMPLER
+            )
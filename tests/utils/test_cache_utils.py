@@ -0,0 +1,182 @@
+import gzip
+import json
+
+import pytest
+
+from utils.cache_utils import (
+    DistanceCacheStore,
+    DynamicDistanceCache,
+    GridDistanceCache,
+    get_distance,
+    get_distance_to_object,
+    pos_to_str_for_cache,
+)
+
+Y = 0.9
+TARGETS = [{"x": 0.0, "y": Y, "z": 0.0}, {"x": 1.0, "y": Y, "z": 0.75}]
+OBJECT_TYPES = ["Apple", "Mug"]
+
+
+def make_cache_dict():
+    """Distances from a 5x5 grid (with a hole in the middle) of positions to two
+    target positions and two object types."""
+    cache = {}
+    for ix in range(5):
+        for iz in range(5):
+            if (ix, iz) == (2, 2):
+                continue
+            pos = {"x": 0.25 * ix, "y": Y, "z": 0.25 * iz}
+            entries = {
+                pos_to_str_for_cache(target): {
+                    "distance": abs(pos["x"] - target["x"])
+                    + abs(pos["z"] - target["z"])
+                }
+                for target in TARGETS
+            }
+            for it, object_type in enumerate(OBJECT_TYPES):
+                entries[object_type] = {"distance": ix + 2.0 * iz + it}
+            cache[pos_to_str_for_cache(pos)] = entries
+    return cache
+
+
+class TestGridDistanceCache(object):
+    def test_same_distances_as_cache_dict(self):
+        cache = make_cache_dict()
+        grid_cache = GridDistanceCache.from_cache_dict(cache)
+
+        positions = [
+            {"x": 0.25, "y": Y, "z": 0.75},  # on the grid
+            {"x": 0.3, "y": Y, "z": 0.61},  # rounded to the grid
+            {"x": 0.45, "y": Y, "z": 0.5},  # rounded to the hole, nearest neighbour
+        ]
+        for pos in positions:
+            for target in TARGETS:
+                assert grid_cache.distance(pos, target) == pytest.approx(
+                    get_distance(cache, pos, target)
+                )
+            for object_type in OBJECT_TYPES:
+                assert grid_cache.distance_to_object(pos, object_type) == pytest.approx(
+                    get_distance_to_object(cache, pos, object_type)
+                )
+
+    def test_kd_tree_fallback(self):
+        cache = make_cache_dict()
+        grid_cache = GridDistanceCache.from_cache_dict(cache)
+        assert grid_cache._positions_tree is None
+        assert grid_cache._targets_tree is None
+
+        # Far outside of the grid, resolved to the nearest cached position
+        far_pos = {"x": 3.1, "y": Y, "z": 0.25}
+        assert grid_cache.distance(far_pos, TARGETS[0]) == pytest.approx(
+            get_distance(cache, far_pos, TARGETS[0])
+        )
+        assert grid_cache.distance(far_pos, TARGETS[0]) == pytest.approx(1.0 + 0.25)
+        assert grid_cache._positions_tree is not None
+
+        # Targets not in the cache are replaced by the nearest cached target
+        uncached_target = {"x": 1.1, "y": Y, "z": 0.9}
+        pos = {"x": 0.25, "y": Y, "z": 0.25}
+        assert grid_cache.distance(pos, uncached_target) == pytest.approx(
+            grid_cache.distance(pos, TARGETS[1])
+        )
+        assert grid_cache._targets_tree is not None
+
+        with pytest.raises(RuntimeError):
+            grid_cache.distance_to_object(far_pos, "Apple")
+        with pytest.raises(RuntimeError):
+            grid_cache.distance_to_object(pos, "Television")
+
+    def test_save_and_load(self, tmpdir):
+        cache = make_cache_dict()
+        path = str(tmpdir.join("cache.json.gz"))
+        with gzip.GzipFile(path, "w") as fout:
+            fout.write(json.dumps(cache).encode("utf-8"))
+
+        grid_cache = GridDistanceCache.from_file(path)
+        grid_cache.save(str(tmpdir.join("grid_cache")))
+
+        for mmap in [True, False]:
+            loaded = GridDistanceCache.load(str(tmpdir.join("grid_cache")), mmap=mmap)
+            assert loaded.object_types == grid_cache.object_types
+            assert (loaded.distances == grid_cache.distances).all()
+            pos = {"x": 0.3, "y": Y, "z": 0.61}
+            assert loaded.distance(pos, TARGETS[1]) == grid_cache.distance(
+                pos, TARGETS[1]
+            )
+            assert loaded.distance_to_object(
+                pos, "Mug"
+            ) == grid_cache.distance_to_object(pos, "Mug")
+
+
+class TestDistanceCacheStore(object):
+    def test_round_trip(self, tmpdir):
+        path = str(tmpdir.join("stores", "distances.sqlite"))
+        entries = {
+            ("FloorPlan1", (0.5, 0.9, 1.0), "Apple"): 1.5,
+            ("FloorPlan1", (0.5, 0.9, 1.0), (1.0, 0.9, 0.0)): 2.25,
+            ("FloorPlan2", (0.5, 0.9, 1.0), "Apple"): 3.0,
+        }
+
+        store = DistanceCacheStore(path, flush_interval=2)
+        for key, distance in entries.items():
+            store.put(key, distance)
+        # Pending (not yet committed) entries are also found
+        assert len(store._pending) == 1
+        for key, distance in entries.items():
+            assert store.get(key) == distance
+        assert store.get(("FloorPlan3", (0.5, 0.9, 1.0), "Apple")) is None
+        store.close()
+
+        store = DistanceCacheStore(path)
+        for key, distance in entries.items():
+            assert store.get(key) == distance
+        assert dict(store.items()) == entries
+        store.close()
+
+    def test_shared_by_dynamic_caches(self, tmpdir):
+        path = str(tmpdir.join("distances.sqlite"))
+        native_calls = []
+
+        def native_distance(position, target):
+            native_calls.append((position, target))
+            return position["x"] + position["z"]
+
+        positions = [{"x": 0.25 * it, "y": 0.9, "z": 1.0} for it in range(4)]
+
+        cache = DynamicDistanceCache(rounding=1, store_path=path)
+        for pos in positions:
+            cache.find_distance(pos, "Apple", native_distance, scene_name="FloorPlan1")
+        cache.close()
+        assert len(native_calls) == len(positions)
+
+        # A new cache (e.g. in another sampler or run) reads the store
+        other_cache = DynamicDistanceCache(rounding=1, store_path=path)
+        for pos in positions:
+            assert other_cache.find_distance(
+                pos, "Apple", native_distance, scene_name="FloorPlan1"
+            ) == pytest.approx(pos["x"] + pos["z"])
+        assert len(native_calls) == len(positions)
+        assert other_cache.store_hits == len(positions)
+
+        # Scenes are cached separately
+        other_cache.find_distance(
+            positions[0], "Apple", native_distance, scene_name="FloorPlan2"
+        )
+        assert len(native_calls) == len(positions) + 1
+        other_cache.close()
+
+    def test_save_and_load(self, tmpdir):
+        path = str(tmpdir.join("distances.sqlite"))
+        cache = DynamicDistanceCache(rounding=1)
+        target = {"x": 1.0, "y": 0.9, "z": 0.0}
+        for it in range(3):
+            cache.find_distance(
+                {"x": float(it), "y": 0.9, "z": 0.0}, target, lambda p, t: 2.0 * it
+            )
+        cache.save(path)
+
+        loaded = DynamicDistanceCache(rounding=1, max_size=2)
+        loaded.load(path)
+        # Bounded by max_size
+        assert len(loaded.cache) == 2
+        assert set(loaded.cache.items()) <= set(cache.cache.items())
@@ -0,0 +1,39 @@
+import os
+
+from utils.episode_metrics_utils import EpisodeMetricsWriter, read_episode_metrics
+
+
+class TestEpisodeMetricsUtils(object):
+    def test_flushed_records_are_readable(self, tmpdir):
+        directory = str(tmpdir)
+
+        writer = EpisodeMetricsWriter(directory=directory, mode="test", worker_id=0)
+        for it in range(3):
+            writer.write({"training_steps": 10, "success": it % 2, "task_info": {}})
+        writer.flush()
+        writer.write({"training_steps": 10, "success": 1})  # not flushed
+
+        # Readable while the writer is still open (or if its process died)
+        records = list(read_episode_metrics(directory))
+        assert [r["success"] for r in records] == [0, 1, 0]
+        writer.close()
+
+        # A new writer for the same worker never appends to existing files
+        writer = EpisodeMetricsWriter(directory=directory, mode="test", worker_id=0)
+        writer.write({"training_steps": 20, "success": 1})
+        writer.close()
+        other = EpisodeMetricsWriter(directory=directory, mode="valid", worker_id=0)
+        other.write({"training_steps": 20, "success": 0})
+        other.close()
+
+        assert len(os.listdir(directory)) == 3
+        assert len(list(read_episode_metrics(directory, mode="test"))) == 5
+        assert [
+            r["success"] for r in read_episode_metrics(directory, training_steps=20)
+        ] == [1, 0]
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    TestEpisodeMetricsUtils().test_flushed_records_are_readable(tempfile.mkdtemp())
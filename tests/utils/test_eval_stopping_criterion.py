@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils.experiment_utils import (
+    ConfidenceIntervalStoppingCriterion,
+    ScalarMeanTracker,
+)
+
+
+class TestEvalStoppingCriterion(object):
+    def test_tracker_variances(self):
+        rng = np.random.RandomState(0)
+        values = rng.rand(50)
+
+        tracker = ScalarMeanTracker()
+        for value in values[:40]:
+            tracker.add_scalars({"reward": value})
+
+        expected = values[:40]
+        assert math.isclose(tracker.means()["reward"], expected.mean())
+        assert math.isclose(tracker.variances()["reward"], expected.var(ddof=1))
+
+        # Means of `n` values weigh as `n` values, but their variance is unknown
+        tracker.add_scalars({"reward": values[40]}, n=10)
+        expected = np.concatenate([values[:40], [values[40]] * 10])
+        assert math.isclose(tracker.means()["reward"], expected.mean())
+        with pytest.raises(AssertionError):
+            tracker.variances()
+
+        tracker.reset()
+        tracker.add_scalars({"reward": 1.0})
+        assert math.isnan(tracker.variances()["reward"])
+
+    def test_stops_when_interval_is_narrow(self):
+        criterion = ConfidenceIntervalStoppingCriterion(
+            max_half_widths={"success": 0.1}, confidence=0.95, min_episodes=10
+        )
+
+        tracker = ScalarMeanTracker()
+        num_episodes = 0
+        reason = None
+        while reason is None:
+            tracker.add_scalars({"success": float(num_episodes % 2)})
+            num_episodes += 1
+            reason = criterion(
+                metrics=tracker,
+                num_episodes=num_episodes,
+                elapsed_seconds=0.0,
+                num_steps=num_episodes,
+            )
+
+        # Half-width ~ 1.96 * 0.5 / sqrt(n) <= 0.1 requires ~97 episodes
+        assert 90 <= num_episodes <= 100
+        assert criterion.half_widths(tracker)["success"] <= 0.1
+
+    def test_budgets(self):
+        tracker = ScalarMeanTracker()
+        tracker.add_scalars({"success": 1.0})
+
+        criterion = ConfidenceIntervalStoppingCriterion(
+            max_episodes=5, max_seconds=60.0
+        )
+        assert (
+            criterion(tracker, num_episodes=4, elapsed_seconds=1.0, num_steps=1) is None
+        )
+        assert criterion(tracker, num_episodes=5, elapsed_seconds=1.0, num_steps=1)
+        assert criterion(tracker, num_episodes=1, elapsed_seconds=60.0, num_steps=1)
+
+        # Metrics without enough samples never satisfy the interval rule
+        criterion = ConfidenceIntervalStoppingCriterion(
+            max_half_widths={"spl": 1.0}, min_episodes=2
+        )
+        assert (
+            criterion(tracker, num_episodes=10, elapsed_seconds=0.0, num_steps=1)
+            is None
+        )
+
+
+if __name__ == "__main__":
+    TestEvalStoppingCriterion().test_tracker_variances()
+    TestEvalStoppingCriterion().test_stops_when_interval_is_narrow()
+    TestEvalStoppingCriterion().test_budgets()
@@ -0,0 +1,50 @@
+import os
+
+import torch
+from torch import nn
+
+from utils.memory_utils import (
+    format_bytes,
+    module_nbytes,
+    optimizer_state_nbytes,
+    process_memory,
+    tensors_nbytes,
+)
+
+
+class TestMemoryUtils(object):
+    def test_shared_storages_are_counted_once(self):
+        tensor = torch.zeros(10, 4, dtype=torch.float32)
+        assert tensors_nbytes(tensor) == 160
+        assert tensors_nbytes({"a": tensor, "b": [tensor[:5], (tensor[1],)]}) == 160
+        assert tensors_nbytes([tensor, torch.zeros(3, dtype=torch.int64)]) == 184
+
+    def test_model_and_optimizer(self):
+        model = nn.Linear(10, 5)  # 55 parameters
+        assert module_nbytes(model) == 55 * 4
+
+        optimizer = torch.optim.Adam(model.parameters())
+        assert optimizer_state_nbytes(optimizer) == 0
+        model(torch.randn(2, 10)).sum().backward()
+        optimizer.step()
+        # Two moments per parameter (and a step counter per parameter tensor)
+        assert optimizer_state_nbytes(optimizer) >= 2 * 55 * 4
+
+    def test_process_memory(self):
+        memory = process_memory()
+        assert memory["peak_rss"] > 0
+        if "rss" in memory:
+            assert memory["peak_rss"] >= memory["rss"] > 0
+            assert process_memory(os.getpid()) != {}
+
+    def test_format_bytes(self):
+        assert format_bytes(100) == "100 B"
+        assert format_bytes(1536) == "1.5 KiB"
+        assert format_bytes(3 * (1 << 30)) == "3 GiB"
+
+
+if __name__ == "__main__":
+    TestMemoryUtils().test_shared_storages_are_counted_once()
+    TestMemoryUtils().test_model_and_optimizer()
+    TestMemoryUtils().test_process_memory()
+    TestMemoryUtils().test_format_bytes()
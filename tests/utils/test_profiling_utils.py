@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+
+from utils.profiling_utils import (
+    SamplingProfiler,
+    summarize_profiles,
+    write_profile,
+)
+
+
+def _busy_loop(n: int) -> int:
+    total = 0
+    for it in range(n):
+        total += it * it % 7
+    return total
+
+
+class TestProfilingUtils(object):
+    def test_sampling_profiler(self):
+        profiler = SamplingProfiler(interval=0.001)
+        if not profiler.start():
+            return  # unsupported platform
+        try:
+            for _ in range(50):
+                _busy_loop(20000)
+        finally:
+            profiler.stop()
+
+        assert profiler.num_samples > 0
+        state = profiler.state_dict()
+        assert sum(int(line.split()[-1]) for line in state["stacks"]) == (
+            profiler.num_samples
+        )
+        functions = {f["function"].split()[0]: f for f in state["functions"]}
+        assert "_busy_loop" in functions
+        assert functions["_busy_loop"]["self_samples"] > 0
+        assert (
+            functions["test_sampling_profiler"]["total_samples"]
+            >= functions["_busy_loop"]["total_samples"]
+        )
+
+        # Stopped profilers don't sample
+        num_samples = profiler.num_samples
+        _busy_loop(100000)
+        assert profiler.num_samples == num_samples
+
+    def test_summarize_profiles(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for it, self_samples in enumerate([10, 30]):
+                write_profile(
+                    directory,
+                    "train_{}_sampler_{}".format(it, it),
+                    "train_sampler",
+                    "python",
+                    dict(
+                        interval=0.01,
+                        num_samples=self_samples + 5,
+                        functions=[
+                            dict(
+                                function="step",
+                                self_samples=self_samples,
+                                total_samples=self_samples,
+                            ),
+                            dict(function="reset", self_samples=5, total_samples=5),
+                        ],
+                    ),
+                )
+            write_profile(
+                directory,
+                "train_0",
+                "train",
+                "torch",
+                dict(
+                    operators=[
+                        dict(
+                            name="aten::mm",
+                            count=2,
+                            self_cpu_us=2e6,
+                            cpu_us=3e6,
+                            self_cuda_us=0,
+                        ),
+                    ]
+                ),
+            )
+
+            summary = summarize_profiles(directory, top_k=1)
+            assert set(summary.keys()) == {"train_sampler", "train (torch)"}
+            assert summary["train_sampler"]["num_processes"] == 2
+            (top,) = summary["train_sampler"]["functions"]
+            assert top["function"] == "step"
+            assert abs(top["self_seconds"] - 0.4) < 1e-9
+            assert summary["train (torch)"]["functions"][0]["total_seconds"] == 3.0
+
+            assert os.path.isfile(os.path.join(directory, "summary.txt"))
+            with open(os.path.join(directory, "summary.json"), "r") as f:
+                assert json.load(f) == summary
+
+
+if __name__ == "__main__":
+    TestProfilingUtils().test_sampling_profiler()
+    TestProfilingUtils().test_summarize_profiles()
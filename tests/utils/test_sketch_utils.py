@@ -0,0 +1,53 @@
+import math
+import pickle
+
+import numpy as np
+
+from utils.sketch_utils import ScalarSketchTracker, TDigest
+
+
+class TestSketchUtils(object):
+    def test_merged_summaries_match_exact_statistics(self):
+        rng = np.random.RandomState(0)
+        values = rng.exponential(size=20000)
+
+        # Summarize in four "workers" and merge, as the runner does
+        trackers = [ScalarSketchTracker() for _ in range(4)]
+        for it, value in enumerate(values):
+            trackers[it % len(trackers)].add_scalars({"ep_length": value})
+        merged = ScalarSketchTracker()
+        for tracker in trackers:
+            merged.merge(pickle.loads(pickle.dumps(tracker)))
+
+        summary = merged.get("ep_length")
+        assert summary.count == len(values)
+        assert math.isclose(summary.mean, values.mean())
+        assert math.isclose(summary.variance, values.var(ddof=1))
+        assert summary.min == values.min() and summary.max == values.max()
+
+        for q in [0.05, 0.25, 0.5, 0.75, 0.95, 0.99]:
+            # Errors are small relative to the local density of values
+            exact_rank = np.mean(values <= summary.quantile(q))
+            assert abs(exact_rank - q) < 0.01 * max(1.0, 10 * min(q, 1 - q))
+
+        # Memory is bounded regardless of the number of values
+        assert summary.digest.num_centroids < 200
+
+    def test_weighted_and_degenerate_inputs(self):
+        tracker = ScalarSketchTracker()
+        assert tracker.empty
+
+        tracker.add_scalars({"success": 1.0}, n=3)
+        tracker.add_scalars({"success": 0.0})
+        summary = tracker.get("success")
+        assert summary.count == 4
+        assert math.isclose(summary.mean, 0.75)
+        assert math.isclose(summary.variance, 0.25)
+        assert tracker.percentiles([5, 95])["success"] == {5: 0.0, 95: 1.0}
+
+        assert math.isnan(TDigest().quantile(0.5))
+
+
+if __name__ == "__main__":
+    TestSketchUtils().test_merged_summaries_match_exact_statistics()
+    TestSketchUtils().test_weighted_and_degenerate_inputs()
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import torch
+
+from utils.timing_utils import TimerRegistry
+
+
+class TestTimerRegistry(object):
+    def test_sections_are_accumulated_and_reset(self):
+        timers = TimerRegistry()
+        for _ in range(3):
+            with timers.time("outer"):
+                with timers.time("inner"):
+                    time.sleep(0.01)
+
+        assert timers.counts() == {"outer": 3, "inner": 3}
+        totals = timers.totals()
+        assert totals["inner"] >= 0.03
+        assert totals["outer"] >= totals["inner"]
+
+        summary = timers.pop_summary()
+        assert set(summary.keys()) == {
+            "timing/outer_ms",
+            "timing/outer_fraction",
+            "timing/inner_ms",
+            "timing/inner_fraction",
+        }
+        assert summary["timing/inner_ms"] >= 10
+        assert 0 < summary["timing/inner_fraction"] <= summary["timing/outer_fraction"]
+        assert summary["timing/outer_fraction"] <= 1
+
+        assert timers.pop_summary() == {}
+
+    def test_exceptions_are_timed_and_propagated(self):
+        timers = TimerRegistry()
+        try:
+            with timers.time("failing"):
+                raise ValueError()
+        except ValueError:
+            pass
+        else:
+            assert False, "exception swallowed"
+        assert timers.counts() == {"failing": 1}
+
+    def test_concurrent_threads(self):
+        timers = TimerRegistry()
+
+        def work():
+            for _ in range(1000):
+                with timers.time("section"):
+                    pass
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert timers.counts() == {"section": 4000}
+
+    def test_disabled(self):
+        timers = TimerRegistry(enabled=False)
+        with timers.time("section"):
+            pass
+        assert timers.counts() == {}
+        assert timers.pop_summary() == {}
+
+    def test_synchronize_only_on_request(self, monkeypatch):
+        synchronized = []
+        monkeypatch.setattr(
+            torch.cuda, "synchronize", lambda device=None: synchronized.append(device)
+        )
+
+        timers = TimerRegistry()
+        with timers.time("section"):
+            pass
+        assert synchronized == []
+
+        timers = TimerRegistry(synchronize_device="cuda:0")
+        with timers.time("section"):
+            pass
+        assert synchronized == ["cuda:0", "cuda:0"]
+        assert timers.counts() == {"section": 1}
+
+
+if __name__ == "__main__":
+    TestTimerRegistry().test_sections_are_accumulated_and_reset()
+    TestTimerRegistry().test_exceptions_are_timed_and_propagated()
+    TestTimerRegistry().test_concurrent_threads()
+    TestTimerRegistry().test_disabled()
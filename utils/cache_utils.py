@@ -1,5 +1,13 @@
+import gzip
+import json
 import math
-from typing import Dict, Any, Union, Callable, Optional
+import os
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, Any, Union, Callable, Optional, List, Tuple, Iterator
+
+import numpy as np
+from scipy.spatial import cKDTree
 
 from utils.system import get_logger
 
@@ -14,8 +22,13 @@ def str_to_pos_for_cache(s: str) -> Dict[str, float]:
 
 
 def get_distance(
-    cache: Dict[str, Any], pos: Dict[str, float], target: Dict[str, float]
+    cache: Union[Dict[str, Any], "GridDistanceCache"],
+    pos: Dict[str, float],
+    target: Dict[str, float],
 ) -> float:
+    if isinstance(cache, GridDistanceCache):
+        return cache.distance(pos, target)
+
     pos = {
         "x": 0.25 * math.ceil(pos["x"] / 0.25),
         "y": pos["y"],
@@ -50,14 +63,17 @@ def get_distance(
         target = find_nearest_point_in_cache(cache, target)
         sp = _get_shortest_path_distance_from_cache(cache, pos, target)
     if sp == -1.0:
-        print("Your cache is incomplete!")
-        exit()
+        raise RuntimeError("Your cache is incomplete!")
     return sp
 
 
 def get_distance_to_object(
-    cache: Dict[str, Any], pos: Dict[str, float], target_class: str
+    cache: Union[Dict[str, Any], "GridDistanceCache"],
+    pos: Dict[str, float],
+    target_class: str,
 ) -> float:
+    if isinstance(cache, GridDistanceCache):
+        return cache.distance_to_object(pos, target_class)
 
     dists = []
     weights = []
@@ -131,13 +147,378 @@ def find_nearest_point_in_cache(
     return closest_point
 
 
+class GridDistanceCache(object):
+    """Array-backed version of the (gzipped json) distance caches.
+
+    The nested `cache[pos_str][target]["distance"]` dictionaries are converted
+    into a `float32` matrix of distances with one row per cached position and
+    one column per target, where targets are either positions or object types.
+    Positions (for both rows and columns) are indexed by their (x, z) grid
+    coordinates, so that rounded lookups are O(1), and points not in the grid
+    are resolved with a KD-tree (L1 distance) over the cached positions. Since
+    scenes are assumed to have a single floor, the y coordinate is ignored in the
+    grid index.
+
+    # Attributes
+
+    grid_size : Size of the grid used to index positions.
+    positions : `npositions x 3` array of the cached (x, y, z) positions.
+    target_positions : `ntargets x 3` array of the cached (x, y, z) target positions.
+    object_types : Cached object type targets.
+    distances : `npositions x (ntargets + nobject_types)` distance matrix, with -1
+        for missing entries. The first `ntargets` columns correspond to
+        `target_positions` and the remaining ones to `object_types`.
+    """
+
+    def __init__(
+        self,
+        positions: np.ndarray,
+        target_positions: np.ndarray,
+        object_types: List[str],
+        distances: np.ndarray,
+        grid_size: float = 0.25,
+    ):
+        assert distances.shape == (
+            positions.shape[0],
+            target_positions.shape[0] + len(object_types),
+        ), "Distance matrix shape {} does not match positions and targets".format(
+            distances.shape
+        )
+
+        self.grid_size = grid_size
+        self.positions = positions.astype(np.float32).reshape(-1, 3)
+        self.target_positions = target_positions.astype(np.float32).reshape(-1, 3)
+        self.object_types = list(object_types)
+        self.distances = distances.astype(np.float32, copy=False)
+
+        self._position_index = self._grid_index(self.positions)
+        self._target_index = self._grid_index(self.target_positions)
+        self._object_type_index = {
+            object_type: self.target_positions.shape[0] + it
+            for it, object_type in enumerate(self.object_types)
+        }
+
+        self._positions_tree: Optional[cKDTree] = None
+        self._targets_tree: Optional[cKDTree] = None
+
+    @classmethod
+    def from_cache_dict(
+        cls, cache: Dict[str, Any], grid_size: float = 0.25
+    ) -> "GridDistanceCache":
+        """Builds the array-backed cache from a `cache[pos_str][target]["distance"]`
+        dictionary, where targets are either position strings or object
+        types."""
+        position_strs = list(cache.keys())
+
+        target_strs: Dict[str, int] = {}
+        object_types: Dict[str, int] = {}
+        for targets in cache.values():
+            for target in targets:
+                if target in target_strs or target in object_types:
+                    continue
+                if _is_pos_str_for_cache(target):
+                    target_strs[target] = len(target_strs)
+                else:
+                    object_types[target] = len(object_types)
+
+        distances = -np.ones(
+            (len(position_strs), len(target_strs) + len(object_types)),
+            dtype=np.float32,
+        )
+        for row, position_str in enumerate(position_strs):
+            for target, entry in cache[position_str].items():
+                col = (
+                    target_strs[target]
+                    if target in target_strs
+                    else len(target_strs) + object_types[target]
+                )
+                distances[row, col] = entry["distance"]
+
+        return cls(
+            positions=_pos_strs_to_array(position_strs),
+            target_positions=_pos_strs_to_array(list(target_strs.keys())),
+            object_types=list(object_types.keys()),
+            distances=distances,
+            grid_size=grid_size,
+        )
+
+    @classmethod
+    def from_file(cls, path: str, grid_size: float = 0.25) -> "GridDistanceCache":
+        """Loads a gzipped json distance cache."""
+        with gzip.GzipFile(path, "r") as fin:
+            cache = json.loads(fin.read().decode("utf-8"))
+        return cls.from_cache_dict(cache, grid_size=grid_size)
+
+    def save(self, path: str) -> None:
+        """Saves the cache as a directory of `.npy` files which can be memory-
+        mapped by `load`."""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "positions.npy"), self.positions)
+        np.save(os.path.join(path, "target_positions.npy"), self.target_positions)
+        np.save(os.path.join(path, "distances.npy"), self.distances)
+        with open(os.path.join(path, "index.json"), "w") as f:
+            json.dump(
+                {"grid_size": self.grid_size, "object_types": self.object_types}, f
+            )
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "GridDistanceCache":
+        """Loads a cache saved with `save`. With `mmap=True` the distance matrix
+        is memory-mapped, so it is shared by all processes in a machine."""
+        with open(os.path.join(path, "index.json"), "r") as f:
+            index = json.load(f)
+        return cls(
+            positions=np.load(os.path.join(path, "positions.npy")),
+            target_positions=np.load(os.path.join(path, "target_positions.npy")),
+            object_types=index["object_types"],
+            distances=np.load(
+                os.path.join(path, "distances.npy"), mmap_mode="r" if mmap else None
+            ),
+            grid_size=index["grid_size"],
+        )
+
+    def distance(self, position: Dict[str, float], target: Dict[str, float]) -> float:
+        """Cached geodesic distance between `position` and `target`.
+
+        `position` is rounded to the four surrounding grid points and, if none of
+        them is cached, the nearest cached position is used. Targets missing from
+        the cache are replaced by the nearest cached target.
+        """
+        col = self._target_index.get(self._grid_key(target["x"], target["z"]))
+        if col is None:
+            col = self._nearest(self._targets_tree_or_build(), target)
+
+        for row in self._rounded_rows(position):
+            if self.distances[row, col] >= 0:
+                return float(self.distances[row, col])
+
+        row = self._nearest(self._positions_tree_or_build(), position)
+        if self.distances[row, col] >= 0:
+            return float(self.distances[row, col])
+
+        raise RuntimeError("Your cache is incomplete!")
+
+    def distance_to_object(self, position: Dict[str, float], object_type: str) -> float:
+        """Cached geodesic distance between `position` and the closest object
+        of type `object_type`, averaged over the surrounding grid points."""
+        col = self._object_type_index.get(object_type)
+
+        dists = []
+        weights = []
+        if col is not None:
+            for rounder_func_0 in [math.ceil, math.floor]:
+                for rounder_func_1 in [math.ceil, math.floor]:
+                    ix = rounder_func_0(position["x"] / self.grid_size)
+                    iz = rounder_func_1(position["z"] / self.grid_size)
+                    row = self._position_index.get((ix, iz))
+                    if row is None or self.distances[row, col] < 0:
+                        continue
+                    dists.append(float(self.distances[row, col]))
+                    weights.append(
+                        1.0
+                        / (
+                            math.sqrt(
+                                (position["x"] - self.grid_size * ix) ** 2
+                                + (position["z"] - self.grid_size * iz) ** 2
+                            )
+                            + 1e6
+                        )
+                    )
+
+        if len(dists) == 0:
+            raise RuntimeError("Your cache is incomplete!")
+
+        total_weight = sum(weights)
+        return sum(d * w / total_weight for d, w in zip(dists, weights))
+
+    def _grid_key(self, x: float, z: float) -> Tuple[int, int]:
+        return round(x / self.grid_size), round(z / self.grid_size)
+
+    def _grid_index(self, positions: np.ndarray) -> Dict[Tuple[int, int], int]:
+        keys = np.round(positions[:, [0, 2]] / self.grid_size).astype(np.int64)
+        return {(int(ix), int(iz)): it for it, (ix, iz) in enumerate(keys)}
+
+    def _rounded_rows(self, position: Dict[str, float]) -> List[int]:
+        rows = []
+        for rounder_func_0 in [math.ceil, math.floor]:
+            for rounder_func_1 in [math.ceil, math.floor]:
+                row = self._position_index.get(
+                    (
+                        rounder_func_0(position["x"] / self.grid_size),
+                        rounder_func_1(position["z"] / self.grid_size),
+                    )
+                )
+                if row is not None:
+                    rows.append(row)
+        return rows
+
+    def _positions_tree_or_build(self) -> cKDTree:
+        if self._positions_tree is None:
+            self._positions_tree = cKDTree(self.positions)
+        return self._positions_tree
+
+    def _targets_tree_or_build(self) -> cKDTree:
+        if self._targets_tree is None:
+            assert self.target_positions.shape[0] > 0, "No target positions cached"
+            self._targets_tree = cKDTree(self.target_positions)
+        return self._targets_tree
+
+    @staticmethod
+    def _nearest(tree: cKDTree, point: Dict[str, float]) -> int:
+        return int(tree.query([point["x"], point["y"], point["z"]], p=1)[1])
+
+
+def _is_pos_str_for_cache(s: str) -> bool:
+    try:
+        str_to_pos_for_cache(s)
+        return True
+    except (ValueError, IndexError):
+        return False
+
+
+def _pos_strs_to_array(pos_strs: List[str]) -> np.ndarray:
+    return np.array(
+        [[float(v) for v in s.split("_")[:3]] for s in pos_strs], dtype=np.float32
+    ).reshape(-1, 3)
+
+
+DistanceCacheKey = Tuple[str, Tuple[float, ...], Union[str, Tuple[float, ...]]]
+
+
+class DistanceCacheStore(object):
+    """On-disk (sqlite) store of geodesic distances.
+
+    The store can be shared by all processes in a machine (e.g. all task
+    samplers) and persists across runs. Writes are buffered and committed in
+    batches of `flush_interval` entries. The database connection is opened
+    lazily, so that the store can be created before forking sampler processes.
+
+    # Attributes
+
+    path : Path to the sqlite database file.
+    flush_interval : Number of buffered writes triggering a commit.
+    """
+
+    def __init__(self, path: str, flush_interval: int = 100):
+        self.path = os.path.abspath(path)
+        self.flush_interval = flush_interval
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pending: Dict[Tuple[str, float, float, float, str], float] = OrderedDict()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=60.0)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS distances ("
+                "scene TEXT, x REAL, y REAL, z REAL, target TEXT, distance REAL, "
+                "PRIMARY KEY (scene, x, y, z, target))"
+            )
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def _target_to_str(target: Union[str, Tuple[float, ...]]) -> str:
+        if isinstance(target, str):
+            return target
+        return "_".join(str(v) for v in target)
+
+    def _row_key(self, key: DistanceCacheKey) -> Tuple[str, float, float, float, str]:
+        scene, (x, y, z), target = key
+        return scene, x, y, z, self._target_to_str(target)
+
+    def get(self, key: DistanceCacheKey) -> Optional[float]:
+        row_key = self._row_key(key)
+        if row_key in self._pending:
+            return self._pending[row_key]
+        row = self.connection.execute(
+            "SELECT distance FROM distances "
+            "WHERE scene=? AND x=? AND y=? AND z=? AND target=?",
+            row_key,
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, key: DistanceCacheKey, distance: float) -> None:
+        self._pending[self._row_key(key)] = distance
+        if len(self._pending) >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if len(self._pending) == 0:
+            return
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO distances VALUES (?, ?, ?, ?, ?, ?)",
+                [(*row_key, distance) for row_key, distance in self._pending.items()],
+            )
+        self._pending = OrderedDict()
+
+    def items(self) -> Iterator[Tuple[DistanceCacheKey, float]]:
+        self.flush()
+        for scene, x, y, z, target, distance in self.connection.execute(
+            "SELECT * FROM distances"
+        ):
+            target_key: Union[str, Tuple[float, ...]] = (
+                tuple(float(v) for v in target.split("_"))
+                if _is_pos_str_for_cache(target)
+                else target
+            )
+            yield (scene, (x, y, z), target_key), distance
+
+    def close(self) -> None:
+        self.flush()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __getstate__(self):
+        self.flush()
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+
 class DynamicDistanceCache(object):
-    def __init__(self, rounding: Optional[int] = None):
-        self.cache: Dict[str, Any] = {}
+    """Bounded (least recently used) cache of geodesic distances computed by a
+    native (e.g. simulator) distance function.
+
+    Entries are keyed by `(scene, rounded position, target)` tuples, where the
+    target is either an object type or a rounded position. Optionally, a
+    `DistanceCacheStore` shared by all processes in the machine is used as a
+    second level cache, so that distances computed by one sampler are
+    available to all others (and to later runs).
+
+    # Attributes
+
+    rounding : Number of decimals used to round positions.
+    max_size : Maximum number of entries kept in memory (`None` for unbounded).
+    store : Optional second level (on-disk) store.
+    hits : Number of lookups found in memory or in the store.
+    misses : Number of lookups requiring a call to the native distance function.
+    log_interval : Number of lookups between (debug) logs of the hit ratio.
+    """
+
+    def __init__(
+        self,
+        rounding: Optional[int] = None,
+        max_size: Optional[int] = 100000,
+        store_path: Optional[str] = None,
+        log_interval: int = 1000,
+    ):
+        self.cache: "OrderedDict[DistanceCacheKey, float]" = OrderedDict()
         self.rounding = rounding
+        self.max_size = max_size
+        self.store = DistanceCacheStore(store_path) if store_path is not None else None
+        self.log_interval = log_interval
+
         self.hits = 0
+        self.store_hits = 0
         self.misses = 0
+        self.evictions = 0
         self.num_accesses = 0
+        self._last_stats = (0, 0, 0)
 
     def find_distance(
         self,
@@ -146,33 +527,93 @@ class DynamicDistanceCache(object):
         native_distance_function: Callable[
             [Dict[str, Any], Union[Dict[str, Any], str]], float
         ],
+        scene_name: str = "",
     ) -> float:
-        # Convert the position to its rounded string representation
-        position_str = self._pos_to_str(position)
-        # If the target is also a position, convert it to its rounded string representation
-        if isinstance(target, str):
-            target_str = target
+        key = (
+            scene_name,
+            self._pos_to_key(position),
+            target if isinstance(target, str) else self._pos_to_key(target),
+        )
+
+        self.num_accesses += 1
+        distance = self.cache.get(key)
+        if distance is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
         else:
-            target_str = self._pos_to_str(target)
+            if self.store is not None:
+                distance = self.store.get(key)
+            if distance is not None:
+                self.hits += 1
+                self.store_hits += 1
+            else:
+                distance = native_distance_function(position, target)
+                self.misses += 1
+                if self.store is not None:
+                    self.store.put(key, distance)
+            self._insert(key, distance)
 
-        if position_str not in self.cache:
-            self.cache[position_str] = {}
-        if target_str not in self.cache[position_str]:
-            self.cache[position_str][target_str] = native_distance_function(
-                position, target
+        if self.num_accesses % self.log_interval == 0:
+            get_logger().debug(
+                "Distance cache hit ratio: {:.4f} ({} entries, {} evictions)".format(
+                    self.hits / self.num_accesses, len(self.cache), self.evictions
+                )
             )
-            self.misses += 1
-        else:
-            self.hits += 1
-        self.num_accesses += 1
-        if self.num_accesses % 1000 == 0:
-            get_logger().debug("Cache Miss-Hit Ratio: %.4f" % (self.misses / self.hits))
-        return self.cache[position_str][target_str]
+        return distance
+
+    def pop_stats(self) -> Dict[str, float]:
+        """Returns the cache statistics since the last call to `pop_stats`, to
+        be reported as train info (see `TASK_TRAIN_INFO_KEY`)."""
+        hits, store_hits, misses = (
+            self.hits - self._last_stats[0],
+            self.store_hits - self._last_stats[1],
+            self.misses - self._last_stats[2],
+        )
+        self._last_stats = (self.hits, self.store_hits, self.misses)
+
+        accesses = hits + misses
+        if accesses == 0:
+            return {}
+        return {
+            "distance_cache/hit_ratio": hits / accesses,
+            "distance_cache/store_hit_ratio": store_hits / accesses,
+            "distance_cache/size": len(self.cache),
+        }
 
     def invalidate(self):
-        self.cache = []
+        self.cache = OrderedDict()
+
+    def save(self, path: str) -> None:
+        """Writes all entries in memory into a (new or existing) store at
+        `path`."""
+        store = DistanceCacheStore(path)
+        for key, distance in self.cache.items():
+            store.put(key, distance)
+        store.close()
+
+    def load(self, path: str) -> None:
+        """Reads entries from the store at `path` (up to `max_size`)."""
+        if not os.path.exists(path):
+            get_logger().warning("No distance cache found at {}".format(path))
+            return
+        store = DistanceCacheStore(path)
+        for key, distance in store.items():
+            self._insert(key, distance)
+        store.close()
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+
+    def _insert(self, key: DistanceCacheKey, distance: float) -> None:
+        self.cache[key] = distance
+        self.cache.move_to_end(key)
+        if self.max_size is not None:
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+                self.evictions += 1
 
-    def _pos_to_str(self, pos: Dict[str, Any]) -> str:
+    def _pos_to_key(self, pos: Dict[str, Any]) -> Tuple[float, ...]:
         if self.rounding:
-            pos = {k: round(v, self.rounding) for k, v in pos.items()}
-        return str(pos)
+            return tuple(round(float(pos[k]), self.rounding) for k in ("x", "y", "z"))
+        return tuple(float(pos[k]) for k in ("x", "y", "z"))
@@ -0,0 +1,131 @@
+"""Append-only, compressed storage of per-episode (task) metrics, written
+directly by each worker and read lazily."""
+import glob
+import gzip
+import json
+import os
+import zlib
+from typing import Any, Dict, Iterator, Optional, IO, Union
+
+from utils.system import get_logger
+
+
+def episode_metrics_file_name(
+    mode: str, worker_id: Union[int, str], part: Union[int, str]
+) -> str:
+    if isinstance(part, int):
+        part = "{:03d}".format(part)
+    return "{}_worker_{}_{}.jsonl.gz".format(mode, worker_id, part)
+
+
+class EpisodeMetricsWriter(object):
+    """Appends records (dictionaries) as lines of JSON to a gzip file.
+
+    Each `flush` completes a compressed block, so all records written
+    before the last flush can be read even if the writer's process dies
+    without closing the file. Files are never reopened: a new writer for the
+    same mode and worker (e.g. after resuming training) writes the next
+    part.
+    """
+
+    def __init__(
+        self, directory: str, mode: str, worker_id: int, compresslevel: int = 6
+    ) -> None:
+        self.directory = directory
+        self.mode = mode
+        self.worker_id = worker_id
+        self.compresslevel = compresslevel
+
+        self.path: Optional[str] = None
+        self._file: Optional[IO[bytes]] = None
+        self.num_records = 0
+
+    def _open(self) -> IO[bytes]:
+        os.makedirs(self.directory, exist_ok=True)
+        part = 0
+        while True:
+            self.path = os.path.join(
+                self.directory,
+                episode_metrics_file_name(self.mode, self.worker_id, part),
+            )
+            try:
+                return gzip.open(self.path, "xb", compresslevel=self.compresslevel)
+            except FileExistsError:
+                part += 1
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self._file is None:
+            self._file = self._open()
+        self._file.write((json.dumps(record, default=str) + "\n").encode("utf-8"))
+        self.num_records += 1
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()  # zlib.Z_SYNC_FLUSH
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def iterate_episode_metrics_file(
+    path: str, chunk_size: int = 1 << 16
+) -> Iterator[Dict[str, Any]]:
+    """Lazily yields the records in a file written by an
+    `EpisodeMetricsWriter`, including those flushed by writers which did not
+    close the file."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    pending = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if len(chunk) == 0:
+                break
+
+            while len(chunk) > 0:
+                try:
+                    pending += decompressor.decompress(chunk)
+                except zlib.error:
+                    get_logger().warning("Stopped reading corrupted {}".format(path))
+                    return
+                chunk = b""
+                if decompressor.eof:  # another gzip member may follow
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                yield json.loads(line)
+
+    if len(pending) > 0:
+        get_logger().warning("Ignoring truncated record at the end of {}".format(path))
+
+
+def read_episode_metrics(
+    directory: str, mode: Optional[str] = None, training_steps: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Lazily yields the per-episode records written by all workers in
+    `directory`.
+
+    # Parameters
+
+    directory : The `episodes` directory in the metrics folder of an experiment.
+    mode : If given, only records from workers in this mode (`"train"`, `"valid"` or
+        `"test"`).
+    training_steps : If given, only records for models trained for this number of steps.
+
+    # Returns
+
+    An iterator over records, each one the metrics dict of an episode plus the `mode`,
+    `worker_id` and `training_steps` of the model evaluated.
+    """
+    paths = sorted(
+        glob.glob(
+            os.path.join(directory, episode_metrics_file_name(mode or "*", "*", "*"))
+        )
+    )
+    for path in paths:
+        for record in iterate_episode_metrics_file(path):
+            if training_steps is None or record.get("training_steps") == training_steps:
+                yield record
@@ -2,6 +2,7 @@
 import abc
 import collections.abc
 import copy
+import math
 import random
 import typing
 from collections import OrderedDict, defaultdict
@@ -17,10 +18,12 @@ from typing import (
     Tuple,
     cast,
     Sequence,
+    Set,
 )
 
 import numpy as np
 import torch
+from scipy.stats import norm
 from torch import optim
 
 from core.algorithms.offpolicy_sync.losses.abstract_offpolicy_loss import (
@@ -29,6 +32,7 @@ from core.algorithms.offpolicy_sync.losses.abstract_offpolicy_loss import (
 )
 from core.algorithms.onpolicy_sync.losses.abstract_loss import AbstractActorCriticLoss
 from core.base_abstractions.misc import Loss
+from utils.sketch_utils import ScalarSketchTracker
 
 
 def recursive_update(
@@ -136,7 +140,10 @@ class ScalarMeanTracker(object):
 
     def __init__(self) -> None:
         self._sums: Dict[str, float] = OrderedDict()
+        self._sums_of_squares: Dict[str, float] = OrderedDict()
         self._counts: Dict[str, int] = OrderedDict()
+        # Scalars added with `n > 1` (e.g. means of batches), whose variance is unknown
+        self._aggregated: Set[str] = set()
 
     def add_scalars(
         self, scalars: Dict[str, Union[float, int]], n: Union[int, Dict[str, int]] = 1
@@ -146,17 +153,22 @@ class ScalarMeanTracker(object):
         # Parameters
 
         scalars : A dictionary of `scalar key -> value` pairs.
+        n : Number of samples (either for all or for each scalar) each value is the mean of.
         """
         ndict = cast(
             Dict[str, int], (n if isinstance(n, Dict) else defaultdict(lambda: n))  # type: ignore
         )
 
         for k in scalars:
+            if ndict[k] != 1:
+                self._aggregated.add(k)
             if k not in self._sums:
                 self._sums[k] = ndict[k] * scalars[k]
+                self._sums_of_squares[k] = ndict[k] * scalars[k] ** 2
                 self._counts[k] = ndict[k]
             else:
                 self._sums[k] += ndict[k] * scalars[k]
+                self._sums_of_squares[k] += ndict[k] * scalars[k] ** 2
                 self._counts[k] += ndict[k]
 
     def pop_and_reset(self) -> Dict[str, float]:
@@ -177,7 +189,9 @@ class ScalarMeanTracker(object):
 
     def reset(self):
         self._sums = OrderedDict()
+        self._sums_of_squares = OrderedDict()
         self._counts = OrderedDict()
+        self._aggregated = set()
 
     def sums(self):
         return copy.copy(self._sums)
@@ -190,6 +204,28 @@ class ScalarMeanTracker(object):
             [(k, float(self._sums[k] / self._counts[k])) for k in self._sums]
         )
 
+    def variances(self):
+        """Unbiased sample variances of the tracked scalars (`nan` for scalars
+        added less than twice).
+
+        Only available for scalars always added with `n == 1`, as the
+        variance within the samples of aggregated values is unknown.
+        """
+        variances = OrderedDict()
+        for k in self._sums:
+            assert (
+                k not in self._aggregated
+            ), "Unknown variance of {}, which was added with n > 1".format(k)
+            n = self._counts[k]
+            if n < 2:
+                variances[k] = float("nan")
+            else:
+                mean = self._sums[k] / n
+                variances[k] = float(
+                    max(self._sums_of_squares[k] - n * mean ** 2, 0.0) / (n - 1)
+                )
+        return variances
+
     @property
     def empty(self):
         assert len(self._sums) == len(
@@ -201,7 +237,13 @@ class ScalarMeanTracker(object):
 
 
 class LoggingPackage(object):
-    """Data package used for logging."""
+    """Data package used for logging.
+
+    Task metrics are summarized in constant memory by `metrics_tracker`
+    (means) and `metrics_sketches` (distributions). Complete per-task
+    metrics dicts are only kept in `metric_dicts` if `keep_metric_dicts`
+    is `True` (e.g. for visualizers, which look up the rendered episodes).
+    """
 
     def __init__(
         self,
@@ -209,6 +251,7 @@ class LoggingPackage(object):
         training_steps: Optional[int],
         pipeline_stage: Optional[int] = None,
         off_policy_steps: Optional[int] = None,
+        keep_metric_dicts: bool = False,
     ) -> None:
         self.mode = mode
 
@@ -217,16 +260,18 @@ class LoggingPackage(object):
         self.off_policy_steps: Optional[int] = off_policy_steps
 
         self.metrics_tracker = ScalarMeanTracker()
+        self.metrics_sketches = ScalarSketchTracker()
         self.train_info_tracker = ScalarMeanTracker()
+        self.keep_metric_dicts = keep_metric_dicts
         self.metric_dicts: List[Any] = []
         self.viz_data: Optional[Dict[str, List[Dict[str, Any]]]] = None
         self.checkpoint_file_name: Optional[str] = None
 
-        self.num_empty_metrics_dicts_added: int = 0
+        # Set if an evaluation stopped before exhausting its task samplers
+        self.stopping_reason: Optional[str] = None
 
-    @property
-    def num_non_empty_metrics_dicts_added(self) -> int:
-        return len(self.metric_dicts)
+        self.num_empty_metrics_dicts_added: int = 0
+        self.num_non_empty_metrics_dicts_added: int = 0
 
     @staticmethod
     def _metrics_dict_is_empty(
@@ -251,10 +296,15 @@ class LoggingPackage(object):
             self.num_empty_metrics_dicts_added += 1
             return False
 
-        self.metric_dicts.append(single_task_metrics_dict)
-        self.metrics_tracker.add_scalars(
-            {k: v for k, v in single_task_metrics_dict.items() if k != "task_info"}
-        )
+        self.num_non_empty_metrics_dicts_added += 1
+        if self.keep_metric_dicts:
+            self.metric_dicts.append(single_task_metrics_dict)
+
+        scalars = {
+            k: v for k, v in single_task_metrics_dict.items() if k != "task_info"
+        }
+        self.metrics_tracker.add_scalars(scalars)
+        self.metrics_sketches.add_scalars(scalars)
         return True
 
     def add_train_info_dict(
@@ -372,6 +422,109 @@ class NeverEarlyStoppingCriterion(EarlyStoppingCriterion):
         return False
 
 
+class EvalStoppingCriterion(abc.ABC):
+    """Abstract class for classes determining if a validation/test run (see
+    `OnPolicyInference.run_eval`) can stop before all task samplers are
+    exhausted.
+
+    Criteria are checked whenever new episodes have completed.
+    """
+
+    @abc.abstractmethod
+    def __call__(
+        self,
+        metrics: ScalarMeanTracker,
+        num_episodes: int,
+        elapsed_seconds: float,
+        num_steps: int,
+    ) -> Optional[str]:
+        """Returns a description of the reason to stop, or `None` to keep
+        evaluating.
+
+        # Parameters
+
+        metrics: Metrics of the episodes completed so far in this run.
+        num_episodes: Number of (non-empty) episodes completed so far in this run.
+        elapsed_seconds: Time since the beginning of the run.
+        num_steps: Number of steps taken by each task sampler so far.
+        """
+        raise NotImplementedError
+
+
+class ConfidenceIntervalStoppingCriterion(EvalStoppingCriterion):
+    """Stops evaluating when the (normal approximation) confidence intervals
+    of the given metrics are narrow enough, or when a budget of episodes or
+    time is exhausted.
+
+    Note that, since episodes which complete earlier are over-represented
+    when stopping before all task samplers are exhausted, metrics
+    correlated with the episode length may be biased.
+
+    # Attributes
+
+    max_half_widths : Dictionary of `metric name -> half-width`. The run stops once the
+        confidence intervals of all these metrics are at most as wide (an empty dictionary
+        only enables the episode and time budgets).
+    confidence : Confidence level of the intervals.
+    min_episodes : Minimum number of episodes before the intervals are considered.
+    max_episodes : Optional maximum number of episodes.
+    max_seconds : Optional maximum duration of the run.
+    """
+
+    def __init__(
+        self,
+        max_half_widths: Optional[Dict[str, float]] = None,
+        confidence: float = 0.95,
+        min_episodes: int = 30,
+        max_episodes: Optional[int] = None,
+        max_seconds: Optional[float] = None,
+    ):
+        assert 0 < confidence < 1, "confidence must be in (0, 1)"
+        assert min_episodes >= 2, "min_episodes must be at least 2"
+
+        self.max_half_widths = max_half_widths if max_half_widths is not None else {}
+        self.confidence = confidence
+        self.min_episodes = min_episodes
+        self.max_episodes = max_episodes
+        self.max_seconds = max_seconds
+
+        self._z = float(norm.ppf(0.5 + confidence / 2))
+
+    def half_widths(self, metrics: ScalarMeanTracker) -> Dict[str, float]:
+        counts = metrics.counts()
+        return {
+            k: self._z * math.sqrt(var / counts[k])
+            for k, var in metrics.variances().items()
+        }
+
+    def __call__(
+        self,
+        metrics: ScalarMeanTracker,
+        num_episodes: int,
+        elapsed_seconds: float,
+        num_steps: int,
+    ) -> Optional[str]:
+        if self.max_episodes is not None and num_episodes >= self.max_episodes:
+            return "max_episodes {} reached".format(self.max_episodes)
+
+        if self.max_seconds is not None and elapsed_seconds >= self.max_seconds:
+            return "max_seconds {} reached".format(self.max_seconds)
+
+        if len(self.max_half_widths) == 0 or num_episodes < self.min_episodes:
+            return None
+
+        half_widths = self.half_widths(metrics)
+        for k, max_half_width in self.max_half_widths.items():
+            # A missing or undefined (nan) half-width compares as not narrow enough
+            if not half_widths.get(k, float("nan")) <= max_half_width:
+                return None
+
+        return "confidence interval half-widths {} within {}".format(
+            {k: round(half_widths[k], 4) for k in self.max_half_widths},
+            self.max_half_widths,
+        )
+
+
 class OffPolicyPipelineComponent(NamedTuple):
     """An off-policy component for a PipeLineStage.
 
@@ -388,6 +541,8 @@ class OffPolicyPipelineComponent(NamedTuple):
         a `cur_worker` int value,
         a `rollouts_per_worker` list of number of samplers per training worker,
         and an optional random `seed` shared by all workers, which can be None.
+    prefetch_batches: number of batches built ahead of time (and moved to the training device) in a background
+        thread, overlapping batch construction with rollout collection. Prefetching is disabled if 0.
     """
 
     data_iterator_builder: Callable[..., Iterator]
@@ -397,6 +552,7 @@ class OffPolicyPipelineComponent(NamedTuple):
     data_iterator_kwargs_generator: Callable[
         [int, Sequence[int], Optional[int]], Dict
     ] = lambda cur_worker, rollouts_per_worker, seed: {}
+    prefetch_batches: int = 0
 
 
 class PipelineStage(object):
@@ -521,6 +677,10 @@ class TrainingPipeline(object):
         as to a tensorboard file.
     lr_scheduler_builder : Optional builder object to instantiate the learning rate scheduler used
         through the pipeline.
+    overlap_rollouts_and_updates : If `True`, each rollout is collected (with a copy of the model
+        holding the parameters before the update) while the update on the previous rollout runs,
+        so the policy used to act lags one update behind the policy being trained. Losses should
+        then rely on the stored (behavior) action log probabilities, as PPO does.
     """
 
     # noinspection PyUnresolvedReferences
@@ -541,6 +701,7 @@ class TrainingPipeline(object):
         metric_accumulate_interval: int,
         should_log: bool = True,
         lr_scheduler_builder: Optional[Builder[optim.lr_scheduler._LRScheduler]] = None,  # type: ignore
+        overlap_rollouts_and_updates: bool = False,
     ):
         """Initializer.
 
@@ -562,6 +723,7 @@ class TrainingPipeline(object):
         self.gae_lambda = gae_lambda
         self.advance_scene_rollout_period = advance_scene_rollout_period
         self.should_log = should_log
+        self.overlap_rollouts_and_updates = overlap_rollouts_and_updates
 
         self.pipeline_stages = pipeline_stages
         if len(self.pipeline_stages) > len(set(id(ps) for ps in pipeline_stages)):
@@ -0,0 +1,112 @@
+"""Accounting of the memory held by tensors, models, optimizers and
+processes."""
+import os
+import sys
+from collections import OrderedDict
+from typing import Dict, Optional, Iterable, Any
+
+import torch
+from torch import nn
+
+from utils.system import get_logger
+
+MB = float(1 << 20)
+
+
+def tensor_nbytes(tensor: torch.Tensor) -> int:
+    return tensor.element_size() * tensor.nelement()
+
+
+def tensors_nbytes(obj: Any) -> int:
+    """Bytes held by all tensors in `obj` (possibly nested in dictionaries,
+    lists or tuples), counting shared storages once."""
+    seen = set()
+
+    def visit(o: Any) -> int:
+        if isinstance(o, torch.Tensor):
+            if hasattr(o, "untyped_storage"):
+                storage = o.untyped_storage()
+                nbytes = storage.nbytes()
+            else:
+                storage = o.storage()
+                nbytes = storage.element_size() * storage.size()
+            key = (storage.data_ptr(), o.device)
+            if key in seen:
+                return 0
+            seen.add(key)
+            return nbytes
+        if isinstance(o, dict):
+            return sum(visit(v) for v in o.values())
+        if isinstance(o, (list, tuple)):
+            return sum(visit(v) for v in o)
+        return 0
+
+    return visit(obj)
+
+
+def module_nbytes(module: nn.Module) -> int:
+    """Bytes held by the parameters and buffers of `module`."""
+    return tensors_nbytes(list(module.parameters()) + list(module.buffers()))
+
+
+def optimizer_state_nbytes(optimizer: torch.optim.Optimizer) -> int:  # type: ignore
+    """Bytes held by the state of `optimizer` (e.g. Adam's moments),
+    excluding the parameters."""
+    return tensors_nbytes(list(optimizer.state.values()))
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, int]:
+    """Current (`"rss"`) and peak (`"peak_rss"`) resident set size, in bytes,
+    of the process with id `pid` (by default, this one).
+
+    Read from `/proc` (Linux). Elsewhere, only the peak of this process
+    is available. Processes which are gone (or not readable) yield an
+    empty dictionary.
+    """
+    status_path = "/proc/{}/status".format("self" if pid is None else pid)
+    if os.path.exists("/proc"):
+        fields = {"VmRSS:": "rss", "VmHWM:": "peak_rss"}
+        result: Dict[str, int] = OrderedDict()
+        try:
+            with open(status_path, "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) >= 2 and parts[0] in fields:
+                        result[fields[parts[0]]] = int(parts[1]) * 1024  # kB
+        except (OSError, ValueError):
+            return OrderedDict()
+        return result
+
+    if pid is None or pid == os.getpid():
+        try:
+            import resource
+
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # kB in Linux, bytes in macOS
+            return OrderedDict(
+                peak_rss=peak if sys.platform == "darwin" else peak * 1024
+            )
+        except ImportError:
+            pass
+    return OrderedDict()
+
+
+def processes_memory(pids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    return OrderedDict((pid, process_memory(pid)) for pid in pids)
+
+
+def format_bytes(nbytes: float) -> str:
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if abs(nbytes) < 1024:
+            return "{:.3g} {}".format(nbytes, unit)
+        nbytes /= 1024
+    return "{:.3g} TiB".format(nbytes)
+
+
+def log_memory_table(title: str, rows: Dict[str, float]) -> None:
+    """Logs a table of `name -> bytes` rows."""
+    width = max([len(name) for name in rows] + [0])
+    lines = [title]
+    for name, nbytes in rows.items():
+        lines.append("  {} {:>12}".format(name.ljust(width), format_bytes(nbytes)))
+    get_logger().info("\n".join(lines))
@@ -0,0 +1,370 @@
+"""Profiling of (windows of) the work done by engines and their task sampler
+processes, see `ProfilingWindow`."""
+import glob
+import json
+import os
+import signal
+import threading
+from collections import defaultdict, Counter
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import torch
+
+from utils.system import get_logger
+
+PROFILE_SUFFIX = ".profile.json"
+
+
+def _frame_key(frame) -> str:
+    code = frame.f_code
+    return "{} ({}:{})".format(code.co_name, code.co_filename, code.co_firstlineno)
+
+
+class SamplingProfiler(object):
+    """Statistical profiler of the Python code run by the main thread of
+    this process.
+
+    Every `interval` seconds of CPU time used by the process, a `SIGPROF`
+    signal interrupts the main thread and its stack is recorded, so that
+    functions are sampled in proportion to the CPU time spent in them (time
+    spent blocked, e.g. waiting for commands, is not sampled). Time spent in
+    native code is attributed to its calling Python function.
+
+    Requires `signal.setitimer` (i.e., not Windows) and must be started and
+    stopped from the main thread.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128) -> None:
+        self.interval = interval
+        self.max_depth = max_depth
+
+        self.stacks: Counter = Counter()
+        self.num_samples = 0
+        self._previous_handler: Any = None
+        self.running = False
+
+    @staticmethod
+    def is_supported() -> bool:
+        return (
+            hasattr(signal, "setitimer")
+            and threading.current_thread() is threading.main_thread()
+        )
+
+    def _sample(self, signum, frame) -> None:
+        stack: List[str] = []
+        while frame is not None and len(stack) < self.max_depth:
+            stack.append(_frame_key(frame))
+            frame = frame.f_back
+        self.stacks[tuple(reversed(stack))] += 1
+        self.num_samples += 1
+
+    def start(self) -> bool:
+        """Starts sampling, if supported (otherwise returns `False`)."""
+        if self.running:
+            return True
+        if not self.is_supported():
+            get_logger().warning(
+                "Sampling profiler unsupported in this platform or thread"
+            )
+            return False
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.running = True
+        return True
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler)
+        self.running = False
+
+    def function_stats(self) -> List[Dict[str, Any]]:
+        """Samples in which each function was running (`"self_samples"`) or
+        in the stack (`"total_samples"`), sorted by decreasing self
+        samples."""
+        self_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        for stack, count in self.stacks.items():
+            self_samples[stack[-1]] += count
+            for function in set(stack):
+                total_samples[function] += count
+        return [
+            dict(
+                function=function,
+                self_samples=self_samples[function],
+                total_samples=total_samples[function],
+            )
+            for function in sorted(
+                total_samples,
+                key=lambda function: (
+                    -self_samples[function],
+                    -total_samples[function],
+                ),
+            )
+        ]
+
+    def state_dict(self) -> Dict[str, Any]:
+        return dict(
+            interval=self.interval,
+            num_samples=self.num_samples,
+            functions=self.function_stats(),
+            # Folded stacks (one "root;...;leaf count" line per stack), e.g. for flame graphs
+            stacks=[
+                "{} {}".format(";".join(stack), count)
+                for stack, count in self.stacks.most_common()
+            ],
+        )
+
+
+def write_profile(
+    directory: str, name: str, role: str, kind: str, profile: Dict[str, Any]
+) -> str:
+    """Writes a profile of a process into `<directory>/<name>.<kind>.profile.json`.
+
+    # Parameters
+
+    directory : Output directory.
+    name : Unique name of the process (e.g. `"train_0"`).
+    role : Role of the process, profiles of processes with the same role are merged in the
+        summary (see `summarize_profiles`).
+    kind : `"python"` (from a `SamplingProfiler`) or `"torch"` (operators from the torch
+        profiler).
+    profile : The profile data.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "{}.{}{}".format(name, kind, PROFILE_SUFFIX))
+    with open(path, "w") as f:
+        json.dump(dict(name=name, role=role, kind=kind, **profile), f)
+    return path
+
+
+class _TorchProfiler(object):
+    """Operator-level profiler of this process, using `torch.profiler` if
+    available (and the autograd profiler otherwise)."""
+
+    def __init__(self, use_cuda: bool = False) -> None:
+        self.use_cuda = use_cuda
+        self._profiler: Any = None
+
+    def start(self) -> None:
+        if hasattr(torch, "profiler") and hasattr(torch.profiler, "profile"):
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if self.use_cuda:
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self._profiler = torch.profiler.profile(activities=activities)
+        else:
+            self._profiler = torch.autograd.profiler.profile(use_cuda=self.use_cuda)
+        self._profiler.__enter__()
+
+    def stop(self, trace_path: str) -> Dict[str, Any]:
+        self._profiler.__exit__(None, None, None)
+        self._profiler.export_chrome_trace(trace_path)
+
+        operators = []
+        for event in self._profiler.key_averages():
+            operators.append(
+                dict(
+                    name=event.key,
+                    count=event.count,
+                    self_cpu_us=event.self_cpu_time_total,
+                    cpu_us=event.cpu_time_total,
+                    self_cuda_us=getattr(
+                        event,
+                        "self_device_time_total",
+                        getattr(event, "self_cuda_time_total", 0),
+                    ),
+                )
+            )
+        operators.sort(key=lambda op: -op["self_cpu_us"])
+        self._profiler = None
+        return dict(operators=operators, trace=os.path.basename(trace_path))
+
+
+class ProfilingWindow(object):
+    """Profiles a window of units of work (e.g. rollouts) of an engine.
+
+    While the window is open, the engine's process is profiled with the
+    torch profiler (written as a chrome trace and a table of operators) and
+    a `SamplingProfiler`, and so are its task sampler processes (with a
+    `SamplingProfiler`). Profiles are written into `directory` once the
+    window is closed.
+
+    # Attributes
+
+    directory : Output directory.
+    name : Unique name of the engine's process (e.g. `"train_0"`).
+    role : Role of the engine (e.g. `"train"`), task samplers have role `"<role>_sampler"`.
+    first_unit : Index of the first unit profiled (counting from 0).
+    num_units : Number of units profiled.
+    interval : Sampling interval (seconds of CPU time) of the `SamplingProfiler`s.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        name: str,
+        role: str,
+        first_unit: int,
+        num_units: int,
+        interval: float = 0.005,
+        device: Optional[torch.device] = None,
+    ) -> None:
+        self.directory = directory
+        self.name = name
+        self.role = role
+        self.first_unit = first_unit
+        self.num_units = num_units
+        self.interval = interval
+
+        self.units_started = 0
+        self.units_finished = 0
+        self.active = False
+
+        self._sampling_profiler: Optional[SamplingProfiler] = None
+        self._torch_profiler = _TorchProfiler(
+            use_cuda=device is not None and torch.device(device).type == "cuda"
+        )
+
+    def unit_started(self, vector_tasks: Optional[Any] = None) -> None:
+        """To be called when a unit of work starts, with the task samplers
+        (`VectorSampledTasks`, if any) used for it."""
+        if self.units_started == self.first_unit and self.num_units > 0:
+            self.open(vector_tasks)
+        self.units_started += 1
+
+    def unit_finished(self, vector_tasks: Optional[Any] = None) -> None:
+        """To be called when a unit of work is finished."""
+        self.units_finished += 1
+        if self.active and self.units_finished >= self.first_unit + self.num_units:
+            self.close(vector_tasks)
+
+    def open(self, vector_tasks: Optional[Any] = None) -> None:
+        get_logger().info(
+            "{}: profiling {} units of work".format(self.name, self.num_units)
+        )
+        if vector_tasks is not None:
+            vector_tasks.start_profiling(interval=self.interval)
+        self._sampling_profiler = SamplingProfiler(interval=self.interval)
+        self._sampling_profiler.start()
+        self._torch_profiler.start()
+        self.active = True
+
+    def close(self, vector_tasks: Optional[Any] = None) -> None:
+        """Stops profiling (if active) and writes the profiles."""
+        if not self.active:
+            return
+        self.active = False
+
+        # Stopped first, so that processing the torch profile isn't sampled
+        self._sampling_profiler.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        torch_profile = self._torch_profiler.stop(
+            os.path.join(self.directory, "{}.trace.json".format(self.name))
+        )
+        write_profile(self.directory, self.name, self.role, "torch", torch_profile)
+
+        write_profile(
+            self.directory,
+            self.name,
+            self.role,
+            "python",
+            self._sampling_profiler.state_dict(),
+        )
+        self._sampling_profiler = None
+
+        if vector_tasks is not None and not vector_tasks.is_closed:
+            vector_tasks.stop_profiling(
+                directory=self.directory,
+                name="{}_sampler".format(self.name),
+                role="{}_sampler".format(self.role),
+            )
+        get_logger().info(
+            "{}: profiles written to {}".format(self.name, self.directory)
+        )
+
+
+def summarize_profiles(
+    directory: str, top_k: int = 25
+) -> Dict[str, Dict[str, Union[int, List[Dict[str, Any]]]]]:
+    """Merges the profiles in `directory` by role and writes the top
+    functions (by self time) of each role into `summary.txt` (and
+    `summary.json`).
+
+    # Parameters
+
+    directory : Directory with the profiles written by `ProfilingWindow`s.
+    top_k : Number of functions (or torch operators) per role.
+
+    # Returns
+
+    A dictionary from role (with a ` (torch)` suffix for torch operators) to the number of
+    processes merged and the top functions, with their self and total seconds.
+    """
+    python_functions: Dict[str, Dict[str, List[float]]] = defaultdict(
+        lambda: defaultdict(lambda: [0.0, 0.0])
+    )
+    torch_operators: Dict[str, Dict[str, List[float]]] = defaultdict(
+        lambda: defaultdict(lambda: [0.0, 0.0])
+    )
+    num_processes: Counter = Counter()
+
+    for path in sorted(glob.glob(os.path.join(directory, "*" + PROFILE_SUFFIX))):
+        with open(path, "r") as f:
+            profile = json.load(f)
+        role = profile["role"]
+        if profile["kind"] == "python":
+            num_processes[role] += 1
+            for function in profile["functions"]:
+                times = python_functions[role][function["function"]]
+                times[0] += function["self_samples"] * profile["interval"]
+                times[1] += function["total_samples"] * profile["interval"]
+        elif profile["kind"] == "torch":
+            num_processes[role + " (torch)"] += 1
+            for op in profile["operators"]:
+                times = torch_operators[role][op["name"]]
+                times[0] += op["self_cpu_us"] / 1e6
+                times[1] += op["cpu_us"] / 1e6
+
+    summary: Dict[str, Dict[str, Any]] = {}
+    lines: List[str] = []
+
+    def add_role(role: str, entries: List[Tuple[str, List[float]]], header: str):
+        total_self = sum(times[0] for _, times in entries)
+        top = sorted(entries, key=lambda entry: -entry[1][0])[:top_k]
+        summary[role] = dict(
+            num_processes=num_processes[role],
+            functions=[
+                dict(function=name, self_seconds=times[0], total_seconds=times[1])
+                for name, times in top
+            ],
+        )
+        lines.append(
+            "{} ({} processes, {:.3g}s self time):".format(
+                role, num_processes[role], total_self
+            )
+        )
+        lines.append(
+            "  {:>10} {:>7} {:>10}  {}".format("self_s", "self_%", "total_s", header)
+        )
+        for name, times in top:
+            lines.append(
+                "  {:>10.3f} {:>6.1f}% {:>10.3f}  {}".format(
+                    times[0], 100 * times[0] / max(total_self, 1e-12), times[1], name
+                )
+            )
+        lines.append("")
+
+    for role in sorted(python_functions):
+        add_role(role, list(python_functions[role].items()), "function")
+    for role in sorted(torch_operators):
+        add_role(role + " (torch)", list(torch_operators[role].items()), "operator")
+
+    if len(summary) > 0:
+        with open(os.path.join(directory, "summary.txt"), "w") as f:
+            f.write("\n".join(lines))
+        with open(os.path.join(directory, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+
+    return summary
@@ -0,0 +1,229 @@
+"""Constant memory, mergeable summaries of streams of scalars."""
+import math
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Union, cast
+
+import numpy as np
+
+
+class TDigest(object):
+    """Mergeable quantile sketch (merging t-digest, Dunning and Ertl, 2019).
+
+    Values are summarized by at most `O(compression)` weighted centroids,
+    with small centroids near the extremes so that tail quantiles are
+    accurate.
+
+    # Attributes
+
+    compression : Trade-off between accuracy and size (the number of centroids is bounded by
+        about `compression`).
+    """
+
+    def __init__(self, compression: float = 100.0) -> None:
+        self.compression = compression
+
+        self._means = np.zeros(0, dtype=np.float64)
+        self._weights = np.zeros(0, dtype=np.float64)
+        self._buffer: List[float] = []
+        self._buffer_weights: List[float] = []
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def total_weight(self) -> float:
+        return float(self._weights.sum()) + sum(self._buffer_weights)
+
+    @property
+    def num_centroids(self) -> int:
+        self._compress()
+        return len(self._means)
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        if weight <= 0:
+            return
+        self._buffer.append(value)
+        self._buffer_weights.append(weight)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        other._compress()
+        self._buffer.extend(other._means.tolist())
+        self._buffer_weights.extend(other._weights.tolist())
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _q_limit(self, q: float) -> float:
+        # k1 scale function k(q) = compression / (2 pi) * asin(2q - 1), one unit of k per centroid
+        k = self.compression / (2 * math.pi) * math.asin(2 * q - 1) + 1
+        return (
+            1.0
+            if k >= self.compression / 4
+            else (math.sin(2 * math.pi * k / self.compression) + 1) / 2
+        )
+
+    def _compress(self) -> None:
+        if len(self._buffer) == 0:
+            return
+
+        means = np.concatenate([self._means, np.array(self._buffer, dtype=np.float64)])
+        weights = np.concatenate(
+            [self._weights, np.array(self._buffer_weights, dtype=np.float64)]
+        )
+        self._buffer, self._buffer_weights = [], []
+
+        order = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+        total_weight = weights.sum()
+
+        new_means, new_weights = [means[0]], [weights[0]]
+        weight_so_far = 0.0  # weight before the current centroid
+        q_limit = self._q_limit(0.0)
+        for mean, weight in zip(means[1:], weights[1:]):
+            if (weight_so_far + new_weights[-1] + weight) / total_weight <= q_limit:
+                new_weights[-1] += weight
+                new_means[-1] += (mean - new_means[-1]) * weight / new_weights[-1]
+            else:
+                weight_so_far += new_weights[-1]
+                q_limit = self._q_limit(weight_so_far / total_weight)
+                new_means.append(mean)
+                new_weights.append(weight)
+
+        self._means = np.array(new_means, dtype=np.float64)
+        self._weights = np.array(new_weights, dtype=np.float64)
+
+    def quantile(self, q: float) -> float:
+        """Estimated `q`-quantile (`q` in [0, 1]) of the added values, `nan` if
+        the digest is empty."""
+        self._compress()
+        if len(self._means) == 0:
+            return math.nan
+
+        # Centroids are assumed to be centered at their cumulative weight midpoints
+        total_weight = self._weights.sum()
+        centers = np.cumsum(self._weights) - self._weights / 2
+        return float(
+            np.interp(
+                q * total_weight,
+                np.concatenate([[0.0], centers, [total_weight]]),
+                np.concatenate([[self.min], self._means, [self.max]]),
+            )
+        )
+
+    def __getstate__(self):
+        self._compress()
+        return self.__dict__
+
+
+class ScalarSummary(object):
+    """Count, mean, variance, extremes and quantiles of a stream of scalars.
+
+    Mean and variance are exact (Welford's algorithm, merged as in Chan
+    et al.) and quantiles are estimated with a `TDigest`.
+    """
+
+    def __init__(self, compression: float = 100.0) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.digest = TDigest(compression=compression)
+
+    @property
+    def min(self) -> float:
+        return self.digest.min
+
+    @property
+    def max(self) -> float:
+        return self.digest.max
+
+    @property
+    def variance(self) -> float:
+        """Unbiased sample variance (`nan` for less than two values)."""
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    def add(self, value: float, n: int = 1) -> None:
+        """Adds `n` copies of `value`."""
+        if n <= 0:
+            return
+        value = float(value)
+        count = self.count + n
+        delta = value - self.mean
+        self.mean += delta * n / count
+        self._m2 += delta ** 2 * self.count * n / count
+        self.count = count
+        self.digest.add(value, weight=n)
+
+    def merge(self, other: "ScalarSummary") -> None:
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.digest.merge(other.digest)
+
+    def quantile(self, q: float) -> float:
+        return self.digest.quantile(q)
+
+
+class ScalarSketchTracker(object):
+    """Track a collection of `scalar key -> ScalarSummary` pairs.
+
+    Unlike `ScalarMeanTracker`, it keeps (constant memory) distributional
+    information, e.g. to log percentiles of task metrics.
+    """
+
+    def __init__(self, compression: float = 100.0) -> None:
+        self.compression = compression
+        self._summaries: Dict[str, ScalarSummary] = OrderedDict()
+
+    def add_scalars(
+        self, scalars: Dict[str, Union[float, int]], n: Union[int, Dict[str, int]] = 1
+    ) -> None:
+        """Add additional scalars to track.
+
+        # Parameters
+
+        scalars : A dictionary of `scalar key -> value` pairs.
+        n : Number of copies of each value to add (a single number or a dictionary of
+            `scalar key -> count`).
+        """
+        for k, v in scalars.items():
+            if k not in self._summaries:
+                self._summaries[k] = ScalarSummary(compression=self.compression)
+            self._summaries[k].add(
+                v, n=cast(Dict[str, int], n)[k] if isinstance(n, Dict) else n
+            )
+
+    def merge(self, other: "ScalarSketchTracker") -> None:
+        for k, summary in other._summaries.items():
+            if k not in self._summaries:
+                self._summaries[k] = ScalarSummary(compression=self.compression)
+            self._summaries[k].merge(summary)
+
+    def summaries(self) -> Dict[str, ScalarSummary]:
+        return OrderedDict(self._summaries)
+
+    def percentiles(
+        self, percents: Sequence[float] = (5, 25, 50, 75, 95)
+    ) -> Dict[str, Dict[float, float]]:
+        """Estimated percentiles (`percents` in [0, 100]) of each tracked
+        scalar."""
+        return OrderedDict(
+            (k, OrderedDict((p, summary.quantile(p / 100)) for p in percents))
+            for k, summary in self._summaries.items()
+        )
+
+    def reset(self) -> None:
+        self._summaries = OrderedDict()
+
+    @property
+    def empty(self) -> bool:
+        return len(self._summaries) == 0
+
+    def get(self, key: str) -> Optional[ScalarSummary]:
+        return self._summaries.get(key)
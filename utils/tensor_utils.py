@@ -1,5 +1,6 @@
 """Functions used to manipulate pytorch tensors and numpy arrays."""
 
+import copy
 import numbers
 import os
 import tempfile
@@ -127,6 +128,25 @@ def detach_recursively(input: Any, inplace=True):
         )
 
 
+def cpu_copy_recursively(input: Any) -> Any:
+    """Recursively copies tensors in some data structure (e.g. state dicts
+    that keep being updated) into new, detached, cpu tensors."""
+    if isinstance(input, torch.Tensor):
+        return input.detach().to("cpu", copy=True)
+    elif isinstance(input, dict):
+        # Shallow copies keep the type (and attributes, e.g. state dicts' `_metadata`)
+        res = copy.copy(input)
+        for key in res:
+            res[key] = cpu_copy_recursively(input[key])
+        return res
+    elif isinstance(input, list):
+        return [cpu_copy_recursively(subinput) for subinput in input]
+    elif isinstance(input, tuple):
+        return tuple(cpu_copy_recursively(subinput) for subinput in input)
+    else:
+        return input
+
+
 def batch_observations(
     observations: List[Dict], device: Optional[torch.device] = None
 ) -> Dict[str, Union[Dict, torch.Tensor]]:
@@ -0,0 +1,140 @@
+"""Low overhead wall-clock timing of (hot) code sections."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Union
+
+import torch
+
+
+class _NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry: "TimerRegistry", name: str) -> None:
+        self.registry = registry
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        if self.registry.synchronize_device is not None:
+            torch.cuda.synchronize(self.registry.synchronize_device)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.registry.synchronize_device is not None:
+            torch.cuda.synchronize(self.registry.synchronize_device)
+        self.registry.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class TimerRegistry(object):
+    """Accumulates the time spent in named sections of code, e.g.
+
+    ```python
+    with timers.time("env_step"):
+        outputs = vector_tasks.step(actions)
+    ```
+
+    Sections may be nested (the time of inner sections is also part of the
+    outer ones) and timed from several threads. When disabled, `time`
+    returns a shared no-op context manager, so instrumented code pays a
+    single method call per section.
+
+    # Attributes
+
+    enabled : Whether sections are timed.
+    synchronize_device : If given, this CUDA device is synchronized when entering and
+        exiting sections, so that asynchronously launched kernels are timed in the
+        section launching them. By default, sections are timed in wall-clock time
+        only and kernels are timed in the next section waiting for their results
+        (e.g. copying them to the CPU). Synchronizing forces a host-device sync per
+        section and serializes concurrent work on the device (e.g. overlapped
+        rollouts and updates), so it is only meant for profiling.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        synchronize_device: Optional[Union[str, int, torch.device]] = None,
+    ) -> None:
+        self.enabled = enabled
+        self.synchronize_device = synchronize_device
+
+        self._lock = threading.Lock()
+        self._totals: Dict[str, float] = OrderedDict()
+        self._counts: Dict[str, int] = OrderedDict()
+        self._last_pop = time.perf_counter()
+
+    def time(self, name: str) -> Union[_Timer, _NullTimer]:
+        """Context manager adding the time spent in its block to `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            if name in self._totals:
+                self._totals[name] += seconds
+                self._counts[name] += 1
+            else:
+                self._totals[name] = seconds
+                self._counts[name] = 1
+
+    def totals(self) -> Dict[str, float]:
+        """Total seconds spent in each section."""
+        with self._lock:
+            return OrderedDict(self._totals)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of times each section was timed."""
+        with self._lock:
+            return OrderedDict(self._counts)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals = OrderedDict()
+            self._counts = OrderedDict()
+            self._last_pop = time.perf_counter()
+
+    def pop_summary(self, prefix: str = "timing/") -> Dict[str, float]:
+        """Summarizes and resets the sections timed since the last call.
+
+        # Parameters
+
+        prefix : Prefix of the returned keys.
+
+        # Returns
+
+        A dictionary with, for each section `name`, the mean milliseconds per call
+        (`{prefix}{name}_ms`) and the fraction of the wall-clock time since the last call
+        spent in the section (`{prefix}{name}_fraction`, which may add up to more than 1
+        for nested sections or sections timed in concurrent threads). Empty if disabled.
+        """
+        with self._lock:
+            now = time.perf_counter()
+            elapsed = now - self._last_pop
+            totals, counts = self._totals, self._counts
+            self._totals, self._counts = OrderedDict(), OrderedDict()
+            self._last_pop = now
+
+        summary: Dict[str, float] = OrderedDict()
+        for name, total in totals.items():
+            summary["{}{}_ms".format(prefix, name)] = 1000 * total / counts[name]
+            summary["{}{}_fraction".format(prefix, name)] = (
+                total / elapsed if elapsed > 0 else 0.0
+            )
+        return summary